@@ -0,0 +1,113 @@
+"""
+Learning analytics endpoints (read from the daily and weekly rollups)
+"""
+from datetime import date, datetime, timedelta, timezone
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.models import StudySession, User
+from app.services.analytics_service import analytics_service, ALL_TOPICS
+
+router = APIRouter()
+
+# Days shown when a query gives no start date
+DEFAULT_DAYS = 30
+
+
+class RecordStudySessionRequest(BaseModel):
+    """Request model for recording a study session"""
+    user_id: int
+    session_type: str  # review, quiz, tutor, note_taking
+    duration: int = Field(ge=0)  # minutes
+    topics_covered: List[str] = []
+    performance_data: Optional[Dict] = None  # e.g. {"score": 80, "topic_scores": {"Mitosis": 65}}
+
+
+def _date_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start is after end")
+    if (end - start).days + 1 > settings.ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is longer than {settings.ANALYTICS_MAX_DAYS} days")
+    return start, end
+
+
+@router.post("/study-sessions")
+async def record_study_session(request: RecordStudySessionRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Store a study session and add it to the analytics rollups
+    """
+    if await db.get(User, request.user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    session = StudySession(
+        user_id=request.user_id,
+        session_type=request.session_type,
+        duration=request.duration,
+        topics_covered=request.topics_covered,
+        performance_data=request.performance_data,
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(session)
+    await analytics_service.record_study_session(db, session)
+    await db.commit()
+    return {"id": session.id, "user_id": session.user_id, "created_at": session.created_at}
+
+
+@router.get("/users/{user_id}/daily")
+async def daily_activity(
+    user_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    topic: str = ALL_TOPICS,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Quiz and study activity per day (UTC), for one topic or across all topics
+    """
+    start, end = _date_range(start, end)
+    series = await analytics_service.series(db, user_id, "day", start, end, topic)
+    return {"user_id": user_id, "topic": topic or None, "start": start, "end": end, "days": series}
+
+
+@router.get("/users/{user_id}/weekly")
+async def weekly_activity(
+    user_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    topic: str = ALL_TOPICS,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Quiz and study activity per week (Monday to Sunday, UTC), for one topic or across all topics
+    """
+    start, end = _date_range(start, end)
+    series = await analytics_service.series(db, user_id, "week", start, end, topic)
+    return {"user_id": user_id, "topic": topic or None, "start": start, "end": end, "weeks": series}
+
+
+@router.get("/users/{user_id}/topics")
+async def topic_breakdown(
+    user_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Quiz and study activity per topic over a date range, most often weak first
+    """
+    start, end = _date_range(start, end)
+    topics = await analytics_service.topics(db, user_id, start, end)
+    return {"user_id": user_id, "start": start, "end": end, "topics": topics}
+
+
+@router.post("/backfill")
+async def backfill(user_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Rebuild the rollups from stored quiz attempts and study sessions (all users, or one)
+    """
+    return await analytics_service.backfill(db, user_id)
@@ -0,0 +1,86 @@
+"""
+Offline batch generation endpoints
+"""
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import FileResponse
+from typing import Optional
+from app.services.batch_service import batch_service
+from app.core.config import settings
+import aiofiles
+import os
+import uuid
+
+router = APIRouter()
+
+
+@router.post("/jobs")
+async def create_batch(
+    file: UploadFile = File(...),
+    concurrency: Optional[int] = None
+):
+    """
+    Start a batch from an uploaded JSONL file of jobs (at most BATCH_MAX_JOBS lines)
+    """
+    upload_path = os.path.join(settings.BATCH_DIR, f"upload-{uuid.uuid4().hex}.jsonl")
+    try:
+        lines, last = 0, b"\n"
+        async with aiofiles.open(upload_path, 'wb') as out_file:
+            while chunk := await file.read(1024 * 1024):
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+                if lines > settings.BATCH_MAX_JOBS:
+                    break
+                await out_file.write(chunk)
+        if lines + (last != b"\n") > settings.BATCH_MAX_JOBS:
+            raise HTTPException(status_code=413, detail=f"Batch has more than {settings.BATCH_MAX_JOBS} jobs")
+
+        batch_id = batch_service.start(upload_path, concurrency)
+        return {"batch_id": batch_id, "status": "running"}
+
+    except Exception:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+        raise
+
+
+@router.get("/jobs/{batch_id}")
+async def get_batch(batch_id: str):
+    """
+    Get the status and progress of a batch
+    """
+    try:
+        manifest = batch_service.status(batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return manifest
+
+
+@router.get("/jobs/{batch_id}/results")
+async def get_batch_results(batch_id: str):
+    """
+    Download the results JSONL of a batch (complete or in progress)
+    """
+    try:
+        path = os.path.join(batch_service.batch_dir(batch_id), "results.jsonl")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Results not found")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"{batch_id}.jsonl")
+
+
+@router.post("/jobs/{batch_id}/resume")
+async def resume_batch(batch_id: str, concurrency: Optional[int] = None):
+    """
+    Resume an interrupted or failed batch, skipping jobs that already succeeded
+    """
+    try:
+        jobs_path = os.path.join(batch_service.batch_dir(batch_id), "jobs.jsonl")
+        if not os.path.exists(jobs_path):
+            raise HTTPException(status_code=404, detail="Batch not found")
+        batch_service.start(jobs_path, concurrency, batch_id=batch_id)
+        return {"batch_id": batch_id, "status": "running"}
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
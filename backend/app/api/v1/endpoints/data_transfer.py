@@ -0,0 +1,40 @@
+"""
+Export and import of a user's learning data (NDJSON)
+"""
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db
+from app.models.models import User
+from app.services.data_transfer import data_transfer, ImportFormatError
+
+router = APIRouter()
+
+
+@router.get("/users/{user_id}/export")
+async def export_user_data(user_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Stream a user's subjects, topics, notes, flashcards, quizzes and quiz attempts as NDJSON
+    """
+    if await db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return StreamingResponse(
+        data_transfer.export(user_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="user-{user_id}-export.ndjson"'}
+    )
+
+
+@router.post("/users/{user_id}/import")
+async def import_user_data(user_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Import an NDJSON export (the request body) into a user's account
+    """
+    if await db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.close()  # the import commits batches in its own session
+    try:
+        imported = await data_transfer.import_records(user_id, request.stream())
+        return {"imported": imported}
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "imported": e.imported})
@@ -1,7 +1,7 @@
 """
 Flashcard endpoints
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import List, Optional
 from app.services.nlp_service import nlp_service
@@ -26,8 +26,5 @@ async def generate_flashcards(request: GenerateFlashcardsRequest):
     """
     Generate flashcards from content
     """
-    try:
-        flashcards = await nlp_service.generate_flashcards(request.content, request.count)
-        return [FlashcardResponse(**card) for card in flashcards]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    flashcards = await nlp_service.generate_flashcards(request.content, request.count)
+    return [FlashcardResponse(**card) for card in flashcards]
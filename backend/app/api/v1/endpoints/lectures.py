@@ -0,0 +1,80 @@
+"""
+Lecture endpoints (timed transcript segments)
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.core.database import get_db
+from app.models.models import Lecture
+from app.services.nlp_service import nlp_service
+from app.services.transcript_segments import SegmentTrack
+
+router = APIRouter()
+
+
+class RangeNotesRequest(BaseModel):
+    """Request model for notes on part of a lecture"""
+    start: float = Field(default=0.0, ge=0)
+    end: float
+    subject: Optional[str] = None
+
+
+async def _load_segments(db: AsyncSession, lecture_id: int) -> SegmentTrack:
+    row = (await db.execute(select(Lecture.id, Lecture.segments).where(Lecture.id == lecture_id))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Lecture not found")
+    if row.segments is None:
+        raise HTTPException(status_code=400, detail="Lecture has no timed segments")
+    return SegmentTrack.from_bytes(row.segments)
+
+
+def _covered(track: SegmentTrack, i: int, j: int) -> Optional[list]:
+    """[first start, last end] in seconds of segments [i, j)"""
+    if j <= i:
+        return None
+    return [float(track.starts[i]), float(track.starts[j - 1] + track.durations[j - 1])]
+
+
+@router.get("/{lecture_id}/segments")
+async def get_segments(
+    lecture_id: int,
+    start: float = Query(default=0.0, ge=0),
+    end: Optional[float] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Captions overlapping [start, end) seconds, as parallel arrays
+
+    Segment k's text is text[offsets[k]:offsets[k + 1] - 1] (character offsets).
+    """
+    if end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    track = await _load_segments(db, lecture_id)
+    i, j = track.span(start, float("inf") if end is None else end)
+    # Returned directly so ORJSONResponse serializes the NumPy arrays without per-item conversion
+    return ORJSONResponse({
+        "lecture_id": lecture_id, "start": start, "end": end, "count": j - i,
+        "covered": _covered(track, i, j), **track.slice(i, j),
+    })
+
+
+@router.post("/{lecture_id}/notes")
+async def generate_range_notes(lecture_id: int, request: RangeNotesRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Generate notes from the captions between start and end seconds of a lecture
+    """
+    if request.end <= request.start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    track = await _load_segments(db, lecture_id)
+    i, j = track.span(request.start, request.end)
+    if j <= i:
+        raise HTTPException(status_code=400, detail="No captions in that time range")
+
+    notes = await nlp_service.generate_notes(track.text_between(i, j), request.subject or "")
+    return {
+        "lecture_id": lecture_id, "start": request.start, "end": request.end,
+        "segments": j - i, "covered": _covered(track, i, j), "notes": notes,
+    }
@@ -1,10 +1,14 @@
 """
 Notes endpoints
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 from typing import Optional
-from app.services.nlp_service import nlp_service
+from app.core.database import get_db
+from app.models.models import Note, Lecture
+from app.services.nlp_service import TranscriptMismatchError, nlp_service
 
 router = APIRouter()
 
@@ -26,13 +30,85 @@ async def generate_notes(request: GenerateNotesRequest):
     """
     Generate structured notes from content
     """
+    notes = await nlp_service.generate_notes(request.content, request.subject or "")
+    summary = await nlp_service.summarize_text(request.content, max_length=150)
+    
+    return NotesResponse(notes=notes, summary=summary)
+
+
+class UpdateNotesRequest(BaseModel):
+    """Request model for incrementally updating notes"""
+    notes: str = ""
+    transcript: str
+    covered_offset: int = 0
+    subject: Optional[str] = None
+
+
+class UpdateNotesResponse(BaseModel):
+    """Response model for incremental notes"""
+    notes: str
+    covered_offset: int
+    processed_chars: int
+
+
+@router.post("/update", response_model=UpdateNotesResponse)
+async def update_notes(request: UpdateNotesRequest):
+    """
+    Extend notes with the part of a growing transcript after covered_offset
+    """
+    try:
+        notes, offset = await nlp_service.update_notes(
+            request.notes, request.transcript, request.covered_offset, request.subject or ""
+        )
+    except TranscriptMismatchError as e:
+        raise HTTPException(status_code=409, detail=f"{e}. Send empty notes and covered_offset 0 to regenerate")
+    return UpdateNotesResponse(
+        notes=notes,
+        covered_offset=offset,
+        processed_chars=offset - request.covered_offset
+    )
+
+
+@router.post("/{note_id}/refresh", response_model=UpdateNotesResponse)
+async def refresh_note(note_id: int, full: bool = False, db: AsyncSession = Depends(get_db)):
+    """
+    Update a stored note from its lecture's transcript, processing only new text
+
+    With full=true the note is regenerated from the whole transcript,
+    replacing its content. That is required for notes stored before
+    offsets were tracked and for transcripts that were replaced.
+    """
+    note = await db.get(Note, note_id, options=[undefer(Note.content)])
+    if note is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    lecture = await db.get(Lecture, note.lecture_id, options=[undefer(Lecture.transcript)]) if note.lecture_id else None
+    if lecture is None or not lecture.transcript:
+        raise HTTPException(status_code=400, detail="Note has no lecture transcript")
+    
+    if full:
+        previous_notes, previous_offset = "", 0
+    elif note.transcript_offset is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Note predates transcript offsets, so the text it covers is unknown; "
+                   "refresh with full=true to regenerate it"
+        )
+    else:
+        previous_notes, previous_offset = note.content, note.transcript_offset
     try:
-        notes = await nlp_service.generate_notes(request.content, request.subject or "")
-        summary = await nlp_service.summarize_text(request.content, max_length=150)
-        
-        return NotesResponse(notes=notes, summary=summary)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        notes, offset = await nlp_service.update_notes(previous_notes, lecture.transcript, previous_offset)
+    except TranscriptMismatchError as e:
+        raise HTTPException(status_code=409, detail=f"{e}. Refresh with full=true to regenerate the note")
+    if offset != previous_offset:
+        note.content = notes
+        note.transcript_offset = offset
+        note.note_type = "ai_generated"
+        await db.commit()
+    return UpdateNotesResponse(
+        notes=notes,
+        covered_offset=offset,
+        processed_chars=offset - previous_offset
+    )
 
 
 @router.post("/extract-concepts")
@@ -40,8 +116,5 @@ async def extract_concepts(content: str):
     """
     Extract key concepts from content
     """
-    try:
-        concepts = await nlp_service.extract_key_concepts(content)
-        return {"concepts": concepts}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    concepts = await nlp_service.extract_key_concepts(content)
+    return {"concepts": concepts}
@@ -1,9 +1,14 @@
 """
 Quiz endpoints
 """
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict
+from app.core.database import get_db
+from app.models.models import Quiz, QuizAttempt, User
+from app.services.analytics_service import analytics_service
 from app.services.quiz_service import quiz_service
 
 router = APIRouter()
@@ -23,6 +28,20 @@ class EvaluateQuizRequest(BaseModel):
     user_answers: List[str]
 
 
+class RecordAttemptRequest(BaseModel):
+    """Request model for recording an attempt at a stored quiz"""
+    user_id: int
+    user_answers: List[str]
+    time_taken: Optional[int] = Field(default=None, ge=0)  # seconds
+
+
+class ExplainAttemptRequest(BaseModel):
+    """Request model for explaining a quiz attempt"""
+    questions: List[Dict]
+    user_answers: List[str]
+    learning_style: str = "visual"
+
+
 class AdaptiveQuizRequest(BaseModel):
     """Request model for adaptive quiz"""
     weak_topics: List[str]
@@ -35,16 +54,13 @@ async def generate_quiz(request: GenerateQuizRequest):
     """
     Generate a quiz from content
     """
-    try:
-        questions = await quiz_service.generate_quiz(
-            content=request.content,
-            num_questions=request.num_questions,
-            difficulty=request.difficulty,
-            question_types=request.question_types
-        )
-        return {"questions": questions}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    questions = await quiz_service.generate_quiz(
+        content=request.content,
+        num_questions=request.num_questions,
+        difficulty=request.difficulty,
+        question_types=request.question_types
+    )
+    return {"questions": questions}
 
 
 @router.post("/evaluate")
@@ -52,14 +68,38 @@ async def evaluate_quiz(request: EvaluateQuizRequest):
     """
     Evaluate a quiz attempt
     """
-    try:
-        results = quiz_service.evaluate_quiz_attempt(
-            questions=request.questions,
-            user_answers=request.user_answers
-        )
-        return results
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    results = quiz_service.evaluate_quiz_attempt(
+        questions=request.questions,
+        user_answers=request.user_answers
+    )
+    return results
+
+
+@router.post("/{quiz_id}/attempts")
+async def record_attempt(quiz_id: int, request: RecordAttemptRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Evaluate and store an attempt at a stored quiz, updating the analytics rollups
+    """
+    quiz = await db.get(Quiz, quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if await db.get(User, request.user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    results = quiz_service.evaluate_quiz_attempt(questions=quiz.questions or [], user_answers=request.user_answers)
+    attempt = QuizAttempt(
+        quiz_id=quiz_id,
+        user_id=request.user_id,
+        answers=request.user_answers,
+        score=results["score"],
+        time_taken=request.time_taken,
+        weak_areas=results["weak_areas"],
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(attempt)
+    await analytics_service.record_quiz_attempt(db, attempt)
+    await db.commit()
+    return {"id": attempt.id, **results}
 
 
 @router.post("/adaptive")
@@ -67,15 +107,12 @@ async def generate_adaptive_quiz(request: AdaptiveQuizRequest):
     """
     Generate an adaptive quiz based on weak areas
     """
-    try:
-        questions = await quiz_service.generate_adaptive_quiz(
-            weak_topics=request.weak_topics,
-            user_level=request.user_level,
-            previous_performance=request.previous_performance
-        )
-        return {"questions": questions}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    questions = await quiz_service.generate_adaptive_quiz(
+        weak_topics=request.weak_topics,
+        user_level=request.user_level,
+        previous_performance=request.previous_performance
+    )
+    return {"questions": questions}
 
 
 @router.post("/explain")
@@ -88,13 +125,23 @@ async def explain_question(
     """
     Get explanation for a quiz question
     """
-    try:
-        explanation = await quiz_service.get_question_explanation(
-            question=question,
-            correct_answer=correct_answer,
-            user_answer=user_answer,
-            learning_style=learning_style
-        )
-        return {"explanation": explanation}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    explanation = await quiz_service.get_question_explanation(
+        question=question,
+        correct_answer=correct_answer,
+        user_answer=user_answer,
+        learning_style=learning_style
+    )
+    return {"explanation": explanation}
+
+
+@router.post("/explain-attempt")
+async def explain_attempt(request: ExplainAttemptRequest):
+    """
+    Get explanations for every wrong answer in a quiz attempt
+    """
+    explanations = await quiz_service.explain_attempt(
+        questions=request.questions,
+        user_answers=request.user_answers,
+        learning_style=request.learning_style
+    )
+    return {"explanations": explanations}
@@ -0,0 +1,33 @@
+"""
+Full-text search endpoints
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.core.config import settings
+from app.core.database import get_db
+from app.services.search_service import search_index, KINDS
+
+router = APIRouter()
+
+
+@router.get("/")
+async def search(
+    q: str,
+    user_id: int,
+    kind: Optional[str] = None,
+    limit: int = Query(default=20, ge=1),
+    offset: int = Query(default=0, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Search a user's notes and lecture transcripts, best matches first, with highlighted snippets
+    """
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(KINDS)}")
+    limit = min(limit, settings.SEARCH_MAX_RESULTS)
+    try:
+        page = await search_index.search(db, user_id, q, [kind] if kind else None, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "limit": limit, "offset": offset, **page}
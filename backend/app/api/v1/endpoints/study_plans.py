@@ -1,24 +1,153 @@
 """
-Study plan endpoints (placeholder for database operations)
+Study plan endpoints
 """
-from fastapi import APIRouter
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.models import QuizAttempt, StudyPlan, Subject, Topic, User
+from app.services.ai_tutor_service import ai_tutor_service
+from app.services.study_scheduler import parse_deadline, study_scheduler
 
 router = APIRouter()
 
+# Quiz attempts whose weak areas count towards a new plan
+RECENT_ATTEMPTS = 5
+
+
+class CreateStudyPlanRequest(BaseModel):
+    """Request model for creating a study plan"""
+    user_id: int
+    title: str = "Study plan"
+    available_hours_per_week: float = Field(gt=0, le=100)
+    goals: List[str] = []
+    deadline: Optional[str] = None
+    weak_areas: Optional[List[str]] = None  # defaults to the user's topics, weakest first
+
+
+async def _mastery_rollup(db: AsyncSession, user_id: int) -> Dict[str, float]:
+    """
+    Mastery by topic name from the user's topics and recent quiz attempts
+    
+    Topics flagged weak in recent attempts count as at most half the
+    weak-area threshold, so they are scheduled ahead of partly known ones.
+    """
+    mastery: Dict[str, float] = {}
+    topics = await db.execute(
+        select(Topic.name, Topic.mastery_level).join(Subject, Topic.subject_id == Subject.id).where(Subject.user_id == user_id)
+    )
+    for name, level in topics:
+        mastery[name] = min(mastery.get(name, 1.0), level or 0.0)
+    
+    attempts = await db.execute(
+        select(QuizAttempt.weak_areas)
+        .where(QuizAttempt.user_id == user_id)
+        .order_by(QuizAttempt.created_at.desc())
+        .limit(RECENT_ATTEMPTS)
+    )
+    for (weak_areas,) in attempts:
+        for area in weak_areas or []:
+            mastery[area] = min(mastery.get(area, 0.0), settings.WEAK_AREA_THRESHOLD / 2)
+    return mastery
+
+
+def _plan_dict(plan: StudyPlan) -> Dict:
+    return {
+        "id": plan.id,
+        "user_id": plan.user_id,
+        "title": plan.title,
+        "description": plan.description,
+        "status": plan.status,
+        "goals": plan.goals,
+        "hours_per_week": plan.hours_per_week,
+        "weekly_schedule": plan.schedule,
+        "allocation": plan.allocation,
+        "priority_topics": plan.priority_topics,
+        "milestones": plan.milestones,
+        "tips": plan.tips,
+        "start_date": plan.start_date,
+        "end_date": plan.end_date,
+        "created_at": plan.created_at,
+    }
+
 
 @router.get("/")
-async def list_study_plans():
-    """List all study plans"""
-    return {"message": "Study plan listing - to be implemented with database"}
+async def list_study_plans(user_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """List study plans, newest first"""
+    query = select(StudyPlan).order_by(StudyPlan.id.desc())
+    if user_id is not None:
+        query = query.where(StudyPlan.user_id == user_id)
+    plans = (await db.execute(query)).scalars().all()
+    return {"study_plans": [
+        {
+            "id": plan.id,
+            "user_id": plan.user_id,
+            "title": plan.title,
+            "status": plan.status,
+            "start_date": plan.start_date,
+            "end_date": plan.end_date,
+        }
+        for plan in plans
+    ]}
 
 
 @router.post("/")
-async def create_study_plan():
-    """Create a new study plan"""
-    return {"message": "Study plan creation - to be implemented with database"}
+async def create_study_plan(request: CreateStudyPlanRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Create a study plan from the user's topic mastery and recent quiz results
+    """
+    if request.available_hours_per_week > study_scheduler.max_hours_per_week:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {study_scheduler.max_hours_per_week:g} hours per week fit between STUDY_DAY_START and STUDY_DAY_END"
+        )
+    if await db.get(User, request.user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    mastery = await _mastery_rollup(db, request.user_id)
+    weak_areas = request.weak_areas or sorted(
+        (name for name, level in mastery.items() if level < 1.0), key=lambda name: mastery[name]
+    )
+    if not weak_areas:
+        raise HTTPException(status_code=400, detail="No topics to plan; pass weak_areas")
+    
+    plan = await ai_tutor_service.generate_study_plan(
+        weak_areas=weak_areas,
+        available_hours_per_week=request.available_hours_per_week,
+        goals=request.goals,
+        deadline=request.deadline,
+        mastery=mastery
+    )
+    
+    deadline = parse_deadline(request.deadline)
+    study_plan = StudyPlan(
+        user_id=request.user_id,
+        title=request.title,
+        description=f"{request.available_hours_per_week:g} hours per week across {len(plan['allocation'])} topics",
+        goals=request.goals,
+        schedule=plan["weekly_schedule"],
+        allocation=plan["allocation"],
+        priority_topics=plan["priority_topics"],
+        milestones=plan["milestones"],
+        tips=plan["tips"],
+        hours_per_week=request.available_hours_per_week,
+        start_date=datetime.now(timezone.utc),
+        end_date=datetime(deadline.year, deadline.month, deadline.day, tzinfo=timezone.utc) if deadline else None,
+    )
+    db.add(study_plan)
+    await db.commit()
+    await db.refresh(study_plan)
+    return _plan_dict(study_plan)
 
 
 @router.get("/{plan_id}")
-async def get_study_plan(plan_id: int):
+async def get_study_plan(plan_id: int, db: AsyncSession = Depends(get_db)):
     """Get study plan by ID"""
-    return {"message": f"Get study plan {plan_id} - to be implemented with database"}
+    plan = await db.get(StudyPlan, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Study plan not found")
+    return _plan_dict(plan)
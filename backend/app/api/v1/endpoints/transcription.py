@@ -1,14 +1,17 @@
 """
 Transcription endpoints
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect, Depends
 from pydantic import BaseModel, HttpUrl
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
+from app.core.database import get_db
+from app.models.models import Lecture, Subject
 from app.services.transcription_service import transcription_service
+from app.services.live_transcription import LiveTranscriptionSession
+from app.services.upload_store import upload_store, UploadTooLargeError
 from app.services.nlp_service import nlp_service
-import aiofiles
-import os
-from app.core.config import settings
+from app.services.keyword_extractor import keyword_extractor, document_key
 
 router = APIRouter()
 
@@ -18,6 +21,7 @@ class YouTubeTranscribeRequest(BaseModel):
     url: HttpUrl
     generate_notes: bool = True
     subject: Optional[str] = None
+    subject_id: Optional[int] = None  # store the lecture, with its timed segments, under this subject
 
 
 class TranscriptionResponse(BaseModel):
@@ -27,34 +31,53 @@ class TranscriptionResponse(BaseModel):
     key_concepts: Optional[list] = None
     duration: Optional[int] = None
     title: Optional[str] = None
+    normalization: Optional[dict] = None
+    content_hash: Optional[str] = None
+    cached: Optional[bool] = None
+    lecture_id: Optional[int] = None
 
 
 @router.post("/youtube", response_model=TranscriptionResponse)
-async def transcribe_youtube(request: YouTubeTranscribeRequest):
+async def transcribe_youtube(request: YouTubeTranscribeRequest, db: AsyncSession = Depends(get_db)):
     """
     Transcribe a YouTube video and optionally generate notes
+
+    With subject_id, the lecture is stored with its timed caption segments
+    (see /lectures/{lecture_id}/segments).
     """
-    try:
-        # Transcribe video
-        transcript, metadata = await transcription_service.transcribe_youtube_video(str(request.url))
-        
-        response_data = {
-            "transcript": transcript,
-            "title": metadata.get('title'),
-            "duration": metadata.get('duration')
-        }
-        
-        # Generate notes if requested
-        if request.generate_notes:
-            notes = await nlp_service.generate_notes(transcript, request.subject or "")
-            concepts = await nlp_service.extract_key_concepts(transcript)
-            response_data["notes"] = notes
-            response_data["key_concepts"] = concepts
-        
-        return TranscriptionResponse(**response_data)
+    if request.subject_id is not None and await db.get(Subject, request.subject_id) is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    # Transcribe video
+    transcript, metadata = await transcription_service.transcribe_youtube_video(
+        str(request.url), segments=request.subject_id is not None
+    )
+    await keyword_extractor.add_document(document_key(video_id=metadata['video_id']), transcript)
+    
+    response_data = {
+        "transcript": transcript,
+        "title": metadata.get('title'),
+        "duration": metadata.get('duration'),
+        "normalization": metadata.get('normalization')
+    }
+    
+    if request.subject_id is not None:
+        lecture = Lecture(
+            subject_id=request.subject_id, title=metadata.get('title') or str(request.url),
+            source_type="youtube", source_url=str(request.url), transcript=transcript,
+            segments=metadata.get('segments'), duration=metadata.get('duration'), status="completed"
+        )
+        db.add(lecture)
+        await db.commit()
+        response_data["lecture_id"] = lecture.id
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Generate notes if requested
+    if request.generate_notes:
+        notes = await nlp_service.generate_notes(transcript, request.subject or "")
+        concepts = await nlp_service.extract_key_concepts(transcript)
+        response_data["notes"] = notes
+        response_data["key_concepts"] = concepts
+    
+    return TranscriptionResponse(**response_data)
 
 
 @router.post("/upload", response_model=TranscriptionResponse)
@@ -64,20 +87,15 @@ async def transcribe_upload(
 ):
     """
     Transcribe an uploaded audio/video file (notes generation disabled - requires paid OpenAI)
+    
+    Uploads are stored once per content hash; a recording that was already
+    transcribed returns its stored transcript without calling Whisper.
     """
-    file_path = None
     try:
-        # Save uploaded file
-        file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
-        
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
+        stored = await upload_store.save(file)
+        transcript, reused = await upload_store.transcript_for(stored, transcription_service.transcribe_audio_file)
         
-        # Transcribe using LOCAL Whisper (FREE!)
-        transcript = await transcription_service.transcribe_audio_file(file_path)
-        
-        response_data = {"transcript": transcript}
+        response_data = {"transcript": transcript, "content_hash": stored.digest, "cached": reused}
         
         # Notes generation disabled (requires OpenAI API - paid)
         # Users can enable this by setting up OpenAI API key and uncommenting below:
@@ -89,18 +107,53 @@ async def transcribe_upload(
         
         return TranscriptionResponse(**response_data)
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@router.websocket("/live")
+async def transcribe_live(websocket: WebSocket, sample_rate: Optional[int] = None):
+    """
+    Transcribe a live lecture streamed as binary 16-bit mono PCM frames
+    
+    The first frame may carry a WAV header instead of the sample_rate query
+    parameter. Ordered {"type": "partial"} messages are pushed as each window
+    is transcribed; send the text "stop" to flush the tail and receive
+    {"type": "final"} with the full transcript.
+    """
+    await websocket.accept()
+    if not transcription_service.client:
+        await websocket.send_json({"type": "error", "detail": "OpenAI API key is not configured"})
+        await websocket.close(code=1011)
+        return
     
-    finally:
-        # Clean up uploaded file
-        if file_path and os.path.exists(file_path):
-            try:
-                import time
-                time.sleep(0.1)  # Brief delay to ensure file is released
-                os.remove(file_path)
-            except Exception:
-                pass  # Ignore cleanup errors
+    session = None
+    try:
+        session = LiveTranscriptionSession(websocket.send_json, sample_rate=sample_rate)
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                await session.cancel()
+                return
+            if message.get("bytes"):
+                await session.feed(message["bytes"])
+            elif (message.get("text") or "").strip().lower() in ("stop", '{"type": "stop"}'):
+                break
+        
+        transcript = await session.finish()
+        await websocket.send_json({
+            "type": "final",
+            "transcript": transcript,
+            "windows": session.windows
+        })
+        await websocket.close()
+    
+    except WebSocketDisconnect:
+        if session:
+            await session.cancel()
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1003)
 
 
 @router.post("/summarize")
@@ -108,8 +161,5 @@ async def summarize_transcript(transcript: str, max_length: int = 300):
     """
     Summarize a transcript
     """
-    try:
-        summary = await nlp_service.summarize_text(transcript, max_length)
-        return {"summary": summary}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    summary = await nlp_service.summarize_text(transcript, max_length)
+    return {"summary": summary}
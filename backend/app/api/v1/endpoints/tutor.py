@@ -2,9 +2,10 @@
 AI Tutor endpoints
 """
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 from app.services.ai_tutor_service import ai_tutor_service
+from app.services.study_scheduler import study_scheduler
 
 router = APIRouter()
 
@@ -29,9 +30,10 @@ class ExplainConceptRequest(BaseModel):
 class StudyPlanRequest(BaseModel):
     """Request model for study plan generation"""
     weak_areas: List[str]
-    available_hours_per_week: int
+    available_hours_per_week: int = Field(gt=0)
     goals: List[str]
     deadline: Optional[str] = None
+    mastery: Optional[Dict[str, float]] = None  # topic -> 0.0 to 1.0
 
 
 class RecommendResourcesRequest(BaseModel):
@@ -46,17 +48,14 @@ async def ask_tutor(request: TutorQuestionRequest):
     """
     Ask the AI tutor a question
     """
-    try:
-        response = await ai_tutor_service.get_tutor_response(
-            user_id=request.user_id,
-            question=request.question,
-            context=request.context,
-            learning_style=request.learning_style,
-            subject=request.subject
-        )
-        return {"response": response}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    response = await ai_tutor_service.get_tutor_response(
+        user_id=request.user_id,
+        question=request.question,
+        context=request.context,
+        learning_style=request.learning_style,
+        subject=request.subject
+    )
+    return {"response": response}
 
 
 @router.post("/explain")
@@ -64,16 +63,13 @@ async def explain_concept(request: ExplainConceptRequest):
     """
     Get explanation for a concept
     """
-    try:
-        explanation = await ai_tutor_service.explain_concept(
-            concept=request.concept,
-            depth_level=request.depth_level,
-            learning_style=request.learning_style,
-            include_examples=request.include_examples
-        )
-        return {"explanation": explanation}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    explanation = await ai_tutor_service.explain_concept(
+        concept=request.concept,
+        depth_level=request.depth_level,
+        learning_style=request.learning_style,
+        include_examples=request.include_examples
+    )
+    return {"explanation": explanation}
 
 
 @router.post("/study-plan")
@@ -81,16 +77,19 @@ async def generate_study_plan(request: StudyPlanRequest):
     """
     Generate a personalized study plan
     """
-    try:
-        plan = await ai_tutor_service.generate_study_plan(
-            weak_areas=request.weak_areas,
-            available_hours_per_week=request.available_hours_per_week,
-            goals=request.goals,
-            deadline=request.deadline
+    if request.available_hours_per_week > study_scheduler.max_hours_per_week:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {study_scheduler.max_hours_per_week:g} hours per week fit between STUDY_DAY_START and STUDY_DAY_END"
         )
-        return plan
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    plan = await ai_tutor_service.generate_study_plan(
+        weak_areas=request.weak_areas,
+        available_hours_per_week=request.available_hours_per_week,
+        goals=request.goals,
+        deadline=request.deadline,
+        mastery=request.mastery
+    )
+    return plan
 
 
 @router.post("/recommend-resources")
@@ -98,15 +97,12 @@ async def recommend_resources(request: RecommendResourcesRequest):
     """
     Get resource recommendations for a topic
     """
-    try:
-        resources = await ai_tutor_service.recommend_resources(
-            topic=request.topic,
-            current_level=request.current_level,
-            learning_style=request.learning_style
-        )
-        return {"resources": resources}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    resources = await ai_tutor_service.recommend_resources(
+        topic=request.topic,
+        current_level=request.current_level,
+        learning_style=request.learning_style
+    )
+    return {"resources": resources}
 
 
 @router.post("/clear-history/{user_id}")
@@ -114,8 +110,5 @@ async def clear_conversation_history(user_id: int):
     """
     Clear conversation history for a user
     """
-    try:
-        ai_tutor_service.clear_conversation_history(user_id)
-        return {"message": "Conversation history cleared"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    ai_tutor_service.clear_conversation_history(user_id)
+    return {"message": "Conversation history cleared"}
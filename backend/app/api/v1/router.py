@@ -7,7 +7,12 @@ from app.api.v1.endpoints import (
     quizzes,
     tutor,
     subjects,
-    study_plans
+    study_plans,
+    batch,
+    analytics,
+    data_transfer,
+    search,
+    lectures
 )
 
 api_router = APIRouter()
@@ -19,3 +24,8 @@ api_router.include_router(quizzes.router, prefix="/quizzes", tags=["quizzes"])
 api_router.include_router(tutor.router, prefix="/tutor", tags=["tutor"])
 api_router.include_router(subjects.router, prefix="/subjects", tags=["subjects"])
 api_router.include_router(study_plans.router, prefix="/study-plans", tags=["study-plans"])
+api_router.include_router(batch.router, prefix="/batch", tags=["batch"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+api_router.include_router(data_transfer.router, prefix="/data", tags=["data"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(lectures.router, prefix="/lectures", tags=["lectures"])
@@ -0,0 +1,176 @@
+"""
+Negotiated gzip/brotli response compression
+"""
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+
+# Content types worth compressing; audio, images and archives are already compact
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+
+class _GzipCodec:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCodec:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def available_encodings() -> Dict[str, int]:
+    """Supported encodings with their server-side preference (higher wins ties)"""
+    encodings = {"gzip": 1}
+    if brotli is not None:
+        encodings["br"] = 2
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick a content encoding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: Header value, e.g. "gzip, deflate, br;q=0.9"
+
+    Returns:
+        "br", "gzip" or None when the client accepts neither
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_key = None, (0.0, 0)
+    for coding, preference in available_encodings().items():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > 0 and (q, preference) > best_key:
+            best, best_key = coding, (q, preference)
+    return best
+
+
+def _new_codec(encoding: str):
+    if encoding == "br":
+        return _BrotliCodec(settings.COMPRESSION_BROTLI_QUALITY)
+    return _GzipCodec(settings.COMPRESSION_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the client's preferred encoding
+
+    Responses below `minimum_size`, non-text content and responses that are
+    already encoded pass through untouched. Streaming responses are
+    compressed chunk by chunk with a sync flush, so each chunk still reaches
+    the client as soon as it is produced.
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        codec = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, codec, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message  # held until the first body chunk decides
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(raw=start.setdefault("headers", []))
+                passthrough = (
+                    "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                )
+                if passthrough:
+                    await send(start)
+                    await send(message)
+                    return
+
+                codec = _new_codec(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start)
+                    await send({"type": "http.response.body", "body": codec.compress(body) + codec.flush(), "more_body": True})
+                else:
+                    compressed = codec.compress(body) + codec.finish()
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressed})
+                return
+
+            if passthrough:
+                await send(message)
+                return
+            data = codec.compress(body)
+            data += codec.flush() if more_body else codec.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
@@ -2,7 +2,7 @@
 Application configuration
 """
 from pydantic_settings import BaseSettings
-from typing import List, Union
+from typing import Dict, List, Union
 from pydantic import field_validator
 import os
 
@@ -54,16 +54,160 @@ class Settings(BaseSettings):
         return v
     
     # File Storage
-    UPLOAD_DIR: str = "./uploads"
+    UPLOAD_DIR: str = "./uploads"  # Served publicly at /uploads
     MAX_UPLOAD_SIZE: int = 104857600  # 100MB
+    UPLOAD_STORE_DIR: str = "./upload_store"  # Recordings and transcripts; keep outside UPLOAD_DIR
+    UPLOAD_STORE_MAX_BYTES: int = 10737418240  # 10GB; least recently used recordings evicted above this
+    UPLOAD_STORE_MAX_AGE_DAYS: int = 30  # Recordings unused this long are evicted (0 = no limit)
+    UPLOAD_EVICTION_INTERVAL: int = 3600  # Seconds between eviction sweeps
     
     # AI Settings
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    CHUNK_TOKENS: int = 1300
+    CHUNK_OVERLAP_TOKENS: int = 260
+    TOKEN_COUNTING: str = "estimate"  # estimate, exact (requires tiktoken)
+    
+    # Notes
+    NOTES_MIN_UPDATE_TOKENS: int = 150  # New transcript needed before an incremental update
+    
+    # Transcripts
+    TRANSCRIPT_NORMALIZATION: bool = True
+    TRANSCRIPT_SENTENCE_GAP: float = 1.0  # Caption pause (seconds) treated as a sentence end
+    
+    # Live Transcription (WebSocket, 16-bit PCM)
+    LIVE_SAMPLE_RATE: int = 16000
+    LIVE_WINDOW_SECONDS: float = 8.0
+    LIVE_WINDOW_OVERLAP_SECONDS: float = 0.5
+    LIVE_MAX_INFLIGHT_WINDOWS: int = 4
+    LIVE_WINDOW_TIMEOUT: float = 30.0
+    
+    # Extractive Pre-summarization (fraction of the input kept per method)
+    EXTRACTIVE_METHOD: str = "textrank"  # textrank, tfidf
+    EXTRACTIVE_MIN_TOKENS: int = 2000
+    EXTRACTIVE_SUMMARY_RATIOS: Dict[str, float] = {
+        "nlp.generate_notes": 0.6,
+        "nlp.summarize_text": 0.4,
+        "quiz.generate_quiz": 0.5,
+    }
+    
+    # Key Concepts
+    CONCEPT_EXTRACTION_MODE: str = "local"  # local, hybrid (local + LLM refinement), llm
+    
+    # Token Budgets
+    MODEL_CONTEXT_WINDOWS: Dict[str, int] = {}  # Overrides for models not built in
+    TOKEN_BUDGET_POLICIES: Dict[str, str] = {}  # method -> truncate, chunk, condense, reject
+    MAX_INPUT_TOKENS: Dict[str, int] = {  # Per-method input caps below the context window
+        "nlp.generate_notes": 16000,
+        "nlp.summarize_text": 16000,
+        "nlp.extract_key_concepts": 8000,
+        "nlp.generate_flashcards": 12000,
+        "quiz.generate_quiz": 12000,
+        "quiz.generate_adaptive_quiz": 2000,
+        "quiz.get_question_explanation": 2000,
+        "quiz.explain_attempt": 6000,
+        "tutor.get_tutor_response": 8000,
+        "tutor.explain_concept": 500,
+        "tutor.generate_study_plan": 2000,
+        "tutor.recommend_resources": 500,
+    }
+    
+    # Quiz Explanations
+    EXPLANATION_BATCH_SIZE: int = 8  # Wrong answers explained per upstream call
+    EXPLANATION_CACHE_SIZE: int = 2048  # In-process entries in front of the quiz_explanations table
+    
+    # Structured Output (flashcards, quiz questions, resources)
+    STRUCTURED_OUTPUT_MAX_REPAIRS: int = 1  # Follow-up calls asking only for missing or invalid items
+    
+    # Full-text Search (notes and lecture transcripts)
+    SEARCH_LANGUAGE: str = "english"  # Postgres text search configuration
+    SEARCH_SNIPPET_TOKENS: int = 24  # Words per highlighted snippet
+    SEARCH_MAX_RESULTS: int = 50  # Largest page a search may ask for
+    
+    # Data Transfer (NDJSON export and import of a user's learning data)
+    EXPORT_BATCH_SIZE: int = 1000  # Rows fetched per server-side cursor batch
+    IMPORT_BATCH_SIZE: int = 1000  # Records inserted per transaction
+    IMPORT_MAX_LINE_BYTES: int = 1048576  # 1MB
+    
+    # Text Storage (transcripts and note bodies; zstd used when installed and chosen)
+    TEXT_COMPRESSION_MIN_BYTES: int = 1024  # Shorter values are stored as they are
+    TEXT_COMPRESSION_CODEC: str = "zlib"  # zlib, zstd
+    TEXT_COMPRESSION_LEVEL: int = 6
+    TEXT_MIGRATION_BATCH: int = 500  # Rows rewritten per transaction by compress_text.py
+    
+    # Prompts
+    PROMPT_VERSIONS: Dict[str, int] = {}  # Pin a template version per prompt, default latest
+    
+    # Study Plans (scheduled locally; the LLM only writes tips and milestone wording)
+    STUDY_DAYS: List[str] = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    STUDY_DAY_START: str = "19:00"
+    STUDY_DAY_END: str = "24:00"  # Sessions end by this time; weekly hours above what fits are rejected
+    STUDY_SESSION_MINUTES: int = 60
+    STUDY_HOURS_PER_TOPIC: float = 10.0  # Study time to take a topic from no to full mastery
     
     # Learning Analytics
     MIN_QUIZ_ACCURACY: float = 0.7
     WEAK_AREA_THRESHOLD: float = 0.6
+    ANALYTICS_MAX_DAYS: int = 366  # Longest date range one analytics query may cover
+    ANALYTICS_BACKFILL_BATCH: int = 1000  # Raw rows read per batch when rebuilding rollups
+    
+    # LLM Calls
+    LLM_MAX_CONCURRENCY: int = 32  # Concurrent upstream calls per worker
+    LLM_REQUESTS_PER_MINUTE: int = 0  # Provider rate limit per worker, 0 = unlimited
+    LLM_DEFAULT_DEADLINE: float = 120.0  # Seconds a call may take, including hedges
+    LLM_DEADLINES: Dict[str, float] = {  # Per-method overrides, keyed by prompt name
+        "tutor.get_tutor_response": 30.0,
+        "tutor.explain_concept": 30.0,
+        "quiz.get_question_explanation": 20.0,
+    }
+    LLM_HEDGING_ENABLED: bool = True  # Duplicate a call once it outlives the method's observed p95
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_DELAY: float = 0.5  # Seconds; never hedge sooner
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Calls observed per method before hedging starts
+    LLM_HEDGE_MAX_RATIO: float = 0.1  # Share of calls that may be hedged
+    LLM_LATENCY_WINDOW: int = 200  # Recent calls per method the percentile is taken over
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive upstream failures that open the circuit
+    LLM_BREAKER_COOLDOWN: float = 30.0  # Seconds before a trial call is let through
+    CANCEL_ON_DISCONNECT: bool = True  # Cancel a request's upstream calls when its client disconnects
+    
+    # Model Routing (first matching route wins; unmatched calls use OPENAI_MODEL)
+    MODEL_ROUTES: List[Dict] = [
+        {  # Short inputs to lightweight methods
+            "name": "small",
+            "model": "gpt-4o-mini",
+            "methods": [
+                "nlp.extract_key_concepts", "nlp.refine_concepts", "nlp.summarize_text",
+                "quiz.get_question_explanation", "tutor.explain_concept", "tutor.enrich_study_plan",
+                "tutor.recommend_resources", "tutor.complete_resources",
+            ],
+            "max_input_tokens": 2000,
+        },
+        {"name": "fast", "model": "gpt-4o-mini", "tiers": ["fast"], "max_input_tokens": 8000},
+    ]
+    MODEL_FALLBACKS: Dict[str, List[str]] = {}  # model -> models tried while its circuit is open
+    LLM_DEFAULT_TIER: str = "standard"  # fast, standard, batch; requests override with X-Latency-Tier
+    
+    # CPU Work (process pool owned by the app lifespan)
+    CPU_POOL_ENABLED: bool = True
+    CPU_POOL_WORKERS: int = 0  # 0 = min(CPU count, 4)
+    CPU_OFFLOAD_MIN_CHARS: int = 50000  # smaller inputs run inline
+    
+    # Batch Generation
+    BATCH_DIR: str = "./batches"
+    BATCH_CONCURRENCY: int = 8
+    BATCH_MAX_CONCURRENCY: int = 16  # Jobs in flight across all running batches
+    BATCH_MAX_JOBS: int = 10000  # Lines per uploaded job file
+    
+    # Response Compression (brotli used when installed and accepted)
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Tracing
+    TRACE_SAMPLE_RATE: float = 0.0  # 0.0 disables tracing, 1.0 traces every request
+    TRACE_EXPORTER: str = "jsonl"  # jsonl, otlp
+    TRACE_JSONL_PATH: str = "./traces.jsonl"
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
     
     class Config:
         env_file = ".env"
@@ -72,5 +216,7 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-# Ensure upload directory exists
+# Ensure upload and batch directories exist
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+os.makedirs(settings.UPLOAD_STORE_DIR, exist_ok=True)
+os.makedirs(settings.BATCH_DIR, exist_ok=True)
@@ -1,6 +1,8 @@
 """
 Database configuration and session management
 """
+from sqlalchemy import LargeBinary, inspect
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
@@ -39,7 +41,46 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def dialect_insert(dialect: str):
+    """insert() of the given dialect, for ON CONFLICT clauses (PostgreSQL, else SQLite)"""
+    return postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+
 async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        if conn.dialect.name == "postgresql":
+            await conn.run_sync(_convert_compressed_columns)
+
+
+def _add_missing_columns(conn):
+    """Add nullable columns introduced after a table was created (create_all skips existing tables)"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+
+
+def _convert_compressed_columns(conn):
+    """
+    Turn TEXT columns that are now CompressedText into BYTEA (PostgreSQL)
+
+    Values written before keep their UTF-8 behind the PLAIN header byte, so
+    they read back unchanged; compress_text.py compresses them later.
+    """
+    from app.models.types import CompressedText  # app.models imports Base from here
+
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if isinstance(column.type, CompressedText) and not isinstance(existing[column.name], LargeBinary):
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE BYTEA "
+                    f"USING decode('00', 'hex') || convert_to({column.name}, 'UTF8')"
+                )
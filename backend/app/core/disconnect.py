@@ -0,0 +1,112 @@
+"""
+Cancel request handling when the client disconnects
+"""
+import asyncio
+from typing import Dict
+
+from app.core.tracing import tracer
+
+
+class CancellationCounter:
+    """Requests and upstream calls abandoned because nobody was waiting any more"""
+
+    def __init__(self):
+        self.requests: Dict[str, int] = {}
+        self.calls: Dict[str, Dict[str, int]] = {}
+
+    def request(self, path: str):
+        self.requests[path] = self.requests.get(path, 0) + 1
+
+    def call(self, kind: str, name: str):
+        """Record a cancelled upstream call, e.g. ("llm", "nlp.generate_notes") or ("whisper", "whisper-1")"""
+        counts = self.calls.setdefault(kind, {})
+        counts[name] = counts.get(name, 0) + 1
+
+    def metrics(self) -> Dict:
+        return {
+            "requests": sum(self.requests.values()),
+            "calls": sum(sum(counts.values()) for counts in self.calls.values()),
+            "by_path": dict(sorted(self.requests.items())),
+            "by_call": {kind: dict(sorted(counts.items())) for kind, counts in sorted(self.calls.items())},
+        }
+
+
+class DisconnectMiddleware:
+    """
+    ASGI middleware that cancels a request's handler when its client goes away
+
+    The handler runs in its own task. Once it has read the request body
+    (immediately for requests without one), the middleware waits for
+    `http.disconnect`; if that arrives before the response is complete the
+    handler task is cancelled, which cancels every call it is awaiting.
+    Work shared with other requests must shield itself from this (see
+    UploadStore.transcript_for).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        has_body = (
+            headers.get(b"content-length", b"0") != b"0"
+            or b"chunked" in headers.get(b"transfer-encoding", b"")
+        )
+        body_read = asyncio.Event()
+        disconnected = asyncio.Event()
+        state = {"empty_body_pending": not has_body, "response_complete": False}
+        if not has_body:
+            body_read.set()
+
+        async def app_receive():
+            # After the body, the watcher owns receive(); the app only ever sees the disconnect
+            if state["empty_body_pending"]:
+                state["empty_body_pending"] = False
+                return {"type": "http.request", "body": b"", "more_body": False}
+            if body_read.is_set():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+                body_read.set()
+            elif not message.get("more_body", False):
+                body_read.set()
+            return message
+
+        async def app_send(message):
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                state["response_complete"] = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, app_receive, app_send))
+
+        async def watch():
+            await body_read.wait()
+            while not disconnected.is_set():
+                if (await receive())["type"] == "http.disconnect":
+                    disconnected.set()
+            if not state["response_complete"] and not handler.done():
+                handler.cancel()
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await asyncio.wait({handler})
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()  # the middleware itself was cancelled (server shutdown)
+
+        if handler.cancelled():
+            cancellations.request(scope["path"])
+            tracer.current_span().set("client_disconnected", True)
+            return
+        handler.result()
+
+
+# Singleton instance
+cancellations = CancellationCounter()
@@ -0,0 +1,46 @@
+"""
+Turn unhandled errors into 500 responses inside the CORS layer
+"""
+import logging
+
+from fastapi.responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorResponseMiddleware:
+    """
+    ASGI middleware that answers unhandled errors with 500 {"detail": ...}
+
+    A handler registered for Exception runs in Starlette's outermost
+    ServerErrorMiddleware, so its response skips CORSMiddleware and browsers
+    only see an opaque CORS failure. Added before CORSMiddleware, this sits
+    inside it and the 500 gets the same CORS headers as any other response.
+    The error is logged instead of re-raised. If the response has already
+    started, the error is re-raised as there is nothing left to replace.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def tracked_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, tracked_send)
+        except Exception as exc:
+            if started:
+                raise
+            logger.exception("Unhandled error in %s %s", scope["method"], scope["path"])
+            response = ORJSONResponse(status_code=500, content={"detail": str(exc)})
+            await response(scope, receive, send)
@@ -0,0 +1,174 @@
+"""
+Process pool for CPU-bound service work
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.tracing import tracer
+
+
+T = TypeVar("T")
+
+# Values shared with CPUExecutor.publish: name -> (version, value). In the parent
+# these are the published objects; pool workers hold snapshots loaded from disk.
+_published: Dict[str, Tuple[int, Any]] = {}
+
+
+def published(name: str, default: Any = None) -> Any:
+    """A value shared with CPUExecutor.publish, for functions run by the executor"""
+    return _published.get(name, (0, default))[1]
+
+
+def _load_published(snapshots: Dict[str, Tuple[int, str]]):
+    """Load snapshots newer than the worker's copies (pool initializer, and before each call)"""
+    for name, (version, path) in snapshots.items():
+        if _published.get(name, (0, None))[0] < version:
+            with open(path, "rb") as f:
+                _published[name] = pickle.load(f)
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict, snapshots: Dict[str, Tuple[int, str]]):
+    """Run fn in a worker, returning its result and the time it took there"""
+    _load_published(snapshots)
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class CPUExecutor:
+    """
+    Runs CPU-heavy functions off the event loop
+
+    Inputs under `min_size` run inline, where pickling and IPC would cost
+    more than the work itself; larger ones go to a process pool so a
+    long summarization or chunking pass never stalls other requests in the
+    worker. Until `start()` is called (CLI tools, scripts) everything runs
+    inline. Submitted functions must be importable module-level callables
+    (or bound methods of picklable objects) and must not rely on state
+    built up in the parent process after startup; large read-mostly state
+    they need is shared with `publish()` instead of passed with every call.
+    """
+
+    def __init__(self, workers: int = 0, min_size: int = 0):
+        self.workers = workers or min(os.cpu_count() or 1, 4)
+        self.min_size = min_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._snapshot_dir: Optional[str] = None
+        self._snapshots: Dict[str, Tuple[int, str]] = {}  # name -> (version, path) of published values
+        self._started_at = 0.0
+        self._in_flight = 0
+        self.stats = {"inline": 0, "offloaded": 0, "errors": 0, "busy_seconds": 0.0, "queue_wait_seconds": 0.0}
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    def start(self):
+        """Create the pool (called from the app lifespan)"""
+        if self._pool is not None:
+            return
+        self._snapshot_dir = tempfile.mkdtemp(prefix="cpu-pool-")
+        for name in _published:
+            self._write_snapshot(name)
+        # spawn: workers must not inherit the parent's threads and event loop
+        self._pool = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_load_published,
+            initargs=(dict(self._snapshots),)
+        )
+        self._started_at = time.monotonic()
+        for _ in range(self.workers):
+            self._pool.submit(os.getpid)  # boot workers now rather than on the first large request
+
+    def shutdown(self):
+        """Stop the pool, cancelling work that has not started"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+            shutil.rmtree(self._snapshot_dir, ignore_errors=True)
+            self._snapshot_dir = None
+            self._snapshots = {}
+
+    def publish(self, name: str, value: Any):
+        """
+        Share a value with functions run here, which read it with published(name)
+
+        Workers load a snapshot once per publish (at boot, or before their
+        next call after it) rather than receiving the value with every call.
+        Publish again after changing the value; inline calls see the object
+        itself, so changes show there before that.
+        """
+        _published[name] = (_published.get(name, (0, None))[0] + 1, value)
+        if self._pool is not None:
+            self._write_snapshot(name)
+
+    def _write_snapshot(self, name: str):
+        path = os.path.join(self._snapshot_dir, f"{name}.pickle")
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(_published[name], f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)  # a worker loading concurrently reads the old or the new snapshot
+        self._snapshots[name] = (_published[name][0], path)
+
+    async def run(self, fn: Callable[..., T], *args, size: int = 0, **kwargs) -> T:
+        """
+        Run fn(*args, **kwargs), in the pool when the input is large enough
+
+        Args:
+            fn: Function to run
+            size: Input size (characters) used to choose inline vs. offload
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            fn's return value
+        """
+        if self._pool is None or size < self.min_size:
+            self.stats["inline"] += 1
+            return fn(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        self.stats["offloaded"] += 1
+        self._in_flight += 1
+        submitted = time.perf_counter()
+        with tracer.span("cpu_pool.run", function=getattr(fn, "__qualname__", repr(fn)), size=size) as span:
+            try:
+                result, busy = await loop.run_in_executor(
+                    self._pool, functools.partial(_timed_call, fn, args, kwargs, dict(self._snapshots))
+                )
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                self._in_flight -= 1
+            wait = max(time.perf_counter() - submitted - busy, 0.0)
+            self.stats["busy_seconds"] += busy
+            self.stats["queue_wait_seconds"] += wait
+            span.set("busy_ms", round(busy * 1000, 3))
+            span.set("queue_wait_ms", round(wait * 1000, 3))
+        return result
+
+    def metrics(self) -> Dict:
+        """Pool size, current load and utilization since start"""
+        uptime = time.monotonic() - self._started_at if self.running else 0.0
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "min_size": self.min_size,
+            "in_flight": self._in_flight,
+            "queued": max(self._in_flight - self.workers, 0),
+            "utilization": round(self.stats["busy_seconds"] / (uptime * self.workers), 4) if uptime else 0.0,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()},
+        }
+
+
+# Singleton instance (started by the app lifespan)
+cpu_executor = CPUExecutor(settings.CPU_POOL_WORKERS, settings.CPU_OFFLOAD_MIN_CHARS)
@@ -0,0 +1,288 @@
+"""
+Lightweight span tracing for endpoint -> service -> upstream call chains
+"""
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """A single timed operation inside a trace"""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "kind",
+        "start_ns", "end_ns", "attributes", "status", "_finished",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: str, finished: List["Span"]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.status = "ok"
+        self._finished = finished
+
+    def set(self, key: str, value):
+        """Set a span attribute"""
+        self.attributes[key] = value
+
+    def add(self, key: str, value: float):
+        """Accumulate a numeric span attribute"""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def end(self):
+        """Close the span and hand it to its trace buffer"""
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self._finished.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned when the current request is not sampled"""
+
+    trace_id = None
+    span_id = None
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JSONLExporter:
+    """Append finished spans to a JSONL file, one span per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class OTLPExporter:
+    """Send finished spans to an OTLP/HTTP (JSON) collector"""
+
+    _KINDS = {"internal": 1, "server": 2, "client": 3}
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.endpoint = endpoint
+        self.service_name = service_name
+
+    def export(self, spans: List[Span]):
+        import httpx
+
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.core.tracing"},
+                    "spans": [self._span(span) for span in spans],
+                }],
+            }]
+        }
+        httpx.post(self.endpoint, json=payload, timeout=5.0)
+
+    def _span(self, span: Span) -> Dict:
+        data = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": self._KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [self._attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2 if span.status == "error" else 1},
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        return data
+
+    @staticmethod
+    def _attribute(key: str, value) -> Dict:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Tracer:
+    """Sampling tracer that propagates the active span through contextvars"""
+
+    def __init__(self, sample_rate: float, exporter=None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self._queue: "queue.SimpleQueue[List[Span]]" = queue.SimpleQueue()
+        self._worker = None
+
+    @contextmanager
+    def start_trace(self, name: str, kind: str = "server", **attributes):
+        """
+        Open a root span if this trace is sampled
+
+        Unsampled traces yield a no-op span and leave the context untouched,
+        so every nested span() call short-circuits.
+        """
+        if self.exporter is None or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            yield NOOP_SPAN
+            return
+
+        finished: List[Span] = []
+        root = Span(name, os.urandom(16).hex(), None, kind, finished)
+        root.attributes.update(attributes)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.status = "error"
+            root.set("error", type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+            self._submit(finished)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        """Open a child span of the current span (no-op when not tracing)"""
+        parent = _current_span.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+
+        span = Span(name, parent.trace_id, parent.span_id, kind, parent._finished)
+        span.attributes.update(attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set("error", type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def current_span(self):
+        """Return the active span, or the no-op span when not tracing"""
+        return _current_span.get() or NOOP_SPAN
+
+    def _submit(self, spans: List[Span]):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._drain, name="trace-exporter", daemon=True)
+            self._worker.start()
+        self._queue.put(spans)
+
+    def _drain(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                self.exporter.export(spans)
+            except Exception:
+                pass  # Tracing must never affect request handling
+
+
+def traced(name: str):
+    """Decorator that wraps an async function in a child span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await func(*args, **kwargs)
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """ASGI middleware that opens a root span for each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.start_trace(
+            f"{scope['method']} {scope['path']}",
+            **{"http.method": scope["method"], "http.path": scope["path"]}
+        ) as root:
+            if root is NOOP_SPAN:
+                await self.app(scope, receive, send)
+                return
+
+            async def traced_receive():
+                message = await receive()
+                if message["type"] == "http.request":
+                    root.add("request_bytes", len(message.get("body", b"")))
+                return message
+
+            async def traced_send(message):
+                if message["type"] == "http.response.start":
+                    root.set("http.status_code", message["status"])
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", root.trace_id.encode())]
+                elif message["type"] == "http.response.body":
+                    root.add("response_bytes", len(message.get("body", b"")))
+                await send(message)
+
+            await self.app(scope, traced_receive, traced_send)
+
+
+def _build_exporter():
+    if settings.TRACE_EXPORTER == "jsonl":
+        return JSONLExporter(settings.TRACE_JSONL_PATH)
+    if settings.TRACE_EXPORTER == "otlp":
+        return OTLPExporter(settings.TRACE_OTLP_ENDPOINT, settings.APP_NAME)
+    return None
+
+
+# Singleton instance
+tracer = Tracer(settings.TRACE_SAMPLE_RATE, _build_exporter())
@@ -1,10 +1,11 @@
 """
 Database models
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, Boolean, ForeignKey, JSON, LargeBinary
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import CompressedText
 
 
 class User(Base):
@@ -74,7 +75,8 @@ class Lecture(Base):
     source_type = Column(String, nullable=False)  # youtube, upload, live
     source_url = Column(String)
     file_path = Column(String)
-    transcript = Column(Text)
+    transcript = deferred(Column(CompressedText))  # loaded on access or with undefer()
+    segments = deferred(Column(LargeBinary))  # timed captions (app.services.transcript_segments.SegmentTrack)
     duration = Column(Integer)  # in seconds
     status = Column(String, default="pending")  # pending, processing, completed, failed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -93,9 +95,10 @@ class Note(Base):
     topic_id = Column(Integer, ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
     lecture_id = Column(Integer, ForeignKey("lectures.id", ondelete="SET NULL"))
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
-    summary = Column(Text)
+    content = deferred(Column(CompressedText, nullable=False), group="body")
+    summary = deferred(Column(CompressedText), group="body")
     note_type = Column(String, default="manual")  # manual, ai_generated
+    transcript_offset = Column(Integer, default=0)  # lecture transcript characters the notes cover
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -158,6 +161,31 @@ class QuizAttempt(Base):
     user = relationship("User", back_populates="quiz_attempts")
 
 
+class QuizExplanation(Base):
+    """Explanation of a wrong answer, shared by every student who makes the same mistake"""
+    __tablename__ = "quiz_explanations"
+    
+    key = Column(String, primary_key=True)  # prompt cache key of (question, correct, user answer, style)
+    explanation = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CorpusDocument(Base):
+    """A transcript counted in the key concept extractor's document frequencies"""
+    __tablename__ = "corpus_documents"
+    
+    key = Column(String, primary_key=True)  # "youtube:<video id>" or "lecture:<id>"
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CorpusTerm(Base):
+    """Number of counted transcripts that contain a term (IDF for key concepts)"""
+    __tablename__ = "corpus_terms"
+    
+    term = Column(String, primary_key=True)
+    document_count = Column(Integer, nullable=False, default=0)
+
+
 class StudySession(Base):
     """Study session model"""
     __tablename__ = "study_sessions"
@@ -174,6 +202,32 @@ class StudySession(Base):
     user = relationship("User", back_populates="study_sessions")
 
 
+class TopicStatsColumns:
+    """Counters shared by the daily and weekly analytics rollups"""
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    topic = Column(String, primary_key=True)  # "" holds the user's totals across topics
+    period_start = Column(Date, primary_key=True)  # UTC day, or the Monday of the week
+    quiz_attempts = Column(Integer, nullable=False, default=0)
+    quiz_scored = Column(Integer, nullable=False, default=0)  # attempts with a score
+    quiz_score_total = Column(Float, nullable=False, default=0.0)  # sum of scores (0-100)
+    quiz_time_seconds = Column(Integer, nullable=False, default=0)
+    weak_area_flags = Column(Integer, nullable=False, default=0)  # attempts that flagged the topic weak
+    study_sessions = Column(Integer, nullable=False, default=0)
+    study_minutes = Column(Float, nullable=False, default=0.0)  # a session's minutes split across its topics
+    session_scored = Column(Integer, nullable=False, default=0)
+    session_score_total = Column(Float, nullable=False, default=0.0)
+
+
+class DailyTopicStats(TopicStatsColumns, Base):
+    """Quiz and study activity per user, topic and UTC day"""
+    __tablename__ = "daily_topic_stats"
+
+
+class WeeklyTopicStats(TopicStatsColumns, Base):
+    """Quiz and study activity per user, topic and week (Monday to Sunday, UTC)"""
+    __tablename__ = "weekly_topic_stats"
+
+
 class StudyPlan(Base):
     """Study plan model"""
     __tablename__ = "study_plans"
@@ -185,6 +239,10 @@ class StudyPlan(Base):
     goals = Column(JSON)
     schedule = Column(JSON)  # Weekly schedule
     priority_topics = Column(JSON)
+    allocation = Column(JSON)  # Minutes per week by topic
+    milestones = Column(JSON)
+    tips = Column(JSON)
+    hours_per_week = Column(Float)
     start_date = Column(DateTime(timezone=True))
     end_date = Column(DateTime(timezone=True))
     status = Column(String, default="active")  # active, completed, paused
@@ -0,0 +1,81 @@
+"""
+Column types
+"""
+import zlib
+from typing import Optional
+
+from sqlalchemy import LargeBinary, Text
+from sqlalchemy.types import TypeDecorator
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is always available
+    zstandard = None
+
+
+# First byte of a stored value
+PLAIN, ZLIB, ZSTD = b"\x00", b"\x01", b"\x02"
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text stored compressed once it reaches TEXT_COMPRESSION_MIN_BYTES
+
+    Values read and written as str. A long value is stored as one header
+    byte (zlib or zstd) and the compressed UTF-8. On PostgreSQL the column is
+    BYTEA and short values are stored as a PLAIN header byte and their UTF-8.
+    On SQLite the column stays TEXT and short values stay text, so rows
+    written before compression existed read back unchanged.
+    """
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(Text())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        data = value.encode("utf-8")
+        if len(data) >= settings.TEXT_COMPRESSION_MIN_BYTES:
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                return compressed
+        return value if dialect.name == "sqlite" else PLAIN + data
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress(bytes(value))
+
+
+def compress(data: bytes) -> bytes:
+    """UTF-8 text as a stored value with the configured codec"""
+    if settings.TEXT_COMPRESSION_CODEC == "zstd" and zstandard is not None:
+        return ZSTD + zstandard.ZstdCompressor(level=settings.TEXT_COMPRESSION_LEVEL).compress(data)
+    return ZLIB + zlib.compress(data, min(settings.TEXT_COMPRESSION_LEVEL, 9))
+
+
+def decompress(value: bytes) -> str:
+    """The text of a stored value"""
+    header, payload = value[:1], value[1:]
+    if header == ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if header == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Text was stored with zstd; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    return payload.decode("utf-8")
+
+
+def stored_plain_text(value) -> Optional[str]:
+    """The text of a raw stored value that is not compressed, else None"""
+    if isinstance(value, str):
+        return value
+    if value is not None and bytes(value[:1]) == PLAIN:
+        return bytes(value[1:]).decode("utf-8")
+    return None
@@ -5,6 +5,19 @@ from openai import AsyncOpenAI
 from typing import List, Dict, Optional
 import json
 from app.core.config import settings
+from app.core.tracing import traced
+from app.services.llm import create_chat_completion
+from app.services.nlp_service import nlp_service
+from app.services.prompts import prompt_registry
+from app.services.structured_output import RESOURCE_SCHEMA, existing_listing, repair_max_tokens, structured_output
+from app.services.study_scheduler import TopicDemand, parse_deadline, study_scheduler
+from app.services.token_budget import token_budget
+from app.services.tokens import get_token_counter
+
+
+# The resources prompt asks for 5-7
+MIN_RESOURCES = 5
+MAX_RESOURCES = 7
 
 
 class AITutorService:
@@ -14,6 +27,7 @@ class AITutorService:
         self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.conversation_history = {}
     
+    @traced("tutor.get_tutor_response")
     async def get_tutor_response(
         self,
         user_id: int,
@@ -39,50 +53,29 @@ class AITutorService:
         if user_id not in self.conversation_history:
             self.conversation_history[user_id] = []
         
-        # Build system prompt based on learning style
-        style_instructions = {
-            "visual": "Use visual descriptions, analogies, and suggest diagrams. Structure information hierarchically.",
-            "auditory": "Use conversational tone, explain things step-by-step verbally, use rhythm in explanations.",
-            "kinesthetic": "Focus on practical examples, hands-on applications, and real-world scenarios.",
-            "reading": "Provide detailed written explanations, definitions, and written examples."
-        }
-        
-        style_instruction = style_instructions.get(learning_style, style_instructions["visual"])
-        subject_context = f"specializing in {subject}" if subject else ""
+        history = self.conversation_history[user_id][-10:]
         
-        system_prompt = f"""You are a patient, encouraging AI tutor {subject_context}.
-        
-Teaching approach:
-- {style_instruction}
-- Break down complex topics into manageable chunks
-- Use the Socratic method when appropriate
-- Encourage critical thinking
-- Provide examples and analogies
-- Check for understanding
-- Be supportive and encouraging
-
-Remember: You're helping the student learn, not just giving answers."""
-
-        # Build messages
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add context if provided
+        # Fit reference material around the question and history
         if context:
-            messages.append({
-                "role": "system",
-                "content": f"Reference material:\n{context}"
-            })
-        
-        # Add conversation history (last 5 exchanges)
-        messages.extend(self.conversation_history[user_id][-10:])
-        
-        # Add current question
-        messages.append({"role": "user", "content": question})
-        
-        # Get response
-        response = await self.client.chat.completions.create(
+            count = get_token_counter()
+            reserved = count(question) + sum(count(m["content"]) for m in history)
+            context = (await nlp_service.fit_input(
+                "tutor.get_tutor_response", context, max_tokens=1000, reserved_tokens=reserved
+            )).text
+        
+        # Static instructions, then session context, history and the question
+        prompt = prompt_registry.get("tutor.get_tutor_response")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
             model=settings.OPENAI_MODEL,
-            messages=messages,
+            messages=prompt.render(
+                history=history,
+                subject=subject or "not specified",
+                learning_style=learning_style,
+                context=context or "none",
+                question=question
+            ),
             temperature=0.7,
             max_tokens=1000
         )
@@ -95,6 +88,7 @@ Remember: You're helping the student learn, not just giving answers."""
         
         return answer
     
+    @traced("tutor.explain_concept")
     async def explain_concept(
         self,
         concept: str,
@@ -114,95 +108,87 @@ Remember: You're helping the student learn, not just giving answers."""
         Returns:
             Detailed explanation
         """
-        depth_instructions = {
-            "beginner": "Explain in simple terms, assume no prior knowledge",
-            "intermediate": "Provide moderate detail with some technical terms",
-            "advanced": "Use technical terminology and dive deep into nuances"
-        }
-        
-        depth_instruction = depth_instructions.get(depth_level, depth_instructions["intermediate"])
-        examples_instruction = "Include practical examples." if include_examples else ""
+        token_budget.fit("tutor.explain_concept", concept, max_tokens=1000)
         
-        prompt = f"""Explain the concept of '{concept}'.
-
-Level: {depth_level}
-{depth_instruction}
-{examples_instruction}
-
-Tailor explanation for {learning_style} learner.
-
-Provide a clear, comprehensive explanation:"""
-
-        response = await self.client.chat.completions.create(
+        prompt = prompt_registry.get("tutor.explain_concept")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
             model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert educator explaining concepts clearly."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt.render(
+                concept=concept,
+                depth_level=depth_level,
+                learning_style=learning_style,
+                include_examples="yes" if include_examples else "no"
+            ),
             temperature=0.7,
             max_tokens=1000
         )
         
         return response.choices[0].message.content
     
+    @traced("tutor.generate_study_plan")
     async def generate_study_plan(
         self,
         weak_areas: List[str],
         available_hours_per_week: int,
         goals: List[str],
-        deadline: Optional[str] = None
+        deadline: Optional[str] = None,
+        mastery: Optional[Dict[str, float]] = None
     ) -> Dict:
         """
         Generate a personalized study plan
         
+        The schedule, time allocation and milestone targets are computed
+        locally; the LLM only writes tips and the milestone wording.
+        
         Args:
-            weak_areas: Topics needing improvement
+            weak_areas: Topics needing improvement, most important first
             available_hours_per_week: Study time available
             goals: Learning goals
-            deadline: Optional deadline for goals
+            deadline: Optional deadline for goals (ISO date)
+            mastery: Mastery (0.0 to 1.0) by topic; without it, topics are
+                ranked by their order in weak_areas
             
         Returns:
             Study plan dictionary
         """
-        deadline_str = f"\nDeadline: {deadline}" if deadline else ""
-        
-        prompt = f"""Create a personalized study plan with these details:
-
-Weak areas to focus on: {', '.join(weak_areas)}
-Available study time: {available_hours_per_week} hours per week
-Goals: {', '.join(goals)}{deadline_str}
-
-Generate a study plan that:
-1. Prioritizes weak areas
-2. Distributes time effectively
-3. Includes variety (reading, practice, review)
-4. Has realistic daily/weekly tasks
-5. Includes milestones and checkpoints
-
-Return as JSON with structure:
-{{
-    "weekly_schedule": {{
-        "Monday": [{{"time": "7-8 PM", "activity": "...", "topic": "..."}}],
-        ...
-    }},
-    "priority_topics": [...],
-    "milestones": [...],
-    "tips": [...]
-}}"""
-
-        response = await self.client.chat.completions.create(
+        if mastery is None:
+            mastery = {area: 0.5 * i / len(weak_areas) for i, area in enumerate(weak_areas)}
+        plan = study_scheduler.schedule(
+            [TopicDemand(area, mastery.get(area, 0.0)) for area in weak_areas],
+            available_hours_per_week,
+            parse_deadline(deadline)
+        ).to_dict()
+        
+        milestones = "\n".join(f"{i}. {m['description']}" for i, m in enumerate(plan["milestones"], 1)) or "none"
+        token_budget.fit("tutor.generate_study_plan", ', '.join(goals) + milestones, max_tokens=400)
+        
+        prompt = prompt_registry.get("tutor.enrich_study_plan")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
             model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert study planner creating effective, personalized learning schedules. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt.render(
+                goals=', '.join(goals) or "none",
+                deadline=deadline or "none",
+                priority_topics=', '.join(plan["priority_topics"]),
+                milestones=milestones
+            ),
             temperature=0.7,
-            max_tokens=1500,
+            max_tokens=400,
             response_format={"type": "json_object"}
         )
         
-        return json.loads(response.choices[0].message.content)
+        result = json.loads(response.choices[0].message.content)
+        plan["tips"] = [str(tip) for tip in result.get("tips", [])]
+        wording = result.get("milestones")
+        if isinstance(wording, list) and len(wording) == len(plan["milestones"]):
+            for milestone, text in zip(plan["milestones"], wording):
+                milestone["description"] = str(text)
+        return plan
     
+    @traced("tutor.recommend_resources")
     async def recommend_resources(
         self,
         topic: str,
@@ -220,42 +206,29 @@ Return as JSON with structure:
         Returns:
             List of recommended resources
         """
-        style_preferences = {
-            "visual": "videos, infographics, diagrams",
-            "auditory": "podcasts, audiobooks, lectures",
-            "kinesthetic": "interactive simulations, labs, hands-on projects",
-            "reading": "textbooks, articles, written tutorials"
-        }
-        
-        preferred_formats = style_preferences.get(learning_style, "various formats")
-        
-        prompt = f"""Recommend learning resources for the topic: {topic}
-
-Student level: {current_level}
-Preferred formats: {preferred_formats}
-
-Suggest 5-7 high-quality resources including:
-- Resource name
-- Type (video, article, book, course, etc.)
-- Brief description
-- Estimated time to complete
-- Why it's suitable for this learner
-
-Return as JSON array."""
-
-        response = await self.client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert at recommending educational resources. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000,
-            response_format={"type": "json_object"}
+        token_budget.fit("tutor.recommend_resources", topic + current_level, max_tokens=1000)
+        
+        async def request(needed: int, accepted: List[Dict]) -> str:
+            variables = {"topic": topic, "current_level": current_level, "learning_style": learning_style}
+            if accepted:
+                prompt = prompt_registry.get("tutor.complete_resources")
+                variables.update(count=needed, existing=existing_listing(accepted, RESOURCE_SCHEMA))
+            else:
+                prompt = prompt_registry.get("tutor.recommend_resources")
+            response = await create_chat_completion(
+                self.client,
+                prompt=prompt,
+                model=settings.OPENAI_MODEL,
+                messages=prompt.render(**variables),
+                temperature=0.7,
+                max_tokens=repair_max_tokens(1000, needed, MIN_RESOURCES),
+                response_format={"type": "json_object"}
+            )
+            return response.choices[0].message.content
+        
+        return await structured_output.collect(
+            "tutor.recommend_resources", RESOURCE_SCHEMA, MIN_RESOURCES, request, maximum=MAX_RESOURCES
         )
-        
-        result = json.loads(response.choices[0].message.content)
-        return result.get('resources', [])
     
     def clear_conversation_history(self, user_id: int):
         """Clear conversation history for a user"""
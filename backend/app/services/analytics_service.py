@@ -0,0 +1,272 @@
+"""
+Daily and weekly learning-analytics rollups per user and topic
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.core.tracing import traced
+from app.models.models import DailyTopicStats, Quiz, QuizAttempt, StudySession, Topic, WeeklyTopicStats
+
+
+ALL_TOPICS = ""  # topic of the rows holding a user's totals
+COUNTERS = (
+    "quiz_attempts", "quiz_scored", "quiz_score_total", "quiz_time_seconds", "weak_area_flags",
+    "study_sessions", "study_minutes", "session_scored", "session_score_total",
+)
+PERIODS = {"day": DailyTopicStats, "week": WeeklyTopicStats}
+
+Increments = Dict[str, Dict[str, float]]  # topic -> counter -> amount
+
+
+class AnalyticsService:
+    """
+    Maintains and reads the daily_topic_stats and weekly_topic_stats rollups
+
+    Every quiz attempt and study session written through the API adds its
+    counts to the rollup rows of its day and week, in the same transaction
+    as the row itself. Analytics reads touch only rollup rows, so their
+    cost depends on the date range asked for, not on how much history a
+    user has. `backfill` rebuilds the rollups from the raw tables, for
+    rows written before the rollups existed or outside the API.
+    """
+
+    @traced("analytics.record_quiz_attempt")
+    async def record_quiz_attempt(self, db: AsyncSession, attempt: QuizAttempt):
+        """Add a new quiz attempt to the rollups (the caller commits)"""
+        topic = await db.scalar(
+            select(Topic.name).join(Quiz, Quiz.topic_id == Topic.id).where(Quiz.id == attempt.quiz_id)
+        )
+        await self._apply(db, attempt.user_id, attempt.created_at, quiz_attempt_increments(attempt, topic))
+
+    @traced("analytics.record_study_session")
+    async def record_study_session(self, db: AsyncSession, session: StudySession):
+        """Add a new study session to the rollups (the caller commits)"""
+        await self._apply(db, session.user_id, session.created_at, study_session_increments(session))
+
+    @traced("analytics.backfill")
+    async def backfill(self, db: AsyncSession, user_id: Optional[int] = None, batch_size: Optional[int] = None) -> Dict:
+        """
+        Rebuild the rollups from quiz_attempts and study_sessions
+
+        Raw rows are streamed in batches and summed in memory (one entry
+        per user, topic and period), then the old rollups are replaced in
+        one transaction. Writes made while the backfill runs may be missed;
+        run it again if the API was taking writes at the time.
+
+        Args:
+            db: Database session
+            user_id: Rebuild only this user's rollups (default: everyone's)
+            batch_size: Raw rows fetched per batch (default ANALYTICS_BACKFILL_BATCH)
+
+        Returns:
+            Counts of raw rows read and rollup rows written
+        """
+        batch_size = batch_size or settings.ANALYTICS_BACKFILL_BATCH
+        totals: Dict[Tuple[str, int, str, date], Dict[str, float]] = {}
+        counts = {"quiz_attempts": 0, "study_sessions": 0}
+
+        attempts = (
+            select(
+                QuizAttempt.user_id, QuizAttempt.created_at, QuizAttempt.score, QuizAttempt.time_taken,
+                QuizAttempt.weak_areas, Topic.name.label("topic")
+            )
+            .outerjoin(Quiz, Quiz.id == QuizAttempt.quiz_id)
+            .outerjoin(Topic, Topic.id == Quiz.topic_id)
+            .order_by(QuizAttempt.id)
+        )
+        sessions = select(
+            StudySession.user_id, StudySession.created_at, StudySession.duration,
+            StudySession.topics_covered, StudySession.performance_data
+        ).order_by(StudySession.id)
+        if user_id is not None:
+            attempts = attempts.where(QuizAttempt.user_id == user_id)
+            sessions = sessions.where(StudySession.user_id == user_id)
+
+        for query, kind in ((attempts, "quiz_attempts"), (sessions, "study_sessions")):
+            result = await db.stream(query.execution_options(yield_per=batch_size))
+            async for rows in result.partitions():
+                for row in rows:
+                    if kind == "quiz_attempts":
+                        increments = quiz_attempt_increments(row, row.topic)
+                    else:
+                        increments = study_session_increments(row)
+                    for period, period_start in _periods(row.created_at).items():
+                        for topic, amounts in increments.items():
+                            entry = totals.setdefault((period, row.user_id, topic, period_start), dict.fromkeys(COUNTERS, 0))
+                            for counter, amount in amounts.items():
+                                entry[counter] += amount
+                    counts[kind] += 1
+
+        written = {"day": 0, "week": 0}
+        for period, table in PERIODS.items():
+            clear = delete(table)
+            if user_id is not None:
+                clear = clear.where(table.user_id == user_id)
+            await db.execute(clear)
+            rows = [
+                {"user_id": user, "topic": topic, "period_start": period_start, **amounts}
+                for (row_period, user, topic, period_start), amounts in totals.items()
+                if row_period == period
+            ]
+            for start in range(0, len(rows), batch_size):
+                await db.execute(insert(table), rows[start:start + batch_size])
+            written[period] = len(rows)
+        await db.commit()
+        return {**counts, "daily_rows": written["day"], "weekly_rows": written["week"]}
+
+    @traced("analytics.series")
+    async def series(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        period: str,
+        start: date,
+        end: date,
+        topic: str = ALL_TOPICS
+    ) -> List[Dict]:
+        """
+        Activity per day or week in [start, end], oldest first
+
+        Args:
+            db: Database session
+            user_id: User whose activity is read
+            period: "day" or "week" (weeks start on Monday)
+            start: First day of the range
+            end: Last day of the range
+            topic: Topic name, or ALL_TOPICS for the user's totals
+
+        Returns:
+            One entry per period with activity; quiet periods are left out
+        """
+        table = PERIODS[period]
+        if period == "week":
+            start = _week_start(start)
+        rows = (await db.execute(
+            select(table)
+            .where(table.user_id == user_id, table.topic == topic, table.period_start.between(start, end))
+            .order_by(table.period_start)
+        )).scalars()
+        return [{"period_start": row.period_start, **_stats({c: getattr(row, c) for c in COUNTERS})} for row in rows]
+
+    @traced("analytics.topics")
+    async def topics(self, db: AsyncSession, user_id: int, start: date, end: date) -> List[Dict]:
+        """Activity per topic summed over the days in [start, end], most often weak first"""
+        table = DailyTopicStats
+        rows = await db.execute(
+            select(table.topic, *(func.sum(getattr(table, c)).label(c) for c in COUNTERS))
+            .where(table.user_id == user_id, table.topic != ALL_TOPICS, table.period_start.between(start, end))
+            .group_by(table.topic)
+        )
+        topics = [{"topic": row.topic, **_stats({c: getattr(row, c) for c in COUNTERS})} for row in rows]
+        topics.sort(key=lambda entry: (-entry["weak_area_flags"], entry["topic"]))
+        return topics
+
+    async def _apply(self, db: AsyncSession, user_id: int, created_at: Optional[datetime], increments: Increments):
+        """Add increments to the day's and the week's rows, creating them when missing"""
+        upsert = dialect_insert(db.bind.dialect.name)
+        for period, period_start in _periods(created_at).items():
+            table = PERIODS[period].__table__
+            rows = [
+                {"user_id": user_id, "topic": topic, "period_start": period_start, **dict.fromkeys(COUNTERS, 0), **amounts}
+                for topic, amounts in increments.items()
+            ]
+            statement = upsert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "topic", "period_start"],
+                set_={c: table.c[c] + statement.excluded[c] for c in COUNTERS}
+            )
+            await db.execute(statement, rows)
+
+
+def quiz_attempt_increments(attempt, topic: Optional[str]) -> Increments:
+    """
+    Rollup counts of one quiz attempt
+
+    The attempt, its score and time count towards the quiz's topic and the
+    user's totals; each weak area counts one weak flag for that topic.
+    """
+    base = {"quiz_attempts": 1, "quiz_time_seconds": attempt.time_taken or 0}
+    score = _number(attempt.score)
+    if score is not None:
+        base.update(quiz_scored=1, quiz_score_total=score)
+    weak_areas = sorted({area for area in attempt.weak_areas or [] if isinstance(area, str) and area})
+    increments = {ALL_TOPICS: {**base, "weak_area_flags": len(weak_areas)}}
+    if topic:
+        _add(increments, topic, base)
+    for area in weak_areas:
+        _add(increments, area, {"weak_area_flags": 1})
+    return increments
+
+
+def study_session_increments(session) -> Increments:
+    """
+    Rollup counts of one study session
+
+    Minutes are split evenly across topics_covered. A session score is read
+    from performance_data["score"], and per-topic scores from
+    performance_data["topic_scores"] override it for their topic.
+    """
+    minutes = float(session.duration or 0)
+    performance = session.performance_data if isinstance(session.performance_data, dict) else {}
+    score = _number(performance.get("score"))
+    topic_scores = performance.get("topic_scores") if isinstance(performance.get("topic_scores"), dict) else {}
+    topics = sorted({topic for topic in session.topics_covered or [] if isinstance(topic, str) and topic})
+
+    increments = {ALL_TOPICS: _session_counts(minutes, score)}
+    for topic in topics:
+        topic_score = _number(topic_scores.get(topic))
+        _add(increments, topic, _session_counts(minutes / len(topics), score if topic_score is None else topic_score))
+    return increments
+
+
+def _session_counts(minutes: float, score: Optional[float]) -> Dict[str, float]:
+    counts = {"study_sessions": 1, "study_minutes": minutes}
+    if score is not None:
+        counts.update(session_scored=1, session_score_total=score)
+    return counts
+
+
+def _add(increments: Increments, topic: str, amounts: Dict[str, float]):
+    entry = increments.setdefault(topic, {})
+    for counter, amount in amounts.items():
+        entry[counter] = entry.get(counter, 0) + amount
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _stats(counters: Dict[str, float]) -> Dict:
+    """Counters with the averages a dashboard shows"""
+    stats = {c: counters[c] or 0 for c in COUNTERS}
+    stats["study_minutes"] = round(stats["study_minutes"], 1)
+    stats["average_score"] = (
+        round(stats["quiz_score_total"] / stats["quiz_scored"], 1) if stats["quiz_scored"] else None
+    )
+    stats["average_session_score"] = (
+        round(stats["session_score_total"] / stats["session_scored"], 1) if stats["session_scored"] else None
+    )
+    return stats
+
+
+def _periods(created_at: Optional[datetime]) -> Dict[str, date]:
+    """The UTC day and week a row belongs to"""
+    moment = created_at or datetime.now(timezone.utc)
+    if moment.tzinfo is not None:  # SQLite returns naive UTC timestamps
+        moment = moment.astimezone(timezone.utc)
+    return {"day": moment.date(), "week": _week_start(moment.date())}
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+# Singleton instance
+analytics_service = AnalyticsService()
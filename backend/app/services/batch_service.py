@@ -0,0 +1,236 @@
+"""
+Offline batch generation over JSONL job files
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Callable, Dict, Optional, Set
+
+import aiofiles
+
+from app.core.config import settings
+from app.services.model_router import model_router
+from app.services.nlp_service import nlp_service
+from app.services.quiz_service import quiz_service
+
+
+# Job method -> service coroutine
+JOB_METHODS: Dict[str, Callable] = {
+    "generate_notes": nlp_service.generate_notes,
+    "summarize_text": nlp_service.summarize_text,
+    "extract_key_concepts": nlp_service.extract_key_concepts,
+    "generate_flashcards": nlp_service.generate_flashcards,
+    "generate_quiz": quiz_service.generate_quiz,
+    "generate_adaptive_quiz": quiz_service.generate_adaptive_quiz,
+    "get_question_explanation": quiz_service.get_question_explanation,
+    "explain_attempt": quiz_service.explain_attempt,
+}
+
+
+class BatchService:
+    """
+    Runs JSONL job files through a bounded worker pool
+
+    Input lines look like {"id": "...", "method": "generate_notes",
+    "params": {...}}; jobs without an id are keyed by line number. Each
+    result is appended to the output JSONL as soon as it finishes, and the
+    output doubles as the checkpoint: rerunning with the same output skips
+    jobs that already succeeded and retries the rest.
+
+    All batches share one limit of BATCH_MAX_CONCURRENCY jobs in flight,
+    however many are running and whatever concurrency each asked for.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def run(
+        self,
+        input_path: str,
+        output_path: str,
+        concurrency: Optional[int] = None,
+        on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Run every pending job in a JSONL file
+
+        Args:
+            input_path: JSONL file of jobs
+            output_path: JSONL file results are appended to (and resumed from)
+            concurrency: Jobs in flight at once (defaults to BATCH_CONCURRENCY, at most BATCH_MAX_CONCURRENCY)
+            on_progress: Called with the running counts after each job
+
+        Returns:
+            Counts of total, skipped, completed and failed jobs
+        """
+        concurrency = min(max(concurrency or settings.BATCH_CONCURRENCY, 1), self.max_concurrency)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        done = await self._completed_ids(output_path)
+        counts = {"total": 0, "skipped": 0, "completed": 0, "failed": 0}
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        write_lock = asyncio.Lock()
+
+        async with aiofiles.open(output_path, "a", encoding="utf-8") as output:
+            async def worker():
+                while True:
+                    job = await queue.get()
+                    if job is None:
+                        return
+                    async with self._slots:
+                        result = await self.run_job(job)
+                    async with write_lock:
+                        await output.write(json.dumps(result, default=str) + "\n")
+                        await output.flush()
+                        counts["completed" if result["status"] == "ok" else "failed"] += 1
+                    if on_progress:
+                        on_progress(counts)
+
+            workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+            try:
+                async with aiofiles.open(input_path, "r", encoding="utf-8") as jobs:
+                    line_number = 0
+                    async for line in jobs:
+                        line_number += 1
+                        if not line.strip():
+                            continue
+                        counts["total"] += 1
+                        job = self._parse_job(line, line_number)
+                        if job["id"] in done:
+                            counts["skipped"] += 1
+                            continue
+                        await queue.put(job)
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+
+        return counts
+
+    async def run_job(self, job: Dict) -> Dict:
+        """Run a single job and describe its outcome as a result line"""
+        started = time.perf_counter()
+        result = {"id": job["id"], "method": job.get("method")}
+        try:
+            if "error" in job:
+                raise ValueError(job["error"])
+            handler = JOB_METHODS.get(job.get("method"))
+            if handler is None:
+                raise ValueError(f"Unknown method: {job.get('method')}")
+            with model_router.tier("batch"):
+                result["result"] = await handler(**job.get("params", {}))
+            result["status"] = "ok"
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = str(e)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def start(self, input_path: str, concurrency: Optional[int] = None, batch_id: Optional[str] = None) -> str:
+        """
+        Start (or resume) a batch in the background under BATCH_DIR
+
+        Args:
+            input_path: JSONL file of jobs, moved into the batch directory
+            concurrency: Jobs in flight at once
+            batch_id: Existing batch to resume
+
+        Returns:
+            Batch ID
+        """
+        batch_id = batch_id or uuid.uuid4().hex
+        if batch_id in self.tasks and not self.tasks[batch_id].done():
+            raise ValueError(f"Batch {batch_id} is already running")
+
+        batch_dir = self.batch_dir(batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        jobs_path = os.path.join(batch_dir, "jobs.jsonl")
+        if input_path != jobs_path:
+            os.replace(input_path, jobs_path)
+
+        async def run_batch():
+            self._write_manifest(batch_id, {"status": "running"})
+            try:
+                counts = await self.run(
+                    jobs_path,
+                    os.path.join(batch_dir, "results.jsonl"),
+                    concurrency,
+                    on_progress=lambda c: self._write_manifest(batch_id, {"status": "running", **c})
+                )
+                self._write_manifest(batch_id, {"status": "completed", **counts})
+            except Exception as e:
+                self._write_manifest(batch_id, {"status": "failed", "error": str(e)})
+
+        self.tasks[batch_id] = asyncio.create_task(run_batch())
+        return batch_id
+
+    async def shutdown(self):
+        """
+        Cancel running batches (called from the app lifespan)
+
+        Their manifests stay "running", reported as "interrupted" after a
+        restart, and resuming skips the jobs that already finished.
+        """
+        running = [task for task in self.tasks.values() if not task.done()]
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        self.tasks.clear()
+
+    def status(self, batch_id: str) -> Optional[Dict]:
+        """Return the manifest of a batch, or None if it does not exist"""
+        path = os.path.join(self.batch_dir(batch_id), "manifest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("status") == "running" and batch_id not in self.tasks:
+            manifest["status"] = "interrupted"  # process restarted mid-run
+        return manifest
+
+    def batch_dir(self, batch_id: str) -> str:
+        if not batch_id.isalnum():
+            raise ValueError("Invalid batch ID")
+        return os.path.join(settings.BATCH_DIR, batch_id)
+
+    def _write_manifest(self, batch_id: str, manifest: Dict):
+        path = os.path.join(self.batch_dir(batch_id), "manifest.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"batch_id": batch_id, **manifest}, f)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _parse_job(line: str, line_number: int) -> Dict:
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("job must be a JSON object")
+        except ValueError as e:
+            return {"id": str(line_number), "error": f"Invalid job on line {line_number}: {e}"}
+        job["id"] = str(job.get("id", line_number))
+        return job
+
+    @staticmethod
+    async def _completed_ids(output_path: str) -> Set[str]:
+        done: Set[str] = set()
+        if not os.path.exists(output_path):
+            return done
+        async with aiofiles.open(output_path, "r", encoding="utf-8") as f:
+            async for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue  # line torn by a crash mid-write
+                if result.get("status") == "ok":
+                    done.add(result["id"])
+        return done
+
+
+# Singleton instance
+batch_service = BatchService(settings.BATCH_MAX_CONCURRENCY)
@@ -0,0 +1,252 @@
+"""
+Streaming NDJSON export and batched bulk import of a user's learning data
+"""
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import DateTime, insert, select
+
+from app.core.config import settings
+from app.core.database import async_session_maker
+from app.core.tracing import tracer
+from app.models.models import Flashcard, Note, Quiz, QuizAttempt, Subject, Topic
+from app.services.analytics_service import analytics_service
+from app.services.search_service import search_index
+
+
+FORMAT_VERSION = 1
+
+# Record type -> (model, exported columns); parents come before their children
+RECORD_TYPES = {
+    "subject": (Subject, ("id", "name", "description", "color", "created_at")),
+    "topic": (Topic, ("id", "subject_id", "name", "description", "mastery_level", "created_at")),
+    "note": (Note, ("id", "topic_id", "title", "content", "summary", "note_type", "created_at")),
+    "flashcard": (Flashcard, (
+        "id", "topic_id", "question", "answer", "difficulty", "mastery_score", "review_count", "next_review", "created_at"
+    )),
+    "quiz": (Quiz, ("id", "topic_id", "title", "description", "difficulty", "questions", "created_at")),
+    "quiz_attempt": (QuizAttempt, ("id", "quiz_id", "answers", "score", "time_taken", "weak_areas", "created_at")),
+}
+# Record type -> (column, parent type) whose exported id is remapped on import
+REFERENCES = {
+    "topic": ("subject_id", "subject"),
+    "note": ("topic_id", "topic"),
+    "flashcard": ("topic_id", "topic"),
+    "quiz": ("topic_id", "topic"),
+    "quiz_attempt": ("quiz_id", "quiz"),
+}
+OWNED_BY_USER = ("subject", "quiz_attempt")  # records that get the importing user's id
+
+
+class ImportFormatError(ValueError):
+    """An import line that cannot be read or refers to a record the stream did not define"""
+
+    def __init__(self, message: str, imported: Dict[str, int]):
+        super().__init__(message)
+        self.imported = imported  # records committed before the error
+
+
+class DataTransferService:
+    """
+    Moves a user's subjects, topics, notes, flashcards, quizzes and quiz attempts as NDJSON
+
+    One JSON object per line, each with a "type" and the record's columns,
+    after an {"type": "export", "version": 1, ...} header. Parents precede
+    their children and keep their exported ids, which children refer to.
+
+    Export reads each table through a server-side cursor (`yield_per`) and
+    writes one chunk per fetched batch, so memory stays flat however many
+    rows a user has. Import parses the request body line by line as it
+    arrives and inserts runs of up to IMPORT_BATCH_SIZE records of one type
+    per transaction. Only the id maps of subjects, topics and quizzes are kept
+    in memory, so notes, flashcards and attempts are never all held at once.
+    """
+
+    def export(self, user_id: int, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        NDJSON export of a user's data, as chunks of lines
+
+        Args:
+            user_id: Owner of the data
+            batch_size: Rows fetched per cursor batch (default EXPORT_BATCH_SIZE)
+        """
+        return self._export(user_id, batch_size or settings.EXPORT_BATCH_SIZE)
+
+    async def _export(self, user_id: int, batch_size: int) -> AsyncIterator[bytes]:
+        yield _line({
+            "type": "export", "version": FORMAT_VERSION, "user_id": user_id,
+            "exported_at": datetime.now(timezone.utc),
+        })
+        with tracer.span("data_transfer.export", user_id=user_id) as span:
+            async with async_session_maker() as db:
+                for kind, query in _export_queries(user_id):
+                    rows = 0
+                    result = await db.stream(query.execution_options(yield_per=batch_size))
+                    async for partition in result.partitions():
+                        rows += len(partition)
+                        yield b"".join(_line({"type": kind, **row._mapping}) for row in partition)
+                    span.set(kind, rows)
+
+    async def import_records(
+        self,
+        user_id: int,
+        chunks: AsyncIterator[bytes],
+        batch_size: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Import an NDJSON export into a user's account
+
+        Records get new ids; references between them are remapped. Each
+        batch is committed on its own, so an error part-way through keeps
+        the batches before it (reported in ImportFormatError.imported).
+        Imported quiz attempts are added to the analytics rollups.
+
+        Args:
+            user_id: User who receives the data
+            chunks: The NDJSON body, in chunks of any size
+            batch_size: Records inserted per transaction (default IMPORT_BATCH_SIZE)
+
+        Returns:
+            Records imported per type
+        """
+        batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        counts = dict.fromkeys(RECORD_TYPES, 0)
+        ids: Dict[str, Dict[int, int]] = {"subject": {}, "topic": {}, "quiz": {}}
+        pending: List[Tuple[int, Dict]] = []
+        pending_kind = None
+
+        with tracer.span("data_transfer.import", user_id=user_id) as span:
+            async with async_session_maker() as db:
+                async def flush():
+                    await self._insert(db, pending_kind, pending, ids, user_id, counts)
+                    counts[pending_kind] += len(pending)
+                    pending.clear()
+
+                async for number, record in _records(chunks, counts):
+                    kind = record.get("type")
+                    if kind == "export":
+                        if record.get("version", FORMAT_VERSION) > FORMAT_VERSION:
+                            raise ImportFormatError(f"line {number}: unsupported format version {record['version']}", counts)
+                        continue
+                    if kind not in RECORD_TYPES:
+                        raise ImportFormatError(f"line {number}: unknown record type {kind!r}", counts)
+                    if pending and (kind != pending_kind or len(pending) >= batch_size):
+                        await flush()
+                    pending_kind = kind
+                    pending.append((number, record))
+                if pending:
+                    await flush()
+
+                if counts["quiz_attempt"]:
+                    await analytics_service.backfill(db, user_id)
+            for kind, count in counts.items():
+                span.set(kind, count)
+        return counts
+
+    async def _insert(self, db, kind: str, batch: List[Tuple[int, Dict]], ids, user_id: int, counts: Dict[str, int]):
+        model, columns = RECORD_TYPES[kind]
+        table = model.__table__
+        rows = [_import_row(kind, table, columns, number, record, ids, user_id, counts) for number, record in batch]
+        if kind in ids or kind == "note":
+            new_ids = (await db.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+            )).scalars().all()
+            for (number, record), row, new_id in zip(batch, rows, new_ids):
+                row["id"] = new_id
+                if kind in ids and record.get("id") is not None:
+                    ids[kind][record["id"]] = new_id
+            if kind == "note":
+                await search_index.add(db, kind, rows, user_id)  # Core inserts skip the ORM events that index notes
+        else:
+            await db.execute(insert(table), rows)
+        await db.commit()
+
+
+def _export_queries(user_id: int):
+    """(record type, query) per exported table, restricted to the user's subjects"""
+    def columns(kind):
+        model, names = RECORD_TYPES[kind]
+        return [getattr(model, name) for name in names]
+
+    yield "subject", select(*columns("subject")).where(Subject.user_id == user_id).order_by(Subject.id)
+    yield "topic", (
+        select(*columns("topic")).join(Subject, Topic.subject_id == Subject.id)
+        .where(Subject.user_id == user_id).order_by(Topic.id)
+    )
+    for kind in ("note", "flashcard", "quiz"):
+        model = RECORD_TYPES[kind][0]
+        yield kind, (
+            select(*columns(kind)).join(Topic, model.topic_id == Topic.id).join(Subject, Topic.subject_id == Subject.id)
+            .where(Subject.user_id == user_id).order_by(model.id)
+        )
+    yield "quiz_attempt", (
+        select(*columns("quiz_attempt")).join(Quiz, QuizAttempt.quiz_id == Quiz.id)
+        .join(Topic, Quiz.topic_id == Topic.id).join(Subject, Topic.subject_id == Subject.id)
+        .where(Subject.user_id == user_id, QuizAttempt.user_id == user_id).order_by(QuizAttempt.id)
+    )
+
+
+def _import_row(kind, table, columns, number, record, ids, user_id, counts) -> Dict:
+    row = {}
+    for name in columns:
+        if name == "id":
+            continue
+        column = table.c[name]
+        value = record.get(name)
+        if value is None and column.default is not None and column.default.is_scalar:
+            value = column.default.arg
+        elif isinstance(column.type, DateTime) and isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                raise ImportFormatError(f"line {number}: {name} is not an ISO timestamp", counts)
+        row[name] = value
+    if kind in REFERENCES:
+        name, parent = REFERENCES[kind]
+        if record.get(name) not in ids[parent]:
+            raise ImportFormatError(f"line {number}: {kind} refers to unknown {parent} {record.get(name)}", counts)
+        row[name] = ids[parent][record[name]]
+    if kind in OWNED_BY_USER:
+        row["user_id"] = user_id
+    row["created_at"] = row.get("created_at") or datetime.now(timezone.utc)
+    for name in columns:
+        if name != "id" and row[name] is None and not table.c[name].nullable:
+            raise ImportFormatError(f"line {number}: {kind} is missing {name}", counts)
+    return row
+
+
+async def _records(chunks: AsyncIterator[bytes], counts: Dict[str, int]) -> AsyncIterator[Tuple[int, Dict]]:
+    """(line number, object) for each non-empty line, parsed as the chunks arrive"""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        if len(buffer) > settings.IMPORT_MAX_LINE_BYTES:
+            raise ImportFormatError(f"line {number + len(lines) + 1}: longer than {settings.IMPORT_MAX_LINE_BYTES} bytes", counts)
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, _parse(line, number, counts)
+    if buffer.strip():
+        yield number + 1, _parse(buffer, number + 1, counts)
+
+
+def _parse(line: bytes, number: int, counts: Dict[str, int]) -> Dict:
+    try:
+        record = orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        raise ImportFormatError(f"line {number}: invalid JSON ({e})", counts)
+    if not isinstance(record, dict):
+        raise ImportFormatError(f"line {number}: not a JSON object", counts)
+    return record
+
+
+def _line(record: Dict) -> bytes:
+    return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NAIVE_UTC)
+
+
+# Singleton instance
+data_transfer = DataTransferService()
@@ -0,0 +1,74 @@
+"""
+Shared cache of wrong-answer explanations
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import async_session_maker, dialect_insert, engine
+from app.models.models import QuizExplanation
+
+
+class ExplanationCache:
+    """
+    Explanations keyed by (question, correct answer, user answer, learning style)
+
+    Keys come from the explanation prompt's cache_key, so a new prompt
+    version starts a fresh cache. Entries live in the quiz_explanations
+    table, shared by every worker, with a small in-process LRU in front.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Cached explanations for the keys that have one"""
+        keys = set(keys)
+        found = {key: self._memory[key] for key in keys if key in self._memory}
+        for key in found:
+            self._memory.move_to_end(key)
+
+        missing = keys - found.keys()
+        if missing:
+            async with async_session_maker() as session:
+                rows = await session.execute(
+                    select(QuizExplanation.key, QuizExplanation.explanation).where(QuizExplanation.key.in_(missing))
+                )
+                for key, explanation in rows:
+                    found[key] = explanation
+                    self._remember(key, explanation)
+
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    async def put_many(self, explanations: Dict[str, str]):
+        """Store new explanations; keys written concurrently by another worker are kept as they are"""
+        if not explanations:
+            return
+        for key, explanation in explanations.items():
+            self._remember(key, explanation)
+        async with async_session_maker() as session:
+            await session.execute(
+                _insert_ignoring_duplicates(),
+                [{"key": key, "explanation": explanation} for key, explanation in explanations.items()]
+            )
+            await session.commit()
+
+    def _remember(self, key: str, explanation: str):
+        self._memory[key] = explanation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+def _insert_ignoring_duplicates():
+    return dialect_insert(engine.dialect.name)(QuizExplanation).on_conflict_do_nothing(index_elements=["key"])
+
+
+# Singleton instance
+explanation_cache = ExplanationCache(settings.EXPLANATION_CACHE_SIZE)
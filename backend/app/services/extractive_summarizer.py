@@ -0,0 +1,166 @@
+"""
+Local extractive summarization (TF-IDF / TextRank sentence ranking)
+"""
+import re
+from typing import List
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.text_chunker import iter_sentences, split_oversized
+from app.services.tokens import count_words, estimate_tokens
+
+
+_TERM = re.compile(r"[a-z0-9][a-z0-9'-]*")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just let like me
+more most my myself no nor not now of off on once only or other our ours ourselves out over own really
+right same she should so some such than that the their theirs them themselves then there these they
+this those through to too um uh under until up very was we were what when where which while who whom
+why will with would you your yours yourself yourselves okay yeah gonna going get got know think
+""".split())
+
+# Captions often lack punctuation; long runs are ranked as pseudo-sentences
+MAX_SENTENCE_WORDS = 40
+# Above this many sentences TextRank's n x n similarity matrix is too costly
+TEXTRANK_MAX_SENTENCES = 2000
+
+
+class ExtractiveSummarizer:
+    """CPU-only extractive summarizer that keeps the highest-ranked sentences"""
+
+    def __init__(self, method: str = "textrank", max_features: int = 4096):
+        if method not in ("textrank", "tfidf"):
+            raise ValueError(f"Unknown extractive summarization method: {method}")
+        self.method = method
+        self.max_features = max_features
+
+    def summarize(self, text: str, ratio: float) -> str:
+        """
+        Reduce text to roughly `ratio` of its length, keeping sentence order
+
+        Args:
+            text: Text to reduce
+            ratio: Target fraction of the original length (0-1)
+
+        Returns:
+            The selected sentences joined in their original order
+        """
+        if ratio >= 1:
+            return text
+
+        sentences = self.split_sentences(text)
+        if len(sentences) < 3:
+            return text
+
+        scores = self.score_sentences(sentences)
+        lengths = np.fromiter((len(s) for s in sentences), dtype=np.int64, count=len(sentences))
+        target = ratio * lengths.sum()
+
+        selected = np.zeros(len(sentences), dtype=bool)
+        seen = set()
+        total = 0
+        for index in np.argsort(-scores, kind="stable"):
+            if total >= target:
+                break
+            key = " ".join(sentences[index].lower().split())
+            if key in seen:
+                continue  # repeated rolling-caption text
+            seen.add(key)
+            selected[index] = True
+            total += lengths[index]
+
+        return " ".join(s for s, keep in zip(sentences, selected) if keep)
+
+    def split_sentences(self, text: str) -> List[str]:
+        sentences = []
+        for sentence in iter_sentences(text):
+            if count_words(sentence) > MAX_SENTENCE_WORDS:
+                sentences.extend(split_oversized(sentence, MAX_SENTENCE_WORDS, lambda w: 1))
+            elif sentence.strip():
+                sentences.append(sentence)
+        return sentences
+
+    def score_sentences(self, sentences: List[str]) -> np.ndarray:
+        """Rank sentences by TextRank, or TF-IDF centroid similarity for long texts"""
+        rows, cols, vocab_size = self._term_indices(sentences)
+        n = len(sentences)
+        if vocab_size == 0:
+            return np.zeros(n)
+
+        # Sparse TF-IDF weights as (row, col, weight) triplets
+        cells, tf = np.unique(rows * vocab_size + cols, return_counts=True)
+        rows, cols = cells // vocab_size, cells % vocab_size
+        df = np.bincount(cols, minlength=vocab_size)
+        idf = np.log((1 + n) / (1 + df)) + 1
+        weights = tf * idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n))
+        norms[norms == 0] = 1
+        weights = weights / norms[rows]
+
+        if self.method == "textrank" and n <= TEXTRANK_MAX_SENTENCES:
+            matrix = np.zeros((n, vocab_size))
+            matrix[rows, cols] = weights
+            return self._textrank(matrix @ matrix.T)
+
+        centroid = np.bincount(cols, weights=weights, minlength=vocab_size)
+        centroid /= np.linalg.norm(centroid) or 1
+        return np.bincount(rows, weights=weights * centroid[cols], minlength=n)
+
+    def _term_indices(self, sentences: List[str]):
+        """Map sentence terms to (row, col) index arrays over a capped vocabulary"""
+        tokenized = [
+            [t for t in _TERM.findall(s.lower()) if t not in STOPWORDS and len(t) > 2]
+            for s in sentences
+        ]
+        counts = {}
+        for terms in tokenized:
+            for term in set(terms):
+                counts[term] = counts.get(term, 0) + 1
+        vocabulary = {
+            term: i for i, term in enumerate(sorted(counts, key=counts.get, reverse=True)[:self.max_features])
+        }
+
+        rows, cols = [], []
+        for row, terms in enumerate(tokenized):
+            for term in terms:
+                col = vocabulary.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64), len(vocabulary)
+
+    @staticmethod
+    def _textrank(similarity: np.ndarray, damping: float = 0.85, iterations: int = 50) -> np.ndarray:
+        np.fill_diagonal(similarity, 0)
+        out_weight = similarity.sum(axis=1)
+        out_weight[out_weight == 0] = 1
+        transition = similarity / out_weight[:, None]
+        n = len(similarity)
+        scores = np.full(n, 1 / n)
+        for _ in range(iterations):
+            updated = (1 - damping) / n + damping * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < 1e-6:
+                return updated
+            scores = updated
+        return scores
+
+
+def reduce_for_method(method: str, text: str) -> str:
+    """
+    Apply the EXTRACTIVE_SUMMARY_RATIOS setting for a service method
+
+    Inputs shorter than EXTRACTIVE_MIN_TOKENS, and methods without a
+    configured ratio, are returned unchanged.
+    """
+    ratio = settings.EXTRACTIVE_SUMMARY_RATIOS.get(method)
+    if ratio is None or ratio >= 1 or estimate_tokens(text) < settings.EXTRACTIVE_MIN_TOKENS:
+        return text
+    return extractive_summarizer.summarize(text, ratio)
+
+
+# Singleton instance
+extractive_summarizer = ExtractiveSummarizer(settings.EXTRACTIVE_METHOD)
@@ -0,0 +1,255 @@
+"""
+Local key concept extraction (RAKE phrases weighted by corpus IDF)
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+
+from app.core.executor import cpu_executor, published
+from app.services.extractive_summarizer import STOPWORDS
+
+
+_PHRASE_BREAK = re.compile(r"[^\w\s'-]+|\s-\s")
+_WORD = re.compile(r"[a-zA-Z][a-zA-Z0-9'-]*")
+_TERM = re.compile(r"[a-z][a-z0-9'-]*")
+
+MAX_PHRASE_WORDS = 3
+
+# Name of the (document_frequency, document_count) pair shared with the CPU pool
+CORPUS = "keyword_extractor.corpus"
+
+# Common verbs also end candidate phrases, keeping candidates noun-like
+PHRASE_STOPWORDS = STOPWORDS | frozenset("""
+use uses used using take takes took taken taking make makes made making play plays played playing
+fix fixes fixed release releases released absorb absorbs absorbed call calls called see sees seen saw
+look looks want wants need needs mean means meant give gives gave given show shows showed shown become
+becomes became happen happens happened include includes included including let lets say says said tell
+tells told put puts keep keeps kept find finds found work works worked help helps helped start starts
+started come comes came goes went gone produce produces produced occur occurs occurred provide provides
+provided allow allows allowed require requires required contain contains contained form forms formed
+describe describes described explain explains explained called known example examples thing things lot
+""".split())
+
+
+def document_key(video_id: Optional[str] = None, lecture_id: Optional[int] = None) -> str:
+    """Corpus key of a transcript: its YouTube video when known, else its lecture"""
+    if video_id:
+        return f"youtube:{video_id}"
+    return f"lecture:{lecture_id}"
+
+
+def document_terms(text: str) -> List[str]:
+    """Distinct terms of a transcript, as counted for document frequency (sorted)"""
+    return sorted(set(_TERM.findall(text.lower())))
+
+
+class KeywordExtractor:
+    """
+    Extracts key concepts in milliseconds without an LLM call
+
+    Document frequencies are kept in the corpus_terms table and updated as
+    transcripts are added. corpus_documents records which transcripts are
+    counted, keyed by YouTube video or lecture, so a video fetched again is
+    not counted twice. The in-process copy is read at startup; documents
+    added by other workers are picked up at their next restart. The copy is
+    published to the CPU pool whenever it changes, so offloaded extractions
+    do not carry it with every call.
+    """
+
+    def __init__(self):
+        self.document_frequency: Counter = Counter()
+        self.document_count = 0
+
+    async def add_document(self, key: str, text: str) -> bool:
+        """
+        Count a transcript in the corpus IDF table, once per key
+
+        Args:
+            key: Corpus key (see document_key)
+            text: Transcript
+
+        Returns:
+            True if the transcript was not counted before
+        """
+        from app.core.database import async_session_maker
+
+        terms = await cpu_executor.run(document_terms, text, size=len(text))
+        async with async_session_maker() as session:
+            added = await self._store(session, key, terms)
+            await session.commit()
+        if added:
+            self._count(terms)
+            self._publish()
+        return added
+
+    async def load_corpus(self, session_maker, batch_size: int = 100):
+        """
+        Read the IDF table, counting stored lectures it does not cover yet
+
+        Only lectures without a corpus entry (stored before the table
+        existed, or by uploads) have their transcripts read, so after the
+        first startup this reads the term table alone.
+
+        Args:
+            session_maker: Async session factory
+            batch_size: Transcripts read per round-trip
+        """
+        from app.models.models import CorpusDocument, CorpusTerm, Lecture
+
+        async with session_maker() as session:
+            self.document_count = await session.scalar(select(func.count()).select_from(CorpusDocument))
+            self.document_frequency = Counter(dict(
+                (await session.execute(select(CorpusTerm.term, CorpusTerm.document_count))).all()
+            ))
+
+            counted = set((await session.scalars(select(CorpusDocument.key))).all())
+            lectures = await session.execute(
+                select(Lecture.id, Lecture.source_type, Lecture.source_url).where(Lecture.transcript.is_not(None))
+            )
+            missing = [row.id for row in lectures if _lecture_key(row) not in counted]
+            for start in range(0, len(missing), batch_size):
+                rows = await session.execute(
+                    select(Lecture.id, Lecture.source_type, Lecture.source_url, Lecture.transcript)
+                    .where(Lecture.id.in_(missing[start:start + batch_size]))
+                )
+                for row in rows:
+                    terms = document_terms(row.transcript)
+                    if await self._store(session, _lecture_key(row), terms):
+                        self._count(terms)
+                await session.commit()
+        self._publish()
+
+    async def _store(self, session, key: str, terms: List[str]) -> bool:
+        """Record the document and add one to each of its terms; False if the key is already counted"""
+        from app.core.database import dialect_insert
+        from app.models.models import CorpusDocument, CorpusTerm
+
+        insert = dialect_insert(session.bind.dialect.name)
+        added = await session.execute(insert(CorpusDocument).values(key=key).on_conflict_do_nothing(index_elements=["key"]))
+        if not added.rowcount:
+            return False
+        if terms:
+            statement = insert(CorpusTerm)
+            statement = statement.on_conflict_do_update(
+                index_elements=["term"],
+                set_={"document_count": CorpusTerm.document_count + statement.excluded.document_count}
+            )
+            await session.execute(statement, [{"term": term, "document_count": 1} for term in terms])
+        return True
+
+    def _count(self, terms: List[str]):
+        self.document_frequency.update(terms)
+        self.document_count += 1
+
+    def _publish(self):
+        cpu_executor.publish(CORPUS, (self.document_frequency, self.document_count))
+
+    def idf(self, term: str) -> float:
+        return _idf(term, self.document_frequency, self.document_count)
+
+    async def extract(self, text: str, top_k: int = 15) -> List[str]:
+        """
+        Extract key concepts from text
+
+        Runs in the CPU pool for texts of CPU_OFFLOAD_MIN_CHARS or more,
+        against the document frequencies last published there.
+
+        Args:
+            text: Text to analyze
+            top_k: Maximum number of concepts
+
+        Returns:
+            List of key concepts, best first
+        """
+        return await cpu_executor.run(_extract_with_corpus, text, top_k, size=len(text))
+
+
+def _extract_with_corpus(text: str, top_k: int) -> List[str]:
+    document_frequency, document_count = published(CORPUS, ({}, 0))
+    return extract_concepts(text, top_k, document_frequency, document_count)
+
+
+def extract_concepts(text: str, top_k: int, document_frequency: Dict[str, int], document_count: int) -> List[str]:
+    """
+    Key concepts of text, best first
+
+    Candidate phrases are runs of up to three content words between
+    stopwords and punctuation (RAKE). Each word scores degree/frequency
+    times its corpus IDF, so terms common to every lecture rank low.
+    """
+    phrases = list(candidate_phrases(text))
+    if not phrases:
+        return []
+
+    frequency: Counter = Counter()
+    degree: Counter = Counter()
+    for phrase in phrases:
+        for word in phrase:
+            frequency[word] += 1
+            degree[word] += len(phrase)
+
+    # RAKE degree/frequency rewards words that live in longer phrases;
+    # damped by sqrt and combined with TF-IDF so repeated topic words win
+    word_scores = {
+        word: math.sqrt(degree[word] / frequency[word]) * frequency[word] * _idf(word, document_frequency, document_count)
+        for word in frequency
+    }
+    phrase_counts = Counter(phrases)
+    scored = sorted(
+        phrase_counts,
+        key=lambda p: sum(word_scores[w] for w in p) / len(p) * (1 + math.log(phrase_counts[p])),
+        reverse=True
+    )
+
+    concepts: List[str] = []
+    for phrase in scored:
+        candidate = " ".join(phrase)
+        if any(candidate in chosen for chosen in concepts):
+            continue
+        concepts.append(candidate)
+        if len(concepts) == top_k:
+            break
+    return concepts
+
+
+def candidate_phrases(text: str) -> Iterable[tuple]:
+    """Runs of up to MAX_PHRASE_WORDS lowercase content words"""
+    for fragment in _PHRASE_BREAK.split(text):
+        run: List[str] = []
+        for word in _WORD.findall(fragment):
+            word = word.lower()
+            if word in PHRASE_STOPWORDS or len(word) < 3:
+                if run:
+                    yield from _split_run(run)
+                run = []
+            else:
+                run.append(word)
+        if run:
+            yield from _split_run(run)
+
+
+def _idf(term: str, document_frequency: Dict[str, int], document_count: int) -> float:
+    return math.log((1 + document_count) / (1 + document_frequency.get(term, 0))) + 1
+
+
+def _split_run(run: List[str]) -> Iterable[tuple]:
+    for start in range(0, len(run), MAX_PHRASE_WORDS):
+        yield tuple(run[start:start + MAX_PHRASE_WORDS])
+
+
+def _lecture_key(row) -> str:
+    video_id = None
+    if row.source_type == "youtube" and row.source_url:
+        from app.services.transcription_service import youtube_video_id
+        try:
+            video_id = youtube_video_id(row.source_url)
+        except ValueError:
+            pass
+    return document_key(video_id, row.id)
+
+
+# Singleton instance
+keyword_extractor = KeywordExtractor()
@@ -0,0 +1,183 @@
+"""
+Incremental transcription of a live audio stream
+"""
+import asyncio
+import struct
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.transcription_service import transcription_service, pcm_to_wav
+from app.services.transcript_normalizer import overlap_length, MAX_OVERLAP_WORDS
+
+
+# Trailing audio shorter than this is dropped when the stream ends
+MIN_FLUSH_SECONDS = 0.25
+# Characters of preceding transcript passed to Whisper for continuity
+PROMPT_CHARS = 200
+
+
+class LiveTranscriptionSession:
+    """
+    Rolling-buffer transcription of one live stream
+
+    Audio (16-bit PCM, optionally preceded by a WAV header) is appended to a
+    buffer; every time it holds `window_seconds` of audio, that window is
+    sent to Whisper in the background and the buffer advances, keeping
+    `overlap_seconds` so words cut at a boundary are heard twice. Up to
+    `max_inflight` windows are transcribed concurrently, and feeding blocks
+    beyond that, so memory stays bounded for any lecture length. Finished
+    windows are sent to the client strictly in order, with words repeated
+    from the overlap removed.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict], Awaitable[None]],
+        sample_rate: Optional[int] = None,
+        channels: int = 1,
+        sample_width: int = 2,
+        window_seconds: Optional[float] = None,
+        overlap_seconds: Optional[float] = None,
+        max_inflight: Optional[int] = None,
+        transcribe: Optional[Callable[..., Awaitable[str]]] = None
+    ):
+        self.send = send
+        self.transcribe = transcribe or transcription_service.transcribe_audio_bytes
+        self.window_seconds = window_seconds or settings.LIVE_WINDOW_SECONDS
+        self.overlap_seconds = settings.LIVE_WINDOW_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+        self._set_format(sample_rate or settings.LIVE_SAMPLE_RATE, channels, sample_width)
+
+        self._buffer = bytearray()
+        self._buffer_start = 0  # stream position (bytes) of _buffer[0]
+        self._header_checked = False
+        self._next_seq = 0
+        self._slots = asyncio.Semaphore(max_inflight or settings.LIVE_MAX_INFLIGHT_WINDOWS)
+        self._tasks: List[asyncio.Task] = []
+
+        self._results: Dict[int, Dict] = {}
+        self._emit_seq = 0
+        self._emit_lock = asyncio.Lock()
+        self._recent = deque(maxlen=MAX_OVERLAP_WORDS)
+        self._texts: List[str] = []
+
+    @property
+    def transcript(self) -> str:
+        """Text emitted so far"""
+        return " ".join(self._texts)
+
+    @property
+    def windows(self) -> int:
+        return self._next_seq
+
+    async def feed(self, data: bytes):
+        """
+        Add received audio, dispatching every window that fills
+
+        Args:
+            data: PCM bytes; the first frame may start with a WAV header
+        """
+        if not self._header_checked:
+            self._header_checked = True
+            if data[:4] == b"RIFF":
+                data = self._read_wav_header(data)
+
+        self._buffer.extend(data)
+        while len(self._buffer) >= self._window_bytes:
+            await self._dispatch(bytes(self._buffer[:self._window_bytes]))
+            advance = self._window_bytes - self._overlap_bytes
+            del self._buffer[:advance]
+            self._buffer_start += advance
+
+    async def finish(self) -> str:
+        """
+        Flush the remaining audio and wait for every window
+
+        Returns:
+            The full ordered transcript
+        """
+        carried = self._overlap_bytes if self._next_seq else 0
+        if len(self._buffer) - carried >= MIN_FLUSH_SECONDS * self._bytes_per_second:
+            await self._dispatch(bytes(self._buffer))
+        self._buffer.clear()
+        await asyncio.gather(*self._tasks)
+        return self.transcript
+
+    async def cancel(self):
+        """Stop all in-flight transcriptions (client went away)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _dispatch(self, pcm: bytes):
+        await self._slots.acquire()
+        seq = self._next_seq
+        self._next_seq += 1
+        start = self._buffer_start / self._bytes_per_second
+        self._tasks = [task for task in self._tasks if not task.done()]
+        window = {"seq": seq, "start": round(start, 3), "end": round(start + len(pcm) / self._bytes_per_second, 3)}
+        self._tasks.append(asyncio.create_task(self._transcribe_window(window, pcm, self.transcript[-PROMPT_CHARS:])))
+
+    async def _transcribe_window(self, window: Dict, pcm: bytes, prompt: str):
+        ready_at = time.perf_counter()
+        try:
+            wav = pcm_to_wav(pcm, self.sample_rate, self.channels, self.sample_width)
+            text = await asyncio.wait_for(
+                self.transcribe(wav, f"window-{window['seq']}.wav", prompt or None),
+                timeout=settings.LIVE_WINDOW_TIMEOUT
+            )
+            window["text"] = text.strip()
+        except asyncio.TimeoutError:
+            window["text"] = ""
+            window["error"] = "Transcription timed out"
+        except Exception as e:
+            window["text"] = ""
+            window["error"] = str(e)
+        finally:
+            self._slots.release()
+
+        window["latency_ms"] = round((time.perf_counter() - ready_at) * 1000, 1)
+        self._results[window["seq"]] = window
+        await self._emit_ready()
+
+    async def _emit_ready(self):
+        # A failed window still advances the order, so later windows never wait on it
+        async with self._emit_lock:
+            while self._emit_seq in self._results:
+                window = self._results.pop(self._emit_seq)
+                self._emit_seq += 1
+                words = window["text"].split()
+                words = words[overlap_length(self._recent, words):]
+                self._recent.extend(w.lower() for w in words)
+                window["text"] = " ".join(words)
+                if window["text"]:
+                    self._texts.append(window["text"])
+                await self.send({"type": "partial", **window})
+
+    def _set_format(self, sample_rate: int, channels: int, sample_width: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        frame = channels * sample_width
+        self._bytes_per_second = sample_rate * frame
+        self._window_bytes = int(self.window_seconds * sample_rate) * frame
+        self._overlap_bytes = int(self.overlap_seconds * sample_rate) * frame
+        if self._overlap_bytes >= self._window_bytes:
+            raise ValueError("Window overlap must be shorter than the window")
+
+    def _read_wav_header(self, data: bytes) -> bytes:
+        """Take the stream format from a WAV header and return the PCM after it"""
+        position = 12
+        while position + 8 <= len(data):
+            chunk_id, size = struct.unpack_from("<4sI", data, position)
+            if chunk_id == b"fmt ":
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", data, position + 8)
+                if audio_format != 1:
+                    raise ValueError("Only PCM WAV audio is supported")
+                self._set_format(sample_rate, channels, bits // 8)
+            elif chunk_id == b"data":
+                # Streamed WAVs often carry a placeholder size; the rest of the stream is audio
+                return data[position + 8:]
+            position += 8 + size + (size & 1)
+        raise ValueError("WAV header must be sent in the first frame")
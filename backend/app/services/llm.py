@@ -0,0 +1,342 @@
+"""
+Shared call path for upstream OpenAI chat completions
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import openai
+from openai import AsyncOpenAI
+from app.core.config import settings
+from app.core.disconnect import cancellations
+from app.core.tracing import tracer
+from app.services.model_router import RouteChoice, model_router
+from app.services.prompts import PromptTemplate, prompt_registry
+
+
+class UpstreamError(Exception):
+    """An LLM call that failed fast or ran out of time; status_code is the HTTP status to report"""
+    status_code = 503
+
+
+class DeadlineExceededError(UpstreamError):
+    """Raised when a call does not finish within its method's deadline"""
+    status_code = 504
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised without calling upstream while the circuit breaker is open"""
+    status_code = 503
+
+
+class RateLimiter:
+    """Spaces calls evenly to stay under a requests-per-minute limit"""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class LatencyTracker:
+    """Recent upstream latencies per method, for choosing when to hedge"""
+
+    def __init__(self, window: int, min_samples: int):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, method: str, seconds: float):
+        self._samples.setdefault(method, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, method: str, pct: float) -> Optional[float]:
+        """Latency percentile in seconds, or None until enough calls were seen"""
+        samples = self._samples.get(method)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(pct / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the upstream is degraded
+
+    Opens after `failure_threshold` consecutive failures (errors the
+    provider is responsible for, or missed deadlines). After `cooldown`
+    seconds a single trial call is let through: success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool):
+        self._trial = False
+        if ok:
+            self.failures = 0
+            self._opened_at = None
+            return
+        self.failures += 1
+        if self._opened_at is not None or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """A call ended without an outcome (cancelled by the caller)"""
+        self._trial = False
+
+
+# Bounds concurrent upstream calls per worker and their rate; time spent
+# waiting here is reported as queue wait on the upstream span.
+_upstream_slots = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+_rate_limiter = RateLimiter(settings.LLM_REQUESTS_PER_MINUTE)
+_latencies = LatencyTracker(settings.LLM_LATENCY_WINDOW, settings.LLM_HEDGE_MIN_SAMPLES)
+_breakers: Dict[str, CircuitBreaker] = {}
+_method_stats: Dict[str, Dict[str, int]] = {}
+_route_latencies = LatencyTracker(settings.LLM_LATENCY_WINDOW, 1)
+_route_stats: Dict[str, Dict[str, Dict[str, int]]] = {}  # route -> model -> counters
+
+
+def _payload_size(messages: List[Dict]) -> int:
+    return sum(len(m.get("content") or "") for m in messages)
+
+
+def _cached_tokens(usage) -> int:
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def _is_upstream_failure(error: BaseException) -> bool:
+    """Errors that say the provider is unhealthy, as opposed to a bad request"""
+    if isinstance(error, (openai.APIConnectionError, DeadlineExceededError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500 or error.status_code == 429
+    return False
+
+
+def _breaker(model: Optional[str]) -> CircuitBreaker:
+    key = model or "default"
+    if key not in _breakers:
+        _breakers[key] = CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_COOLDOWN)
+    return _breakers[key]
+
+
+def _route(method: str, kwargs: Dict) -> RouteChoice:
+    """Route calls made with the default model; a model named explicitly is kept"""
+    if kwargs.get("model", settings.OPENAI_MODEL) != settings.OPENAI_MODEL:
+        return RouteChoice("pinned", kwargs["model"])
+    return model_router.route(
+        method, kwargs.get("messages", []), kwargs.get("max_tokens") or 0, settings.OPENAI_MODEL,
+        available=lambda model: _breaker(model).state != "open"
+    )
+
+
+def _route_counters(choice: RouteChoice) -> Dict[str, int]:
+    models = _route_stats.setdefault(choice.route, {})
+    if choice.model not in models:
+        models[choice.model] = {"calls": 0, "fallbacks": 0, "errors": 0}
+    return models[choice.model]
+
+
+def _stats(method: str) -> Dict[str, int]:
+    if method not in _method_stats:
+        _method_stats[method] = {
+            "calls": 0, "hedged": 0, "hedge_wins": 0, "deadline_exceeded": 0, "failures": 0, "rejected": 0,
+            "cancelled": 0,
+        }
+    return _method_stats[method]
+
+
+async def _attempt(client: AsyncOpenAI, kwargs: Dict, span=None) -> Tuple[object, float]:
+    """One upstream request, returning the response and its latency in seconds"""
+    queued_at = time.perf_counter()
+    await _rate_limiter.acquire()
+    async with _upstream_slots:
+        started_at = time.perf_counter()
+        if span is not None:
+            span.set("queue_wait_ms", round((started_at - queued_at) * 1000, 3))
+        response = await client.chat.completions.create(**kwargs)
+        return response, time.perf_counter() - started_at
+
+
+def _may_hedge(method: str, breaker: CircuitBreaker) -> bool:
+    stats = _stats(method)
+    return (
+        breaker.state == "closed"
+        and not _upstream_slots.locked()
+        and stats["hedged"] < stats["calls"] * settings.LLM_HEDGE_MAX_RATIO
+    )
+
+
+async def _hedged_call(client: AsyncOpenAI, method: str, kwargs: Dict, breaker: CircuitBreaker, span):
+    """
+    Run a call, firing one duplicate once it outlives the method's observed p95
+
+    Whichever attempt succeeds first wins and the other is cancelled; if one
+    attempt fails, the other is still awaited.
+    """
+    tasks = [asyncio.ensure_future(_attempt(client, kwargs, span))]
+    try:
+        pending = set(tasks)
+        delay = _latencies.percentile(method, settings.LLM_HEDGE_PERCENTILE) if settings.LLM_HEDGING_ENABLED else None
+        if delay is not None:
+            _, pending = await asyncio.wait(pending, timeout=max(delay, settings.LLM_HEDGE_MIN_DELAY))
+            if pending and _may_hedge(method, breaker):
+                tasks.append(asyncio.ensure_future(_attempt(client, kwargs)))
+                pending.add(tasks[-1])
+                _stats(method)["hedged"] += 1
+                span.set("hedged", True)
+
+        while True:
+            if not pending:
+                return tasks[0].result()  # every attempt failed: raise the first error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in tasks if task in done and task.exception() is None), None)
+            if winner is not None:
+                if winner is not tasks[0]:
+                    _stats(method)["hedge_wins"] += 1
+                    span.set("hedge_won", True)
+                return winner.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # a losing attempt's error is not reported
+
+
+async def create_chat_completion(client: AsyncOpenAI, prompt: Optional[PromptTemplate] = None, **kwargs):
+    """
+    Call chat.completions.create with upstream tracing
+
+    Args:
+        client: OpenAI client owned by the calling service
+        prompt: Template the messages were rendered from, for prefix-cache stats
+        **kwargs: Arguments passed through to chat.completions.create
+
+    Returns:
+        The ChatCompletion response
+    """
+    method = prompt.name if prompt is not None else "default"
+    deadline = settings.LLM_DEADLINES.get(method, settings.LLM_DEFAULT_DEADLINE)
+    choice = _route(method, kwargs)
+    kwargs["model"] = choice.model
+    breaker = _breaker(choice.model)
+    stats = _stats(method)
+    route_stats = _route_counters(choice)
+
+    with tracer.span("openai.chat.completions", kind="client", model=choice.model) as span:
+        if prompt is not None:
+            span.set("prompt", f"{prompt.name}@{prompt.version}")
+        span.set("route", choice.route)
+        if choice.fallback:
+            span.set("route_fallback", True)
+        span.set("request_chars", _payload_size(kwargs.get("messages", [])))
+        if not breaker.allow():
+            stats["rejected"] += 1
+            raise CircuitOpenError(f"Upstream {kwargs.get('model')} is unavailable; try again shortly")
+
+        stats["calls"] += 1
+        route_stats["calls"] += 1
+        route_stats["fallbacks"] += choice.fallback
+        try:
+            try:
+                response, latency = await asyncio.wait_for(_hedged_call(client, method, kwargs, breaker, span), deadline)
+            except asyncio.TimeoutError:
+                stats["deadline_exceeded"] += 1
+                raise DeadlineExceededError(f"{method} did not finish within {deadline:g}s")
+        except asyncio.CancelledError:
+            # The caller was cancelled (e.g. the client disconnected); so is every attempt
+            breaker.release()
+            stats["cancelled"] += 1
+            cancellations.call("llm", method)
+            raise
+        except Exception as e:
+            failed = _is_upstream_failure(e)
+            stats["failures"] += failed
+            route_stats["errors"] += 1
+            breaker.record(ok=not failed)
+            raise
+        breaker.record(ok=True)
+        _latencies.record(method, latency)
+        _route_latencies.record(f"{choice.route}/{choice.model}", latency)
+        span.set("upstream_latency_ms", round(latency * 1000, 3))
+
+        if response.usage is not None:
+            cached = _cached_tokens(response.usage)
+            span.set("prompt_tokens", response.usage.prompt_tokens)
+            span.set("cached_tokens", cached)
+            span.set("completion_tokens", response.usage.completion_tokens)
+            if prompt is not None:
+                prompt_registry.record(prompt, response.usage.prompt_tokens, cached, latency)
+        span.set("response_chars", len(response.choices[0].message.content or ""))
+        return response
+
+
+def metrics() -> Dict:
+    """Per-method and per-route latency, hedging, deadline and cancellation counters, and circuit breaker states"""
+    methods = {}
+    for method, stats in sorted(_method_stats.items()):
+        p50 = _latencies.percentile(method, 50)
+        p95 = _latencies.percentile(method, settings.LLM_HEDGE_PERCENTILE)
+        methods[method] = {
+            **stats,
+            "deadline_seconds": settings.LLM_DEADLINES.get(method, settings.LLM_DEFAULT_DEADLINE),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "hedge_after_ms": round(max(p95, settings.LLM_HEDGE_MIN_DELAY) * 1000, 1) if p95 is not None else None,
+        }
+    routes = {}
+    for route, models in sorted(_route_stats.items()):
+        routes[route] = {}
+        for model, counters in sorted(models.items()):
+            p50 = _route_latencies.percentile(f"{route}/{model}", 50)
+            p95 = _route_latencies.percentile(f"{route}/{model}", 95)
+            routes[route][model] = {
+                **counters,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+    return {
+        "methods": methods,
+        "routes": routes,
+        "breakers": {
+            model: {"state": breaker.state, "consecutive_failures": breaker.failures, "rejected": breaker.rejected}
+            for model, breaker in _breakers.items()
+        },
+    }
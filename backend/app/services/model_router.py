@@ -0,0 +1,144 @@
+"""
+Model routing for chat completions by method, input size and latency tier
+"""
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.token_budget import PROMPT_OVERHEAD_TOKENS, token_budget
+from app.services.tokens import estimate_tokens
+
+
+TIERS = ("fast", "standard", "batch")
+TIER_HEADER = b"x-latency-tier"
+
+_tier: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("latency_tier", default=None)
+
+
+@dataclass
+class ModelRoute:
+    """A routing rule: calls it matches go to `model`, or to a fallback while that model is unavailable"""
+    name: str
+    model: str
+    methods: List[str] = field(default_factory=list)  # prompt names or "prefix.*"; empty matches any
+    tiers: List[str] = field(default_factory=list)  # empty matches any tier
+    max_input_tokens: Optional[int] = None
+    fallbacks: List[str] = field(default_factory=list)
+
+    def matches(self, method: str, tier: str, input_tokens: int) -> bool:
+        if self.methods and not any(
+            method == pattern or (pattern.endswith(".*") and method.startswith(pattern[:-1]))
+            for pattern in self.methods
+        ):
+            return False
+        if self.tiers and tier not in self.tiers:
+            return False
+        return self.max_input_tokens is None or input_tokens <= self.max_input_tokens
+
+
+@dataclass
+class RouteChoice:
+    """The route and model picked for one call"""
+    route: str
+    model: str
+    fallback: bool = False  # True when the route's own model was unavailable
+
+
+class ModelRouter:
+    """
+    Picks the model for each chat completion
+
+    Routes from MODEL_ROUTES are tried in order; the first whose methods,
+    tiers and input-token limit match the call wins, provided its model's
+    context window holds the prompt and the requested completion. Calls no
+    route matches use the default route (the model the service asked for,
+    i.e. OPENAI_MODEL). While a model's circuit breaker is open its route
+    falls back to the route's `fallbacks`, then MODEL_FALLBACKS[model].
+    Input size is estimated from characters, which is close enough for
+    choosing a route and costs nothing on large prompts.
+    """
+
+    def __init__(self, routes: List[Dict], fallbacks: Dict[str, List[str]], default_tier: str):
+        self.routes = [ModelRoute(**route) for route in routes]
+        self.fallbacks = fallbacks
+        if default_tier not in TIERS:
+            raise ValueError(f"Unknown latency tier: {default_tier}")
+        self.default_tier = default_tier
+
+    def route(
+        self,
+        method: str,
+        messages: List[Dict],
+        max_tokens: int,
+        default_model: str,
+        available: Callable[[str], bool] = lambda model: True
+    ) -> RouteChoice:
+        """
+        Choose the model for a call
+
+        Args:
+            method: Prompt name of the call (e.g. "nlp.summarize_text")
+            messages: Rendered chat messages
+            max_tokens: Completion tokens requested
+            default_model: Model used when no route matches
+            available: Whether a model can take calls now (its circuit is not open)
+
+        Returns:
+            The chosen route and model
+        """
+        input_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages) + PROMPT_OVERHEAD_TOKENS
+        tier = self.current_tier()
+        route = next(
+            (r for r in self.routes if r.matches(method, tier, input_tokens) and self._fits(r.model, input_tokens, max_tokens)),
+            None
+        )
+        name, model = (route.name, route.model) if route else ("default", default_model)
+        if available(model):
+            return RouteChoice(name, model)
+
+        candidates = (route.fallbacks if route else []) + self.fallbacks.get(model, [])
+        if route and model != default_model:
+            candidates.append(default_model)
+        for candidate in candidates:
+            if candidate != model and available(candidate) and self._fits(candidate, input_tokens, max_tokens):
+                return RouteChoice(name, candidate, fallback=True)
+        return RouteChoice(name, model)  # nothing better; the open circuit fails the call fast
+
+    def current_tier(self) -> str:
+        return _tier.get() or self.default_tier
+
+    @contextmanager
+    def tier(self, tier: str):
+        """Run the enclosed calls under a latency tier"""
+        token = _tier.set(tier if tier in TIERS else None)
+        try:
+            yield
+        finally:
+            _tier.reset(token)
+
+    @staticmethod
+    def _fits(model: str, input_tokens: int, max_tokens: int) -> bool:
+        return input_tokens + max_tokens <= token_budget.context_window(model)
+
+
+class LatencyTierMiddleware:
+    """ASGI middleware that applies a request's X-Latency-Tier header (fast, standard, batch)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        tier = None
+        if scope["type"] == "http":
+            tier = dict(scope.get("headers") or []).get(TIER_HEADER, b"").decode("latin-1").strip().lower()
+        if not tier:
+            await self.app(scope, receive, send)
+            return
+        with model_router.tier(tier):
+            await self.app(scope, receive, send)
+
+
+# Singleton instance
+model_router = ModelRouter(settings.MODEL_ROUTES, settings.MODEL_FALLBACKS, settings.LLM_DEFAULT_TIER)
@@ -2,9 +2,31 @@
 NLP service for text summarization and processing
 """
 from openai import AsyncOpenAI
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
+import asyncio
 import re
 from app.core.config import settings
+from app.core.executor import cpu_executor
+from app.core.tracing import traced
+from app.services.extractive_summarizer import reduce_for_method
+from app.services.keyword_extractor import keyword_extractor
+from app.services.llm import create_chat_completion
+from app.services.prompts import prompt_registry
+from app.services.structured_output import FLASHCARD_SCHEMA, existing_listing, repair_max_tokens, structured_output
+from app.services.text_chunker import iter_chunks
+from app.services.token_budget import FittedInput, token_budget
+from app.services.tokens import count_words, estimate_tokens, get_token_counter
+
+
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+")
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s|$)")
+
+# Most recent note headings sent as merge context with an update
+MAX_CONTEXT_HEADINGS = 30
+
+
+class TranscriptMismatchError(Exception):
+    """Raised when notes claim to cover more of a transcript than it has (it was replaced, not extended)"""
 
 
 class NLPService:
@@ -13,6 +35,7 @@ class NLPService:
     def __init__(self):
         self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
     
+    @traced("nlp.generate_notes")
     async def generate_notes(self, transcript: str, subject: str = "") -> str:
         """
         Generate structured notes from a transcript
@@ -24,34 +47,102 @@ class NLPService:
         Returns:
             Structured notes in markdown format
         """
-        subject_context = f"for a {subject} lecture " if subject else ""
+        transcript = await cpu_executor.run(reduce_for_method, "nlp.generate_notes", transcript, size=len(transcript))
+        fitted = await self.fit_input("nlp.generate_notes", transcript, max_tokens=2000, can_chunk=True)
+        if fitted.chunks:
+            sections = await asyncio.gather(*(self._generate_notes(chunk, subject) for chunk in fitted.chunks))
+            return "\n\n".join(sections)
+        return await self._generate_notes(fitted.text, subject)
+    
+    async def _generate_notes(self, transcript: str, subject: str) -> str:
+        """Generate notes for a transcript that fits the prompt budget"""
+        prompt = prompt_registry.get("nlp.generate_notes")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
+            model=settings.OPENAI_MODEL,
+            messages=prompt.render(transcript=transcript, subject=subject or "not specified"),
+            temperature=0.7,
+            max_tokens=2000
+        )
+        
+        return response.choices[0].message.content
+    
+    @traced("nlp.update_notes")
+    async def update_notes(
+        self,
+        notes: str,
+        transcript: str,
+        covered_offset: int = 0,
+        subject: str = ""
+    ) -> Tuple[str, int]:
+        """
+        Extend notes with the part of a growing transcript they do not cover yet
         
-        prompt = f"""Generate comprehensive, well-structured notes {subject_context}from the following transcript.
+        Only the new tail, up to its last complete sentence, is sent to the
+        LLM along with the existing section headings; the result is merged
+        into the matching sections. Each update therefore costs about the
+        same however long the transcript has grown.
         
-Format the notes with:
-- Clear headings and subheadings
-- Key concepts highlighted
-- Important definitions
-- Examples and explanations
-- Summary points
-
-Transcript:
-{transcript}
-
-Generate detailed, organized notes in markdown format:"""
-
-        response = await self.client.chat.completions.create(
+        Args:
+            notes: Existing markdown notes (empty to start)
+            transcript: The full transcript so far
+            covered_offset: Transcript characters the notes already cover
+            subject: Subject context (optional)
+            
+        Returns:
+            Tuple of (updated notes, new covered offset)
+            
+        Raises:
+            TranscriptMismatchError: covered_offset is past the end of the transcript
+        """
+        if covered_offset > len(transcript):
+            raise TranscriptMismatchError(
+                f"Notes cover {covered_offset} transcript characters but the transcript has {len(transcript)}; "
+                "it was replaced rather than extended"
+            )
+        
+        end = covered_offset + _complete_sentences_length(transcript[covered_offset:])
+        segment = transcript[covered_offset:end].strip()
+        if not segment or (notes and estimate_tokens(segment) < settings.NOTES_MIN_UPDATE_TOKENS):
+            return notes, covered_offset
+        if not notes:
+            return await self.generate_notes(segment, subject), end
+        
+        headings = [heading for heading, _ in split_sections(notes) if heading][-MAX_CONTEXT_HEADINGS:]
+        fitted = await self.fit_input(
+            "nlp.generate_notes",
+            segment,
+            max_tokens=2000,
+            reserved_tokens=estimate_tokens("\n".join(headings)),
+            can_chunk=True
+        )
+        updates = await asyncio.gather(*(
+            self._generate_note_update(chunk, headings, subject) for chunk in (fitted.chunks or [fitted.text])
+        ))
+        for update in updates:
+            notes = merge_notes(notes, update)
+        return notes, end
+    
+    async def _generate_note_update(self, segment: str, headings: List[str], subject: str) -> str:
+        """Generate notes for a new transcript segment, reusing existing headings"""
+        prompt = prompt_registry.get("nlp.update_notes")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
             model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert note-taking assistant that creates clear, comprehensive, and well-organized study notes."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt.render(
+                headings="\n".join(headings) or "(none)",
+                segment=segment,
+                subject=subject or "not specified"
+            ),
             temperature=0.7,
             max_tokens=2000
         )
         
         return response.choices[0].message.content
     
+    @traced("nlp.summarize_text")
     async def summarize_text(self, text: str, max_length: int = 300) -> str:
         """
         Generate a concise summary of text
@@ -63,26 +154,22 @@ Generate detailed, organized notes in markdown format:"""
         Returns:
             Summary text
         """
-        prompt = f"""Summarize the following text in {max_length} words or less. 
-Focus on the key points and main ideas.
-
-Text:
-{text}
-
-Summary:"""
-
-        response = await self.client.chat.completions.create(
+        text = await cpu_executor.run(reduce_for_method, "nlp.summarize_text", text, size=len(text))
+        text = (await self.fit_input("nlp.summarize_text", text, max_tokens=500)).text
+        
+        prompt = prompt_registry.get("nlp.summarize_text")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
             model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert at creating concise, informative summaries."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt.render(text=text, max_length=max_length),
             temperature=0.5,
             max_tokens=500
         )
         
         return response.choices[0].message.content
     
+    @traced("nlp.extract_key_concepts")
     async def extract_key_concepts(self, text: str) -> List[str]:
         """
         Extract key concepts and topics from text
@@ -93,20 +180,25 @@ Summary:"""
         Returns:
             List of key concepts
         """
-        prompt = f"""Extract the main concepts, topics, and important terms from the following text.
-Return them as a comma-separated list.
-
-Text:
-{text}
-
-Key concepts:"""
-
-        response = await self.client.chat.completions.create(
+        mode = settings.CONCEPT_EXTRACTION_MODE
+        if mode != "llm":
+            concepts = await keyword_extractor.extract(text)
+            if mode == "local" or not concepts:
+                return concepts
+            return await self._refine_concepts(text, concepts)
+        
+        fitted = await self.fit_input("nlp.extract_key_concepts", text, max_tokens=300, can_chunk=True)
+        if fitted.chunks:
+            results = await asyncio.gather(*(self.extract_key_concepts(chunk) for chunk in fitted.chunks))
+            return _merge_unique(concept for concepts in results for concept in concepts)
+        text = fitted.text
+        
+        prompt = prompt_registry.get("nlp.extract_key_concepts")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
             model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert at identifying key concepts and topics in educational content."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt.render(text=text),
             temperature=0.5,
             max_tokens=300
         )
@@ -115,6 +207,24 @@ Key concepts:"""
         concepts = [c.strip() for c in concepts_text.split(',')]
         return concepts
     
+    async def _refine_concepts(self, text: str, candidates: List[str]) -> List[str]:
+        """Ask the LLM to clean up locally extracted concept candidates"""
+        excerpt = next(iter_chunks(text, 1000, 0, get_token_counter()), "")
+        
+        prompt = prompt_registry.get("nlp.refine_concepts")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
+            model=settings.OPENAI_MODEL,
+            messages=prompt.render(excerpt=excerpt, candidates=", ".join(candidates)),
+            temperature=0.3,
+            max_tokens=150
+        )
+        
+        concepts_text = response.choices[0].message.content
+        return _merge_unique(c.strip() for c in concepts_text.split(','))
+    
+    @traced("nlp.generate_flashcards")
     async def generate_flashcards(self, content: str, count: int = 10) -> List[dict]:
         """
         Generate flashcards from content
@@ -126,38 +236,102 @@ Key concepts:"""
         Returns:
             List of flashcard dictionaries with question and answer
         """
-        prompt = f"""Generate {count} flashcards from the following content.
-Each flashcard should have a clear question and a concise answer.
-Format as JSON array with 'question' and 'answer' fields.
-
-Content:
-{content}
-
-Generate flashcards:"""
-
-        response = await self.client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert at creating effective study flashcards. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1500,
-            response_format={"type": "json_object"}
+        fitted = await self.fit_input("nlp.generate_flashcards", content, max_tokens=1500, can_chunk=True)
+        if fitted.chunks:
+            counts = split_count(count, len(fitted.chunks))
+            results = await asyncio.gather(*(
+                self.generate_flashcards(chunk, n) for chunk, n in zip(fitted.chunks, counts) if n
+            ))
+            return [card for cards in results for card in cards]
+        content = fitted.text
+        
+        async def request(needed: int, accepted: List[dict]) -> str:
+            if accepted:
+                prompt = prompt_registry.get("nlp.complete_flashcards")
+                messages = prompt.render(
+                    content=content, count=needed, existing=existing_listing(accepted, FLASHCARD_SCHEMA)
+                )
+            else:
+                prompt = prompt_registry.get("nlp.generate_flashcards")
+                messages = prompt.render(content=content, count=needed)
+            response = await create_chat_completion(
+                self.client,
+                prompt=prompt,
+                model=settings.OPENAI_MODEL,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=repair_max_tokens(1500, needed, count),
+                response_format={"type": "json_object"}
+            )
+            return response.choices[0].message.content
+        
+        return await structured_output.collect("nlp.generate_flashcards", FLASHCARD_SCHEMA, count, request)
+    
+    async def fit_input(
+        self,
+        method: str,
+        text: str,
+        max_tokens: int,
+        reserved_tokens: int = 0,
+        can_chunk: bool = False
+    ) -> FittedInput:
+        """
+        Fit a method's input into its prompt budget before calling the LLM
+        
+        Condensing is resolved here; chunked inputs are returned with
+        `chunks` set for the caller to fan out. Methods that cannot combine
+        per-chunk results get their input condensed instead.
+        
+        Args:
+            method: Service method name (e.g. "nlp.generate_notes")
+            text: Variable input to fit
+            max_tokens: Completion tokens requested by the method
+            reserved_tokens: Tokens already used by other variable parts
+            can_chunk: Whether the caller can combine per-chunk results
+            
+        Returns:
+            FittedInput with the text to send, or chunks to fan out
+        """
+        fitted = await cpu_executor.run(
+            token_budget.fit, method, text, max_tokens, reserved_tokens=reserved_tokens, size=len(text)
         )
+        if fitted.chunks and (fitted.strategy == "condense" or not can_chunk):
+            condensed = await self.condense_text(fitted.chunks, fitted.budget_tokens)
+            if len(condensed) >= len(text):
+                # Summaries did not shrink the input; keep what fits
+                condensed = next(iter_chunks(condensed, fitted.budget_tokens, 0, get_token_counter()), "")
+            return await self.fit_input(method, condensed, max_tokens, reserved_tokens, can_chunk)
+        return fitted
+    
+    async def condense_text(self, chunks: List[str], target_tokens: int) -> str:
+        """
+        Condense chunks of a long text by summarizing each one
         
-        import json
-        result = json.loads(response.choices[0].message.content)
-        return result.get('flashcards', [])
+        Args:
+            chunks: Chunks of the text, each within a prompt budget
+            target_tokens: Approximate token size of the condensed text
+            
+        Returns:
+            Concatenated chunk summaries
+        """
+        # ~0.75 words per token, capped by summarize_text's completion size
+        words_per_chunk = min(max(int(target_tokens * 0.75 / len(chunks)), 50), 300)
+        summaries = await asyncio.gather(*(
+            self.summarize_text(chunk, max_length=words_per_chunk) for chunk in chunks
+        ))
+        return "\n\n".join(summaries)
     
     def chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
         """
         Split text into chunks for processing
         
+        Sentences are kept whole, so a chunk can exceed chunk_size when a
+        single sentence does; use iter_chunks for a hard token budget.
+        
         Args:
             text: Text to chunk
-            chunk_size: Size of each chunk
-            overlap: Overlap between chunks
+            chunk_size: Size of each chunk in words
+            overlap: Overlap between chunks in words
             
         Returns:
             List of text chunks
@@ -165,37 +339,111 @@ Generate flashcards:"""
         chunk_size = chunk_size or settings.CHUNK_SIZE
         overlap = overlap or settings.CHUNK_OVERLAP
         
-        # Split by sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        chunks = []
-        current_chunk = []
-        current_length = 0
+        return list(iter_chunks(text, chunk_size, overlap, count=count_words, fit=False))
+    
+    def iter_chunks(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Lazily split text into token-sized chunks for LLM calls
         
-        for sentence in sentences:
-            sentence_length = len(sentence.split())
-            
-            if current_length + sentence_length > chunk_size and current_chunk:
-                chunks.append(' '.join(current_chunk))
-                # Keep last few sentences for overlap
-                overlap_sentences = []
-                overlap_length = 0
-                for s in reversed(current_chunk):
-                    if overlap_length < overlap:
-                        overlap_sentences.insert(0, s)
-                        overlap_length += len(s.split())
-                    else:
-                        break
-                current_chunk = overlap_sentences
-                current_length = overlap_length
+        Args:
+            text: Text to chunk
+            max_tokens: Token budget per chunk (defaults to CHUNK_TOKENS)
+            overlap_tokens: Overlap between chunks in tokens (defaults to CHUNK_OVERLAP_TOKENS)
+            model: Model whose tokenizer sizes the chunks
             
-            current_chunk.append(sentence)
-            current_length += sentence_length
-        
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        Returns:
+            Iterator of text chunks
+        """
+        max_tokens = max_tokens or settings.CHUNK_TOKENS
+        if overlap_tokens is None:
+            overlap_tokens = settings.CHUNK_OVERLAP_TOKENS
         
-        return chunks
+        return iter_chunks(text, max_tokens, overlap_tokens, count=get_token_counter(model))
+
+
+def split_sections(markdown: str) -> List[Tuple[Optional[str], List[str]]]:
+    """Split markdown into (heading line, body lines) sections; text before the first heading has heading None"""
+    sections: List[Tuple[Optional[str], List[str]]] = [(None, [])]
+    for line in markdown.splitlines():
+        if _HEADING.match(line):
+            sections.append((line.strip(), []))
+        else:
+            sections[-1][1].append(line)
+    if not "".join(sections[0][1]).strip():
+        sections.pop(0)
+    return sections
+
+
+def merge_notes(notes: str, update: str) -> str:
+    """
+    Merge newly generated notes into existing ones
+    
+    Sections whose heading matches an existing one (ignoring level and case)
+    are appended to that section; lines already present there are skipped.
+    Other sections are added at the end.
+    """
+    sections = split_sections(notes)
+    index = {_heading_key(heading): i for i, (heading, _) in enumerate(sections) if heading}
+    for heading, body in split_sections(update):
+        key = _heading_key(heading) if heading else None
+        if key in index:
+            existing = sections[index[key]][1]
+            seen = {line.strip() for line in existing if line.strip()}
+            while existing and not existing[-1].strip():
+                existing.pop()
+            existing.extend(line for line in body if not line.strip() or line.strip() not in seen)
+        else:
+            if key:
+                index[key] = len(sections)
+            sections.append((heading, list(body)))
+    
+    lines = []
+    for heading, body in sections:
+        if heading:
+            if lines and lines[-1].strip():
+                lines.append("")
+            lines.append(heading)
+        lines.extend(body)
+    return "\n".join(lines).strip() + "\n"
+
+
+def _heading_key(heading: str) -> str:
+    return _HEADING.sub("", heading).strip().strip("*").strip().lower()
+
+
+def _complete_sentences_length(text: str) -> int:
+    """Length of the prefix of text ending at its last sentence boundary (or word, if unpunctuated)"""
+    boundary = None
+    for boundary in _SENTENCE_END.finditer(text):
+        pass
+    if boundary:
+        return boundary.end()
+    # Unpunctuated text: stop before a possibly unfinished last word
+    return text.rfind(" ") + 1
+
+
+def split_count(total: int, parts: int) -> List[int]:
+    """Split an item count as evenly as possible across parts"""
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def _merge_unique(items) -> List[str]:
+    """Deduplicate strings case-insensitively, keeping first-seen order"""
+    seen = set()
+    merged = []
+    for item in items:
+        key = item.lower()
+        if item and key not in seen:
+            seen.add(key)
+            merged.append(item)
+    return merged
 
 
 # Singleton instance
@@ -0,0 +1,346 @@
+"""
+Versioned prompt templates with stable, cacheable prefixes
+"""
+import hashlib
+import json
+import string
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class PromptTemplate:
+    """
+    A named, versioned prompt
+
+    Messages are laid out from most to least stable so providers can reuse
+    the processed prefix: the static `system` instructions (no variables,
+    byte-identical on every call), an optional `context` message that stays
+    fixed for a session, any conversation history, and finally the `user`
+    message. Inside variable templates, large inputs go before small knobs
+    (counts, levels) so requests over the same content share more prefix.
+    """
+
+    def __init__(self, name: str, version: int, system: str, user: str, context: Optional[str] = None):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.user = user
+        self.context = context
+        self.fields = _fields(context or "") + _fields(user)
+        self.fingerprint = _digest(json.dumps([name, version, system, context, user]))
+        self.prefix_key = _digest(system)
+        self._system_message = {"role": "system", "content": system}
+
+    def render(self, history: Optional[List[Dict]] = None, **variables) -> List[Dict]:
+        """
+        Build the chat messages for a call
+
+        Args:
+            history: Prior conversation turns, placed before the user message
+            **variables: Values for the template fields
+
+        Returns:
+            Messages for chat.completions.create
+        """
+        missing = set(self.fields) - set(variables)
+        if missing:
+            raise KeyError(f"Prompt {self.name} is missing variables: {', '.join(sorted(missing))}")
+        messages = [self._system_message]
+        if self.context is not None:
+            messages.append({"role": "system", "content": self.context.format(**variables)})
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": self.user.format(**variables)})
+        return messages
+
+    def cache_key(self, **variables) -> str:
+        """Deterministic key for a response to this template version and these variables"""
+        payload = json.dumps(
+            {field: variables.get(field) for field in self.fields}, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return f"{self.name}@{self.version}:{_digest(self.fingerprint + payload)}"
+
+
+class PromptRegistry:
+    """
+    All prompt templates, plus prefix-cache statistics per template
+
+    Templates are registered once at import; `get` returns the version
+    pinned in PROMPT_VERSIONS or the latest. Provider-reported cached
+    prompt tokens are recorded per template so the hit rate and the latency
+    of cached vs. uncached calls can be compared.
+    """
+
+    def __init__(self):
+        self._templates: Dict[str, Dict[int, PromptTemplate]] = {}
+        self._stats: Dict[Tuple[str, int], Dict] = {}
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        versions = self._templates.setdefault(template.name, {})
+        if template.version in versions:
+            raise ValueError(f"Prompt {template.name} v{template.version} is already registered")
+        versions[template.version] = template
+        return template
+
+    def get(self, name: str, version: Optional[int] = None) -> PromptTemplate:
+        versions = self._templates[name]
+        version = version or settings.PROMPT_VERSIONS.get(name) or max(versions)
+        return versions[version]
+
+    def record(self, template: PromptTemplate, prompt_tokens: int, cached_tokens: int, latency_seconds: float):
+        """Record one upstream call made with a template"""
+        stats = self._stats.setdefault((template.name, template.version), {
+            "calls": 0, "hits": 0, "prompt_tokens": 0, "cached_tokens": 0,
+            "hit_latency_seconds": 0.0, "miss_latency_seconds": 0.0,
+        })
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached_tokens
+        if cached_tokens:
+            stats["hits"] += 1
+            stats["hit_latency_seconds"] += latency_seconds
+        else:
+            stats["miss_latency_seconds"] += latency_seconds
+
+    def metrics(self) -> List[Dict]:
+        """Prefix-cache hit rate and mean latency with and without a hit, per template"""
+        rows = []
+        for (name, version), stats in sorted(self._stats.items()):
+            misses = stats["calls"] - stats["hits"]
+            rows.append({
+                "prompt": name,
+                "version": version,
+                "fingerprint": self._templates[name][version].fingerprint,
+                "calls": stats["calls"],
+                "hit_rate": round(stats["hits"] / stats["calls"], 4),
+                "cached_token_share": round(stats["cached_tokens"] / stats["prompt_tokens"], 4) if stats["prompt_tokens"] else 0.0,
+                "mean_latency_ms_hit": round(stats["hit_latency_seconds"] / stats["hits"] * 1000, 1) if stats["hits"] else None,
+                "mean_latency_ms_miss": round(stats["miss_latency_seconds"] / misses * 1000, 1) if misses else None,
+            })
+        return rows
+
+
+def _fields(template: str) -> Tuple[str, ...]:
+    return tuple(field for _, field, _, _ in string.Formatter().parse(template) if field)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+LEARNING_STYLE_GUIDE = """Adapt to the learner's style:
+- visual: Use visual descriptions, analogies, and suggest diagrams. Structure information hierarchically.
+- auditory: Use conversational tone, explain things step-by-step verbally, use rhythm in explanations.
+- kinesthetic: Focus on practical examples, hands-on applications, and real-world scenarios.
+- reading: Provide detailed written explanations, definitions, and written examples."""
+
+NOTE_TAKER = "You are an expert note-taking assistant that creates clear, comprehensive, and well-organized study notes."
+CONCEPT_EXPERT = "You are an expert at identifying key concepts and topics in educational content."
+EXPLAINER = "You are a patient tutor explaining quiz answers to students."
+EXPLANATION_STYLE_GUIDE = """Adapt to the learner's style:
+- visual: Use analogies, diagrams descriptions, and visual metaphors
+- auditory: Use conversational tone and verbal explanations
+- kinesthetic: Use practical examples and real-world applications
+- reading: Use detailed written explanations with examples"""
+
+
+prompt_registry = PromptRegistry()
+
+prompt_registry.register(PromptTemplate("nlp.generate_notes", 1, system=f"""{NOTE_TAKER}
+
+Generate comprehensive, well-structured notes from the lecture transcript the user provides.
+
+Format the notes with:
+- Clear headings and subheadings
+- Key concepts highlighted
+- Important definitions
+- Examples and explanations
+- Summary points
+
+Write detailed, organized notes in markdown format.""", user="""Transcript:
+{transcript}
+
+Subject: {subject}"""))
+
+prompt_registry.register(PromptTemplate("nlp.update_notes", 1, system=f"""{NOTE_TAKER}
+
+The user sends the next part of a lecture transcript for which notes already exist, with the existing note headings.
+Write notes covering ONLY the new part, in markdown. When content continues an existing topic, use exactly the same heading so it can be merged. Do not repeat a summary of earlier material.""", user="""Existing note headings:
+{headings}
+
+New transcript segment:
+{segment}
+
+Subject: {subject}"""))
+
+prompt_registry.register(PromptTemplate("nlp.summarize_text", 1, system="""You are an expert at creating concise, informative summaries.
+
+Summarize the text the user provides, focusing on the key points and main ideas. Stay within the requested word limit.""", user="""Text:
+{text}
+
+Maximum length: {max_length} words"""))
+
+prompt_registry.register(PromptTemplate("nlp.extract_key_concepts", 1, system=f"""{CONCEPT_EXPERT}
+
+Extract the main concepts, topics, and important terms from the text the user provides.
+Return them as a comma-separated list.""", user="""Text:
+{text}"""))
+
+prompt_registry.register(PromptTemplate("nlp.refine_concepts", 1, system=f"""{CONCEPT_EXPERT}
+
+The user provides the opening of some educational content and candidate key concepts extracted from it, best first.
+Merge duplicates, fix wording and drop candidates that are not real concepts.
+Return the final concepts as a comma-separated list.""", user="""Opening of the content:
+{excerpt}
+
+Candidate concepts:
+{candidates}"""))
+
+FLASHCARDS = prompt_registry.register(PromptTemplate("nlp.generate_flashcards", 1, system="""You are an expert at creating effective study flashcards. Return only valid JSON.
+
+Generate the requested number of flashcards from the content the user provides.
+Each flashcard should have a clear question and a concise answer.
+Return a JSON object with a "flashcards" array of objects with 'question' and 'answer' fields.""", user="""Content:
+{content}
+
+Number of flashcards: {count}"""))
+
+# Repair prompts share their generation prompt's system message and leading
+# content so the retry reuses the provider's cached prefix.
+prompt_registry.register(PromptTemplate("nlp.complete_flashcards", 1, system=FLASHCARDS.system, user="""Content:
+{content}
+
+Number of flashcards: {count}
+Do not repeat these existing flashcards:
+{existing}"""))
+
+QUIZ = prompt_registry.register(PromptTemplate("quiz.generate_quiz", 1, system="""You are an expert educator creating effective quiz questions. Return only valid JSON.
+
+Generate quiz questions from the content the user provides, with the requested count, difficulty and question types.
+
+For multiple choice questions (mcq):
+- Provide 4 options (A, B, C, D)
+- Mark the correct answer
+- Include plausible distractors
+
+For true/false questions:
+- Include a statement and correct answer
+
+For short answer questions:
+- Include the question and a model answer
+
+Return a JSON object with a "questions" array; each question has fields: type, question, options (for mcq), correct_answer, explanation""", user="""Content:
+{content}
+
+Number of questions: {num_questions}
+Difficulty: {difficulty}
+Question types to include: {question_types}"""))
+
+prompt_registry.register(PromptTemplate("quiz.complete_quiz", 1, system=QUIZ.system, user="""Content:
+{content}
+
+Number of questions: {num_questions}
+Difficulty: {difficulty}
+Question types to include: {question_types}
+Do not repeat these existing questions:
+{existing}"""))
+
+prompt_registry.register(PromptTemplate("quiz.generate_adaptive_quiz", 1, system="""You are an expert at creating adaptive assessments that help students improve. Return only valid JSON.
+
+Generate an adaptive quiz of 10 questions for the weak topics the user lists, that:
+1. Start easier and gradually increase difficulty
+2. Focus heavily on the weak topics
+3. Include explanations for incorrect answers
+4. Help identify specific misconceptions
+
+Return a JSON object with a "questions" array; each question has fields: question, options, correct_answer, difficulty, topic, explanation""", user="""Weak topics: {weak_topics}
+User level: {user_level}
+Previous performance: {performance}"""))
+
+prompt_registry.register(PromptTemplate("quiz.get_question_explanation", 1, system=f"""{EXPLAINER}
+
+Explain why the correct answer to the user's question is correct and why the student's answer is not.
+Keep it concise but thorough. {EXPLANATION_STYLE_GUIDE}""", user="""Question: {question}
+Correct answer: {correct_answer}
+Student's answer: {user_answer}
+Learning style: {learning_style}"""))
+
+prompt_registry.register(PromptTemplate("quiz.explain_attempt", 1, system=f"""{EXPLAINER} Return only valid JSON.
+
+The user lists numbered items from one quiz attempt, each with the question, the correct answer and the student's answer.
+For every item, explain why the correct answer is correct and why the student's answer is not.
+Keep each explanation concise but thorough. {EXPLANATION_STYLE_GUIDE}
+
+Return a JSON object with an "explanations" array of objects with 'item' (the item number) and 'explanation' fields, one per item.""", user="""{items}
+
+Learning style: {learning_style}"""))
+
+prompt_registry.register(PromptTemplate("tutor.get_tutor_response", 1, system=f"""You are a patient, encouraging AI tutor.
+
+Teaching approach:
+- Break down complex topics into manageable chunks
+- Use the Socratic method when appropriate
+- Encourage critical thinking
+- Provide examples and analogies
+- Check for understanding
+- Be supportive and encouraging
+
+{LEARNING_STYLE_GUIDE}
+
+Remember: You're helping the student learn, not just giving answers.""", context="""Reference material:
+{context}
+
+Subject: {subject}
+Learning style: {learning_style}""", user="{question}"))
+
+prompt_registry.register(PromptTemplate("tutor.explain_concept", 1, system=f"""You are an expert educator explaining concepts clearly.
+
+Explain the concept the user names with a clear, comprehensive explanation at the requested level:
+- beginner: Explain in simple terms, assume no prior knowledge
+- intermediate: Provide moderate detail with some technical terms
+- advanced: Use technical terminology and dive deep into nuances
+
+Include practical examples when requested.
+
+{LEARNING_STYLE_GUIDE}""", user="""Concept: {concept}
+Level: {depth_level}
+Learning style: {learning_style}
+Include examples: {include_examples}"""))
+
+prompt_registry.register(PromptTemplate("tutor.enrich_study_plan", 1, system="""You are an expert study planner creating effective, personalized learning schedules. Return only valid JSON.
+
+The weekly schedule of a study plan has already been worked out. From the student's goals, priority topics and numbered milestone checkpoints, write:
+- 3-5 short, practical study tips for following this plan
+- one motivating sentence per milestone, in the same order, keeping its week and mastery targets
+
+Return a JSON object: {"tips": ["..."], "milestones": ["..."]}""", user="""Goals: {goals}
+Deadline: {deadline}
+Priority topics: {priority_topics}
+Milestones:
+{milestones}"""))
+
+RESOURCES = prompt_registry.register(PromptTemplate("tutor.recommend_resources", 1, system="""You are an expert at recommending educational resources. Return only valid JSON.
+
+Suggest 5-7 high-quality learning resources for the user's topic and level, including:
+- Resource name
+- Type (video, article, book, course, etc.)
+- Brief description
+- Estimated time to complete
+- Why it's suitable for this learner
+
+Prefer formats that suit the learner's style:
+- visual: videos, infographics, diagrams
+- auditory: podcasts, audiobooks, lectures
+- kinesthetic: interactive simulations, labs, hands-on projects
+- reading: textbooks, articles, written tutorials
+
+Return a JSON object with a "resources" array with fields: name, type, description, estimated_time, why_suitable""", user="""Topic: {topic}
+Student level: {current_level}
+Learning style: {learning_style}"""))
+
+prompt_registry.register(PromptTemplate("tutor.complete_resources", 1, system=RESOURCES.system, user="""Topic: {topic}
+Student level: {current_level}
+Learning style: {learning_style}
+Suggest only {count} more resources, different from these:
+{existing}"""))
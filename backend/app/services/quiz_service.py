@@ -3,8 +3,18 @@ Quiz generation and adaptive learning service
 """
 from openai import AsyncOpenAI
 from typing import List, Dict, Optional
+import asyncio
 import json
 from app.core.config import settings
+from app.core.executor import cpu_executor
+from app.core.tracing import traced
+from app.services.explanation_cache import explanation_cache
+from app.services.extractive_summarizer import reduce_for_method
+from app.services.llm import create_chat_completion
+from app.services.nlp_service import nlp_service, split_count
+from app.services.prompts import prompt_registry
+from app.services.structured_output import QuizQuestionSchema, existing_listing, repair_max_tokens, structured_output
+from app.services.token_budget import InputTooLargeError, token_budget
 
 
 class QuizService:
@@ -13,6 +23,7 @@ class QuizService:
     def __init__(self):
         self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
     
+    @traced("quiz.generate_quiz")
     async def generate_quiz(
         self,
         content: str,
@@ -35,42 +46,53 @@ class QuizService:
         if question_types is None:
             question_types = ["mcq", "true_false"]
         
-        types_str = ", ".join(question_types)
-        
-        prompt = f"""Generate {num_questions} {difficulty} difficulty quiz questions from the following content.
+        content = await cpu_executor.run(reduce_for_method, "quiz.generate_quiz", content, size=len(content))
+        fitted = await nlp_service.fit_input("quiz.generate_quiz", content, max_tokens=2000, can_chunk=True)
+        if fitted.chunks:
+            counts = split_count(num_questions, len(fitted.chunks))
+            results = await asyncio.gather(*(
+                self._generate_quiz(chunk, n, difficulty, question_types)
+                for chunk, n in zip(fitted.chunks, counts) if n
+            ))
+            return [question for questions in results for question in questions]
+        return await self._generate_quiz(fitted.text, num_questions, difficulty, question_types)
+    
+    async def _generate_quiz(
+        self,
+        content: str,
+        num_questions: int,
+        difficulty: str,
+        question_types: List[str]
+    ) -> List[Dict]:
+        """Generate quiz questions for content that fits the prompt budget"""
+        schema = QuizQuestionSchema(question_types)
         
-Question types to include: {types_str}
-
-For multiple choice questions (mcq):
-- Provide 4 options (A, B, C, D)
-- Mark the correct answer
-- Include plausible distractors
-
-For true/false questions:
-- Include a statement and correct answer
-
-For short answer questions:
-- Include the question and a model answer
-
-Content:
-{content}
-
-Generate questions in JSON format with fields: type, question, options (for mcq), correct_answer, explanation"""
-
-        response = await self.client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert educator creating effective quiz questions. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000,
-            response_format={"type": "json_object"}
-        )
+        async def request(needed: int, accepted: List[Dict]) -> str:
+            variables = {
+                "content": content,
+                "num_questions": needed,
+                "difficulty": difficulty,
+                "question_types": ", ".join(question_types),
+            }
+            if accepted:
+                prompt = prompt_registry.get("quiz.complete_quiz")
+                variables["existing"] = existing_listing(accepted, schema)
+            else:
+                prompt = prompt_registry.get("quiz.generate_quiz")
+            response = await create_chat_completion(
+                self.client,
+                prompt=prompt,
+                model=settings.OPENAI_MODEL,
+                messages=prompt.render(**variables),
+                temperature=0.7,
+                max_tokens=repair_max_tokens(2000, needed, num_questions),
+                response_format={"type": "json_object"}
+            )
+            return response.choices[0].message.content
         
-        result = json.loads(response.choices[0].message.content)
-        return result.get('questions', [])
+        return await structured_output.collect("quiz.generate_quiz", schema, num_questions, request)
     
+    @traced("quiz.generate_adaptive_quiz")
     async def generate_adaptive_quiz(
         self,
         weak_topics: List[str],
@@ -88,28 +110,15 @@ Generate questions in JSON format with fields: type, question, options (for mcq)
         Returns:
             List of adaptive question dictionaries
         """
-        performance_context = ""
-        if previous_performance:
-            performance_context = f"\nPrevious performance: {json.dumps(previous_performance)}"
-        
-        prompt = f"""Generate an adaptive quiz focusing on these weak topics: {', '.join(weak_topics)}
+        performance = json.dumps(previous_performance, sort_keys=True) if previous_performance else "none"
+        token_budget.fit("quiz.generate_adaptive_quiz", ', '.join(weak_topics) + performance, max_tokens=2000)
         
-User level: {user_level}{performance_context}
-
-Generate 10 questions that:
-1. Start easier and gradually increase difficulty
-2. Focus heavily on the weak topics
-3. Include explanations for incorrect answers
-4. Help identify specific misconceptions
-
-Return as JSON with fields: question, options, correct_answer, difficulty, topic, explanation"""
-
-        response = await self.client.chat.completions.create(
+        prompt = prompt_registry.get("quiz.generate_adaptive_quiz")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
             model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert at creating adaptive assessments that help students improve. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt.render(weak_topics=', '.join(weak_topics), user_level=user_level, performance=performance),
             temperature=0.7,
             max_tokens=2000,
             response_format={"type": "json_object"}
@@ -171,6 +180,7 @@ Return as JSON with fields: question, options, correct_answer, difficulty, topic
             'passed': score >= (settings.MIN_QUIZ_ACCURACY * 100)
         }
     
+    @traced("quiz.get_question_explanation")
     async def get_question_explanation(
         self,
         question: str,
@@ -190,33 +200,174 @@ Return as JSON with fields: question, options, correct_answer, difficulty, topic
         Returns:
             Personalized explanation
         """
-        style_prompts = {
-            "visual": "Use analogies, diagrams descriptions, and visual metaphors",
-            "auditory": "Use conversational tone and verbal explanations",
-            "kinesthetic": "Use practical examples and real-world applications",
-            "reading": "Use detailed written explanations with examples"
-        }
+        key = explanation_key(question, correct_answer, user_answer, learning_style)
+        cached = await explanation_cache.get_many([key])
+        if key in cached:
+            return cached[key]
         
-        style_instruction = style_prompts.get(learning_style, style_prompts["visual"])
+        explanation = await self._generate_explanation(question, correct_answer, user_answer, learning_style)
+        await explanation_cache.put_many({key: explanation})
+        return explanation
+    
+    async def _generate_explanation(
+        self,
+        question: str,
+        correct_answer: str,
+        user_answer: str,
+        learning_style: str
+    ) -> str:
+        """Explain a single wrong answer"""
+        token_budget.fit("quiz.get_question_explanation", question + correct_answer + user_answer, max_tokens=500)
         
-        prompt = f"""Explain why the answer to this question is '{correct_answer}' and not '{user_answer}'.
-
-Question: {question}
-
-{style_instruction} in your explanation.
-Keep it concise but thorough."""
-
-        response = await self.client.chat.completions.create(
+        prompt = prompt_registry.get("quiz.get_question_explanation")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
             model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": f"You are a patient tutor explaining concepts to a {learning_style} learner."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt.render(
+                question=question,
+                correct_answer=correct_answer,
+                user_answer=user_answer,
+                learning_style=learning_style
+            ),
             temperature=0.7,
             max_tokens=500
         )
         
         return response.choices[0].message.content
+    
+    @traced("quiz.explain_attempt")
+    async def explain_attempt(
+        self,
+        questions: List[Dict],
+        user_answers: List[str],
+        learning_style: str = "visual"
+    ) -> List[Dict]:
+        """
+        Explain every wrong answer in a quiz attempt
+        
+        Mistakes already explained for any student come from the shared
+        cache. The rest are deduplicated and explained together, up to
+        EXPLANATION_BATCH_SIZE per upstream call, with calls made in parallel.
+        
+        Args:
+            questions: List of quiz questions
+            user_answers: List of user's answers
+            learning_style: User's learning style
+            
+        Returns:
+            One dictionary per wrong answer with question_index, question,
+            correct_answer, user_answer, explanation and cached
+        """
+        evaluation = self.evaluate_quiz_attempt(questions, user_answers)
+        wrong = []
+        for result in evaluation['results']:
+            if result['correct'] or result['correct_answer'] is None:
+                continue
+            item = {
+                'question_index': result['question_index'],
+                'question': str(questions[result['question_index']].get('question', '')),
+                'correct_answer': str(result['correct_answer']),
+                'user_answer': str(result['user_answer']),
+            }
+            item['key'] = explanation_key(item['question'], item['correct_answer'], item['user_answer'], learning_style)
+            wrong.append(item)
+        
+        cached = await explanation_cache.get_many(item['key'] for item in wrong)
+        pending = {}
+        for item in wrong:
+            if item['key'] not in cached:
+                pending.setdefault(item['key'], item)
+        
+        items = list(pending.values())
+        size = max(settings.EXPLANATION_BATCH_SIZE, 1)
+        batches = await asyncio.gather(*(
+            self._explain_batch(items[i:i + size], learning_style) for i in range(0, len(items), size)
+        ))
+        generated = {key: explanation for batch in batches for key, explanation in batch.items()}
+        await explanation_cache.put_many(generated)
+        
+        return [
+            {
+                **{field: value for field, value in item.items() if field != 'key'},
+                'explanation': cached.get(item['key']) or generated[item['key']],
+                'cached': item['key'] in cached,
+            }
+            for item in wrong
+        ]
+    
+    async def _explain_batch(self, items: List[Dict], learning_style: str) -> Dict[str, str]:
+        """
+        Explain several wrong answers in one call, returning explanations by cache key
+
+        A batch too large for the prompt budget is split in half, down to
+        single items, which use the single-question prompt.
+        """
+        listing = "\n\n".join(
+            f"Item {number}:\nQuestion: {item['question']}\n"
+            f"Correct answer: {item['correct_answer']}\nStudent's answer: {item['user_answer']}"
+            for number, item in enumerate(items, 1)
+        )
+        max_tokens = 300 * len(items)
+        try:
+            token_budget.fit("quiz.explain_attempt", listing, max_tokens=max_tokens)
+        except InputTooLargeError:
+            if len(items) == 1:
+                item = items[0]
+                return {item['key']: await self._generate_explanation(
+                    item['question'], item['correct_answer'], item['user_answer'], learning_style
+                )}
+            half = len(items) // 2
+            first, second = await asyncio.gather(
+                self._explain_batch(items[:half], learning_style),
+                self._explain_batch(items[half:], learning_style)
+            )
+            return {**first, **second}
+        
+        prompt = prompt_registry.get("quiz.explain_attempt")
+        response = await create_chat_completion(
+            self.client,
+            prompt=prompt,
+            model=settings.OPENAI_MODEL,
+            messages=prompt.render(items=listing, learning_style=learning_style),
+            temperature=0.7,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
+        
+        result = json.loads(response.choices[0].message.content)
+        explanations = {}
+        for entry in result.get('explanations', []):
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.get('item')) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < len(items) and entry.get('explanation'):
+                explanations[items[index]['key']] = str(entry['explanation'])
+        
+        # Items the model skipped are explained one at a time
+        missing = [item for item in items if item['key'] not in explanations]
+        singles = await asyncio.gather(*(
+            self._generate_explanation(item['question'], item['correct_answer'], item['user_answer'], learning_style)
+            for item in missing
+        ))
+        explanations.update((item['key'], explanation) for item, explanation in zip(missing, singles))
+        return explanations
+
+
+def explanation_key(question: str, correct_answer: str, user_answer: str, learning_style: str) -> str:
+    """Cache key of an explanation; differences in case and whitespace are ignored"""
+    def normalize(text: str) -> str:
+        return " ".join(str(text).split()).casefold()
+    
+    return prompt_registry.get("quiz.get_question_explanation").cache_key(
+        question=normalize(question),
+        correct_answer=normalize(correct_answer),
+        user_answer=normalize(user_answer),
+        learning_style=normalize(learning_style)
+    )
 
 
 # Singleton instance
@@ -0,0 +1,392 @@
+"""
+Full-text search over notes and lecture transcripts (SQLite FTS5, Postgres tsvector)
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.tracing import traced
+from app.models.models import Lecture, Note
+
+
+FTS5_TOKENIZER = "porter unicode61 remove_diacritics 2"  # English stemming, like Postgres' english config
+SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS = "<mark>", "</mark>", "…"
+REBUILD_BATCH = 1000  # source rows read per batch when filling a new index table
+
+_QUERY_TERM = re.compile(r'-?"[^"]*"|-?[\w\']+')
+
+
+@dataclass(frozen=True)
+class SearchKind:
+    """A searchable table: its index table, indexed columns, rank weights and owning user"""
+    name: str
+    model: type
+    index_table: str
+    columns: Sequence[str]
+    snippet_column: str
+    weights: Sequence[float]  # bm25 weights (SQLite) per column
+    pg_weights: Sequence[str]  # setweight classes (Postgres) per column
+    parent_column: str  # column of the source row that decides its owner
+    owner_join: str  # joins from the source table (alias d) to subjects (alias s)
+    owner_query: str  # the owner's user id from :parent, the parent_column's value
+
+
+KINDS = {
+    "note": SearchKind(
+        "note", Note, "notes_fts", ("title", "summary", "content"), "content", (5.0, 2.0, 1.0), ("A", "B", "C"),
+        "topic_id", "JOIN topics t ON t.id = d.topic_id JOIN subjects s ON s.id = t.subject_id",
+        "SELECT s.user_id FROM topics t JOIN subjects s ON s.id = t.subject_id WHERE t.id = :parent",
+    ),
+    "lecture": SearchKind(
+        "lecture", Lecture, "lectures_fts", ("title", "transcript"), "transcript", (5.0, 1.0), ("A", "C"),
+        "subject_id", "JOIN subjects s ON s.id = d.subject_id",
+        "SELECT user_id FROM subjects WHERE id = :parent",
+    ),
+}
+KIND_BY_MODEL = {kind.model: kind for kind in KINDS.values()}
+
+
+class SearchIndex:
+    """
+    Ranked full-text search over Note (title, summary, content) and Lecture (title, transcript)
+
+    Each searchable table has an index table holding its terms and its
+    owner's user id, keyed by the source row's id, but not its text, which
+    stays compressed in the source table: a contentless FTS5 table on SQLite
+    (the owner as a "u<id>" token), a table of GIN-indexed tsvectors on
+    Postgres. ORM writes update the index in the same flush (mapper events);
+    bulk Core inserts call `add`. A contentless table forgets a row only when
+    given the values it was indexed with, so rows are unindexed before they
+    are updated or deleted, from the text still stored. The owner is matched
+    inside the index, so a word every student uses is ranked (bm25 /
+    ts_rank_cd) over one student's documents rather than everyone's, and only
+    the returned page is decompressed for snippets. Results are still joined
+    to the user's subjects, so a stale owner can hide a row but never leak one.
+    """
+
+    def __init__(self):
+        self.ready = False  # set once the index tables exist; writes before that are not indexed
+
+    async def setup(self):
+        """Create the index tables if missing or outdated, filling them from the existing rows"""
+        async with engine.begin() as conn:
+            dialect = conn.dialect.name
+            existing = set(await conn.run_sync(lambda sync: inspect(sync).get_table_names()))
+            for kind in KINDS.values():
+                if kind.index_table in existing:
+                    if not await conn.run_sync(_stores_text, kind):
+                        continue
+                    await conn.exec_driver_sql(f"DROP TABLE {kind.index_table}")
+                for statement in _create_statements(dialect, kind):
+                    await conn.exec_driver_sql(statement)
+                # Read through the column types, so compressed text is indexed as text
+                table = kind.model.__table__
+                rows = text(
+                    f"SELECT d.id, {', '.join(f'd.{column}' for column in kind.columns)}, s.user_id "
+                    f"FROM {table.name} d {kind.owner_join}"
+                ).columns(**{column: table.c[column].type for column in kind.columns})
+                result = await conn.stream(rows.execution_options(yield_per=REBUILD_BATCH))
+                async for partition in result.partitions():
+                    await conn.execute(_insert_statement(dialect, kind), [
+                        {**row._mapping, "owner": _owner(dialect, row.user_id)} for row in partition
+                    ])
+        self.ready = True
+
+    async def add(self, db: AsyncSession, kind: str, rows: List[Dict], user_id: int):
+        """Index one user's rows written without the ORM (each needs its id and the indexed columns)"""
+        if self.ready and rows:
+            dialect = db.bind.dialect.name
+            await db.execute(_insert_statement(dialect, KINDS[kind]), _index_rows(dialect, KINDS[kind], rows, user_id))
+
+    @traced("search.query")
+    async def search(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        query: str,
+        kinds: Optional[Sequence[str]] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict:
+        """
+        Search a user's notes and lecture transcripts
+
+        Args:
+            db: Database session
+            user_id: Owner of the subjects searched
+            query: Words to match, all required unless separated by "or";
+                "quoted phrases" match in order and -word excludes a word
+            kinds: "note" and/or "lecture" (default both)
+            limit: Results per page
+            offset: Results skipped
+
+        Returns:
+            The page of results, best first, with snippets and whether more follow
+        """
+        dialect = db.bind.dialect.name
+        kinds = [KINDS[name] for name in (kinds or KINDS)]
+        match = _fts5_match(query) if dialect == "sqlite" else query.strip()
+        if not match:
+            raise ValueError("Search query has no words")
+
+        selects = [_match_select(dialect, kind, i) for i, kind in enumerate(kinds)]
+        params = {f"query{i}": _owned_match(dialect, kind, match, user_id) for i, kind in enumerate(kinds)}
+        ordering = "rank" if dialect == "sqlite" else "rank DESC"
+        rows = (await db.execute(
+            text(f"{' UNION ALL '.join(selects)} ORDER BY {ordering}, id LIMIT :limit OFFSET :offset"),
+            {**params, "user_id": user_id, "limit": limit + 1, "offset": offset, "language": settings.SEARCH_LANGUAGE}
+        )).all()
+        page = rows[:limit]
+
+        snippets = {}
+        for kind in kinds:
+            ids = [row.id for row in page if row.kind == kind.name]
+            if ids:
+                snippets.update(await self._snippets(db, dialect, kind, match, ids))
+        return {
+            "results": [
+                {
+                    "kind": row.kind, "id": row.id, "title": row.title,
+                    "score": -row.rank if dialect == "sqlite" else row.rank,  # higher is better
+                    "snippet": snippets.get((row.kind, row.id)),
+                }
+                for row in page
+            ],
+            "has_more": len(rows) > limit,
+        }
+
+    async def _snippets(self, db: AsyncSession, dialect: str, kind: SearchKind, match: str, ids: List[int]) -> Dict:
+        """
+        Highlighted fragments of the body text for one page of results
+
+        The index keeps no text, so the page's rows are read (and decompressed)
+        from the source table. On SQLite they are put in a temporary FTS5 table
+        with the index's tokenizer, so snippet() highlights the same stemmed
+        matches the search found.
+        """
+        tokens = settings.SEARCH_SNIPPET_TOKENS
+        table = kind.model.__table__
+        rows = (await db.execute(
+            select(table.c.id, *(table.c[column] for column in kind.columns)).where(table.c.id.in_(ids))
+        )).all()
+        if dialect == "sqlite":
+            page = f"temp.{kind.index_table}_page"
+            await db.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {page} USING fts5({', '.join(kind.columns)}, "
+                f"tokenize = '{FTS5_TOKENIZER}')"
+            ))
+            await db.execute(text(
+                f"INSERT INTO {page} (rowid, {', '.join(kind.columns)}) "
+                f"VALUES (:id, {', '.join(f':{column}' for column in kind.columns)})"
+            ), [dict(row._mapping) for row in rows])
+            column = kind.columns.index(kind.snippet_column)
+            try:
+                result = await db.execute(text(
+                    f"SELECT rowid AS id, snippet({kind.index_table}_page, {column}, '{SNIPPET_START}', "
+                    f"'{SNIPPET_END}', '{SNIPPET_ELLIPSIS}', {tokens}) AS snippet FROM {page} "
+                    f"WHERE {kind.index_table}_page MATCH :query"
+                ), {"query": _text_match(kind, match)})
+                return {(kind.name, row.id): row.snippet for row in result}
+            finally:
+                await db.execute(text(f"DELETE FROM {page}"))
+        result = await db.execute(text(
+            f"SELECT page.id, ts_headline(CAST(:language AS regconfig), page.body, "
+            f"websearch_to_tsquery(CAST(:language AS regconfig), :query), "
+            f"'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, FragmentDelimiter={SNIPPET_ELLIPSIS}, "
+            f"MaxFragments=2, MaxWords={tokens}, MinWords={max(tokens // 3, 1)}') AS snippet "
+            f"FROM unnest(CAST(:ids AS integer[]), CAST(:bodies AS text[])) AS page(id, body)"
+        ), {
+            "query": match, "language": settings.SEARCH_LANGUAGE, "ids": [row.id for row in rows],
+            "bodies": [getattr(row, kind.snippet_column) or "" for row in rows],
+        })
+        return {(kind.name, row.id): row.snippet for row in result}
+
+
+def _fts5_match(query: str) -> str:
+    """
+    User input as an FTS5 expression, with the syntax of Postgres' websearch_to_tsquery
+
+    Every word and "phrase" is quoted, so FTS5 operators and column filters
+    typed by the user are matched as text. Adjacent terms are all required,
+    "or" between terms allows either and -term excludes a term.
+    """
+    parts: List[str] = []
+    for token in _QUERY_TERM.findall(query):
+        negated = token.startswith("-")
+        token = token[1:] if negated else token
+        if token.lower() == "or":
+            if parts and parts[-1] != "OR":
+                parts.append("OR")
+            continue
+        term = token.strip('"').replace('"', "")
+        if not term.strip():
+            continue
+        if not negated:
+            parts.append(f'"{term}"')
+        elif parts and parts[-1] != "OR":  # FTS5's NOT needs a term on its left
+            parts.append(f'NOT "{term}"')
+    while parts and parts[-1] == "OR":
+        parts.pop()
+    return " ".join(parts)
+
+
+def _text_match(kind: SearchKind, match: str) -> str:
+    """An FTS5 expression limited to the text columns, so the owner token never matches a word"""
+    return f"{{{' '.join(kind.columns)}}} : ({match})"
+
+
+def _owned_match(dialect: str, kind: SearchKind, match: str, user_id: int) -> str:
+    """The match expression of one kind's query: on SQLite the owner token comes first and is matched in the index"""
+    return f'owner : "u{user_id}" AND {_text_match(kind, match)}' if dialect == "sqlite" else match
+
+
+def _match_select(dialect: str, kind: SearchKind, number: int) -> str:
+    """Matching ids of one kind with their rank, restricted to the user's subjects"""
+    source = kind.model.__tablename__
+    query = f":query{number}"
+    if dialect == "sqlite":
+        return (
+            f"SELECT '{kind.name}' AS kind, d.id AS id, d.title AS title, f.rank AS rank "
+            f"FROM {kind.index_table} f JOIN {source} d ON d.id = f.rowid {kind.owner_join} "
+            f"WHERE {kind.index_table} MATCH {query} AND s.user_id = :user_id"
+        )
+    tsquery = f"websearch_to_tsquery(CAST(:language AS regconfig), {query})"
+    return (
+        f"SELECT '{kind.name}' AS kind, d.id AS id, d.title AS title, ts_rank_cd(f.document, {tsquery}) AS rank "
+        f"FROM {kind.index_table} f JOIN {source} d ON d.id = f.id {kind.owner_join} "
+        f"WHERE f.user_id = :user_id AND f.document @@ {tsquery} AND s.user_id = :user_id"
+    )
+
+
+def _create_statements(dialect: str, kind: SearchKind) -> List[str]:
+    if dialect == "sqlite":
+        return [
+            f"CREATE VIRTUAL TABLE {kind.index_table} USING fts5({', '.join(kind.columns)}, owner, "
+            f"content = '', tokenize = '{FTS5_TOKENIZER}')",
+            f"INSERT INTO {kind.index_table} ({kind.index_table}, rank) "
+            f"VALUES ('rank', 'bm25({', '.join(str(w) for w in kind.weights)}, 0)')",  # the owner adds nothing to rank
+        ]
+    source = kind.model.__tablename__
+    return [
+        f"CREATE TABLE {kind.index_table} (id INTEGER PRIMARY KEY REFERENCES {source}(id) ON DELETE CASCADE, "
+        f"user_id INTEGER, document tsvector NOT NULL)",
+        f"CREATE INDEX {kind.index_table}_document ON {kind.index_table} USING GIN (document)",
+        f"CREATE INDEX {kind.index_table}_user_id ON {kind.index_table} (user_id)",
+    ]
+
+
+def _stores_text(connection, kind: SearchKind) -> bool:
+    """Whether an index table is from a version that kept a copy of the indexed text"""
+    if connection.dialect.name == "sqlite":
+        statement = text("SELECT sql FROM sqlite_master WHERE name = :name")
+        return "content = ''" not in connection.execute(statement, {"name": kind.index_table}).scalar()
+    return kind.snippet_column in {column["name"] for column in inspect(connection).get_columns(kind.index_table)}
+
+
+def _insert_statement(dialect: str, kind: SearchKind):
+    columns = ", ".join(kind.columns)
+    values = ", ".join(f":{column}" for column in kind.columns)
+    if dialect == "sqlite":
+        return text(f"INSERT INTO {kind.index_table} (rowid, {columns}, owner) VALUES (:id, {values}, :owner)")
+    language = settings.SEARCH_LANGUAGE
+    document = " || ".join(
+        f"setweight(to_tsvector('{language}', coalesce(CAST(:{column} AS text), '')), '{weight}')"
+        for column, weight in zip(kind.columns, kind.pg_weights)
+    )
+    return text(f"INSERT INTO {kind.index_table} (id, user_id, document) VALUES (:id, :owner, {document})")
+
+
+def _delete_statement(dialect: str, kind: SearchKind):
+    """Removes a row from the index; on SQLite it takes the values the row was indexed with"""
+    if dialect == "sqlite":
+        columns = ", ".join(kind.columns)
+        values = ", ".join(f":{column}" for column in kind.columns)
+        return text(
+            f"INSERT INTO {kind.index_table} ({kind.index_table}, rowid, {columns}, owner) "
+            f"VALUES ('delete', :id, {values}, :owner)"
+        )
+    return text(f"DELETE FROM {kind.index_table} WHERE id = :id")
+
+
+def _owner(dialect: str, user_id: Optional[int]):
+    return f"u{user_id}" if dialect == "sqlite" and user_id is not None else user_id
+
+
+def _index_rows(dialect: str, kind: SearchKind, rows: List[Dict], user_id: Optional[int]) -> List[Dict]:
+    owner = _owner(dialect, user_id)
+    return [{"id": row["id"], "owner": owner, **{column: row.get(column) for column in kind.columns}} for row in rows]
+
+
+def _stored_row(connection, kind: SearchKind, id_: int):
+    """The indexed columns and parent of a row as stored, read through the column types (decompressed)"""
+    table = kind.model.__table__
+    columns = [table.c[column] for column in (*kind.columns, kind.parent_column)]
+    return connection.execute(select(*columns).where(table.c.id == id_)).first()
+
+
+def _index(connection, kind: SearchKind, id_: int, row):
+    """Index a row's stored values (a mapping with the indexed columns and parent)"""
+    dialect = connection.dialect.name
+    user_id = connection.execute(text(kind.owner_query), {"parent": row[kind.parent_column]}).scalar()
+    connection.execute(_insert_statement(dialect, kind), _index_rows(dialect, kind, [{**row, "id": id_}], user_id))
+
+
+def _unindex(connection, kind: SearchKind, id_: int):
+    """Remove a row from the index while its old values are still stored"""
+    dialect = connection.dialect.name
+    if dialect != "sqlite":
+        connection.execute(_delete_statement(dialect, kind), {"id": id_})
+        return
+    row = _stored_row(connection, kind, id_)
+    if row is not None:
+        user_id = connection.execute(text(kind.owner_query), {"parent": row._mapping[kind.parent_column]}).scalar()
+        rows = _index_rows(dialect, kind, [{**row._mapping, "id": id_}], user_id)
+        connection.execute(_delete_statement(dialect, kind), rows)
+
+
+def _indexed_changes(target) -> bool:
+    kind = KIND_BY_MODEL[type(target)]
+    state = inspect(target)
+    watched = (*kind.columns, kind.parent_column)
+    return search_index.ready and any(state.attrs[column].history.has_changes() for column in watched)
+
+
+@event.listens_for(Note, "after_insert")
+@event.listens_for(Lecture, "after_insert")
+def _index_inserted(mapper, connection, target):
+    if search_index.ready:
+        kind = KIND_BY_MODEL[type(target)]
+        values = {**target.__dict__, kind.parent_column: getattr(target, kind.parent_column)}
+        _index(connection, kind, target.id, values)
+
+
+@event.listens_for(Note, "before_update")
+@event.listens_for(Lecture, "before_update")
+def _unindex_updated(mapper, connection, target):
+    if _indexed_changes(target):
+        _unindex(connection, KIND_BY_MODEL[type(target)], target.id)
+
+
+@event.listens_for(Note, "after_update")
+@event.listens_for(Lecture, "after_update")
+def _index_updated(mapper, connection, target):
+    if _indexed_changes(target):
+        # Deferred text may not be loaded; read the row just written instead of loading it during the flush
+        kind = KIND_BY_MODEL[type(target)]
+        _index(connection, kind, target.id, _stored_row(connection, kind, target.id)._mapping)
+
+
+@event.listens_for(Note, "before_delete")
+@event.listens_for(Lecture, "before_delete")
+def _unindex_deleted(mapper, connection, target):
+    if search_index.ready:
+        _unindex(connection, KIND_BY_MODEL[type(target)], target.id)
+
+
+# Singleton instance
+search_index = SearchIndex()
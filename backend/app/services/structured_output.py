@@ -0,0 +1,328 @@
+"""
+Validation, local repair and partial regeneration of structured LLM output
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.tracing import tracer
+
+
+OPTION_LETTERS = "ABCDEFGH"
+MIN_REPAIR_TOKENS = 200  # completion tokens for even a single missing item
+QUESTION_TYPE_ALIASES = {
+    "multiple_choice": "mcq", "multiple choice": "mcq", "multiple-choice": "mcq",
+    "true/false": "true_false", "true-false": "true_false", "truefalse": "true_false", "tf": "true_false",
+    "short": "short_answer", "short answer": "short_answer", "open": "short_answer",
+}
+
+
+class ItemSchema:
+    """
+    Required fields of the items in one output array, with cheap local repairs
+
+    `repair` renames common field aliases and strips text; `problem`
+    returns why an item is unusable (None when it is valid); `identity`
+    is the text compared to drop duplicates.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        required: Sequence[str],
+        optional: Sequence[str] = (),
+        aliases: Optional[Dict[str, str]] = None,
+        identity_field: Optional[str] = None
+    ):
+        self.key = key
+        self.required = tuple(required)
+        self.optional = tuple(optional)
+        self.aliases = aliases or {}
+        self.identity_field = identity_field or self.required[0]
+
+    def repair(self, item: Dict) -> Dict:
+        repaired = {}
+        for name, value in item.items():
+            name = self.aliases.get(name, name)
+            if name in repaired:
+                continue
+            if isinstance(value, list) and name not in self.structured_fields() and all(isinstance(v, str) for v in value):
+                value = "\n".join(value)  # bullet points where text was expected
+            repaired[name] = value.strip() if isinstance(value, str) else value
+        return repaired
+
+    def problem(self, item: Dict) -> Optional[str]:
+        for name in self.required:
+            value = item.get(name)
+            if value is None or (isinstance(value, str) and not value):
+                return f"missing {name}"
+        for name in self.required + self.optional:
+            if isinstance(item.get(name), (dict, list)) and name not in self.structured_fields():
+                return f"{name} is not text"
+        return None
+
+    def structured_fields(self) -> Sequence[str]:
+        """Fields that may hold lists or objects"""
+        return ()
+
+    def identity(self, item: Dict) -> str:
+        return " ".join(str(item.get(self.identity_field, "")).split()).casefold()
+
+
+class QuizQuestionSchema(ItemSchema):
+    """Quiz questions of the requested types, with options and answers that agree"""
+
+    def __init__(self, question_types: Sequence[str]):
+        super().__init__(
+            "questions",
+            required=("type", "question", "correct_answer"),
+            optional=("options", "explanation", "topic", "difficulty"),
+            aliases={"answer": "correct_answer", "correct": "correct_answer", "choices": "options", "prompt": "question"},
+        )
+        self.question_types = {_question_type(t) for t in question_types}
+
+    def repair(self, item: Dict) -> Dict:
+        item = super().repair(item)
+        if isinstance(item.get("type"), str):
+            item["type"] = _question_type(item["type"])
+        elif len(self.question_types) == 1:
+            item["type"] = next(iter(self.question_types))
+        elif item.get("options"):
+            item["type"] = "mcq"
+        elif str(item.get("correct_answer")).lower() in ("true", "false"):
+            item["type"] = "true_false"
+        options = item.get("options")
+        if isinstance(options, dict):  # {"A": "...", "B": "..."}
+            item["options"] = [options[letter] for letter in sorted(options)]
+        if isinstance(item.get("correct_answer"), bool):
+            item["correct_answer"] = "True" if item["correct_answer"] else "False"
+        elif item.get("type") == "true_false" and isinstance(item.get("correct_answer"), str):
+            item["correct_answer"] = item["correct_answer"].capitalize()
+        return item
+
+    def problem(self, item: Dict) -> Optional[str]:
+        problem = super().problem(item)
+        if problem:
+            return problem
+        if item["type"] not in self.question_types:
+            return f"unrequested type {item['type']}"
+        if item["type"] == "mcq":
+            options = item.get("options")
+            if not isinstance(options, list) or len(options) < 2 or not all(
+                isinstance(option, str) and option.strip() for option in options
+            ):
+                return "mcq without options"
+            answer = str(item["correct_answer"]).strip()
+            labels = OPTION_LETTERS[:len(options)]
+            if answer not in options and answer not in map(_option_text, options) and (
+                answer.rstrip(".):").upper() not in labels or not answer
+            ):
+                return "correct_answer is not an option"
+        if item["type"] == "true_false" and item["correct_answer"] not in ("True", "False"):
+            return "true_false answer is not True or False"
+        return None
+
+    def structured_fields(self) -> Sequence[str]:
+        return ("options",)
+
+
+FLASHCARD_SCHEMA = ItemSchema(
+    "flashcards",
+    required=("question", "answer"),
+    aliases={"front": "question", "back": "answer", "term": "question", "definition": "answer", "q": "question", "a": "answer"},
+)
+RESOURCE_SCHEMA = ItemSchema(
+    "resources",
+    required=("name", "type", "description"),
+    optional=("estimated_time", "why_suitable", "url"),
+    aliases={"title": "name", "resource": "name", "format": "type", "summary": "description", "time": "estimated_time"},
+    identity_field="name",
+)
+
+
+@dataclass
+class ParsedItems:
+    """Items read from one response"""
+    items: List[Dict] = field(default_factory=list)
+    invalid: List[str] = field(default_factory=list)  # why each rejected item was rejected
+    repaired: int = 0  # valid only after a local repair
+    salvaged: bool = False  # the JSON was cut off or malformed; complete items were recovered
+
+
+def parse_items(content: str, schema: ItemSchema) -> ParsedItems:
+    """
+    Validate the items of a JSON response, repairing what can be fixed locally
+
+    Args:
+        content: Raw model output
+        schema: Schema of the items
+
+    Returns:
+        The valid items and the reasons the others were rejected
+    """
+    raw, salvaged = _load_array(content or "", schema.key)
+    parsed = ParsedItems(salvaged=salvaged)
+    for entry in raw:
+        if not isinstance(entry, dict):
+            parsed.invalid.append("not an object")
+            continue
+        repaired = schema.repair(entry)
+        problem = schema.problem(repaired)
+        if problem is None:
+            parsed.items.append(repaired)
+            parsed.repaired += repaired != entry
+        else:
+            parsed.invalid.append(problem)
+    return parsed
+
+
+class StructuredOutput:
+    """
+    Collects a requested number of valid items, re-requesting only what is missing
+
+    The first call asks for everything. Items are validated against the
+    schema, repaired locally where possible (field aliases, option maps,
+    boolean answers, truncated JSON) and deduplicated. If fewer than
+    `minimum` remain, up to STRUCTURED_OUTPUT_MAX_REPAIRS follow-up calls
+    ask for just the missing number, listing the accepted items so the
+    model does not repeat them. Counters per method are kept for
+    /metrics/structured-output.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    async def collect(
+        self,
+        method: str,
+        schema: ItemSchema,
+        minimum: int,
+        request: Callable[[int, List[Dict]], Awaitable[str]],
+        maximum: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Gather at least `minimum` valid items (at most `maximum`)
+
+        Args:
+            method: Service method, for the counters
+            schema: Schema of the items
+            minimum: Items needed
+            request: Called with (items still needed, items accepted so far);
+                returns the raw model output. The first call has none accepted.
+            maximum: Items kept (defaults to minimum)
+
+        Returns:
+            Up to `maximum` valid items; fewer than `minimum` only if the
+            repair calls did not produce enough
+        """
+        if minimum <= 0:
+            return []
+        maximum = maximum or minimum
+        stats = self._method_stats(method)
+        accepted: List[Dict] = []
+        seen = set()
+        with tracer.span("structured_output.collect", method=method, requested=minimum) as span:
+            for attempt in range(settings.STRUCTURED_OUTPUT_MAX_REPAIRS + 1):
+                needed = minimum - len(accepted)
+                if attempt:
+                    stats["repair_calls"] += 1
+                    stats["regenerated_requested"] += needed
+                parsed = parse_items(await request(needed, list(accepted)), schema)
+                stats["calls"] += 1
+                stats["invalid"] += len(parsed.invalid)
+                stats["repaired"] += parsed.repaired
+                stats["salvaged"] += parsed.salvaged
+                for item in parsed.items:
+                    identity = schema.identity(item)
+                    if identity in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    if len(accepted) < maximum:
+                        seen.add(identity)
+                        accepted.append(item)
+                        stats["regenerated" if attempt else "first_pass"] += 1
+                if len(accepted) >= minimum:
+                    break
+            stats["requests"] += 1
+            stats["short"] += len(accepted) < minimum
+            span.set("returned", len(accepted))
+            span.set("repair_calls", attempt)
+        return accepted
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        """Counters per method: first-pass, locally repaired and regenerated items, repair calls"""
+        return {method: dict(stats) for method, stats in sorted(self._stats.items())}
+
+    def _method_stats(self, method: str) -> Dict[str, int]:
+        if method not in self._stats:
+            self._stats[method] = {
+                "requests": 0, "calls": 0, "repair_calls": 0, "first_pass": 0, "repaired": 0,
+                "regenerated_requested": 0, "regenerated": 0, "invalid": 0, "duplicates": 0, "salvaged": 0, "short": 0,
+            }
+        return self._stats[method]
+
+
+def repair_max_tokens(max_tokens: int, needed: int, requested: int) -> int:
+    """Completion tokens for a call asking for `needed` of `requested` items"""
+    if needed >= requested:
+        return max_tokens
+    return min(max(max_tokens * needed // requested, MIN_REPAIR_TOKENS), max_tokens)
+
+
+def existing_listing(items: List[Dict], schema: ItemSchema) -> str:
+    """Accepted items as a bullet list for a repair prompt"""
+    return "\n".join(f"- {item.get(schema.identity_field)}" for item in items) or "(none)"
+
+
+def _load_array(content: str, key: str) -> tuple[List, bool]:
+    """The `key` array of a JSON response, recovering complete items from cut-off or malformed JSON"""
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError:
+        return _salvage_array(content, key), True
+    if isinstance(result, list):
+        return result, False
+    if isinstance(result, dict):
+        value = result.get(key)
+        if isinstance(value, list):
+            return value, False
+        lists = [v for v in result.values() if isinstance(v, list)]
+        if len(lists) == 1:  # the array under another name
+            return lists[0], False
+    return [], False
+
+
+def _salvage_array(content: str, key: str) -> List:
+    start = content.find(f'"{key}"')
+    start = content.find("[", start if start >= 0 else 0)
+    if start < 0:
+        return []
+    decoder, items, position = json.JSONDecoder(), [], start + 1
+    while True:
+        while position < len(content) and content[position] in " \t\r\n,":
+            position += 1
+        if position >= len(content) or content[position] == "]":
+            return items
+        try:
+            item, position = decoder.raw_decode(content, position)
+        except json.JSONDecodeError:
+            return items  # the rest was cut off
+        items.append(item)
+
+
+def _option_text(option: str) -> str:
+    """An option without a leading "A) " / "A. " / "A: " label"""
+    option = option.strip()
+    if len(option) > 2 and option[0].upper() in OPTION_LETTERS and option[1] in ".):":
+        return option[2:].strip()
+    return option
+
+
+def _question_type(value: str) -> str:
+    value = value.strip().lower()
+    return QUESTION_TYPE_ALIASES.get(value, value.replace(" ", "_"))
+
+
+# Singleton instance
+structured_output = StructuredOutput()
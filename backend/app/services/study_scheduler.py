@@ -0,0 +1,266 @@
+"""
+Local study-plan scheduling
+"""
+import math
+from dataclasses import dataclass, asdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+# Activity by current mastery: (upper bound, activity)
+ACTIVITIES = (
+    (0.4, "Learn: work through notes and lecture material"),
+    (0.7, "Practice: flashcards and exercises"),
+    (1.01, "Review: spaced repetition of key points"),
+)
+CHECKPOINT_ACTIVITY = "Checkpoint: self-test quiz"
+MIN_GAP = 0.1  # mastered topics still get some review time
+MAX_MILESTONES = 4
+DEFAULT_HORIZON_WEEKS = 4  # milestone horizon without a deadline
+
+
+@dataclass
+class TopicDemand:
+    """A topic to schedule and the student's mastery of it (0.0 to 1.0)"""
+    name: str
+    mastery: float = 0.0
+
+
+@dataclass
+class SchedulePlan:
+    """A weekly schedule with its allocation and milestones"""
+    weekly_schedule: Dict[str, List[Dict]]
+    allocation: Dict[str, int]  # minutes per week by topic, highest priority first
+    priority_topics: List[str]
+    milestones: List[Dict]
+    weeks: Optional[int]  # whole weeks until the deadline
+    load: Optional[float]  # weekly hours needed to reach mastery by the deadline / hours available
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class StudyScheduler:
+    """
+    Allocates weekly study time without calling the LLM
+
+    Time is split into fixed blocks shared out in proportion to each topic's
+    mastery gap (largest-remainder rounding, at least one block per topic
+    while blocks last). Blocks are grouped into sessions, interleaved across
+    topics and spread over the study days so each day carries a similar load.
+    Sessions stay between day_start and day_end: hours beyond what the days
+    hold are dropped (max_hours_per_week), and a session that fits in no
+    day's remaining time is split across days. With a deadline, milestones
+    follow projected mastery week by week and `load` reports whether the
+    available hours are enough.
+    """
+
+    def __init__(
+        self,
+        days: Optional[List[str]] = None,
+        day_start: Optional[str] = None,
+        day_end: Optional[str] = None,
+        session_minutes: Optional[int] = None,
+        block_minutes: int = 30,
+        hours_per_topic: Optional[float] = None
+    ):
+        self.days = days or settings.STUDY_DAYS
+        self.day_start = _parse_time(day_start or settings.STUDY_DAY_START)
+        self.day_end = _parse_time(day_end or settings.STUDY_DAY_END)
+        self.block_minutes = block_minutes
+        self.day_blocks = max(self.day_end - self.day_start, 0) // block_minutes
+        self.session_blocks = max((session_minutes or settings.STUDY_SESSION_MINUTES) // block_minutes, 1)
+        self.hours_per_topic = hours_per_topic or settings.STUDY_HOURS_PER_TOPIC
+
+    @property
+    def max_hours_per_week(self) -> float:
+        """Study time that fits between day_start and day_end on the study days"""
+        return len(self.days) * self.day_blocks * self.block_minutes / 60
+
+    def schedule(
+        self,
+        topics: List[TopicDemand],
+        hours_per_week: float,
+        deadline: Optional[date] = None,
+        today: Optional[date] = None
+    ) -> SchedulePlan:
+        """
+        Build a weekly schedule
+
+        Args:
+            topics: Topics to study, weakest or most important first
+            hours_per_week: Study time available each week (capped at max_hours_per_week)
+            deadline: Date the topics should be mastered by (optional)
+            today: Plan start date (defaults to today)
+
+        Returns:
+            The schedule plan
+        """
+        today = today or date.today()
+        mastery = _unique_topics(topics)
+        total_blocks = min(int(hours_per_week * 60 // self.block_minutes), len(self.days) * self.day_blocks)
+        blocks = self.allocate(mastery, total_blocks)
+        allocation = {name: count * self.block_minutes for name, count in blocks.items()}
+
+        weeks = max(math.ceil((deadline - today).days / 7), 1) if deadline else None
+        load = None
+        if weeks and hours_per_week > 0:
+            needed = sum(_gap(level) for level in mastery.values()) * self.hours_per_topic / weeks
+            load = round(needed / hours_per_week, 2)
+
+        return SchedulePlan(
+            weekly_schedule=self._lay_out(blocks, mastery),
+            allocation=allocation,
+            priority_topics=list(allocation),
+            milestones=self._milestones(allocation, mastery, today, weeks, deadline),
+            weeks=weeks,
+            load=load,
+        )
+
+    def allocate(self, mastery: Dict[str, float], total_blocks: int) -> Dict[str, int]:
+        """Blocks per topic, in proportion to the mastery gap, highest first"""
+        ranked = sorted(mastery, key=lambda name: -_gap(mastery[name]))[:max(total_blocks, 0)]
+        if not ranked:
+            return {}
+        total_gap = sum(_gap(mastery[name]) for name in ranked)
+        quotas = {name: total_blocks * _gap(mastery[name]) / total_gap for name in ranked}
+        blocks = {name: max(int(quotas[name]), 1) for name in ranked}
+
+        surplus = sum(blocks.values()) - total_blocks
+        while surplus > 0:  # minimum blocks overshot: trim the most over-allocated
+            name = max((n for n in ranked if blocks[n] > 1), key=lambda n: blocks[n] - quotas[n])
+            blocks[name] -= 1
+            surplus -= 1
+        leftover = total_blocks - sum(blocks.values())
+        by_remainder = sorted(ranked, key=lambda name: quotas[name] - blocks[name], reverse=True)
+        for name in by_remainder[:leftover]:
+            blocks[name] += 1
+        return {name: blocks[name] for name in sorted(ranked, key=lambda name: -blocks[name])}
+
+    def _lay_out(self, blocks: Dict[str, int], mastery: Dict[str, float]) -> Dict[str, List[Dict]]:
+        """Group blocks into sessions and spread them over the study days"""
+        sessions_by_topic = []
+        for name, count in blocks.items():
+            sessions, extra = divmod(count, self.session_blocks)
+            sizes = [self.session_blocks] * sessions + ([extra] if extra else [])
+            activity = next(activity for bound, activity in ACTIVITIES if mastery[name] < bound)
+            activities = [activity] * len(sizes)
+            if len(sizes) > 1:
+                activities[-1] = CHECKPOINT_ACTIVITY
+            sessions_by_topic.append([(name, size, act) for size, act in zip(sizes, activities)])
+
+        # Interleave: first session of every topic, then the second, ...
+        ordered = [
+            topic_sessions[i]
+            for i in range(max((len(s) for s in sessions_by_topic), default=0))
+            for topic_sessions in sessions_by_topic if i < len(topic_sessions)
+        ]
+
+        days: Dict[str, List] = {day: [] for day in self.days}
+        used = {day: 0 for day in self.days}  # blocks
+        for name, size, activity in ordered:
+            fitting = [d for d in self.days if used[d] + size <= self.day_blocks]
+            if fitting:
+                day = min(fitting, key=lambda d: (
+                    any(session[0] == name for session in days[d]), used[d], self.days.index(d)
+                ))
+                days[day].append((name, size, activity))
+                used[day] += size
+                continue
+            # No day has room for the whole session: split it over the days with the most room
+            while size:
+                day = min(self.days, key=lambda d: (used[d], self.days.index(d)))
+                part = min(size, self.day_blocks - used[day])
+                days[day].append((name, part, activity))
+                used[day] += part
+                size -= part
+
+        schedule = {}
+        for day, sessions in days.items():
+            if not sessions:
+                continue
+            start, entries = self.day_start, []
+            for name, size, activity in sessions:
+                end = start + size * self.block_minutes
+                entries.append({
+                    "time": f"{_format_time(start)}-{_format_time(end)}",
+                    "minutes": size * self.block_minutes,
+                    "activity": activity,
+                    "topic": name,
+                })
+                start = end
+            schedule[day] = entries
+        return schedule
+
+    def _milestones(
+        self,
+        allocation: Dict[str, int],
+        mastery: Dict[str, float],
+        today: date,
+        weeks: Optional[int],
+        deadline: Optional[date]
+    ) -> List[Dict]:
+        """Checkpoints with the mastery each topic should reach by then"""
+        if not allocation:
+            return []
+        horizon = weeks or DEFAULT_HORIZON_WEEKS
+        count = min(MAX_MILESTONES, horizon)
+        checkpoints = sorted({max(round(horizon * (k + 1) / count), 1) for k in range(count)})
+        milestones = []
+        for week in checkpoints:
+            targets = {
+                name: round(min(1.0, mastery[name] + week * minutes / 60 / self.hours_per_topic), 2)
+                for name, minutes in allocation.items()
+            }
+            when = today + timedelta(weeks=week)
+            if deadline and when > deadline:
+                when = deadline
+            focus = ", ".join(f"{name} {int(targets[name] * 100)}%" for name in list(allocation)[:3])
+            milestones.append({
+                "week": week,
+                "date": when.isoformat(),
+                "targets": targets,
+                "description": f"Week {week}: reach {focus}",
+            })
+            if all(target >= 1.0 for target in targets.values()):
+                break  # later checkpoints would repeat full mastery
+        return milestones
+
+
+def parse_deadline(deadline: Optional[str]) -> Optional[date]:
+    """ISO date (or datetime) string to a date; None when missing or not a date"""
+    if not deadline:
+        return None
+    try:
+        return date.fromisoformat(deadline.strip()[:10])
+    except ValueError:
+        return None
+
+
+def _unique_topics(topics: List[TopicDemand]) -> Dict[str, float]:
+    mastery: Dict[str, float] = {}
+    for topic in topics:
+        name = topic.name.strip()
+        if name:
+            level = min(max(topic.mastery, 0.0), 1.0)
+            mastery[name] = min(mastery.get(name, level), level)
+    return mastery
+
+
+def _gap(mastery: float) -> float:
+    return max(1.0 - mastery, MIN_GAP)
+
+
+def _parse_time(text: str) -> int:
+    hours, minutes = text.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _format_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+# Singleton instance
+study_scheduler = StudyScheduler()
@@ -0,0 +1,100 @@
+"""
+Streaming sentence-based text chunker
+"""
+import re
+from collections import deque
+from typing import Callable, Iterator
+
+from app.services.tokens import estimate_tokens
+
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+_WORD = re.compile(r'\S+')
+
+
+def iter_sentences(text: str) -> Iterator[str]:
+    """
+    Lazily split text into sentences on terminal punctuation
+
+    Yields the same pieces as re.split, including an empty last piece when
+    the text is empty or ends with whitespace after punctuation.
+    """
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+
+def split_oversized(sentence: str, max_tokens: int, count: Callable[[str], int]) -> Iterator[str]:
+    """Split a sentence larger than the chunk budget at word boundaries"""
+    piece_start = None
+    piece_end = 0
+    piece_tokens = 0
+    for match in _WORD.finditer(sentence):
+        word_tokens = count(match.group())
+        if piece_start is not None and piece_tokens + word_tokens > max_tokens:
+            yield sentence[piece_start:piece_end]
+            piece_start = None
+            piece_tokens = 0
+        if piece_start is None:
+            piece_start = match.start()
+        piece_end = match.end()
+        piece_tokens += word_tokens
+    if piece_start is not None:
+        yield sentence[piece_start:piece_end]
+
+
+def iter_chunks(
+    text: str,
+    max_tokens: int,
+    overlap_tokens: int = 0,
+    count: Callable[[str], int] = estimate_tokens,
+    fit: bool = True
+) -> Iterator[str]:
+    """
+    Yield overlapping chunks of whole sentences, sized by token count
+
+    Each sentence is measured once and the overlap window is kept as a deque,
+    so the total work is linear in the length of the text. With fit, no chunk
+    exceeds max_tokens: sentences larger than the budget are split at word
+    boundaries and the overlap is trimmed when it would not fit. Without it,
+    sentences stay whole and the overlap is kept in full, giving the same
+    boundaries as the original NLPService.chunk_text; a chunk can then
+    exceed max_tokens.
+
+    Args:
+        text: Text to chunk
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens of trailing sentences repeated at the start of the next chunk
+        count: Token counter applied to each sentence (estimate, exact or word count)
+        fit: Keep every chunk within max_tokens
+
+    Yields:
+        Text chunks
+    """
+    window = deque()  # (sentence, tokens)
+    window_tokens = 0
+
+    for sentence in iter_sentences(text):
+        if fit and not sentence:
+            continue
+        sentence_tokens = count(sentence)
+        if fit and sentence_tokens > max_tokens:
+            pieces = ((piece, count(piece)) for piece in split_oversized(sentence, max_tokens, count))
+        else:
+            pieces = ((sentence, sentence_tokens),)
+
+        for piece, piece_tokens in pieces:
+            if window and window_tokens + piece_tokens > max_tokens:
+                yield ' '.join(s for s, _ in window)
+                # Keep the shortest suffix of sentences that reaches the overlap
+                while window and window_tokens - window[0][1] >= overlap_tokens:
+                    window_tokens -= window.popleft()[1]
+                while fit and window and window_tokens + piece_tokens > max_tokens:
+                    window_tokens -= window.popleft()[1]
+            window.append((piece, piece_tokens))
+            window_tokens += piece_tokens
+
+    if window:
+        yield ' '.join(s for s, _ in window)
@@ -0,0 +1,90 @@
+"""
+Migration of transcripts and note bodies to compressed storage
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Table, bindparam, select, type_coerce, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import NullType
+
+from app.core.config import settings
+from app.core.database import Base
+from app.core.tracing import tracer
+from app.models.types import CompressedText, stored_plain_text
+
+
+def compressed_columns() -> List[Tuple[Table, List]]:
+    """(table, CompressedText columns) for every table that has any"""
+    tables = []
+    for table in Base.metadata.sorted_tables:
+        columns = [column for column in table.columns if isinstance(column.type, CompressedText)]
+        if columns:
+            tables.append((table, columns))
+    return tables
+
+
+class TextStorageService:
+    """
+    Brings rows written before CompressedText up to date
+
+    New writes are compressed as they happen and old rows read as they are
+    (on PostgreSQL init_db has made the columns BYTEA, old text behind the
+    PLAIN header), so the migration only saves space. Rows are read by id in
+    batches without decoding; only values still stored plain and long enough
+    are rewritten, one transaction per batch, so the job can be stopped and
+    rerun at any point.
+    """
+
+    async def migrate(self, db: AsyncSession, batch_size: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Compress every CompressedText column
+
+        Args:
+            db: Database session
+            batch_size: Rows read per transaction (default TEXT_MIGRATION_BATCH)
+
+        Returns:
+            Rows read and rows rewritten per table
+        """
+        batch_size = batch_size or settings.TEXT_MIGRATION_BATCH
+        counts = {}
+        with tracer.span("text_storage.migrate") as span:
+            for table, columns in compressed_columns():
+                counts[table.name] = await self._compress_rows(db, table, columns, batch_size)
+                span.set(table.name, counts[table.name]["rows_compressed"])
+        return counts
+
+    async def _compress_rows(self, db: AsyncSession, table: Table, columns: List, batch_size: int) -> Dict[str, int]:
+        raw = [type_coerce(column, NullType()).label(column.name) for column in columns]  # values as stored
+        counts = {"rows_read": 0, "rows_compressed": 0}
+        last_id = 0
+        while True:
+            rows = (await db.execute(
+                select(table.c.id, *raw).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            )).all()
+            if not rows:
+                return counts
+            last_id = rows[-1].id
+            counts["rows_read"] += len(rows)
+
+            # Rows grouped by the columns they need rewritten, one executemany per group
+            groups: Dict[Tuple[str, ...], List[Dict]] = {}
+            for row in rows:
+                values = {}
+                for column in columns:
+                    plain = stored_plain_text(getattr(row, column.name))
+                    if plain is not None and len(plain.encode("utf-8")) >= settings.TEXT_COMPRESSION_MIN_BYTES:
+                        values[column.name] = plain
+                if values:
+                    groups.setdefault(tuple(values), []).append({"row_id": row.id, **values})
+            for names, params in groups.items():
+                statement = update(table).where(table.c.id == bindparam("row_id")).values(
+                    {name: bindparam(name, type_=table.c[name].type) for name in names}
+                )
+                await db.execute(statement, params)
+                counts["rows_compressed"] += len(params)
+            await db.commit()
+
+
+# Singleton instance
+text_storage = TextStorageService()
@@ -0,0 +1,173 @@
+"""
+Prompt token budgeting and input fitting for service methods
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.tracing import tracer
+from app.services.text_chunker import iter_chunks
+from app.services.tokens import get_token_counter
+
+
+# Context window sizes (prompt + completion) of known models
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4-turbo-preview": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Per-message framing tokens added by the chat format, plus instruction
+# templates, which are all well under this size
+PROMPT_OVERHEAD_TOKENS = 300
+
+# How each method fits an oversized input:
+#   truncate - keep the leading sentences that fit
+#   chunk    - split into fitting chunks and call once per chunk
+#   condense - summarize chunks first, then call on the condensed text
+#   reject   - fail locally with InputTooLargeError
+DEFAULT_POLICIES = {
+    "nlp.generate_notes": "chunk",
+    "nlp.summarize_text": "condense",
+    "nlp.extract_key_concepts": "chunk",
+    "nlp.generate_flashcards": "condense",
+    "quiz.generate_quiz": "condense",
+    "quiz.generate_adaptive_quiz": "reject",
+    "quiz.get_question_explanation": "reject",
+    "quiz.explain_attempt": "reject",
+    "tutor.get_tutor_response": "truncate",
+    "tutor.explain_concept": "reject",
+    "tutor.generate_study_plan": "reject",
+    "tutor.recommend_resources": "reject",
+}
+
+STRATEGIES = ("truncate", "chunk", "condense", "reject")
+
+
+class InputTooLargeError(ValueError):
+    """Raised when an input cannot be fitted into the prompt budget"""
+
+
+@dataclass
+class FittedInput:
+    """Result of fitting an input into a method's prompt budget"""
+    text: str
+    input_tokens: int
+    budget_tokens: int
+    strategy: Optional[str] = None  # None when the input already fits
+    chunks: Optional[List[str]] = None  # Set for chunk and condense
+
+    @property
+    def fits(self) -> bool:
+        return self.strategy is None
+
+
+class TokenBudget:
+    """Works out prompt room per method and fits inputs before the call"""
+
+    def __init__(self):
+        self.context_windows = {**MODEL_CONTEXT_WINDOWS, **settings.MODEL_CONTEXT_WINDOWS}
+        self.policies = {**DEFAULT_POLICIES, **settings.TOKEN_BUDGET_POLICIES}
+        unknown = {p for p in self.policies.values() if p not in STRATEGIES}
+        if unknown:
+            raise ValueError(f"Unknown token budget strategy: {', '.join(sorted(unknown))}")
+        unknown = set(settings.TOKEN_BUDGET_POLICIES) - set(DEFAULT_POLICIES)
+        if unknown:
+            raise ValueError(f"TOKEN_BUDGET_POLICIES names unknown methods: {', '.join(sorted(unknown))}")
+
+    def context_window(self, model: str) -> int:
+        """Context window of a model, matching dated variants by prefix"""
+        if model in self.context_windows:
+            return self.context_windows[model]
+        for name, window in sorted(self.context_windows.items(), key=lambda item: -len(item[0])):
+            if model.startswith(name):
+                return window
+        return DEFAULT_CONTEXT_WINDOW
+
+    def input_budget(
+        self,
+        model: str,
+        max_tokens: int,
+        reserved_tokens: int = 0,
+        method: Optional[str] = None
+    ) -> int:
+        """
+        Tokens left for the variable input of a prompt
+
+        Args:
+            model: Model the prompt is sent to
+            max_tokens: Completion tokens requested
+            reserved_tokens: Tokens already used by other variable parts (history, question)
+            method: Service method, for its MAX_INPUT_TOKENS cap
+
+        Returns:
+            Input token budget (may be zero)
+        """
+        room = self.context_window(model) - max_tokens - PROMPT_OVERHEAD_TOKENS - reserved_tokens
+        cap = settings.MAX_INPUT_TOKENS.get(method) if method else None
+        if cap is not None:
+            room = min(room, cap)
+        return max(room, 0)
+
+    def fit(
+        self,
+        method: str,
+        text: str,
+        max_tokens: int,
+        model: Optional[str] = None,
+        reserved_tokens: int = 0
+    ) -> FittedInput:
+        """
+        Fit text into the prompt budget of a service method
+
+        Args:
+            method: Service method name (e.g. "nlp.generate_notes")
+            text: Variable input to fit
+            max_tokens: Completion tokens requested by the method
+            model: Model the prompt is sent to (defaults to OPENAI_MODEL)
+            reserved_tokens: Tokens already used by other variable parts
+
+        Returns:
+            FittedInput describing the fitted text or chunks
+
+        Raises:
+            InputTooLargeError: If the policy is reject, or nothing fits
+            KeyError: If the method has no policy in DEFAULT_POLICIES
+        """
+        if method not in self.policies:
+            raise KeyError(f"No token budget policy for {method}; add it to DEFAULT_POLICIES")
+        model = model or settings.OPENAI_MODEL
+        count = get_token_counter(model)
+        budget = self.input_budget(model, max_tokens, reserved_tokens, method)
+        input_tokens = count(text)
+
+        span = tracer.current_span()
+        span.set("input_tokens", input_tokens)
+        span.set("input_budget_tokens", budget)
+
+        if input_tokens <= budget:
+            return FittedInput(text, input_tokens, budget)
+
+        strategy = self.policies[method]
+        span.set("fit_strategy", strategy)
+        if strategy == "reject" or budget == 0:
+            raise InputTooLargeError(
+                f"Input is about {input_tokens} tokens; {method} accepts at most {budget} with {model}"
+            )
+
+        if strategy == "truncate":
+            fitted = next(iter_chunks(text, budget, 0, count), "")
+            return FittedInput(fitted, count(fitted), budget, strategy)
+
+        overlap = min(settings.CHUNK_OVERLAP_TOKENS, budget // 5)
+        chunks = list(iter_chunks(text, budget, overlap, count))
+        return FittedInput(text, input_tokens, budget, strategy, chunks)
+
+
+# Singleton instance
+token_budget = TokenBudget()
@@ -0,0 +1,58 @@
+"""
+Token counting helpers for sizing LLM inputs
+"""
+from functools import lru_cache
+from typing import Callable, Optional
+
+from app.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # Exact counting is optional; fall back to estimates
+    tiktoken = None
+
+
+# Average characters per token for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text without a tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def count_words(text: str) -> int:
+    """Count whitespace-separated words"""
+    return len(text.split())
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count tokens exactly when tiktoken is installed, otherwise estimate
+
+    Args:
+        text: Text to measure
+        model: Model whose tokenizer to use (defaults to OPENAI_MODEL)
+
+    Returns:
+        Token count
+    """
+    if tiktoken is None:
+        return estimate_tokens(text)
+    return len(_encoding(model or settings.OPENAI_MODEL).encode(text, disallowed_special=()))
+
+
+def get_token_counter(model: Optional[str] = None) -> Callable[[str], int]:
+    """Return the token counter selected by TOKEN_COUNTING (estimate or exact)"""
+    if settings.TOKEN_COUNTING == "exact" and tiktoken is not None:
+        encoding = _encoding(model or settings.OPENAI_MODEL)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens
@@ -0,0 +1,178 @@
+"""
+Streaming normalization of YouTube caption snippets
+"""
+import html
+import re
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from app.core.config import settings
+from app.services.tokens import estimate_tokens
+
+
+# [Music], [Applause], (laughs), (inaudible), music notes, speaker-change >>
+_NON_SPEECH = re.compile(
+    r"\[[^\]]*\]"
+    r"|\((?:[^)]*\b(?:music|applause|laugh\w*|inaudible|silence|noise|cheer\w*|cough\w*)\b[^)]*)\)"
+    r"|[♪♫]+"
+    r"|>>",
+    re.IGNORECASE
+)
+_SENTENCE_END = (".", "!", "?")
+
+# Longest rolling-caption overlap searched between consecutive snippets
+MAX_OVERLAP_WORDS = 30
+MIN_OVERLAP_WORDS = 2
+# Force a sentence break at the next snippet boundary after this many words
+MAX_SENTENCE_WORDS = 40
+
+
+@dataclass
+class NormalizationStats:
+    """What normalization removed from a transcript"""
+    snippets: int = 0
+    raw_tokens: int = 0
+    normalized_tokens: int = 0
+    markers_removed: int = 0
+    duplicate_words_removed: int = 0
+    sentence_breaks_added: int = 0
+    duration: float = 0.0  # seconds, from the last snippet's end
+
+    @property
+    def token_reduction(self) -> float:
+        if not self.raw_tokens:
+            return 0.0
+        return 1 - self.normalized_tokens / self.raw_tokens
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "token_reduction": round(self.token_reduction, 4)}
+
+
+def iter_normalized(
+    snippets: Iterable[Dict],
+    stats: NormalizationStats,
+    sentence_gap: float = None
+) -> Iterator[str]:
+    """
+    Normalize caption snippets one at a time
+
+    Each yielded piece is the cleaned text of one snippet. Non-speech
+    markers are removed, words repeated from the end of the previous
+    snippet (rolling captions) are dropped, and a sentence break is added
+    where the pause before a snippet is at least `sentence_gap` seconds or
+    the running sentence has grown past MAX_SENTENCE_WORDS.
+
+    Args:
+        snippets: Caption dicts with text, start and duration
+        stats: Stats object updated as snippets are processed
+        sentence_gap: Pause in seconds treated as a sentence boundary
+
+    Yields:
+        Normalized text per snippet
+    """
+    if sentence_gap is None:
+        sentence_gap = settings.TRANSCRIPT_SENTENCE_GAP
+
+    recent = deque(maxlen=MAX_OVERLAP_WORDS)  # lowercased words already emitted
+    pending: List[str] = []  # held back so a period can still be appended
+    sentence_words = 0
+    previous_end = None
+
+    for snippet in snippets:
+        raw = snippet.get("text", "")
+        stats.snippets += 1
+        stats.raw_tokens += estimate_tokens(raw) + 1
+        start = snippet.get("start", 0.0)
+        end = start + snippet.get("duration", 0.0)
+        stats.duration = max(stats.duration, end)
+
+        text, markers = _NON_SPEECH.subn(" ", html.unescape(raw))
+        stats.markers_removed += markers
+        words = text.split()
+
+        overlap = overlap_length(recent, words)
+        stats.duplicate_words_removed += overlap
+        words = words[overlap:]
+        if not words:
+            previous_end = end if previous_end is None else max(previous_end, end)
+            continue
+
+        if not pending:
+            words[0] = words[0][:1].upper() + words[0][1:]
+        else:
+            paused = previous_end is not None and start - previous_end >= sentence_gap
+            if (paused or sentence_words >= MAX_SENTENCE_WORDS) and not pending[-1].endswith(_SENTENCE_END):
+                pending[-1] += "."
+                words[0] = words[0][:1].upper() + words[0][1:]
+                stats.sentence_breaks_added += 1
+            if pending[-1].endswith(_SENTENCE_END):
+                sentence_words = 0
+            piece = " ".join(pending)
+            stats.normalized_tokens += estimate_tokens(piece) + 1
+            yield piece
+
+        pending = words
+        sentence_words += len(words)
+        recent.extend(w.lower() for w in words)
+        previous_end = end
+
+    if pending:
+        if not pending[-1].endswith(_SENTENCE_END):
+            pending[-1] += "."
+        piece = " ".join(pending)
+        stats.normalized_tokens += estimate_tokens(piece) + 1
+        yield piece
+
+
+def normalize_snippets(snippets: Iterable[Dict], sentence_gap: float = None) -> Tuple[str, NormalizationStats]:
+    """
+    Normalize a caption track into transcript text
+
+    Args:
+        snippets: Caption dicts with text, start and duration
+        sentence_gap: Pause in seconds treated as a sentence boundary
+
+    Returns:
+        Tuple of (transcript, stats)
+    """
+    stats = NormalizationStats()
+    transcript = " ".join(iter_normalized(snippets, stats, sentence_gap))
+    return transcript, stats
+
+
+def iter_segments(snippets: Iterable[Dict]) -> Iterator[Tuple[float, float, str]]:
+    """
+    Clean caption snippets one at a time, keeping each snippet's timing
+
+    Non-speech markers and words repeated from the previous snippets
+    (rolling captions) are removed as in iter_normalized, but no sentence
+    breaks are added. Snippets left empty are skipped.
+
+    Args:
+        snippets: Caption dicts with text, start and duration
+
+    Yields:
+        Tuples of (start, duration, text)
+    """
+    recent = deque(maxlen=MAX_OVERLAP_WORDS)
+    for snippet in snippets:
+        words = _NON_SPEECH.sub(" ", html.unescape(snippet.get("text", ""))).split()
+        words = words[overlap_length(recent, words):]
+        if words:
+            recent.extend(w.lower() for w in words)
+            yield snippet.get("start", 0.0), snippet.get("duration", 0.0), " ".join(words)
+
+
+def overlap_length(recent: deque, words: List[str]) -> int:
+    """Length of the longest suffix of `recent` that prefixes `words`"""
+    limit = min(len(recent), len(words))
+    if not limit:
+        return 0
+    lowered = [w.lower() for w in words[:limit]]
+    tail = list(recent)
+    for size in range(limit, 0, -1):
+        if tail[-size:] == lowered[:size]:
+            # A single repeated word is usually speech ("that that"), not overlap
+            return size if size >= MIN_OVERLAP_WORDS or size == len(words) else 0
+    return 0
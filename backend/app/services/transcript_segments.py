@@ -0,0 +1,106 @@
+"""
+Timestamped caption segments stored as parallel arrays
+"""
+import struct
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from app.services.transcript_normalizer import iter_segments
+
+
+MAGIC = b"SEG1"
+_HEADER = struct.Struct("<4sI")  # magic, segment count; 8 bytes, so the float64 array stays aligned
+START_DTYPE, DURATION_DTYPE, OFFSET_DTYPE = np.dtype("<f8"), np.dtype("<f4"), np.dtype("<u4")
+
+
+class SegmentTrack:
+    """
+    A lecture's captions as parallel arrays over one text buffer
+
+    `starts` (float64 seconds), `durations` (float32 seconds) and
+    `offsets` (uint32 byte offsets, one more than there are segments) are
+    NumPy arrays over `text`, the UTF-8 of all segments each followed by a
+    space. Stored as one blob: header, the three arrays, then the text.
+    Loading views all of them in place; a time range is found by binary
+    search and only its bytes are decoded, so a request costs the same
+    however long the lecture is and no Python object is created per caption.
+    The text is left uncompressed so a range can be sliced out directly.
+    """
+    __slots__ = ("starts", "durations", "offsets", "text")
+
+    def __init__(self, starts: np.ndarray, durations: np.ndarray, offsets: np.ndarray, text: bytes):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def from_snippets(cls, snippets: Iterable[Dict]) -> "SegmentTrack":
+        """Build a track from caption dicts with text, start and duration (cleaned by iter_segments)"""
+        starts, durations, lengths, texts = [], [], [], []
+        for start, duration, text in iter_segments(snippets):
+            starts.append(start)
+            durations.append(duration)
+            texts.append(text.encode("utf-8") + b" ")
+            lengths.append(len(texts[-1]))
+        offsets = np.zeros(len(texts) + 1, dtype=OFFSET_DTYPE)
+        offsets[1:] = np.cumsum(lengths)
+        return cls(
+            np.asarray(starts, dtype=START_DTYPE), np.asarray(durations, dtype=DURATION_DTYPE), offsets, b"".join(texts)
+        )
+
+    def to_bytes(self) -> bytes:
+        arrays = (self.starts, self.durations, self.offsets)
+        return b"".join((_HEADER.pack(MAGIC, len(self)), *(array.tobytes() for array in arrays), self.text))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "SegmentTrack":
+        magic, count = _HEADER.unpack_from(blob)
+        if magic != MAGIC:
+            raise ValueError("Not a segment track")
+        position = _HEADER.size
+        arrays = []
+        for dtype, length in ((START_DTYPE, count), (DURATION_DTYPE, count), (OFFSET_DTYPE, count + 1)):
+            arrays.append(np.frombuffer(blob, dtype=dtype, count=length, offset=position))
+            position += dtype.itemsize * length
+        return cls(*arrays, memoryview(blob)[position:])
+
+    def span(self, start: float, end: float) -> Tuple[int, int]:
+        """Index range [i, j) of the segments overlapping the time range [start, end)"""
+        j = int(np.searchsorted(self.starts, end, side="left"))
+        # Captions overlap (rolling captions), so look back by the longest one for segments still running at start
+        lo = int(np.searchsorted(self.starts, start - float(self.durations.max(initial=0.0)), side="left"))
+        running = self.starts[lo:j] + self.durations[lo:j] > start
+        i = lo + int(np.argmax(running)) if running.any() else j
+        return i, j
+
+    def text_between(self, i: int, j: int) -> str:
+        """Text of segments [i, j), space-separated"""
+        return bytes(self.text[self.offsets[i]:self.offsets[j] - 1]).decode("utf-8") if j > i else ""
+
+    def slice(self, i: int, j: int) -> Dict:
+        """
+        Segments [i, j) as arrays, ready for ORJSONResponse
+
+        Offsets are rebased to the returned text and counted in characters:
+        segment k's text is text[offsets[k]:offsets[k + 1] - 1].
+        """
+        data = np.frombuffer(self.text[self.offsets[i]:self.offsets[j]], dtype=np.uint8)
+        # Characters before each byte position: count the bytes that start a UTF-8 character
+        characters = np.zeros(len(data) + 1, dtype=OFFSET_DTYPE)
+        np.cumsum((data & 0xC0) != 0x80, out=characters[1:])
+        return {
+            "starts": self.starts[i:j],
+            "durations": self.durations[i:j],
+            "offsets": characters[self.offsets[i:j + 1] - self.offsets[i]],
+            "text": self.text_between(i, j),
+        }
+
+
+def build_segments(snippets: Iterable[Dict]) -> bytes:
+    """Stored form of a caption track (picklable, for the CPU pool)"""
+    return SegmentTrack.from_snippets(snippets).to_bytes()
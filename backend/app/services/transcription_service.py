@@ -1,14 +1,41 @@
 """
 Transcription service using OpenAI Whisper API and YouTube Transcripts (FREE!)
 """
+import io
 import os
-import tempfile
+import wave
 from openai import AsyncOpenAI
 from youtube_transcript_api import YouTubeTranscriptApi
 from app.core.config import settings
+from app.core.disconnect import cancellations
+from app.core.executor import cpu_executor
+from app.core.tracing import tracer, traced
+from app.services.transcript_normalizer import normalize_snippets
+from app.services.transcript_segments import build_segments
 import asyncio
 
 
+def pcm_to_wav(pcm: bytes, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """Wrap raw PCM samples in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def youtube_video_id(youtube_url: str) -> str:
+    """Extract the video ID from a YouTube URL"""
+    if "v=" in youtube_url:
+        return youtube_url.split("v=")[1].split("&")[0]
+    elif "youtu.be/" in youtube_url:
+        return youtube_url.split("youtu.be/")[1].split("?")[0]
+    else:
+        raise ValueError("Invalid YouTube URL")
+
+
 class TranscriptionService:
     """Service for transcribing audio and video content"""
     
@@ -17,6 +44,7 @@ class TranscriptionService:
         # Make OpenAI client optional - only initialize if API key is provided
         self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
     
+    @traced("transcription.transcribe_audio_file")
     async def transcribe_audio_file(self, file_path: str) -> str:
         """
         Transcribe an audio file using OpenAI Whisper API
@@ -31,17 +59,24 @@ class TranscriptionService:
             raise Exception("OpenAI API key is not configured. Please add OPENAI_API_KEY to environment variables.")
         
         try:
-            with open(file_path, "rb") as audio_file:
-                transcript = await self.client.audio.transcriptions.create(
-                    model=settings.WHISPER_MODEL,
-                    file=audio_file,
-                    response_format="text"
-                )
+            with tracer.span("openai.audio.transcriptions", kind="client", model=settings.WHISPER_MODEL) as span:
+                span.set("request_bytes", os.path.getsize(file_path))
+                with open(file_path, "rb") as audio_file:
+                    transcript = await self.client.audio.transcriptions.create(
+                        model=settings.WHISPER_MODEL,
+                        file=audio_file,
+                        response_format="text"
+                    )
+                span.set("response_chars", len(transcript))
             return transcript
+        except asyncio.CancelledError:
+            cancellations.call("whisper", settings.WHISPER_MODEL)
+            raise
         except Exception as e:
             raise Exception(f"Transcription failed: {str(e)}")
     
-    async def transcribe_youtube_video(self, youtube_url: str) -> tuple[str, dict]:
+    @traced("transcription.transcribe_youtube_video")
+    async def transcribe_youtube_video(self, youtube_url: str, segments: bool = False) -> tuple[str, dict]:
         """
         Transcribe a YouTube video using its captions (completely FREE!)
         
@@ -49,9 +84,11 @@ class TranscriptionService:
         
         Args:
             youtube_url: YouTube video URL
+            segments: Also build the timed captions, for a lecture that stores them
             
         Returns:
-            Tuple of (transcript, metadata)
+            Tuple of (transcript, metadata); with segments, metadata["segments"]
+            holds the timed captions in SegmentTrack's stored form
         """
         try:
             # Extract video ID
@@ -59,21 +96,37 @@ class TranscriptionService:
             
             # Fetch captions using YouTube Transcript API (run in thread to avoid blocking)
             try:
-                transcript_list = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        YouTubeTranscriptApi.get_transcript, 
-                        video_id, 
-                        languages=['en']
-                    ),
-                    timeout=30.0
-                )
-                # Combine transcript snippets into one string
-                transcript = " ".join([item['text'] for item in transcript_list])
-                
+                with tracer.span("youtube.get_transcript", kind="client", video_id=video_id) as span:
+                    transcript_list = await asyncio.wait_for(
+                        asyncio.to_thread(
+                            YouTubeTranscriptApi.get_transcript, 
+                            video_id, 
+                            languages=['en']
+                        ),
+                        timeout=30.0
+                    )
+                    span.set("snippets", len(transcript_list))
                 # Get basic metadata
                 metadata = self._get_youtube_metadata(youtube_url)
+                size = sum(len(item['text']) for item in transcript_list)
+                if segments:
+                    metadata['segments'] = await cpu_executor.run(build_segments, transcript_list, size=size)
+                
+                # Combine transcript snippets into one string
+                if settings.TRANSCRIPT_NORMALIZATION:
+                    with tracer.span("transcript.normalize", snippets=len(transcript_list)) as span:
+                        transcript, stats = await cpu_executor.run(normalize_snippets, transcript_list, size=size)
+                        metadata['duration'] = int(stats.duration)
+                        metadata['normalization'] = stats.to_dict()
+                        span.set("token_reduction", metadata['normalization']['token_reduction'])
+                else:
+                    transcript = " ".join([item['text'] for item in transcript_list])
                 
                 return transcript, metadata
+            except asyncio.CancelledError:
+                # The caption fetch thread cannot be interrupted; its result is dropped
+                cancellations.call("youtube", "captions")
+                raise
             except asyncio.TimeoutError:
                 raise Exception("Request timed out. The YouTube transcript API took too long to respond.")
             except Exception as yt_error:
@@ -86,12 +139,7 @@ class TranscriptionService:
     
     def _extract_video_id(self, youtube_url: str) -> str:
         """Extract video ID from YouTube URL"""
-        if "v=" in youtube_url:
-            return youtube_url.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in youtube_url:
-            return youtube_url.split("youtu.be/")[1].split("?")[0]
-        else:
-            raise ValueError("Invalid YouTube URL")
+        return youtube_video_id(youtube_url)
     
     def _get_youtube_metadata(self, youtube_url: str) -> dict:
         """Get YouTube video metadata - simplified version without yt-dlp"""
@@ -107,28 +155,54 @@ class TranscriptionService:
         except Exception as e:
             return {'error': str(e)}
     
-    async def transcribe_live_audio(self, audio_chunks: list) -> str:
+    @traced("transcription.transcribe_audio_bytes")
+    async def transcribe_audio_bytes(self, audio: bytes, filename: str = "audio.wav", prompt: str = None) -> str:
         """
-        Transcribe live audio in real-time
+        Transcribe in-memory audio using OpenAI Whisper API
         
         Args:
-            audio_chunks: List of audio data chunks
+            audio: Encoded audio (format inferred from filename)
+            filename: Name sent with the upload
+            prompt: Preceding text, used by Whisper for continuity
             
         Returns:
             Transcribed text
         """
-        # This would be implemented with streaming audio processing
-        # For now, we'll save chunks to a temp file and transcribe
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-            # Combine audio chunks
-            # Implementation depends on audio format
-            temp_path = temp_file.name
+        if not self.client:
+            raise Exception("OpenAI API key is not configured. Please add OPENAI_API_KEY to environment variables.")
+        
+        with tracer.span("openai.audio.transcriptions", kind="client", model=settings.WHISPER_MODEL) as span:
+            span.set("request_bytes", len(audio))
+            kwargs = {"prompt": prompt} if prompt else {}
+            try:
+                transcript = await self.client.audio.transcriptions.create(
+                    model=settings.WHISPER_MODEL,
+                    file=(filename, audio),
+                    response_format="text",
+                    **kwargs
+                )
+            except asyncio.CancelledError:
+                cancellations.call("whisper", settings.WHISPER_MODEL)
+                raise
+            span.set("response_chars", len(transcript))
+        return transcript
+    
+    async def transcribe_live_audio(self, audio_chunks: list, sample_rate: int = None) -> str:
+        """
+        Transcribe buffered live audio in one call
+        
+        For continuous streams use LiveTranscriptionSession, which
+        transcribes fixed windows as they fill.
+        
+        Args:
+            audio_chunks: List of 16-bit mono PCM chunks
+            sample_rate: Sample rate of the PCM (defaults to LIVE_SAMPLE_RATE)
             
-        try:
-            transcript = await self.transcribe_audio_file(temp_path)
-            return transcript
-        finally:
-            os.unlink(temp_path)
+        Returns:
+            Transcribed text
+        """
+        wav = pcm_to_wav(b"".join(audio_chunks), sample_rate or settings.LIVE_SAMPLE_RATE)
+        return await self.transcribe_audio_bytes(wav)
 
 
 # Singleton instance
@@ -0,0 +1,259 @@
+"""
+Content-addressed storage for uploaded recordings and their transcripts
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiofiles
+from fastapi import UploadFile
+
+from app.core.config import settings
+
+
+READ_SIZE = 1024 * 1024
+MIN_IDLE_SECONDS = 600  # Recordings used this recently, and newer temporary files, are never evicted
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_SIZE"""
+
+
+@dataclass
+class _SharedTranscription:
+    """A transcription in progress and the number of requests waiting for it"""
+    task: asyncio.Future
+    waiters: int = 0
+
+
+@dataclass
+class StoredUpload:
+    """An upload in the store"""
+    digest: str
+    path: str
+    size: int
+    created: bool  # False when identical content was already stored
+
+
+class UploadStore:
+    """
+    Stores each distinct upload once, keyed by its SHA-256
+
+    Uploads are hashed while they are copied to a temporary file, then
+    moved to `<root>/<digest[:2]>/<digest>/audio<ext>`; if that digest is
+    already present the copy is discarded. Transcripts are kept next to
+    the audio per Whisper model, so re-uploading a recording returns the
+    stored transcript instead of transcribing it again.
+
+    The root must not be publicly served. evict() removes recordings not
+    used for `max_age` seconds, then the least recently used ones while the
+    store is over `max_bytes`; saving a recording again counts as a use.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 0, max_age: float = 0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._pending: Dict[str, _SharedTranscription] = {}
+
+    async def save(self, upload: UploadFile, max_size: Optional[int] = None) -> StoredUpload:
+        """
+        Stream an upload into the store
+
+        Args:
+            upload: Uploaded file
+            max_size: Size limit in bytes (defaults to MAX_UPLOAD_SIZE)
+
+        Returns:
+            The stored upload
+        """
+        max_size = max_size or settings.MAX_UPLOAD_SIZE
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(tmp_path, "wb") as out_file:
+                while chunk := await upload.read(READ_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise UploadTooLargeError(f"Upload exceeds the {max_size} byte limit")
+                    sha256.update(chunk)
+                    await out_file.write(chunk)
+
+            digest = sha256.hexdigest()
+            existing = self.find(digest)
+            if existing:
+                os.remove(tmp_path)
+                os.utime(existing)  # last use, for eviction
+                return StoredUpload(digest, existing, size, created=False)
+
+            ext = os.path.splitext(upload.filename or "")[1].lower()
+            path = os.path.join(self._object_dir(digest), f"audio{ext}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return StoredUpload(digest, path, size, created=True)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def find(self, digest: str) -> Optional[str]:
+        """Path of the stored audio for a digest, or None"""
+        directory = self._object_dir(digest)
+        if not os.path.isdir(directory):
+            return None
+        for name in os.listdir(directory):
+            if name.startswith("audio"):
+                return os.path.join(directory, name)
+        return None
+
+    def get_transcript(self, digest: str, model: Optional[str] = None) -> Optional[str]:
+        """Stored transcript of an upload for a Whisper model, or None"""
+        path = self._transcript_path(digest, model)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["transcript"]
+
+    def put_transcript(self, digest: str, transcript: str, model: Optional[str] = None):
+        """Store a completed transcript for an upload"""
+        path = self._transcript_path(digest, model)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"model": model or settings.WHISPER_MODEL, "transcript": transcript}, f)
+            os.replace(path + ".tmp", path)
+        except BaseException:
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            raise
+
+    def evict(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Remove expired and least recently used recordings with their transcripts
+
+        Recordings being transcribed or used in the last MIN_IDLE_SECONDS are
+        kept. Temporary files older than that (left by a crash) are removed.
+
+        Returns:
+            Counts of removed recordings and temporary files, and bytes freed
+        """
+        now = now or time.time()
+        counts = {"removed": 0, "removed_tmp": 0, "freed_bytes": 0}
+
+        tmp_dir = os.path.join(self.root, "tmp")
+        for entry in _scan(tmp_dir):
+            stat = entry.stat()
+            if entry.is_file() and now - stat.st_mtime > MIN_IDLE_SECONDS:
+                _remove(entry.path)
+                counts["freed_bytes"] += stat.st_size
+                counts["removed_tmp"] += 1
+
+        objects = []  # (last used, bytes, digest)
+        for prefix in _scan(self.root):
+            if prefix.name == "tmp" or not prefix.is_dir():
+                continue
+            for directory in _scan(prefix.path):
+                stats = [entry.stat() for entry in _scan(directory.path)]
+                if stats:
+                    objects.append((max(st.st_mtime for st in stats), sum(st.st_size for st in stats), directory.name))
+        objects.sort()
+
+        total = sum(size for _, size, _ in objects)
+        for last_used, size, digest in objects:
+            expired = self.max_age and now - last_used > self.max_age
+            if not expired and (not self.max_bytes or total <= self.max_bytes):
+                break
+            if digest in self._pending or now - last_used < MIN_IDLE_SECONDS:
+                continue
+            shutil.rmtree(self._object_dir(digest), ignore_errors=True)
+            total -= size
+            counts["removed"] += 1
+            counts["freed_bytes"] += size
+        return counts
+
+    async def run_eviction(self, interval: float):
+        """Evict every `interval` seconds until cancelled (started by the app lifespan)"""
+        while True:
+            await asyncio.to_thread(self.evict)
+            await asyncio.sleep(interval)
+
+    async def transcript_for(self, stored: StoredUpload, transcribe: Callable[[str], Awaitable[str]]) -> tuple[str, bool]:
+        """
+        Return the stored transcript of an upload, transcribing it only once
+
+        Concurrent requests for the same digest share a single transcription,
+        run in its own task. A request that is cancelled (its client
+        disconnected) stops waiting without affecting the others; the
+        transcription itself is cancelled only when no request is left.
+
+        Args:
+            stored: Upload from save()
+            transcribe: Coroutine function transcribing a file path
+
+        Returns:
+            Tuple of (transcript, whether it was reused)
+        """
+        transcript = self.get_transcript(stored.digest)
+        if transcript is not None:
+            return transcript, True
+
+        shared = self._pending.get(stored.digest)
+        reused = shared is not None
+        if shared is None:
+            shared = self._pending[stored.digest] = _SharedTranscription(
+                asyncio.ensure_future(self._transcribe(stored, transcribe))
+            )
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task), reused
+        finally:
+            shared.waiters -= 1
+            if not shared.waiters and not shared.task.done():
+                shared.task.cancel()
+
+    async def _transcribe(self, stored: StoredUpload, transcribe: Callable[[str], Awaitable[str]]) -> str:
+        try:
+            transcript = await transcribe(stored.path)
+            self.put_transcript(stored.digest, transcript)
+            return transcript
+        finally:
+            del self._pending[stored.digest]
+
+    def _object_dir(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _transcript_path(self, digest: str, model: Optional[str]) -> str:
+        model = (model or settings.WHISPER_MODEL).replace("/", "_")
+        return os.path.join(self._object_dir(digest), f"transcript-{model}.json")
+
+
+def _scan(path: str):
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except FileNotFoundError:
+        return []
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Singleton instance
+upload_store = UploadStore(
+    settings.UPLOAD_STORE_DIR,
+    settings.UPLOAD_STORE_MAX_BYTES,
+    settings.UPLOAD_STORE_MAX_AGE_DAYS * 86400
+)
@@ -0,0 +1,41 @@
+"""
+Rebuild the daily and weekly analytics rollups
+
+Reads every quiz attempt and study session (or one user's) in batches and
+replaces the rollup rows with fresh totals. Run once after upgrading to
+fill the rollups from existing history, or after writing rows outside the
+API.
+
+Usage:
+    python backfill_analytics.py [--user-id 42] [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import sys
+
+from app.core.database import async_session_maker, init_db
+from app.models import models  # noqa: F401  (registers tables for init_db)
+from app.services.analytics_service import analytics_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, help="rebuild only this user's rollups")
+    parser.add_argument("--batch-size", type=int, help="raw rows read per batch (default: ANALYTICS_BACKFILL_BATCH)")
+    args = parser.parse_args()
+
+    async def run():
+        await init_db()  # creates the rollup tables on first use
+        async with async_session_maker() as session:
+            return await analytics_service.backfill(session, args.user_id, args.batch_size)
+
+    counts = asyncio.run(run())
+    print(
+        f"{counts['quiz_attempts']} quiz attempts and {counts['study_sessions']} study sessions read; "
+        f"{counts['daily_rows']} daily and {counts['weekly_rows']} weekly rollup rows written",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
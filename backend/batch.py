@@ -0,0 +1,61 @@
+"""
+Run a JSONL file of generation jobs offline
+
+Each input line is {"id": "...", "method": "generate_notes", "params": {...}}.
+Results are appended to the output file as they finish; rerunning with the
+same output file resumes, skipping jobs that already succeeded.
+
+Usage:
+    python batch.py jobs.jsonl results.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import sys
+
+from app.core.config import settings
+from app.core.database import init_db
+from app.core.executor import cpu_executor
+from app.models import models  # noqa: F401  (registers tables for init_db)
+from app.services.batch_service import batch_service, JOB_METHODS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", help="JSONL file of jobs")
+    parser.add_argument("output", nargs="?", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, help="jobs in flight at once (default: BATCH_CONCURRENCY)")
+    parser.add_argument("--list-methods", action="store_true", help="print the supported job methods and exit")
+    args = parser.parse_args()
+
+    if args.list_methods:
+        print("\n".join(sorted(JOB_METHODS)))
+        return
+    if not args.input or not args.output:
+        parser.error("input and output are required")
+
+    def report(counts):
+        print(
+            f"\r{counts['completed']} completed, {counts['failed']} failed",
+            end="", file=sys.stderr, flush=True
+        )
+
+    async def run():
+        await init_db()  # explanations are cached in the database
+        return await batch_service.run(args.input, args.output, args.concurrency, on_progress=report)
+
+    if settings.CPU_POOL_ENABLED:
+        cpu_executor.start()
+    try:
+        counts = asyncio.run(run())
+    finally:
+        cpu_executor.shutdown()
+    print(
+        f"\n{counts['total']} jobs: {counts['completed']} completed, "
+        f"{counts['failed']} failed, {counts['skipped']} skipped (already done)",
+        file=sys.stderr
+    )
+    sys.exit(1 if counts["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
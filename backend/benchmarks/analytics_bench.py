@@ -0,0 +1,197 @@
+"""
+Benchmark: dashboard latency from raw rows vs. analytics rollups as history grows
+
+For each history length, one student's quiz attempts and study sessions
+are spread over the past --history-days in a fresh SQLite database, next
+to other students' rows, and the rollups are built with the backfill job.
+A dashboard (last 30 days per day, last 365 days per topic) is then served
+two ways:
+
+    raw       select the student's rows in range and sum them in Python,
+              parsing the JSON columns (what a dashboard had to do before)
+    rollups   analytics_service.series + topics (rollup rows only)
+
+Also reported: the cost the rollups add to each write (insert with and
+without the rollup upserts) and backfill throughput.
+
+Usage (from backend/):
+    python -m benchmarks.analytics_bench --history 1000,10000,100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from benchmarks.load_test import percentile
+from app.core.database import Base
+from app.models.models import Quiz, QuizAttempt, StudySession, Subject, Topic, User
+from app.services.analytics_service import (
+    ALL_TOPICS, analytics_service, quiz_attempt_increments, study_session_increments, _periods
+)
+
+TOPICS = [f"Topic {i}" for i in range(12)]
+USER_ID = 1
+
+
+async def seed(maker, history: int, other_users: int, history_days: int):
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    async with maker() as db:
+        await db.execute(insert(User), [
+            {"id": user, "email": f"u{user}@example.com", "username": f"u{user}", "hashed_password": "x"}
+            for user in range(1, other_users + 2)
+        ])
+        await db.execute(insert(Subject), [{"id": 1, "user_id": USER_ID, "name": "Biology"}])
+        await db.execute(insert(Topic), [{"id": i + 1, "subject_id": 1, "name": name} for i, name in enumerate(TOPICS)])
+        await db.execute(insert(Quiz), [{"id": i + 1, "topic_id": i + 1, "title": name} for i, name in enumerate(TOPICS)])
+
+        attempts, sessions = [], []
+        for user in range(1, other_users + 2):
+            for _ in range(history // 2):
+                created = now - timedelta(seconds=rng.uniform(0, history_days * 86400))
+                attempts.append({
+                    "quiz_id": rng.randint(1, len(TOPICS)), "user_id": user, "score": rng.uniform(20, 100),
+                    "time_taken": rng.randint(60, 900), "weak_areas": rng.sample(TOPICS, rng.randint(0, 3)),
+                    "answers": ["A"] * 10, "created_at": created,
+                })
+                sessions.append({
+                    "user_id": user, "session_type": "review", "duration": rng.randint(10, 90),
+                    "topics_covered": rng.sample(TOPICS, rng.randint(1, 3)),
+                    "performance_data": {"score": rng.uniform(40, 100)}, "created_at": created,
+                })
+        for start in range(0, len(attempts), 5000):
+            await db.execute(insert(QuizAttempt), attempts[start:start + 5000])
+            await db.execute(insert(StudySession), sessions[start:start + 5000])
+        await db.commit()
+
+
+async def raw_dashboard(db: AsyncSession, today) -> Dict:
+    """The same dashboard computed from raw rows"""
+    since = datetime.combine(today - timedelta(days=364), datetime.min.time())
+    recent = today - timedelta(days=29)
+    daily: Dict = {}
+    topics: Dict = {}
+    attempts = await db.execute(
+        select(QuizAttempt.created_at, QuizAttempt.score, QuizAttempt.time_taken, QuizAttempt.weak_areas,
+               Topic.name.label("topic"))
+        .join(Quiz, Quiz.id == QuizAttempt.quiz_id).join(Topic, Topic.id == Quiz.topic_id)
+        .where(QuizAttempt.user_id == USER_ID, QuizAttempt.created_at >= since)
+    )
+    sessions = await db.execute(
+        select(StudySession.created_at, StudySession.duration, StudySession.topics_covered,
+               StudySession.performance_data)
+        .where(StudySession.user_id == USER_ID, StudySession.created_at >= since)
+    )
+    rows = [(row, quiz_attempt_increments(row, row.topic)) for row in attempts]
+    rows += [(row, study_session_increments(row)) for row in sessions]
+    for row, increments in rows:
+        day = _periods(row.created_at)["day"]
+        for topic, amounts in increments.items():
+            target = daily.setdefault(day, {}) if topic == ALL_TOPICS else topics.setdefault(topic, {})
+            if topic == ALL_TOPICS and day < recent:
+                continue
+            for counter, amount in amounts.items():
+                target[counter] = target.get(counter, 0) + amount
+    return {"days": len(daily), "topics": len(topics)}
+
+
+async def rollup_dashboard(db: AsyncSession, today) -> Dict:
+    days = await analytics_service.series(db, USER_ID, "day", today - timedelta(days=29), today)
+    topics = await analytics_service.topics(db, USER_ID, today - timedelta(days=364), today)
+    return {"days": len(days), "topics": len(topics)}
+
+
+async def time_calls(maker, dashboard, repeats: int) -> List[float]:
+    today = datetime.now(timezone.utc).date()
+    latencies = []
+    for _ in range(repeats):
+        async with maker() as db:
+            started = time.perf_counter()
+            await dashboard(db, today)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return sorted(latencies)
+
+
+async def time_writes(maker, writes: int, with_rollups: bool) -> float:
+    """Mean milliseconds per quiz attempt write"""
+    started = time.perf_counter()
+    for i in range(writes):
+        async with maker() as db:
+            attempt = QuizAttempt(
+                quiz_id=1 + i % len(TOPICS), user_id=USER_ID, score=75.0, time_taken=300,
+                weak_areas=[TOPICS[i % len(TOPICS)]], created_at=datetime.now(timezone.utc)
+            )
+            db.add(attempt)
+            if with_rollups:
+                await analytics_service.record_quiz_attempt(db, attempt)
+            await db.commit()
+    return (time.perf_counter() - started) * 1000 / writes
+
+
+async def measure(history: int, args) -> Dict:
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}")
+    maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await seed(maker, history, args.other_users, args.history_days)
+
+        async with maker() as db:
+            started = time.perf_counter()
+            backfill = await analytics_service.backfill(db)
+            backfill_seconds = time.perf_counter() - started
+
+        raw = await time_calls(maker, raw_dashboard, args.repeats)
+        rollups = await time_calls(maker, rollup_dashboard, args.repeats)
+        plain_write = await time_writes(maker, args.writes, with_rollups=False)
+        rollup_write = await time_writes(maker, args.writes, with_rollups=True)
+    finally:
+        await engine.dispose()
+    raw_rows = backfill["quiz_attempts"] + backfill["study_sessions"]
+    return {
+        "history_rows": history,
+        "table_rows": raw_rows,
+        "backfill_rows_per_second": round(raw_rows / backfill_seconds),
+        "raw_ms": {"p50": round(percentile(raw, 50), 2), "p95": round(percentile(raw, 95), 2)},
+        "rollup_ms": {"p50": round(percentile(rollups, 50), 2), "p95": round(percentile(rollups, 95), 2)},
+        "write_ms": {"plain": round(plain_write, 2), "with_rollups": round(rollup_write, 2)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", default="1000,10000,100000", help="Comma-separated rows of history per student")
+    parser.add_argument("--history-days", type=int, default=3 * 365)
+    parser.add_argument("--other-users", type=int, default=3, help="Students with the same history in the same tables")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    results = []
+    for history in (int(value) for value in args.history.split(",")):
+        result = asyncio.run(measure(history, args))
+        results.append(result)
+        print(
+            f"history={history:<7d} raw_p50={result['raw_ms']['p50']:.1f}ms rollup_p50={result['rollup_ms']['p50']:.1f}ms "
+            f"raw_p95={result['raw_ms']['p95']:.1f}ms rollup_p95={result['rollup_ms']['p95']:.1f}ms "
+            f"write={result['write_ms']['plain']:.2f}->{result['write_ms']['with_rollups']:.2f}ms "
+            f"backfill={result['backfill_rows_per_second']} rows/s"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"history_days": args.history_days, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark: streaming chunker vs. the original NLPService.chunk_text
+
+Runs both on synthetic transcripts of increasing size and reports wall time,
+throughput and peak memory, so the legacy quadratic-overlap behaviour and the
+linear streaming chunker can be compared directly.
+
+Usage (from backend/):
+    python -m benchmarks.chunker_bench --sizes 100000,1000000,4000000
+"""
+import argparse
+import json
+import re
+import time
+import tracemalloc
+
+from app.services.text_chunker import iter_chunks
+from benchmarks.corpus import make_transcript
+from app.services.tokens import count_words, estimate_tokens
+
+
+def legacy_chunk_text(text: str, chunk_size: int, overlap: int):
+    """The original NLPService.chunk_text implementation"""
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+
+    chunks = []
+    current_chunk = []
+    current_length = 0
+
+    for sentence in sentences:
+        sentence_length = len(sentence.split())
+
+        if current_length + sentence_length > chunk_size and current_chunk:
+            chunks.append(' '.join(current_chunk))
+            overlap_sentences = []
+            overlap_length = 0
+            for s in reversed(current_chunk):
+                if overlap_length < overlap:
+                    overlap_sentences.insert(0, s)
+                    overlap_length += len(s.split())
+                else:
+                    break
+            current_chunk = overlap_sentences
+            current_length = overlap_length
+
+        current_chunk.append(sentence)
+        current_length += sentence_length
+
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+
+    return chunks
+
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunks = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000,4000000", help="Transcript sizes in characters")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk budget (words / tokens)")
+    parser.add_argument("--overlap", type=int, default=200, help="Overlap (words / tokens)")
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        text = make_transcript(size)
+        variants = {
+            "legacy_words": lambda: legacy_chunk_text(text, args.chunk_size, args.overlap),
+            "streaming_words": lambda: list(iter_chunks(text, args.chunk_size, args.overlap, count=count_words, fit=False)),
+            "streaming_tokens": lambda: list(iter_chunks(text, args.chunk_size, args.overlap, count=estimate_tokens)),
+            # Consumed one chunk at a time, as the LLM call path does
+            "streaming_tokens_lazy": lambda: sum(1 for _ in iter_chunks(text, args.chunk_size, args.overlap)),
+        }
+        for name, func in variants.items():
+            result, elapsed, peak = measure(func)
+            rows.append({
+                "size_chars": len(text),
+                "variant": name,
+                "chunks": result if isinstance(result, int) else len(result),
+                "seconds": round(elapsed, 4),
+                "mb_per_second": round(len(text) / elapsed / 1e6, 2),
+                "peak_memory_mb": round(peak / 1e6, 2),
+            })
+            row = rows[-1]
+            print(
+                f"{row['size_chars']:>9d} chars  {name:22s} {row['chunks']:>6d} chunks  "
+                f"{row['seconds']:8.4f}s  {row['mb_per_second']:7.2f} MB/s  peak {row['peak_memory_mb']:7.2f} MB"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Synthetic lecture transcripts for benchmarks
+"""
+import random
+
+
+TOPIC_WORDS = (
+    "cell membrane energy protein gradient transport signal molecule reaction enzyme "
+    "substrate receptor diffusion osmosis mitochondria glucose oxygen carbon pathway"
+).split()
+FILLER_WORDS = "so basically you know um right okay now the a of and is to in that this".split()
+
+
+def make_transcript(size: int, seed: int = 0, repetition: float = 0.0) -> str:
+    """
+    Build a punctuated transcript of roughly `size` characters
+
+    Args:
+        size: Target length in characters
+        seed: Random seed, so runs are reproducible
+        repetition: Probability that a sentence repeats an earlier one
+            (lectures restate points; rolling captions duplicate text)
+
+    Returns:
+        Transcript text
+    """
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size:
+        if parts and rng.random() < repetition:
+            sentence = rng.choice(parts[-50:])
+        else:
+            words = [
+                rng.choice(TOPIC_WORDS) if rng.random() < 0.5 else rng.choice(FILLER_WORDS)
+                for _ in range(rng.randint(4, 30))
+            ]
+            sentence = " ".join(words).capitalize() + "."
+        parts.append(sentence)
+        total += len(sentence) + 1
+    return " ".join(parts)
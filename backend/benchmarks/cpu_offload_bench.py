@@ -0,0 +1,124 @@
+"""
+Benchmark: tutor latency while a large transcript is being processed
+
+Starts the fake OpenAI server and the app twice, with the CPU process pool
+disabled and enabled. In each run a steady stream of /tutor/ask requests
+measures latency while large /notes/generate requests (extractive
+pre-summarization and chunking of a long transcript) run alongside.
+
+Usage (from backend/):
+    python -m benchmarks.cpu_offload_bench --transcript-chars 1000000 --heavy-requests 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.corpus import make_transcript
+from benchmarks.load_test import SCENARIOS, percentile, _start, _wait_ready
+
+
+async def measure(base_url: str, transcript: str, heavy_requests: int, probe_interval: float) -> Dict:
+    """Probe tutor latency until all heavy requests finish"""
+    probe = SCENARIOS["tutor.ask"]
+    latencies: List[float] = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=600.0) as client:
+        async def heavy():
+            started = time.perf_counter()
+            response = await client.post("/api/v1/notes/generate", json={"content": transcript, "subject": "Biology"})
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        async def probes(stop: asyncio.Event):
+            i = 0
+            while not stop.is_set():
+                request = probe(i)
+                started = time.perf_counter()
+                await client.request(request.pop("method"), request.pop("url"), **request)
+                latencies.append((time.perf_counter() - started) * 1000)
+                i += 1
+                await asyncio.sleep(probe_interval)
+
+        # Baseline before the heavy work starts
+        for i in range(10):
+            request = probe(i)
+            await client.request(request.pop("method"), request.pop("url"), **request)
+
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probes(stop))
+        heavy_seconds = await asyncio.gather(*(heavy() for _ in range(heavy_requests)))
+        stop.set()
+        await prober
+        pool = (await client.get("/metrics/cpu-pool")).json()
+
+    latencies.sort()
+    return {
+        "tutor_probes": len(latencies),
+        "tutor_latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "max": round(latencies[-1], 1) if latencies else 0.0,
+        },
+        "heavy_request_seconds": [round(s, 2) for s in heavy_seconds],
+        "cpu_pool": pool,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcript-chars", type=int, default=1_000_000)
+    parser.add_argument("--heavy-requests", type=int, default=4)
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Seconds between tutor probes")
+    parser.add_argument("--profile", default="fast", help="Fake OpenAI latency profile")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--app-port", type=int, default=8901)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    transcript = make_transcript(args.transcript_chars, repetition=0.2)
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    fake = _start("benchmarks.fake_openai", args.fake_port, "--profile", args.profile)
+    results = {}
+    try:
+        _wait_ready(f"http://127.0.0.1:{args.fake_port}/stats")
+        for pool_enabled in (False, True):
+            app = _start("benchmarks.serve_app", args.app_port, env={
+                "OPENAI_API_KEY": "sk-benchmark",
+                "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+                "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+                "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+                "UPLOAD_STORE_DIR": os.path.join(workdir, "upload_store"),
+                "DEBUG": "False",
+                "CPU_POOL_ENABLED": str(pool_enabled),
+            })
+            try:
+                _wait_ready(f"http://127.0.0.1:{args.app_port}/health")
+                result = asyncio.run(measure(
+                    f"http://127.0.0.1:{args.app_port}", transcript, args.heavy_requests, args.probe_interval
+                ))
+            finally:
+                app.terminate()
+                app.wait(timeout=10)
+            label = "pool" if pool_enabled else "inline"
+            results[label] = result
+            latency = result["tutor_latency_ms"]
+            print(
+                f"{label:6s} tutor p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms max={latency['max']:.1f}ms  "
+                f"heavy={result['heavy_request_seconds']}s  utilization={result['cpu_pool']['utilization']}"
+            )
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"transcript_chars": args.transcript_chars, "profile": args.profile, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
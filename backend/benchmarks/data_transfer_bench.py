@@ -0,0 +1,155 @@
+"""
+Benchmark: memory and throughput of NDJSON export/import as a user's flashcards grow
+
+A fresh SQLite database is filled with one user's flashcards (across a few
+subjects and topics). Each phase then runs in its own process, so its peak
+RSS is its own:
+
+    naive_export    load every flashcard through the ORM and dump one JSON
+                    document (what an export without cursors would do)
+    stream_export   data_transfer.export: server-side cursor, NDJSON chunks
+    stream_import   data_transfer.import_records of that NDJSON file into a
+                    second user, read in 64KB chunks as a request body would be
+
+Usage (from backend/):
+    python -m benchmarks.data_transfer_bench --flashcards 100000,1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+PHASES = ("naive_export", "stream_export", "stream_import")
+TOPICS = 20
+
+
+def _database_url(path: str) -> str:
+    return f"sqlite:///{path}"
+
+
+async def seed(flashcards: int):
+    from sqlalchemy import insert
+    from app.core.database import async_session_maker, init_db
+    from app.models.models import Flashcard, Subject, Topic, User
+
+    await init_db()
+    async with async_session_maker() as db:
+        await db.execute(insert(User), [
+            {"id": user, "email": f"u{user}@example.com", "username": f"u{user}", "hashed_password": "x"} for user in (1, 2)
+        ])
+        await db.execute(insert(Subject), [{"id": s, "user_id": 1, "name": f"Subject {s}"} for s in range(1, 5)])
+        await db.execute(insert(Topic), [
+            {"id": t, "subject_id": 1 + t % 4, "name": f"Topic {t}"} for t in range(1, TOPICS + 1)
+        ])
+        for start in range(0, flashcards, 10000):
+            await db.execute(insert(Flashcard), [
+                {"topic_id": 1 + i % TOPICS, "question": f"What is the definition of concept {i}?",
+                 "answer": f"Concept {i} is the idea that a lecture introduces and later builds upon."}
+                for i in range(start, min(start + 10000, flashcards))
+            ])
+        await db.commit()
+
+
+async def run_phase(phase: str, path: str) -> int:
+    """Run one phase; returns records moved"""
+    from sqlalchemy import select
+    from app.core.database import async_session_maker
+    from app.models.models import Flashcard, Subject, Topic
+    from app.services.data_transfer import data_transfer
+
+    if phase == "naive_export":
+        async with async_session_maker() as db:
+            cards = (await db.execute(
+                select(Flashcard).join(Topic).join(Subject).where(Subject.user_id == 1)
+            )).scalars().all()
+            document = json.dumps([
+                {"id": c.id, "topic_id": c.topic_id, "question": c.question, "answer": c.answer,
+                 "difficulty": c.difficulty, "created_at": str(c.created_at)}
+                for c in cards
+            ])
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(document)
+        return len(cards)
+
+    if phase == "stream_export":
+        lines = 0
+        with open(path, "wb") as f:
+            async for chunk in data_transfer.export(1):
+                f.write(chunk)
+                lines += chunk.count(b"\n")
+        return lines - 1  # header
+
+    async def chunks():
+        with open(path, "rb") as f:
+            while chunk := f.read(65536):
+                yield chunk
+
+    imported = await data_transfer.import_records(2, chunks())
+    return sum(imported.values())
+
+
+def _child(args) -> None:
+    if args.phase == "seed":
+        asyncio.run(seed(args.flashcards))
+        return
+    started = time.perf_counter()
+    records = asyncio.run(run_phase(args.phase, args.file))
+    seconds = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"records": records, "seconds": round(seconds, 2), "peak_rss_mb": round(peak_mb, 1)}))
+
+
+def _spawn(phase: str, database: str, file: str, flashcards: int = 0) -> Dict:
+    env = {**os.environ, "DATABASE_URL": _database_url(database), "DEBUG": "False", "OPENAI_API_KEY": "sk-benchmark"}
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.data_transfer_bench", "--phase", phase, "--file", file,
+         "--flashcards", str(flashcards)],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1]) if phase != "seed" else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flashcards", default="100000,1000000", help="Comma-separated flashcard counts")
+    parser.add_argument("--output", help="Optional JSON report path")
+    parser.add_argument("--phase", choices=("seed",) + PHASES, help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        args.flashcards = int(args.flashcards)
+        _child(args)
+        return
+
+    results = []
+    for flashcards in (int(value) for value in args.flashcards.split(",")):
+        workdir = tempfile.mkdtemp(prefix="bench-")
+        database = os.path.join(workdir, "bench.db")
+        _spawn("seed", database, "", flashcards)
+        result = {"flashcards": flashcards}
+        for phase in PHASES:
+            file = os.path.join(workdir, "naive.json" if phase == "naive_export" else "export.ndjson")
+            result[phase] = _spawn(phase, database, file)
+            moved = result[phase]
+            print(
+                f"flashcards={flashcards:<8d} {phase:14s} records={moved['records']:<8d} "
+                f"seconds={moved['seconds']:<7.2f} rows/s={moved['records'] / max(moved['seconds'], 1e-9):<9.0f} "
+                f"peak_rss={moved['peak_rss_mb']:.1f}MB"
+            )
+        result["export_bytes"] = os.path.getsize(os.path.join(workdir, "export.ndjson"))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: upstream work spent on abandoned requests, with and without cancel-on-disconnect
+
+Drives `/notes/generate` where a share of the clients give up (close the
+connection) after a fixed time, as students closing the tab would. The app
+runs twice against a fresh fake OpenAI server, with CANCEL_ON_DISCONNECT
+off and on, and a small LLM_MAX_CONCURRENCY so abandoned calls compete with
+live ones for upstream slots.
+
+Reported per run: latency of the requests that were waited for, upstream
+chat calls answered and calls the app cancelled before the answer
+(`abandoned_calls` on the fake server), and the app's cancellation counters.
+
+Usage (from backend/):
+    python -m benchmarks.disconnect_bench --requests 60 --concurrency 12 --abandon 0.5 --give-up 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict
+
+import httpx
+
+from benchmarks.corpus import make_transcript
+from benchmarks.load_test import percentile, _start, _wait_ready
+
+
+async def drive(base_url: str, content: str, requests: int, concurrency: int, abandon: float, give_up: float) -> Dict:
+    rng = random.Random(0)
+    plan = [rng.random() < abandon for _ in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+    waited, errors = [], 0
+
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        async def one(abandons: bool):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        "/api/v1/notes/generate", json={"content": content, "subject": "Biology"},
+                        timeout=give_up if abandons else 300.0
+                    )
+                except httpx.TimeoutException:
+                    return
+                if response.status_code != 200:
+                    errors += 1
+                waited.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(abandons) for abandons in plan))
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(1.0)  # let the server settle calls that were left running
+        cancellations = (await client.get("/metrics/cancellations")).json()
+
+    waited.sort()
+    return {
+        "requests": requests,
+        "abandoned_requests": sum(plan),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 2),
+        "waited_latency_ms": {
+            "p50": round(percentile(waited, 50), 1),
+            "p95": round(percentile(waited, 95), 1),
+        },
+        "cancellations": cancellations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--abandon", type=float, default=0.5, help="Share of clients that give up")
+    parser.add_argument("--give-up", type=float, default=1.0, help="Seconds before an abandoning client disconnects")
+    parser.add_argument("--content-chars", type=int, default=6000)
+    parser.add_argument("--upstream-concurrency", type=int, default=4, help="LLM_MAX_CONCURRENCY for the app")
+    parser.add_argument("--profile", default="realistic", help="Fake OpenAI latency profile")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--app-port", type=int, default=8901)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    content = make_transcript(args.content_chars)
+    results = {}
+    for cancel in (False, True):
+        label = "cancel" if cancel else "baseline"
+        workdir = tempfile.mkdtemp(prefix="bench-")
+        fake = _start("benchmarks.fake_openai", args.fake_port, "--profile", args.profile)
+        app = _start("benchmarks.serve_app", args.app_port, env={
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+            "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+            "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+            "UPLOAD_STORE_DIR": os.path.join(workdir, "upload_store"),
+            "DEBUG": "False",
+            "CANCEL_ON_DISCONNECT": str(cancel),
+            "LLM_MAX_CONCURRENCY": str(args.upstream_concurrency),
+        })
+        try:
+            _wait_ready(f"http://127.0.0.1:{args.fake_port}/stats")
+            _wait_ready(f"http://127.0.0.1:{args.app_port}/health")
+            result = asyncio.run(drive(
+                f"http://127.0.0.1:{args.app_port}", content, args.requests, args.concurrency, args.abandon, args.give_up
+            ))
+            upstream = httpx.get(f"http://127.0.0.1:{args.fake_port}/stats").json()
+            result["upstream_chat_calls"] = upstream["chat_calls"]
+            result["upstream_abandoned_calls"] = upstream["abandoned_calls"]
+            results[label] = result
+        finally:
+            for process in (app, fake):
+                process.terminate()
+                process.wait(timeout=10)
+        print(
+            f"{label:8s} abandoned={result['abandoned_requests']:<3d} upstream_calls={result['upstream_chat_calls']:<3d} "
+            f"cancelled_upstream={result['upstream_abandoned_calls']:<3d} "
+            f"waited_p50={result['waited_latency_ms']['p50']:.1f}ms waited_p95={result['waited_latency_ms']['p95']:.1f}ms "
+            f"elapsed={result['elapsed_seconds']:.1f}s errors={result['errors']}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"profile": args.profile, "abandon": args.abandon, "give_up": args.give_up,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: extractive pre-summarization, compression vs. latency saved
+
+For each target ratio, reduces synthetic lecture transcripts locally and
+reports the compression achieved, the local CPU time spent and the upstream
+latency saved under a fake-server latency profile (prompt processing scales
+with prompt tokens).
+
+Usage (from backend/):
+    python -m benchmarks.extractive_bench --sizes 20000,100000 --ratios 0.8,0.6,0.4,0.2
+"""
+import argparse
+import json
+import time
+
+from app.services.extractive_summarizer import ExtractiveSummarizer
+from app.services.tokens import estimate_tokens
+from benchmarks.corpus import make_transcript
+from benchmarks.fake_openai import PROFILES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="20000,100000,400000", help="Transcript sizes in characters")
+    parser.add_argument("--ratios", default="0.8,0.6,0.4,0.2")
+    parser.add_argument("--methods", default="textrank,tfidf")
+    parser.add_argument("--repetition", type=float, default=0.2, help="Share of repeated sentences")
+    parser.add_argument("--profile", default="realistic", choices=sorted(PROFILES))
+    parser.add_argument("--output-tokens", type=int, default=2000, help="Completion size of the upstream call")
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        text = make_transcript(size, repetition=args.repetition)
+        original_tokens = estimate_tokens(text)
+        baseline = profile.latency_seconds(original_tokens, args.output_tokens)
+        for method in args.methods.split(","):
+            summarizer = ExtractiveSummarizer(method)
+            for ratio in (float(r) for r in args.ratios.split(",")):
+                started = time.perf_counter()
+                reduced = summarizer.summarize(text, ratio)
+                local = time.perf_counter() - started
+                reduced_tokens = estimate_tokens(reduced)
+                upstream = profile.latency_seconds(reduced_tokens, args.output_tokens)
+                row = {
+                    "size_chars": len(text),
+                    "method": method,
+                    "ratio": ratio,
+                    "original_tokens": original_tokens,
+                    "reduced_tokens": reduced_tokens,
+                    "compression": round(reduced_tokens / original_tokens, 3),
+                    "local_ms": round(local * 1000, 2),
+                    "upstream_ms_before": round(baseline * 1000, 1),
+                    "upstream_ms_after": round(upstream * 1000, 1),
+                    "net_saved_ms": round((baseline - upstream - local) * 1000, 1),
+                }
+                rows.append(row)
+                print(
+                    f"{row['size_chars']:>8d} chars  {method:8s} ratio={ratio:.1f}  "
+                    f"tokens {original_tokens}->{reduced_tokens} ({row['compression']:.2f})  "
+                    f"local {row['local_ms']:8.2f}ms  net saved {row['net_saved_ms']:9.1f}ms"
+                )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"profile": args.profile, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
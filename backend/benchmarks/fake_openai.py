@@ -0,0 +1,282 @@
+"""
+Local fake OpenAI-compatible server for benchmarks
+
+Serves /v1/chat/completions and /v1/audio/transcriptions with latency drawn
+from a named profile: time-to-first-token, prompt processing rate, output
+token rate, jitter and a tail-latency probability. Responses are shaped to what each service method
+parses, so the app runs its normal code paths end to end. Prompt prefixes are
+cached like the hosted API does (128-token blocks once a prompt reaches
+--cache-min-tokens): cached tokens skip prompt processing and are reported
+in usage.prompt_tokens_details.cached_tokens.
+
+Usage:
+    python -m benchmarks.fake_openai --port 8900 --profile realistic
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse, PlainTextResponse
+import uvicorn
+
+
+@dataclass
+class LatencyProfile:
+    """Upstream latency model"""
+    ttft_ms: float = 400.0  # time to first token
+    prompt_tokens_per_second: float = 4000.0  # prompt processing added to ttft
+    tokens_per_second: float = 60.0
+    jitter: float = 0.2  # +/- fraction applied to every call
+    tail_probability: float = 0.02
+    tail_multiplier: float = 5.0
+    completion_tokens: int = 300  # default output size when max_tokens allows
+
+    def latency_seconds(self, prompt_tokens: int, output_tokens: int, rng: random.Random = None) -> float:
+        """Simulated duration of one call; deterministic when rng is None"""
+        seconds = (
+            self.ttft_ms / 1000
+            + prompt_tokens / self.prompt_tokens_per_second
+            + output_tokens / self.tokens_per_second
+        )
+        if rng is not None:
+            seconds *= 1 + rng.uniform(-self.jitter, self.jitter)
+            if rng.random() < self.tail_probability:
+                seconds *= self.tail_multiplier
+        return max(seconds, 0)
+
+
+PROFILES = {
+    "instant": LatencyProfile(ttft_ms=0, prompt_tokens_per_second=1e9, tokens_per_second=1e9, jitter=0, tail_probability=0),
+    "fast": LatencyProfile(ttft_ms=50, prompt_tokens_per_second=20000, tokens_per_second=500, jitter=0.1, tail_probability=0),
+    "realistic": LatencyProfile(),
+    "degraded": LatencyProfile(ttft_ms=1500, prompt_tokens_per_second=1000, tokens_per_second=20, jitter=0.5,
+                               tail_probability=0.1, tail_multiplier=8),
+}
+
+
+class PrefixCache:
+    """
+    Provider-style prompt prefix cache
+
+    The serialized prompt is hashed incrementally at fixed block
+    boundaries; a request reuses the longest run of leading blocks seen
+    before, provided the prompt is at least `min_tokens` long.
+    """
+
+    BLOCK_CHARS = 512  # 128 tokens at 4 chars per token
+
+    def __init__(self, min_tokens: int = 1024, max_entries: int = 100_000):
+        self.min_chars = min_tokens * 4
+        self.max_entries = max_entries
+        self._blocks: OrderedDict = OrderedDict()
+
+    def lookup_and_store(self, prompt: str) -> int:
+        """Return how many leading characters were cached, then cache this prompt's blocks"""
+        if len(prompt) < self.min_chars:
+            return 0
+        sha256 = hashlib.sha256()
+        cached, matching = 0, True
+        for end in range(self.BLOCK_CHARS, len(prompt) + 1, self.BLOCK_CHARS):
+            sha256.update(prompt[end - self.BLOCK_CHARS:end].encode("utf-8"))
+            key = sha256.hexdigest()
+            if matching and key in self._blocks:
+                self._blocks.move_to_end(key)
+                cached = end
+            else:
+                matching = False
+                self._blocks[key] = None
+        while len(self._blocks) > self.max_entries:
+            self._blocks.popitem(last=False)
+        return cached if cached >= self.min_chars else 0
+
+
+def create_app(
+    profile: LatencyProfile,
+    seed: int = 0,
+    cache_min_tokens: int = 1024,
+    error_rate: float = 0.0,
+    model_speedups: Optional[Dict[str, float]] = None,
+    defect_rate: float = 0.0
+) -> FastAPI:
+    """Build the fake server for a latency profile; model_speedups divides the latency of named models"""
+    app = FastAPI(title="Fake OpenAI")
+    rng = random.Random(seed)
+    prefix_cache = PrefixCache(cache_min_tokens)
+    stats = {
+        "chat_calls": 0, "transcription_calls": 0, "prompt_chars": 0, "cached_prompt_chars": 0, "cache_hits": 0,
+        "errors": 0, "abandoned_calls": 0, "calls_by_model": {},
+    }
+    model_speedups = model_speedups or {}
+
+    async def simulate(output_tokens: int, prompt_tokens: int = 0, speedup: float = 1.0):
+        await asyncio.sleep(profile.latency_seconds(prompt_tokens, output_tokens, rng) / speedup)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if error_rate and rng.random() < error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(profile.ttft_ms / 1000)
+            return JSONResponse({"error": {"message": "Simulated upstream failure", "type": "server_error"}}, 500)
+        messages = body.get("messages", [])
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        serialized = "".join(f"<|{m.get('role')}|>{m.get('content') or ''}" for m in messages)
+        output_tokens = min(body.get("max_tokens") or profile.completion_tokens, profile.completion_tokens)
+        cached_chars = prefix_cache.lookup_and_store(serialized)
+
+        model = body.get("model", "")
+        stats["chat_calls"] += 1
+        stats["calls_by_model"][model] = stats["calls_by_model"].get(model, 0) + 1
+        stats["prompt_chars"] += len(prompt)
+        stats["cached_prompt_chars"] += cached_chars
+        stats["cache_hits"] += bool(cached_chars)
+        await simulate(output_tokens, max(len(serialized) - cached_chars, 0) // 4, model_speedups.get(model, 1.0))
+        if await request.is_disconnected():
+            stats["abandoned_calls"] += 1  # the caller cancelled; a real provider would have stopped generating
+
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(_json_content(prompt, stats["chat_calls"], rng, defect_rate))
+        else:
+            content = _text_content(prompt, output_tokens)
+
+        return {
+            "id": f"chatcmpl-fake-{stats['chat_calls']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": output_tokens,
+                "total_tokens": len(prompt) // 4 + output_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_chars // 4},
+            },
+        }
+
+    @app.post("/v1/audio/transcriptions")
+    async def audio_transcriptions(file: UploadFile = File(...), model: str = Form(...)):
+        audio = await file.read()
+        stats["transcription_calls"] += 1
+        await simulate(max(len(audio) // 1000, 50))
+        return PlainTextResponse(_text_content("lecture audio", 200))
+
+    @app.get("/stats")
+    async def get_stats():
+        return {"profile": asdict(profile), **stats}
+
+    return app
+
+
+def _json_content(prompt: str, call_id: int = 0, rng: Optional[random.Random] = None, defect_rate: float = 0.0) -> dict:
+    lowered = prompt.lower()
+    if "flashcard" in lowered:
+        return {"flashcards": _with_defects([
+            {"question": f"What is concept {call_id}.{i}?", "answer": f"Concept {call_id}.{i} is a key idea."}
+            for i in range(_requested(prompt, r"^Number of flashcards: (\d+)", 10))
+        ], "answer", rng, defect_rate)}
+    if "study plan" in lowered or "study planner" in lowered:
+        return {
+            "tips": ["Study in short sessions", "Test yourself before rereading"],
+            "milestones": [
+                f"By week {week}, you are on track." for week in re.findall(r"^\d+\. Week (\d+)", prompt, re.MULTILINE)
+            ],
+        }
+    if '"explanations" array' in lowered:
+        return {"explanations": [
+            {"item": int(number), "explanation": f"Item {number}: the correct answer follows from the definition."}
+            for number in re.findall(r"^Item (\d+):", prompt, re.MULTILINE)
+        ]}
+    if "resources" in lowered:
+        return {"resources": _with_defects([
+            {"name": f"Resource {call_id}.{i}", "type": "video", "description": "An introduction",
+             "estimated_time": "1 hour", "why_suitable": "Matches the learner"}
+            for i in range(_requested(prompt, r"^Suggest only (\d+) more", 5))
+        ], "description", rng, defect_rate)}
+    return {"questions": _with_defects([
+        {"type": "mcq", "question": f"Question {call_id}.{i}?", "options": ["A", "B", "C", "D"],
+         "correct_answer": "A", "explanation": "A is correct.", "topic": "general"}
+        for i in range(_requested(prompt, r"^Number of questions: (\d+)", 10))
+    ], "correct_answer", rng, defect_rate)}
+
+
+def _requested(prompt: str, pattern: str, default: int) -> int:
+    match = re.search(pattern, prompt, re.MULTILINE)
+    return int(match.group(1)) if match else default
+
+
+def _with_defects(items: list, required: str, rng: Optional[random.Random], defect_rate: float) -> list:
+    """Drop or break a share of the items, as a model that stops early or skips fields would"""
+    if not defect_rate or rng is None:
+        return items
+    kept = []
+    for item in items:
+        if rng.random() >= defect_rate:
+            kept.append(item)
+        elif rng.random() < 0.5:
+            kept.append({k: v for k, v in item.items() if k != required})
+    return kept
+
+
+def _text_content(prompt: str, output_tokens: int) -> str:
+    if "comma-separated" in prompt:
+        return "photosynthesis, chlorophyll, light reactions, Calvin cycle"
+    sentence = "This is a generated sentence about the lecture material. "
+    return sentence * max(output_tokens // 10, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--ttft-ms", type=float)
+    parser.add_argument("--prompt-tokens-per-second", type=float)
+    parser.add_argument("--tokens-per-second", type=float)
+    parser.add_argument("--jitter", type=float)
+    parser.add_argument("--tail-probability", type=float)
+    parser.add_argument("--tail-multiplier", type=float)
+    parser.add_argument("--cache-min-tokens", type=int, default=1024, help="Shortest prompt eligible for prefix caching")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of chat calls answered with HTTP 500")
+    parser.add_argument(
+        "--model-speedup", action="append", default=["gpt-4o-mini=3"], metavar="MODEL=FACTOR",
+        help="Serve a model this many times faster (repeatable)"
+    )
+    parser.add_argument(
+        "--defect-rate", type=float, default=0.0,
+        help="Share of JSON list items dropped or missing a required field"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    overrides = {
+        field: getattr(args, field)
+        for field in (
+            "ttft_ms", "prompt_tokens_per_second", "tokens_per_second", "jitter", "tail_probability", "tail_multiplier"
+        )
+        if getattr(args, field) is not None
+    }
+    profile = LatencyProfile(**{**asdict(profile), **overrides})
+
+    speedups = {model: float(factor) for model, factor in (item.split("=", 1) for item in args.model_speedup)}
+
+    uvicorn.run(
+        create_app(profile, args.seed, args.cache_min_tokens, args.error_rate, speedups, args.defect_rate),
+        host=args.host, port=args.port, log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: tutor-call tail latency with and without hedged requests
+
+Sends tutor questions through create_chat_completion to the fake OpenAI
+server configured with a heavy latency tail, once with hedging disabled and
+once enabled. Each run gets a fresh server and fresh latency statistics;
+the warmup calls fill the latency window the hedge delay is taken from.
+
+A second phase points the same call path at a server that fails every
+request and reports how long callers wait before and after the circuit
+breaker opens.
+
+Usage (from backend/):
+    python -m benchmarks.hedging_bench --requests 400 --concurrency 8 --tail-probability 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from openai import AsyncOpenAI
+
+from benchmarks.corpus import make_transcript
+from benchmarks.load_test import percentile, _start, _wait_ready
+from app.core.config import settings
+from app.services import llm
+from app.services.prompts import prompt_registry
+
+
+def _reset():
+    llm._latencies = llm.LatencyTracker(settings.LLM_LATENCY_WINDOW, settings.LLM_HEDGE_MIN_SAMPLES)
+    llm._method_stats.clear()
+    llm._breakers.clear()
+
+
+async def _ask(client: AsyncOpenAI, context: str, i: int) -> float:
+    prompt = prompt_registry.get("tutor.get_tutor_response")
+    started = time.perf_counter()
+    await llm.create_chat_completion(
+        client, prompt=prompt, model="fake", max_tokens=300,
+        messages=prompt.render(
+            subject="Biology", learning_style="visual", context=context,
+            question=f"Question {i}: what drives the membrane gradient?"
+        ),
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+async def measure_hedging(base_url: str, hedging: bool, context: str, requests: int, concurrency: int, warmup: int) -> Dict:
+    settings.LLM_HEDGING_ENABLED = hedging
+    _reset()
+    client = AsyncOpenAI(api_key="sk-benchmark", base_url=base_url, max_retries=0)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> float:
+        async with semaphore:
+            return await _ask(client, context, i)
+
+    await asyncio.gather(*(one(i) for i in range(warmup)))
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one(i) for i in range(requests))))
+    elapsed = time.perf_counter() - started
+    stats = llm.metrics()["methods"]["tutor.get_tutor_response"]
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 2),
+        "latency_ms": {pct: round(percentile(latencies, int(pct[1:])), 1) for pct in ("p50", "p95", "p99")},
+        "max_ms": round(latencies[-1], 1),
+        "hedged": stats["hedged"],
+        "hedge_wins": stats["hedge_wins"],
+        "hedge_after_ms": stats["hedge_after_ms"],
+    }
+
+
+async def measure_breaker(base_url: str, context: str, calls: int) -> List[Dict]:
+    _reset()
+    client = AsyncOpenAI(api_key="sk-benchmark", base_url=base_url, max_retries=0)
+    rows = []
+    for i in range(calls):
+        started = time.perf_counter()
+        try:
+            await _ask(client, context, i)
+            outcome = "ok"
+        except llm.CircuitOpenError:
+            outcome = "rejected"
+        except Exception as e:
+            outcome = type(e).__name__
+        rows.append({"call": i, "outcome": outcome, "ms": round((time.perf_counter() - started) * 1000, 2)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=40)
+    parser.add_argument("--context-chars", type=int, default=4000)
+    parser.add_argument("--profile", default="fast", help="Fake OpenAI latency profile")
+    parser.add_argument("--tail-probability", type=float, default=0.05)
+    parser.add_argument("--tail-multiplier", type=float, default=10.0)
+    parser.add_argument("--breaker-calls", type=int, default=10)
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    context = make_transcript(args.context_chars)
+    base_url = f"http://127.0.0.1:{args.fake_port}/v1"
+    fake_args = [
+        "--profile", args.profile,
+        "--tail-probability", str(args.tail_probability), "--tail-multiplier", str(args.tail_multiplier),
+    ]
+    results = {}
+    for hedging in (False, True):
+        label = "hedged" if hedging else "baseline"
+        fake = _start("benchmarks.fake_openai", args.fake_port, *fake_args)
+        try:
+            _wait_ready(f"http://127.0.0.1:{args.fake_port}/stats")
+            results[label] = asyncio.run(measure_hedging(
+                base_url, hedging, context, args.requests, args.concurrency, args.warmup
+            ))
+        finally:
+            fake.terminate()
+            fake.wait(timeout=10)
+        result = results[label]
+        print(
+            f"{label:8s} p50={result['latency_ms']['p50']:.1f}ms p95={result['latency_ms']['p95']:.1f}ms "
+            f"p99={result['latency_ms']['p99']:.1f}ms max={result['max_ms']:.1f}ms "
+            f"hedged={result['hedged']} hedge_wins={result['hedge_wins']}"
+        )
+
+    fake = _start("benchmarks.fake_openai", args.fake_port, *fake_args, "--error-rate", "1.0")
+    try:
+        _wait_ready(f"http://127.0.0.1:{args.fake_port}/stats")
+        results["breaker"] = asyncio.run(measure_breaker(base_url, context, args.breaker_calls))
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+    for row in results["breaker"]:
+        print(f"breaker  call={row['call']:<3d} {row['outcome']:20s} {row['ms']:.2f}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"profile": args.profile, "tail_probability": args.tail_probability,
+                       "tail_multiplier": args.tail_multiplier, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
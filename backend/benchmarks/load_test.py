@@ -0,0 +1,244 @@
+"""
+Load and latency benchmark for every API endpoint
+
+Starts the fake OpenAI server and the app (pointed at it through
+OPENAI_BASE_URL) as subprocesses, drives each endpoint at the requested
+concurrency levels and writes throughput and p50/p95/p99 latency to a JSON
+report together with the machine and commit it ran on.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --profile realistic --concurrency 1,8,32 \\
+        --requests 200 --output bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+
+LECTURE_TEXT = " ".join(
+    f"Sentence {i} explains how photosynthesis converts light energy into chemical energy."
+    for i in range(200)
+)
+
+QUIZ_QUESTIONS = [
+    {"question": f"Question {i}?", "correct_answer": "A", "topic": f"topic-{i % 3}"}
+    for i in range(20)
+]
+
+
+def _request(method: str, path: str, **kwargs) -> Callable[[int], Dict]:
+    return lambda i: {"method": method, "url": path, **kwargs}
+
+
+# Endpoint name -> request builder (request index -> httpx request kwargs)
+SCENARIOS: Dict[str, Callable[[int], Dict]] = {
+    "tutor.ask": lambda i: {
+        "method": "POST", "url": "/api/v1/tutor/ask",
+        "json": {"user_id": i % 50, "question": "Why is the sky blue?", "subject": "Physics"},
+    },
+    "tutor.explain": _request("POST", "/api/v1/tutor/explain", json={"concept": "Entropy"}),
+    "tutor.study_plan": _request("POST", "/api/v1/tutor/study-plan", json={
+        "weak_areas": ["Algebra", "Geometry"], "available_hours_per_week": 10, "goals": ["Pass exam"],
+    }),
+    "tutor.recommend_resources": _request("POST", "/api/v1/tutor/recommend-resources", json={
+        "topic": "Linear algebra", "current_level": "beginner",
+    }),
+    "notes.generate": _request("POST", "/api/v1/notes/generate", json={"content": LECTURE_TEXT, "subject": "Biology"}),
+    "notes.extract_concepts": _request("POST", "/api/v1/notes/extract-concepts", params={"content": LECTURE_TEXT[:2000]}),
+    "flashcards.generate": _request("POST", "/api/v1/flashcards/generate", json={"content": LECTURE_TEXT}),
+    "quizzes.generate": _request("POST", "/api/v1/quizzes/generate", json={"content": LECTURE_TEXT}),
+    "quizzes.evaluate": _request("POST", "/api/v1/quizzes/evaluate", json={
+        "questions": QUIZ_QUESTIONS, "user_answers": ["A", "B"] * 10,
+    }),
+    "quizzes.adaptive": _request("POST", "/api/v1/quizzes/adaptive", json={
+        "weak_topics": ["Fractions"], "user_level": "beginner",
+    }),
+    "quizzes.explain": _request("POST", "/api/v1/quizzes/explain", params={
+        "question": "2 + 2?", "correct_answer": "4", "user_answer": "5",
+    }),
+    "quizzes.explain_attempt": lambda i: {
+        "method": "POST", "url": "/api/v1/quizzes/explain-attempt",
+        "json": {"questions": QUIZ_QUESTIONS, "user_answers": [["A", "B", "C", "D"][(i + j) % 4] for j in range(20)]},
+    },
+    "transcription.summarize": _request("POST", "/api/v1/transcription/summarize", params={
+        "transcript": LECTURE_TEXT[:4000],
+    }),
+    "transcription.youtube": _request("POST", "/api/v1/transcription/youtube", json={
+        "url": "https://www.youtube.com/watch?v=benchmark01",
+    }),
+    "transcription.upload": lambda i: {
+        "method": "POST", "url": "/api/v1/transcription/upload",
+        "files": {"file": (f"lecture-{i}.wav", b"\0" * 64_000, "audio/wav")},
+    },
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+async def run_level(client: httpx.AsyncClient, build: Callable[[int], Dict], concurrency: int, total: int) -> Dict:
+    """Send `total` requests with `concurrency` in flight and collect latencies"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(**build(index))
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def _start(module: str, port: int, *extra_args: str, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", module, "--port", str(port), *extra_args],
+        env={**os.environ, **(env or {})},
+    )
+
+
+def _wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(base_url: str, endpoints: List[str], levels: List[int], total: int, warmup: int) -> List[Dict]:
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=300.0, limits=limits) as client:
+        for name in endpoints:
+            build = SCENARIOS[name]
+            if warmup:
+                await run_level(client, build, 1, warmup)
+            for concurrency in levels:
+                result = await run_level(client, build, concurrency, total)
+                result["endpoint"] = name
+                results.append(result)
+                print(
+                    f"{name:28s} c={concurrency:<4d} {result['throughput_rps']:8.2f} req/s  "
+                    f"p50={result['latency_ms']['p50']:.1f}ms p95={result['latency_ms']['p95']:.1f}ms "
+                    f"p99={result['latency_ms']['p99']:.1f}ms errors={result['errors']}"
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default="realistic", help="Fake OpenAI latency profile")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and level")
+    parser.add_argument("--warmup", type=int, default=5, help="Warm-up requests per endpoint")
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--app-port", type=int, default=8901)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = set(endpoints) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    fake = _start("benchmarks.fake_openai", args.fake_port, "--profile", args.profile)
+    app = _start("benchmarks.serve_app", args.app_port, env={
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "UPLOAD_STORE_DIR": os.path.join(workdir, "upload_store"),
+        "DEBUG": "False",
+    })
+    try:
+        _wait_ready(f"http://127.0.0.1:{args.fake_port}/stats")
+        _wait_ready(f"http://127.0.0.1:{args.app_port}/health")
+        results = asyncio.run(run_benchmark(
+            f"http://127.0.0.1:{args.app_port}", endpoints, levels, args.requests, args.warmup
+        ))
+        upstream = httpx.get(f"http://127.0.0.1:{args.fake_port}/stats").json()
+    finally:
+        for proc in (app, fake):
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "profile": upstream["profile"],
+            "profile_name": args.profile,
+            "concurrency_levels": levels,
+            "requests_per_level": args.requests,
+        },
+        "upstream": {k: v for k, v in upstream.items() if k != "profile"},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
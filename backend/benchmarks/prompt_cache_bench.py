@@ -0,0 +1,250 @@
+"""
+Benchmark: provider prefix-cache hits with registry prompts vs. the old layout
+
+Sends the same workloads to the fake OpenAI server (which simulates prefix
+caching) twice: once with the previous ad hoc prompts, where variables such
+as the subject, learning style or requested count came before the large
+inputs, and once with the prompt registry templates, where static
+instructions come first and small variables last. Each layout gets a fresh
+server so caches do not carry over.
+
+Workloads:
+    tutor       several students with different learning styles asking
+                follow-up questions about the same lecture
+    generation  flashcards, quizzes and summaries of one transcript with
+                different counts, difficulties and lengths
+
+Usage (from backend/):
+    python -m benchmarks.prompt_cache_bench --content-chars 24000 --students 8 --turns 4
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from benchmarks.corpus import make_transcript
+from benchmarks.load_test import percentile, _start, _wait_ready
+from app.services.llm import create_chat_completion
+from app.services.prompts import PromptTemplate, prompt_registry
+
+
+STYLES = ["visual", "auditory", "kinesthetic", "reading"]
+LEGACY_STYLE_INSTRUCTIONS = {
+    "visual": "Use visual descriptions, analogies, and suggest diagrams. Structure information hierarchically.",
+    "auditory": "Use conversational tone, explain things step-by-step verbally, use rhythm in explanations.",
+    "kinesthetic": "Focus on practical examples, hands-on applications, and real-world scenarios.",
+    "reading": "Provide detailed written explanations, definitions, and written examples.",
+}
+
+# A call: (messages, registry template or None, create() kwargs)
+Call = Tuple[List[Dict], Optional[PromptTemplate], Dict]
+
+
+def legacy_tutor(style: str, subject: str, context: str, history: List[Dict], question: str) -> List[Dict]:
+    system = f"""You are a patient, encouraging AI tutor specializing in {subject}.
+
+Teaching approach:
+- {LEGACY_STYLE_INSTRUCTIONS[style]}
+- Break down complex topics into manageable chunks
+- Use the Socratic method when appropriate
+- Encourage critical thinking
+- Provide examples and analogies
+- Check for understanding
+- Be supportive and encouraging
+
+Remember: You're helping the student learn, not just giving answers."""
+    return [
+        {"role": "system", "content": system},
+        {"role": "system", "content": f"Reference material:\n{context}"},
+        *history,
+        {"role": "user", "content": question},
+    ]
+
+
+def registry_tutor(style: str, subject: str, context: str, history: List[Dict], question: str) -> List[Dict]:
+    return prompt_registry.get("tutor.get_tutor_response").render(
+        history=history, subject=subject, learning_style=style, context=context, question=question
+    )
+
+
+def legacy_generation(content: str) -> List[Call]:
+    calls = []
+    for count in (5, 10, 15, 20):
+        prompt = f"""Generate {count} flashcards from the following content.
+Each flashcard should have a clear question and a concise answer.
+Format as JSON array with 'question' and 'answer' fields.
+
+Content:
+{content}
+
+Generate flashcards:"""
+        calls.append(([
+            {"role": "system", "content": "You are an expert at creating effective study flashcards. Return only valid JSON."},
+            {"role": "user", "content": prompt},
+        ], None, {"response_format": {"type": "json_object"}, "max_tokens": 1500}))
+    for num_questions, difficulty in ((5, "easy"), (10, "medium"), (10, "hard")):
+        prompt = f"""Generate {num_questions} {difficulty} difficulty quiz questions from the following content.
+
+Question types to include: mcq, true_false
+
+For multiple choice questions (mcq):
+- Provide 4 options (A, B, C, D)
+- Mark the correct answer
+- Include plausible distractors
+
+For true/false questions:
+- Include a statement and correct answer
+
+For short answer questions:
+- Include the question and a model answer
+
+Content:
+{content}
+
+Generate questions in JSON format with fields: type, question, options (for mcq), correct_answer, explanation"""
+        calls.append(([
+            {"role": "system", "content": "You are an expert educator creating effective quiz questions. Return only valid JSON."},
+            {"role": "user", "content": prompt},
+        ], None, {"response_format": {"type": "json_object"}, "max_tokens": 2000}))
+    for max_length in (100, 200, 300):
+        prompt = f"""Summarize the following text in {max_length} words or less.
+Focus on the key points and main ideas.
+
+Text:
+{content}
+
+Summary:"""
+        calls.append(([
+            {"role": "system", "content": "You are an expert at creating concise, informative summaries."},
+            {"role": "user", "content": prompt},
+        ], None, {"max_tokens": 500}))
+    return calls
+
+
+def registry_generation(content: str) -> List[Call]:
+    calls = []
+    flashcards = prompt_registry.get("nlp.generate_flashcards")
+    for count in (5, 10, 15, 20):
+        calls.append((flashcards.render(content=content, count=count), flashcards,
+                      {"response_format": {"type": "json_object"}, "max_tokens": 1500}))
+    quiz = prompt_registry.get("quiz.generate_quiz")
+    for num_questions, difficulty in ((5, "easy"), (10, "medium"), (10, "hard")):
+        messages = quiz.render(
+            content=content, num_questions=num_questions, difficulty=difficulty, question_types="mcq, true_false"
+        )
+        calls.append((messages, quiz, {"response_format": {"type": "json_object"}, "max_tokens": 2000}))
+    summary = prompt_registry.get("nlp.summarize_text")
+    for max_length in (100, 200, 300):
+        calls.append((summary.render(text=content, max_length=max_length), summary, {"max_tokens": 500}))
+    return calls
+
+
+class Recorder:
+    """Latency and cached-token share of every call in a workload"""
+
+    def __init__(self):
+        self.rows: List[Tuple[float, int, int]] = []
+
+    async def call(self, client: AsyncOpenAI, messages: List[Dict], prompt: Optional[PromptTemplate], **kwargs) -> str:
+        started = time.perf_counter()
+        response = await create_chat_completion(client, prompt=prompt, model="fake", messages=messages, **kwargs)
+        details = response.usage.prompt_tokens_details
+        cached = (details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", 0)) or 0
+        self.rows.append(((time.perf_counter() - started) * 1000, response.usage.prompt_tokens, cached))
+        return response.choices[0].message.content
+
+    def summary(self) -> Dict:
+        latencies = sorted(row[0] for row in self.rows)
+        prompt_tokens = sum(row[1] for row in self.rows)
+        return {
+            "calls": len(self.rows),
+            "hit_rate": round(sum(1 for row in self.rows if row[2]) / len(self.rows), 3) if self.rows else 0.0,
+            "cached_token_share": round(sum(row[2] for row in self.rows) / prompt_tokens, 3) if prompt_tokens else 0.0,
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "p50": round(percentile(latencies, 50), 1),
+                "p95": round(percentile(latencies, 95), 1),
+            },
+        }
+
+
+async def run_tutor(client: AsyncOpenAI, render: Callable, context: str, students: int, turns: int) -> Dict:
+    recorder = Recorder()
+    prompt = prompt_registry.get("tutor.get_tutor_response") if render is registry_tutor else None
+
+    async def student(i: int):
+        style, history = STYLES[i % len(STYLES)], []
+        for turn in range(turns):
+            question = f"Student {i}, question {turn}: can you explain the part about the membrane gradient again?"
+            answer = await recorder.call(
+                client, render(style, "Biology", context, history, question), prompt, max_tokens=300
+            )
+            history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+
+    # The first student warms the shared prefix, as an earlier lecture viewer would have
+    await student(0)
+    await asyncio.gather(*(student(i) for i in range(1, students)))
+    return recorder.summary()
+
+
+async def run_generation(client: AsyncOpenAI, calls: List[Call]) -> Dict:
+    recorder = Recorder()
+    for messages, prompt, kwargs in calls:
+        await recorder.call(client, messages, prompt, **kwargs)
+    return recorder.summary()
+
+
+async def measure(base_url: str, layout: str, content: str, students: int, turns: int) -> Dict:
+    client = AsyncOpenAI(api_key="sk-benchmark", base_url=base_url, max_retries=0)
+    tutor_render = registry_tutor if layout == "registry" else legacy_tutor
+    generation = registry_generation(content) if layout == "registry" else legacy_generation(content)
+    return {
+        "tutor": await run_tutor(client, tutor_render, content, students, turns),
+        "generation": await run_generation(client, generation),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--content-chars", type=int, default=24000)
+    parser.add_argument("--students", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--profile", default="realistic", help="Fake OpenAI latency profile")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    content = make_transcript(args.content_chars)
+    results = {}
+    for layout in ("legacy", "registry"):
+        fake = _start("benchmarks.fake_openai", args.fake_port, "--profile", args.profile)
+        try:
+            _wait_ready(f"http://127.0.0.1:{args.fake_port}/stats")
+            results[layout] = asyncio.run(measure(
+                f"http://127.0.0.1:{args.fake_port}/v1", layout, content, args.students, args.turns
+            ))
+        finally:
+            fake.terminate()
+            fake.wait(timeout=10)
+        for workload, result in results[layout].items():
+            print(
+                f"{layout:8s} {workload:10s} calls={result['calls']:<3d} hit_rate={result['hit_rate']:.2f} "
+                f"cached_tokens={result['cached_token_share']:.2f} mean={result['latency_ms']['mean']:.1f}ms "
+                f"p95={result['latency_ms']['p95']:.1f}ms"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "content_chars": args.content_chars,
+                "profile": args.profile,
+                "results": results,
+                "registry_metrics": prompt_registry.metrics(),
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
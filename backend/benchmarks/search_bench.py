@@ -0,0 +1,136 @@
+"""
+Benchmark: full-text search vs. LIKE scans over lecture transcripts
+
+Fills a fresh SQLite database with --lectures transcripts spread over
+--users students. Each transcript is a synthetic lecture plus a few
+"conceptN" terms drawn from a Zipf distribution, so some terms are rare
+and others occur in most lectures. The search index is then built by
+search_index.setup() (as on the first start after upgrading), and one
+student's lectures are searched two ways:
+
+    like      lectures JOIN subjects WHERE transcript LIKE '%term%' (first page, unranked)
+    fts       search_index.search: ranked page of 20 with snippets
+
+Usage (from backend/):
+    python -m benchmarks.search_bench --lectures 200000 --users 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.corpus import make_transcript
+from benchmarks.load_test import percentile
+
+QUERIES = {
+    "rare": "concept30",
+    "medium": "concept3",
+    "common": "mitochondria",
+    "phrase": '"membrane transport"',
+    "two_terms": "enzyme concept3",
+}
+
+
+async def seed(lectures: int, users: int, chars: int):
+    from sqlalchemy import insert
+    from app.core.database import async_session_maker, init_db
+    from app.models.models import Lecture, Subject, User
+
+    await init_db()
+    rng = random.Random(0)
+    bases = [make_transcript(chars, seed=i) for i in range(50)]
+    async with async_session_maker() as db:
+        await db.execute(insert(User), [
+            {"id": user, "email": f"u{user}@example.com", "username": f"u{user}", "hashed_password": "x"}
+            for user in range(1, users + 1)
+        ])
+        await db.execute(insert(Subject), [{"id": user, "user_id": user, "name": "Biology"} for user in range(1, users + 1)])
+        for start in range(0, lectures, 5000):
+            rows = []
+            for i in range(start, min(start + 5000, lectures)):
+                concepts = " ".join(f"concept{min(int(rng.paretovariate(1.0)), 10000)}" for _ in range(5))
+                rows.append({
+                    "subject_id": 1 + i % users, "title": f"Lecture {i}", "source_type": "upload", "status": "completed",
+                    "transcript": f"{rng.choice(bases)} Key terms: {concepts}.",
+                })
+            await db.execute(insert(Lecture), rows)
+        await db.commit()
+
+
+async def measure(args) -> Dict:
+    from sqlalchemy import text
+    from app.core.database import async_session_maker
+    from app.services.search_service import search_index
+
+    started = time.perf_counter()
+    await search_index.setup()
+    index_seconds = time.perf_counter() - started
+
+    user_id = 7
+    results = {"index_build_seconds": round(index_seconds, 1), "queries": {}}
+    for name, query in QUERIES.items():
+        like_term = query.strip('"').split()[0]
+        timings: Dict[str, List[float]] = {"like": [], "fts": []}
+        hits = 0
+        for _ in range(args.repeats):
+            async with async_session_maker() as db:
+                started = time.perf_counter()
+                rows = (await db.execute(text(
+                    "SELECT d.id, d.title FROM lectures d JOIN subjects s ON s.id = d.subject_id "
+                    "WHERE s.user_id = :user_id AND d.transcript LIKE :pattern LIMIT 20"
+                ), {"user_id": user_id, "pattern": f"%{like_term}%"})).all()
+                timings["like"].append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                page = await search_index.search(db, user_id, query, limit=20)
+                timings["fts"].append((time.perf_counter() - started) * 1000)
+                hits = len(page["results"])
+        for values in timings.values():
+            values.sort()
+        results["queries"][name] = {
+            "query": query,
+            "fts_results": hits,
+            "like_rows": len(rows),
+            **{
+                method: {"p50": round(percentile(values, 50), 2), "p95": round(percentile(values, 95), 2)}
+                for method, values in timings.items()
+            },
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lectures", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--chars", type=int, default=1500, help="Transcript length")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DEBUG"] = "False"
+    os.environ["TEXT_COMPRESSION_MIN_BYTES"] = str(2 ** 62)  # transcripts stay plain, so LIKE can scan them
+
+    asyncio.run(seed(args.lectures, args.users, args.chars))
+    results = asyncio.run(measure(args))
+    print(f"lectures={args.lectures} users={args.users} index_build={results['index_build_seconds']}s")
+    for name, result in results["queries"].items():
+        print(
+            f"{name:10s} like_p50={result['like']['p50']:8.1f}ms fts_p50={result['fts']['p50']:6.1f}ms "
+            f"like_p95={result['like']['p95']:8.1f}ms fts_p95={result['fts']['p95']:6.1f}ms "
+            f"results={result['fts_results']}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"lectures": args.lectures, "users": args.users, **results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark: timed caption segments as per-caption objects vs. a SegmentTrack
+
+For each caption count, a synthetic caption track (3-second captions with
+rolling overlap) is stored and queried two ways:
+
+    objects     a JSON list of {"start", "duration", "text"} per caption:
+                parsed into dicts, filtered, and serialized back
+    columnar    SegmentTrack's stored form: arrays viewed in place, the
+                range found by binary search, NumPy slices serialized
+                by orjson directly
+
+Reported: stored bytes, time to build the stored form, latency and peak
+Python allocations of fetching a --window seconds range (load + select +
+serialize, as GET /lectures/{id}/segments does), and latency of extracting
+the range's text for note generation.
+
+Usage (from backend/):
+    python -m benchmarks.segments_bench --captions 1200,3600,20000
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import orjson
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.corpus import make_transcript  # noqa: E402
+from benchmarks.load_test import percentile  # noqa: E402
+from app.services.transcript_segments import SegmentTrack  # noqa: E402
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def make_captions(count: int) -> List[Dict]:
+    words = make_transcript(count * 40, seed=count).split()
+    captions = []
+    for k in range(count):
+        # Rolling captions repeat the end of the previous line
+        line = words[k * 6:k * 6 + 8] if k * 6 + 8 <= len(words) else words[-8:]
+        captions.append({"text": " ".join(line), "start": k * 3.0, "duration": 4.2})
+    return captions
+
+
+def objects_fetch(blob: bytes, start: float, end: float) -> bytes:
+    captions = orjson.loads(blob)
+    selected = [c for c in captions if c["start"] < end and c["start"] + c["duration"] > start]
+    return orjson.dumps({"segments": selected})
+
+
+def columnar_fetch(blob: bytes, start: float, end: float) -> bytes:
+    track = SegmentTrack.from_bytes(blob)
+    i, j = track.span(start, end)
+    return orjson.dumps(track.slice(i, j), option=OPTIONS)
+
+
+def objects_text(blob: bytes, start: float, end: float) -> str:
+    return " ".join(c["text"] for c in orjson.loads(blob) if c["start"] < end and c["start"] + c["duration"] > start)
+
+
+def columnar_text(blob: bytes, start: float, end: float) -> str:
+    track = SegmentTrack.from_bytes(blob)
+    return track.text_between(*track.span(start, end))
+
+
+def timed(call: Callable, repeats: int, *args) -> Dict:
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        call(*args)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    tracemalloc.start()
+    call(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"p50_ms": round(percentile(latencies, 50), 3), "p95_ms": round(percentile(latencies, 95), 3),
+            "alloc_kb": round(peak / 1024, 1)}
+
+
+def measure(count: int, window: float, repeats: int) -> Dict:
+    captions = make_captions(count)
+    midpoint = count * 3.0 / 2
+    start, end = midpoint, midpoint + window
+
+    started = time.perf_counter()
+    # The objects form keeps the cleaned text too, so both store the same captions
+    track = SegmentTrack.from_snippets(captions)
+    objects_blob = orjson.dumps([
+        {"start": float(track.starts[k]), "duration": float(track.durations[k]), "text": track.text_between(k, k + 1)}
+        for k in range(len(track))
+    ])
+    objects_build = time.perf_counter() - started
+    started = time.perf_counter()
+    columnar_blob = SegmentTrack.from_snippets(captions).to_bytes()
+    columnar_build = time.perf_counter() - started
+
+    assert objects_text(objects_blob, start, end) == columnar_text(columnar_blob, start, end)
+    return {
+        "captions": count,
+        "objects": {"bytes": len(objects_blob), "build_ms": round(objects_build * 1000, 1),
+                    "fetch": timed(objects_fetch, repeats, objects_blob, start, end),
+                    "text": timed(objects_text, repeats, objects_blob, start, end)},
+        "columnar": {"bytes": len(columnar_blob), "build_ms": round(columnar_build * 1000, 1),
+                     "fetch": timed(columnar_fetch, repeats, columnar_blob, start, end),
+                     "text": timed(columnar_text, repeats, columnar_blob, start, end)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--captions", default="1200,3600,20000", help="Comma-separated caption counts")
+    parser.add_argument("--window", type=float, default=300.0, help="Seconds fetched per request")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    results = []
+    for count in (int(value) for value in args.captions.split(",")):
+        result = measure(count, args.window, args.repeats)
+        results.append(result)
+        for form in ("objects", "columnar"):
+            r = result[form]
+            print(
+                f"captions={count:<6d} {form:8s} bytes={r['bytes']:<8d} build={r['build_ms']:6.1f}ms "
+                f"fetch_p50={r['fetch']['p50_ms']:7.3f}ms fetch_alloc={r['fetch']['alloc_kb']:8.1f}KB "
+                f"text_p50={r['text']['p50_ms']:7.3f}ms"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"window": args.window, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
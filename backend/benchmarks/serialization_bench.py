@@ -0,0 +1,107 @@
+"""
+Benchmark: JSON serialization CPU time and bytes on the wire
+
+Renders typical and large lecture payloads (a /transcription/youtube
+response with notes, a /quizzes/generate response) with the stdlib-based
+JSONResponse and with ORJSONResponse, then compresses the body with each
+encoding the middleware can negotiate.
+
+Usage (from backend/):
+    python -m benchmarks.serialization_bench --sizes 20000,400000 --iterations 50
+"""
+import argparse
+import json
+import time
+import zlib
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.core.compression import brotli
+from app.core.config import settings
+from benchmarks.corpus import make_transcript
+
+
+def transcription_payload(size: int) -> dict:
+    transcript = make_transcript(size, repetition=0.2)
+    return {
+        "transcript": transcript,
+        "notes": "\n".join(f"## Section {i}\n- {line}" for i, line in enumerate(transcript[: size // 3].split(". "))),
+        "key_concepts": ["cell membrane", "energy", "protein gradient", "diffusion", "osmosis"] * 3,
+        "duration": size // 15,
+        "title": "Video: dQw4w9WgXcQ",
+        "normalization": {"snippets": size // 40, "raw_tokens": size // 4, "token_reduction": 0.0712},
+    }
+
+
+def quiz_payload(size: int) -> dict:
+    sentences = make_transcript(size, seed=1).split(". ")
+    return {"questions": [
+        {
+            "type": "mcq",
+            "question": sentence + "?",
+            "options": [f"Option {c}: {sentence[:60]}" for c in "ABCD"],
+            "correct_answer": "Option A",
+            "explanation": sentence,
+            "topic": "general",
+            "difficulty": 0.5,
+        }
+        for sentence in sentences[: max(size // 400, 10)]
+    ]}
+
+
+def time_render(response_class, payload: dict, iterations: int):
+    response = response_class(content=None)
+    started = time.process_time()
+    for _ in range(iterations):
+        body = response.render(payload)
+    return body, (time.process_time() - started) / iterations
+
+
+def time_compress(body: bytes, encoding: str, iterations: int):
+    started = time.process_time()
+    for _ in range(iterations):
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            compressed = compressor.compress(body) + compressor.flush()
+    return compressed, (time.process_time() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="20000,400000", help="Transcript sizes in characters (typical, large)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        for name, payload in (("transcription", transcription_payload(size)), ("quiz", quiz_payload(size))):
+            bodies = {}
+            for label, response_class in (("json", JSONResponse), ("orjson", ORJSONResponse)):
+                body, cpu = time_render(response_class, payload, args.iterations)
+                bodies[label] = body
+                rows.append({
+                    "payload": name, "size_chars": size, "step": f"render:{label}",
+                    "cpu_ms": round(cpu * 1000, 3), "bytes": len(body),
+                })
+            for encoding in encodings:
+                compressed, cpu = time_compress(bodies["orjson"], encoding, args.iterations)
+                rows.append({
+                    "payload": name, "size_chars": size, "step": f"compress:{encoding}",
+                    "cpu_ms": round(cpu * 1000, 3), "bytes": len(compressed),
+                })
+
+    for row in rows:
+        print(f"{row['payload']:14s} {row['size_chars']:>8d} chars  {row['step']:16s} "
+              f"{row['cpu_ms']:9.3f}ms  {row['bytes']:>9d} bytes")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"iterations": args.iterations, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
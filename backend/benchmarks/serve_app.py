@@ -0,0 +1,42 @@
+"""
+Run the app for benchmarks with YouTube caption fetches served locally
+
+OpenAI traffic is redirected to the fake server through OPENAI_BASE_URL by
+the load driver; the YouTube transcript API has no base URL, so it is
+replaced here with a synthetic caption track of BENCH_CAPTION_SNIPPETS
+snippets returned after BENCH_YOUTUBE_LATENCY_MS.
+
+Usage:
+    python -m benchmarks.serve_app --port 8901
+"""
+import argparse
+import os
+import time
+
+import uvicorn
+from youtube_transcript_api import YouTubeTranscriptApi
+
+
+def _fake_get_transcript(video_id, languages=None, **kwargs):
+    time.sleep(float(os.environ.get("BENCH_YOUTUBE_LATENCY_MS", "200")) / 1000)
+    snippets = int(os.environ.get("BENCH_CAPTION_SNIPPETS", "600"))
+    return [
+        {"text": f"today we discuss part {i} of the lecture topic", "start": i * 2.0, "duration": 2.0}
+        for i in range(snippets)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+
+    YouTubeTranscriptApi.get_transcript = staticmethod(_fake_get_transcript)
+
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
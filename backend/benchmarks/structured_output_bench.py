@@ -0,0 +1,142 @@
+"""
+Benchmark: complete flashcard sets from a model that drops or breaks items
+
+The fake OpenAI server drops or strips a required field from a share of
+the items it returns (--defect-rate). Three strategies generate the same
+number of flashcard sets:
+
+    single        one call, invalid items discarded (the previous behaviour,
+                  minus the 500 a malformed item used to cause)
+    full_retry    repeat the whole call until a complete set arrives
+                  (at most STRUCTURED_OUTPUT_MAX_REPAIRS extra calls)
+    partial       nlp_service.generate_flashcards: repair locally, then ask
+                  only for the missing items
+
+Reported: share of complete sets, upstream calls, flashcards requested
+upstream, completion-token budget requested, and latency.
+
+Usage (from backend/):
+    python -m benchmarks.structured_output_bench --sets 40 --count 10 --defect-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from openai import AsyncOpenAI
+
+from benchmarks.corpus import make_transcript
+from benchmarks.load_test import percentile, _start, _wait_ready
+from app.core.config import settings
+from app.services import llm
+from app.services.nlp_service import nlp_service
+from app.services.prompts import prompt_registry
+from app.services.structured_output import FLASHCARD_SCHEMA, parse_items
+
+
+class CountingClient:
+    """Wraps chat.completions.create to count calls, items and max_tokens requested"""
+
+    def __init__(self, client: AsyncOpenAI):
+        self.client = client
+        self.chat = self
+        self.completions = self
+        self.calls = self.items = self.max_tokens = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.max_tokens += kwargs.get("max_tokens") or 0
+        user = kwargs["messages"][-1]["content"]
+        self.items += int(user.split("Number of flashcards: ")[1].split()[0])
+        return await self.client.chat.completions.create(**kwargs)
+
+
+async def single(client, content: str, count: int) -> List[Dict]:
+    prompt = prompt_registry.get("nlp.generate_flashcards")
+    response = await llm.create_chat_completion(
+        client, prompt=prompt, model=settings.OPENAI_MODEL, messages=prompt.render(content=content, count=count),
+        temperature=0.7, max_tokens=1500, response_format={"type": "json_object"}
+    )
+    return parse_items(response.choices[0].message.content, FLASHCARD_SCHEMA).items
+
+
+async def full_retry(client, content: str, count: int) -> List[Dict]:
+    for _ in range(settings.STRUCTURED_OUTPUT_MAX_REPAIRS + 1):
+        cards = await single(client, content, count)
+        if len(cards) >= count:
+            break
+    return cards
+
+
+async def partial(client, content: str, count: int) -> List[Dict]:
+    return await nlp_service.generate_flashcards(content, count)
+
+
+async def measure(base_url: str, strategy, content: str, sets: int, count: int, concurrency: int) -> Dict:
+    client = CountingClient(AsyncOpenAI(api_key="sk-benchmark", base_url=base_url, max_retries=0))
+    nlp_service.client = client
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, sizes = [], []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            cards = await strategy(client, content, count)
+            latencies.append((time.perf_counter() - started) * 1000)
+            sizes.append(len(cards))
+
+    await asyncio.gather(*(one() for _ in range(sets)))
+    latencies.sort()
+    return {
+        "complete_share": round(sum(size >= count for size in sizes) / sets, 3),
+        "mean_cards": round(sum(sizes) / sets, 2),
+        "upstream_calls": client.calls,
+        "cards_requested": client.items,
+        "max_tokens_requested": client.max_tokens,
+        "latency_ms": {"p50": round(percentile(latencies, 50), 1), "p95": round(percentile(latencies, 95), 1)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", type=int, default=40)
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--defect-rate", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--content-chars", type=int, default=4000)
+    parser.add_argument("--profile", default="realistic", help="Fake OpenAI latency profile")
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    settings.LLM_HEDGING_ENABLED = False  # hedges would add calls unrelated to repairs
+    content = make_transcript(args.content_chars)
+    base_url = f"http://127.0.0.1:{args.fake_port}/v1"
+    results = {}
+    for name, strategy in (("single", single), ("full_retry", full_retry), ("partial", partial)):
+        fake = _start(
+            "benchmarks.fake_openai", args.fake_port, "--profile", args.profile, "--defect-rate", str(args.defect_rate)
+        )
+        try:
+            _wait_ready(f"http://127.0.0.1:{args.fake_port}/stats")
+            results[name] = asyncio.run(measure(base_url, strategy, content, args.sets, args.count, args.concurrency))
+        finally:
+            fake.terminate()
+            fake.wait(timeout=10)
+        result = results[name]
+        print(
+            f"{name:10s} complete={result['complete_share']:.2f} mean_cards={result['mean_cards']:.2f} "
+            f"calls={result['upstream_calls']:<4d} cards_requested={result['cards_requested']:<5d} "
+            f"max_tokens={result['max_tokens_requested']:<6d} p50={result['latency_ms']['p50']:.1f}ms "
+            f"p95={result['latency_ms']['p95']:.1f}ms"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"profile": args.profile, "defect_rate": args.defect_rate, "count": args.count,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark: row size, list latency and memory of plain vs. compressed, deferred text
+
+A fresh SQLite database is filled with --lectures lectures (transcripts of
+--chars characters) and as many notes, stored plain as before compressed
+storage. The same reads are measured before and after compress_text.py's
+migration (text_storage.migrate):
+
+    before    plain TEXT columns, loaded with every row (undefer(), as the
+              columns used to be)
+    after     compressed above TEXT_COMPRESSION_MIN_BYTES, deferred: a list
+              query leaves the text unloaded
+
+Reported per state: stored bytes per transcript, database file size after
+VACUUM, latency of listing one subject's lectures and of loading one
+lecture with its transcript, and the Python memory a list query allocates.
+The synthetic transcripts use a small vocabulary and compress better than
+real speech; treat the size ratio as an upper bound.
+
+Usage (from backend/):
+    python -m benchmarks.text_storage_bench --lectures 2000 --chars 50000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from benchmarks.corpus import make_transcript
+from benchmarks.load_test import percentile
+
+SUBJECTS = 20
+
+
+async def seed(lectures: int, chars: int):
+    from sqlalchemy import insert
+    from app.core.config import settings
+    from app.core.database import async_session_maker, init_db
+    from app.models.models import Lecture, Note, Subject, Topic, User
+
+    await init_db()
+    minimum, settings.TEXT_COMPRESSION_MIN_BYTES = settings.TEXT_COMPRESSION_MIN_BYTES, 2 ** 62  # store plain
+    try:
+        async with async_session_maker() as db:
+            await db.execute(insert(User), [{"id": 1, "email": "u1@example.com", "username": "u1", "hashed_password": "x"}])
+            await db.execute(insert(Subject), [{"id": s, "user_id": 1, "name": f"Subject {s}"} for s in range(1, SUBJECTS + 1)])
+            await db.execute(insert(Topic), [{"id": s, "subject_id": s, "name": f"Topic {s}"} for s in range(1, SUBJECTS + 1)])
+            for start in range(0, lectures, 200):
+                batch = range(start, min(start + 200, lectures))
+                await db.execute(insert(Lecture), [
+                    {"subject_id": 1 + i % SUBJECTS, "title": f"Lecture {i}", "source_type": "upload",
+                     "status": "completed", "transcript": make_transcript(chars, seed=i)}
+                    for i in batch
+                ])
+                await db.execute(insert(Note), [
+                    {"topic_id": 1 + i % SUBJECTS, "title": f"Notes {i}", "content": make_transcript(chars // 10, seed=-i),
+                     "summary": make_transcript(chars // 50, seed=i + lectures)}
+                    for i in batch
+                ])
+            await db.commit()
+    finally:
+        settings.TEXT_COMPRESSION_MIN_BYTES = minimum
+
+
+async def measure(path: str, eager: bool, repeats: int) -> Dict:
+    from sqlalchemy import select, text
+    from sqlalchemy.orm import undefer
+    from app.core.database import async_session_maker, engine
+    from app.models.models import Lecture
+
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("VACUUM")
+        stored = (await conn.execute(text(
+            "SELECT avg(length(CAST(transcript AS BLOB))) FROM lectures"
+        ))).scalar()
+
+    listing = select(Lecture).where(Lecture.subject_id == 1).order_by(Lecture.id)
+    if eager:
+        listing = listing.options(undefer(Lecture.transcript))
+
+    async def list_lectures():
+        async with async_session_maker() as db:
+            return (await db.execute(listing)).scalars().all()
+
+    async def load_lecture():
+        async with async_session_maker() as db:
+            lecture = await db.get(Lecture, 1, options=[undefer(Lecture.transcript)])
+            return len(lecture.transcript)
+
+    timings: Dict[str, List[float]] = {"list": [], "get": []}
+    for _ in range(repeats):
+        for name, call in (("list", list_lectures), ("get", load_lecture)):
+            started = time.perf_counter()
+            await call()
+            timings[name].append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    listed = await list_lectures()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "transcript_bytes": round(stored),
+        "file_mb": round(os.path.getsize(path) / 1e6, 1),
+        "listed": len(listed),
+        "list_alloc_mb": round(peak / 1e6, 2),
+    }
+    for name, values in timings.items():
+        values.sort()
+        result[f"{name}_p50_ms"] = round(percentile(values, 50), 2)
+        result[f"{name}_p95_ms"] = round(percentile(values, 95), 2)
+    return result
+
+
+async def migrate() -> Dict:
+    from app.core.database import async_session_maker
+    from app.services.text_storage import text_storage
+
+    started = time.perf_counter()
+    async with async_session_maker() as db:
+        counts = await text_storage.migrate(db)
+    seconds = time.perf_counter() - started
+    rows = sum(table["rows_read"] for table in counts.values())
+    return {"seconds": round(seconds, 2), "rows_per_second": round(rows / seconds), **counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lectures", type=int, default=2000)
+    parser.add_argument("--chars", type=int, default=50000, help="Transcript length")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="Optional JSON report path")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["DEBUG"] = "False"
+
+    async def run():
+        await seed(args.lectures, args.chars)
+        before = await measure(path, eager=True, repeats=args.repeats)
+        migration = await migrate()
+        after = await measure(path, eager=False, repeats=args.repeats)
+        return before, migration, after
+
+    before, migration, after = asyncio.run(run())
+    print(f"lectures={args.lectures} chars={args.chars} listed per subject={before['listed']}")
+    for state, result in (("before", before), ("after", after)):
+        print(
+            f"{state:7s} transcript={result['transcript_bytes']:>7d}B file={result['file_mb']:7.1f}MB "
+            f"list_p50={result['list_p50_ms']:7.2f}ms list_p95={result['list_p95_ms']:7.2f}ms "
+            f"get_p50={result['get_p50_ms']:6.2f}ms list_alloc={result['list_alloc_mb']:7.2f}MB"
+        )
+    print(f"migration {migration['seconds']}s ({migration['rows_per_second']} rows/s)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"lectures": args.lectures, "chars": args.chars, "before": before,
+                       "migration": migration, "after": after}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
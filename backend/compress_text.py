@@ -0,0 +1,37 @@
+"""
+Compress stored lecture transcripts and note bodies
+
+Rewrites Lecture.transcript, Note.content and Note.summary values written
+before compressed storage, TEXT_MIGRATION_BATCH rows per transaction. Old
+rows stay readable without it (on PostgreSQL startup turns the columns into
+BYTEA), so the job only saves space. Safe to stop and run again.
+
+Usage:
+    python compress_text.py [--batch-size 500]
+"""
+import argparse
+import asyncio
+import sys
+
+from app.core.database import async_session_maker, init_db
+from app.models import models  # noqa: F401  (registers tables for init_db)
+from app.services.text_storage import text_storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, help="rows read per transaction (default: TEXT_MIGRATION_BATCH)")
+    args = parser.parse_args()
+
+    async def run():
+        await init_db()
+        async with async_session_maker() as session:
+            return await text_storage.migrate(session, args.batch_size)
+
+    counts = asyncio.run(run())
+    for table, moved in counts.items():
+        print(f"{table}: {moved['rows_read']} rows read, {moved['rows_compressed']} compressed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
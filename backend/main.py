@@ -1,15 +1,32 @@
 """
 Main FastAPI application for AI Learning Assistant
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, async_session_maker
+from app.core.executor import cpu_executor
+from app.models import models  # noqa: F401  (registers tables for init_db)
+from app.core.compression import CompressionMiddleware
+from app.core.disconnect import DisconnectMiddleware, cancellations
+from app.core.errors import ErrorResponseMiddleware
+from app.core.tracing import TracingMiddleware
 from app.api.v1.router import api_router
+from app.services import llm
+from app.services.batch_service import batch_service
+from app.services.keyword_extractor import keyword_extractor
+from app.services.model_router import LatencyTierMiddleware
+from app.services.prompts import prompt_registry
+from app.services.search_service import search_index
+from app.services.structured_output import structured_output
+from app.services.token_budget import InputTooLargeError
+from app.services.upload_store import upload_store
 
 
 @asynccontextmanager
@@ -17,18 +34,29 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
     await init_db()
+    await search_index.setup()
+    await keyword_extractor.load_corpus(async_session_maker)
+    if settings.CPU_POOL_ENABLED:
+        cpu_executor.start()
+    eviction = asyncio.create_task(upload_store.run_eviction(settings.UPLOAD_EVICTION_INTERVAL))
     yield
     # Shutdown
-    pass
+    eviction.cancel()
+    await batch_service.shutdown()
+    cpu_executor.shutdown()
 
 
 app = FastAPI(
     title=settings.APP_NAME,
     version="1.0.0",
     description="AI-powered intelligent learning assistant",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
+# Unhandled errors become 500s (inside CORS, so they carry its headers)
+app.add_middleware(ErrorResponseMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -38,10 +66,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response compression (gzip/brotli, negotiated per request)
+app.add_middleware(CompressionMiddleware)
+
+# Latency tier for model routing (X-Latency-Tier header)
+app.add_middleware(LatencyTierMiddleware)
+
+# Cancel abandoned requests (inside tracing so the root span records the disconnect)
+if settings.CANCEL_ON_DISCONNECT:
+    app.add_middleware(DisconnectMiddleware)
+
+# Request tracing (sampled by TRACE_SAMPLE_RATE)
+app.add_middleware(TracingMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
-# Static files
+
+# Error mapping shared by all endpoints (detail as in HTTPException responses;
+# anything else is a 500 from ErrorResponseMiddleware)
+@app.exception_handler(InputTooLargeError)
+async def input_too_large_handler(request: Request, exc: InputTooLargeError):
+    """Input that cannot be fitted into the prompt budget"""
+    return ORJSONResponse(status_code=413, content={"detail": str(exc)})
+
+
+@app.exception_handler(llm.UpstreamError)
+async def upstream_error_handler(request: Request, exc: llm.UpstreamError):
+    """LLM call that failed fast or timed out (503/504)"""
+    return ORJSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
+# Static files (the upload store lives under UPLOAD_STORE_DIR, not here)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 
@@ -61,6 +117,36 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics/cpu-pool")
+async def cpu_pool_metrics():
+    """Process pool load and utilization"""
+    return cpu_executor.metrics()
+
+
+@app.get("/metrics/llm")
+async def llm_metrics():
+    """Upstream latency, hedging, deadlines and circuit breaker state"""
+    return llm.metrics()
+
+
+@app.get("/metrics/cancellations")
+async def cancellation_metrics():
+    """Requests and upstream calls cancelled after their client disconnected"""
+    return cancellations.metrics()
+
+
+@app.get("/metrics/prompts")
+async def prompt_metrics():
+    """Prefix-cache hit rate and latency per prompt template"""
+    return prompt_registry.metrics()
+
+
+@app.get("/metrics/structured-output")
+async def structured_output_metrics():
+    """Valid, locally repaired and regenerated items per generation method"""
+    return structured_output.metrics()
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
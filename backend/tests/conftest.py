@@ -0,0 +1,51 @@
+"""
+Shared fixtures: settings point at a temporary directory before the app is imported
+"""
+import os
+import tempfile
+
+ROOT = tempfile.mkdtemp(prefix="edu-ai-tests-")
+os.environ.update({
+    "OPENAI_API_KEY": "sk-test",
+    "DATABASE_URL": f"sqlite:///{os.path.join(ROOT, 'test.db')}",
+    "DEBUG": "False",
+    "UPLOAD_DIR": os.path.join(ROOT, "uploads"),
+    "UPLOAD_STORE_DIR": os.path.join(ROOT, "upload_store"),
+    "BATCH_DIR": os.path.join(ROOT, "batches"),
+    "CPU_POOL_ENABLED": "False",
+    "TOKEN_COUNTING": "estimate",
+    "TRACE_SAMPLE_RATE": "0",
+})
+
+import pytest  # noqa: E402
+
+from app.core.database import Base, async_session_maker, engine, init_db  # noqa: E402
+from app.models.models import Subject, Topic, User  # noqa: E402
+from app.services.search_service import KINDS, search_index  # noqa: E402
+
+
+@pytest.fixture
+async def db():
+    """A session on freshly created tables (search index included), dropped afterwards"""
+    await init_db()
+    await search_index.setup()
+    try:
+        async with async_session_maker() as session:
+            yield session
+    finally:
+        search_index.ready = False
+        async with engine.begin() as conn:
+            for kind in KINDS.values():
+                await conn.exec_driver_sql(f"DROP TABLE IF EXISTS {kind.index_table}")
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()  # connections belong to this test's event loop
+
+
+@pytest.fixture
+async def topic(db):
+    """A user (id 1) with one subject and one topic"""
+    db.add(User(id=1, email="student@example.com", username="student", hashed_password="x"))
+    db.add(Subject(id=1, user_id=1, name="Biology"))
+    db.add(Topic(id=1, subject_id=1, name="Cells"))
+    await db.commit()
+    return await db.get(Topic, 1)
@@ -0,0 +1,98 @@
+"""
+Learning-analytics rollups: counts per attempt and session, incremental upserts and the backfill
+"""
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+from app.models.models import DailyTopicStats, Quiz, QuizAttempt, StudySession, WeeklyTopicStats
+from app.services.analytics_service import (
+    ALL_TOPICS, COUNTERS, analytics_service, quiz_attempt_increments, study_session_increments
+)
+
+
+def at(day: int) -> datetime:
+    return datetime(2026, 10, day, 15, 30, tzinfo=timezone.utc)  # 12 October 2026 is a Monday
+
+
+def test_quiz_attempts_count_towards_topic_totals_and_weak_areas():
+    attempt = SimpleNamespace(score=80.0, time_taken=120, weak_areas=["Osmosis", "Osmosis", "", 3])
+    assert quiz_attempt_increments(attempt, "Cells") == {
+        ALL_TOPICS: {"quiz_attempts": 1, "quiz_time_seconds": 120, "quiz_scored": 1, "quiz_score_total": 80.0,
+                     "weak_area_flags": 1},
+        "Cells": {"quiz_attempts": 1, "quiz_time_seconds": 120, "quiz_scored": 1, "quiz_score_total": 80.0},
+        "Osmosis": {"weak_area_flags": 1},
+    }
+    unscored = quiz_attempt_increments(SimpleNamespace(score=None, time_taken=None, weak_areas=None), None)
+    assert unscored == {ALL_TOPICS: {"quiz_attempts": 1, "quiz_time_seconds": 0, "weak_area_flags": 0}}
+
+
+def test_session_minutes_are_split_and_topic_scores_override_the_session_score():
+    session = SimpleNamespace(duration=60, topics_covered=["Cells", "Osmosis"],
+                              performance_data={"score": 70, "topic_scores": {"Osmosis": 40, "Cells": True}})
+    increments = study_session_increments(session)
+    assert increments[ALL_TOPICS] == {"study_sessions": 1, "study_minutes": 60.0, "session_scored": 1,
+                                      "session_score_total": 70.0}
+    assert increments["Cells"]["study_minutes"] == 30.0 and increments["Cells"]["session_score_total"] == 70.0
+    assert increments["Osmosis"]["session_score_total"] == 40.0
+
+
+@pytest.fixture
+async def activity(db, topic):
+    """Attempts and sessions over two weeks, recorded through the rollups as the API does"""
+    db.add(Quiz(id=1, topic_id=1, title="Cells quiz", questions=[]))
+    await db.flush()
+    rows = [
+        QuizAttempt(id=1, quiz_id=1, user_id=1, score=60.0, time_taken=100, weak_areas=["Osmosis"], created_at=at(12)),
+        QuizAttempt(id=2, quiz_id=1, user_id=1, score=90.0, time_taken=80, weak_areas=[], created_at=at(12)),
+        QuizAttempt(id=3, quiz_id=1, user_id=1, score=75.0, time_taken=90, weak_areas=["Osmosis"], created_at=at(20)),
+        StudySession(id=1, user_id=1, session_type="review", duration=45, topics_covered=["Cells"],
+                     performance_data={"score": 80}, created_at=at(14)),
+    ]
+    for row in rows:
+        db.add(row)
+        await db.flush()
+        if isinstance(row, QuizAttempt):
+            await analytics_service.record_quiz_attempt(db, row)
+        else:
+            await analytics_service.record_study_session(db, row)
+    await db.commit()
+
+
+async def rollups(db):
+    result = {}
+    for table in (DailyTopicStats, WeeklyTopicStats):
+        for row in (await db.execute(select(table))).scalars():
+            result[(table.__tablename__, row.topic, row.period_start)] = tuple(getattr(row, c) for c in COUNTERS)
+    return result
+
+
+async def test_series_read_the_daily_and_weekly_rows(db, activity):
+    days = await analytics_service.series(db, 1, "day", date(2026, 10, 12), date(2026, 10, 31))
+    assert [(d["period_start"], d["quiz_attempts"], d["study_minutes"]) for d in days] == [
+        (date(2026, 10, 12), 2, 0), (date(2026, 10, 14), 0, 45.0), (date(2026, 10, 20), 1, 0),
+    ]
+    assert days[0]["average_score"] == 75.0 and days[1]["average_score"] is None
+
+    weeks = await analytics_service.series(db, 1, "week", date(2026, 10, 14), date(2026, 10, 31), topic="Cells")
+    assert [(w["period_start"], w["quiz_attempts"], w["study_sessions"]) for w in weeks] == [
+        (date(2026, 10, 12), 2, 1), (date(2026, 10, 19), 1, 0),
+    ]
+
+
+async def test_topics_are_ordered_by_weak_flags(db, activity):
+    topics = await analytics_service.topics(db, 1, date(2026, 10, 1), date(2026, 10, 31))
+    assert [(t["topic"], t["weak_area_flags"], t["quiz_attempts"]) for t in topics] == [("Osmosis", 2, 0), ("Cells", 0, 3)]
+
+
+async def test_backfill_rebuilds_the_same_rollups(db, activity):
+    recorded = await rollups(db)
+    await db.execute(DailyTopicStats.__table__.delete())
+    await db.commit()
+
+    counts = await analytics_service.backfill(db, batch_size=2)
+    assert counts == {"quiz_attempts": 3, "study_sessions": 1, "daily_rows": 8, "weekly_rows": 6}
+    db.expunge_all()
+    assert await rollups(db) == recorded
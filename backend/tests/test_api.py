@@ -0,0 +1,36 @@
+"""
+Error responses shared by all endpoints
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import llm
+from app.services.nlp_service import nlp_service
+from app.services.token_budget import InputTooLargeError
+from main import app
+
+
+ORIGIN = "http://localhost:3000"
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)  # server exceptions are raised, so an error that escapes fails the test
+
+
+@pytest.mark.parametrize("error, status", [
+    (InputTooLargeError("Input is 9000 tokens, at most 8000 fit"), 413),
+    (llm.DeadlineExceededError("generate_notes did not finish within 30s"), 504),
+    (llm.CircuitOpenError("Upstream unavailable, retry in 10s"), 503),
+    (RuntimeError("unexpected"), 500),
+], ids=["too_large", "deadline", "circuit_open", "unhandled"])
+def test_errors_map_to_status_and_detail_with_cors_headers(client, monkeypatch, error, status):
+    async def generate_notes(content, subject):
+        raise error
+
+    monkeypatch.setattr(nlp_service, "generate_notes", generate_notes)
+    response = client.post("/api/v1/notes/generate", json={"content": "Cells divide."}, headers={"Origin": ORIGIN})
+    assert response.status_code == status
+    assert response.json() == {"detail": str(error)}
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+
@@ -0,0 +1,96 @@
+"""
+Offline batches: shared concurrency limit, resuming from the output, shutdown and the upload limit
+"""
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.services import batch_service as batch_module
+from app.services.batch_service import BatchService
+from main import app
+
+
+class Tracker:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def job(self, value, delay=0.01):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(delay)
+            if value == "fail":
+                raise ValueError("bad input")
+            return value
+        finally:
+            self.running -= 1
+
+
+def write_jobs(path, values):
+    path.write_text("".join(json.dumps({"id": f"job{i}", "method": "echo", "params": {"value": v}}) + "\n"
+                            for i, v in enumerate(values)))
+
+
+async def test_all_batches_share_one_concurrency_limit(tmp_path, monkeypatch):
+    tracker = Tracker()
+    monkeypatch.setitem(batch_module.JOB_METHODS, "echo", tracker.job)
+    service = BatchService(max_concurrency=3)
+    for name in ("a", "b"):
+        write_jobs(tmp_path / f"{name}.jsonl", range(10))
+
+    counts = await asyncio.gather(*(
+        service.run(str(tmp_path / f"{name}.jsonl"), str(tmp_path / f"{name}.out"), concurrency=50)
+        for name in ("a", "b")
+    ))
+    assert all(c == {"total": 10, "skipped": 0, "completed": 10, "failed": 0} for c in counts)
+    assert tracker.peak == 3
+
+
+async def test_rerun_skips_jobs_that_succeeded(tmp_path, monkeypatch):
+    tracker = Tracker()
+    monkeypatch.setitem(batch_module.JOB_METHODS, "echo", tracker.job)
+    service = BatchService(max_concurrency=4)
+    jobs, output = tmp_path / "jobs.jsonl", tmp_path / "results.jsonl"
+    write_jobs(jobs, ["ok", "fail", "ok"])
+    with open(jobs, "a") as f:
+        f.write("not json\n")
+
+    first = await service.run(str(jobs), str(output))
+    assert first == {"total": 4, "skipped": 0, "completed": 2, "failed": 2}
+    errors = {result["id"]: result["error"] for result in map(json.loads, output.read_text().splitlines())
+              if result["status"] == "error"}
+    assert errors["job1"] == "bad input"
+    assert errors["4"].startswith("Invalid job on line 4")
+
+    second = await service.run(str(jobs), str(output))
+    assert second == {"total": 4, "skipped": 2, "completed": 0, "failed": 2}
+
+
+async def test_shutdown_cancels_running_batches(tmp_path, monkeypatch):
+    tracker = Tracker()
+    monkeypatch.setattr(batch_module.settings, "BATCH_DIR", str(tmp_path))
+    monkeypatch.setitem(batch_module.JOB_METHODS, "echo", lambda value: tracker.job(value, delay=10))
+    service = BatchService(max_concurrency=2)
+    jobs = tmp_path / "upload.jsonl"
+    write_jobs(jobs, range(5))
+
+    batch_id = service.start(str(jobs), concurrency=2)
+    await asyncio.sleep(0.05)
+    assert tracker.running == 2
+    await service.shutdown()
+
+    assert tracker.running == 0 and not service.tasks
+    assert service.status(batch_id)["status"] == "interrupted"
+
+
+def test_uploads_over_the_job_limit_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_module.settings, "BATCH_DIR", str(tmp_path))
+    monkeypatch.setattr(batch_module.settings, "BATCH_MAX_JOBS", 2)
+    jobs = b'{"id": "1"}\n{"id": "2"}\n{"id": "3"}'  # the last line has no newline
+
+    response = TestClient(app).post("/api/v1/batch/jobs", files={"file": ("jobs.jsonl", jobs)})
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Batch has more than 2 jobs"}
+    assert list(tmp_path.iterdir()) == []  # the partial upload is removed
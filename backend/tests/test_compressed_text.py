@@ -0,0 +1,69 @@
+"""
+Compressed text columns: round trip, legacy plain rows and the migration job
+"""
+import zlib
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import undefer
+
+from app.core.config import settings
+from app.models.models import Lecture, Note
+from app.models.types import PLAIN, ZLIB, CompressedText, decompress, stored_plain_text
+from app.services.text_storage import text_storage
+
+
+LONG = "The mitochondria is the powerhouse of the cell. " * 100
+
+
+@pytest.mark.parametrize("dialect", [sqlite.dialect(), postgresql.dialect()], ids=["sqlite", "postgresql"])
+def test_values_round_trip(dialect):
+    column = CompressedText()
+    stored = column.process_bind_param(LONG, dialect)
+    assert stored[:1] == ZLIB and len(stored) < len(LONG)
+    assert column.process_result_value(stored, dialect) == LONG
+
+    short = column.process_bind_param("Short note", dialect)
+    assert short == ("Short note" if dialect.name == "sqlite" else PLAIN + b"Short note")
+    assert column.process_result_value(short, dialect) == "Short note"
+    assert column.process_bind_param(None, dialect) is None
+
+
+def test_stored_plain_text():
+    assert stored_plain_text("legacy text") == "legacy text"
+    assert stored_plain_text(PLAIN + "ünïcode".encode("utf-8")) == "ünïcode"
+    assert stored_plain_text(ZLIB + zlib.compress(b"x")) is None
+    assert decompress(ZLIB + zlib.compress("ünïcode".encode("utf-8"))) == "ünïcode"
+
+
+async def test_long_text_is_stored_compressed(db, topic):
+    db.add(Lecture(id=1, subject_id=1, title="Lecture", source_type="upload", transcript=LONG))
+    await db.commit()
+
+    raw = (await db.execute(text("SELECT transcript FROM lectures WHERE id = 1"))).scalar()
+    assert isinstance(raw, bytes) and raw[:1] == ZLIB
+    db.expunge_all()
+    lecture = await db.get(Lecture, 1, options=[undefer(Lecture.transcript)])
+    assert lecture.transcript == LONG
+
+
+async def test_legacy_rows_are_read_and_then_compressed(db, topic, monkeypatch):
+    await db.execute(text(
+        "INSERT INTO notes (id, topic_id, title, content, summary, note_type) "
+        "VALUES (1, 1, 'Old note', :content, 'Short summary', 'manual')"
+    ), {"content": LONG})
+    await db.commit()
+    note = (await db.execute(select(Note).options(undefer(Note.content), undefer(Note.summary)))).scalar_one()
+    assert (note.content, note.summary) == (LONG, "Short summary")
+
+    monkeypatch.setattr(settings, "TEXT_MIGRATION_BATCH", 1)
+    counts = await text_storage.migrate(db)
+    assert counts["notes"] == {"rows_read": 1, "rows_compressed": 1}
+    raw = (await db.execute(text("SELECT content, summary FROM notes"))).one()
+    assert raw.content[:1] == ZLIB and raw.summary == "Short summary"
+
+    db.expunge_all()
+    note = await db.get(Note, 1, options=[undefer(Note.content)])
+    assert note.content == LONG
+    assert (await text_storage.migrate(db))["notes"]["rows_compressed"] == 0  # nothing left to do
@@ -0,0 +1,92 @@
+"""
+Response compression: encoding negotiation, size and type thresholds, streaming
+"""
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core import compression
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+
+
+LARGE = {"transcript": "The Calvin cycle fixes carbon in the stroma. " * 200}
+
+
+def build_app() -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/large")
+    async def large():
+        return LARGE
+
+    @app.get("/audio")
+    async def audio():
+        return Response(b"\x00" * 5000, media_type="audio/mpeg")
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for n in range(3):
+                yield f'{{"line": {n}, "text": "{"x" * 300}"}}\n'
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return app
+
+
+@pytest.fixture
+def client():
+    return TestClient(build_app())
+
+
+def test_negotiation_follows_q_values_and_prefers_brotli_on_ties(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())  # only its presence matters here
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("*;q=0.3") == "br"
+    assert negotiate_encoding("br;q=0, identity") is None
+
+    monkeypatch.setattr(compression, "brotli", None)
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("br, gzip;q=0.1") == "gzip"
+    assert negotiate_encoding("gzip;q=bad") is None
+
+
+def test_large_json_is_gzipped_and_small_or_binary_bodies_are_not(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content) / 10
+    assert response.json() == LARGE
+
+    for path in ("/small", "/audio"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streamed_chunks_are_each_flushed(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        chunks = list(response.iter_raw())
+
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    decoded = [decoder.decompress(chunk) for chunk in chunks]
+    assert decoded[0].startswith(b'{"line": 0') and decoded[0].endswith(b"\n")  # usable before the stream ends
+    assert b"".join(decoded).count(b"\n") == 3
+
+
+def test_brotli_when_installed(client):
+    brotli = pytest.importorskip("brotli")
+    response = client.get("/large", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    with client.stream("GET", "/large", headers={"Accept-Encoding": "br"}) as raw:
+        assert brotli.decompress(b"".join(raw.iter_raw())).decode() == response.text
@@ -0,0 +1,85 @@
+"""
+NDJSON export and import of a user's data
+"""
+import orjson
+import pytest
+
+from app.models.models import Flashcard, Note, Quiz, QuizAttempt, Subject, Topic, User
+from app.services.data_transfer import ImportFormatError, data_transfer
+
+
+async def export_lines(user_id: int):
+    body = b"".join([chunk async for chunk in data_transfer.export(user_id, batch_size=2)])
+    return [orjson.loads(line) for line in body.splitlines()]
+
+
+async def chunks(body: bytes, size: int = 7):
+    for start in range(0, len(body), size):  # lines split across chunks, as a streamed request body arrives
+        yield body[start:start + size]
+
+
+def comparable(records):
+    """Records without the ids and owners an import assigns anew"""
+    skip = {"id", "subject_id", "topic_id", "quiz_id", "created_at"}
+    return [{k: v for k, v in record.items() if k not in skip} for record in records if record["type"] != "export"]
+
+
+@pytest.fixture
+async def library(db, topic):
+    db.add(User(id=2, email="other@example.com", username="other", hashed_password="x"))
+    db.add(Topic(id=2, subject_id=1, name="Energy"))
+    db.add_all([Note(topic_id=1, title=f"Note {i}", content=f"Cells, part {i}. " * (50 * i + 1)) for i in range(3)])
+    db.add(Flashcard(topic_id=2, question="What makes ATP?", answer="Mitochondria"))
+    db.add(Quiz(id=1, topic_id=2, title="Energy quiz", questions=[{"question": "ATP?", "correct_answer": "Yes"}]))
+    await db.flush()
+    db.add(QuizAttempt(quiz_id=1, user_id=1, answers=["Yes"], score=1.0, weak_areas=[]))
+    await db.commit()
+
+
+async def test_export_then_import_reproduces_the_data(library):
+    exported = await export_lines(1)
+    assert exported[0]["type"] == "export" and exported[0]["version"] == 1
+    assert [record["type"] for record in exported[1:]] == (
+        ["subject", "topic", "topic"] + ["note"] * 3 + ["flashcard", "quiz", "quiz_attempt"]
+    )
+
+    body = b"".join(orjson.dumps(record) + b"\n" for record in exported)
+    counts = await data_transfer.import_records(2, chunks(body), batch_size=2)
+    assert counts == {"subject": 1, "topic": 2, "note": 3, "flashcard": 1, "quiz": 1, "quiz_attempt": 1}
+
+    imported = await export_lines(2)
+    assert comparable(imported) == comparable(exported)
+    by_type = {}
+    for record in imported[1:]:
+        by_type.setdefault(record["type"], []).append(record)
+    assert {t["subject_id"] for t in by_type["topic"]} == {by_type["subject"][0]["id"]}
+    assert by_type["flashcard"][0]["topic_id"] == by_type["topic"][1]["id"]
+    assert by_type["quiz_attempt"][0]["quiz_id"] == by_type["quiz"][0]["id"] != 1
+
+
+async def test_bad_line_reports_what_was_already_imported(db, topic):
+    body = (
+        b'{"type": "subject", "id": 7, "name": "Chemistry"}\n'
+        b'{"type": "topic", "id": 8, "subject_id": 7, "name": "Bonds"}\n'
+        b'{"type": "note", "id": 9, "topic_id": 99, "title": "Orphan", "content": "x"}\n'
+    )
+    with pytest.raises(ImportFormatError) as error:
+        await data_transfer.import_records(1, chunks(body), batch_size=1)
+    assert "line 3" in str(error.value) and "unknown topic 99" in str(error.value)
+    assert error.value.imported["subject"] == 1 and error.value.imported["topic"] == 1
+
+    with pytest.raises(ImportFormatError, match="line 1: invalid JSON"):
+        await data_transfer.import_records(1, chunks(b"{not json\n"))
+
+
+async def test_imported_notes_are_searchable(db, topic):
+    from app.services.search_service import search_index
+
+    body = (
+        b'{"type": "subject", "id": 1, "name": "Chemistry"}\n'
+        b'{"type": "topic", "id": 1, "subject_id": 1, "name": "Bonds"}\n'
+        b'{"type": "note", "id": 1, "topic_id": 1, "title": "Covalent", "content": "Electrons are shared"}\n'
+    )
+    await data_transfer.import_records(1, chunks(body))
+    page = await search_index.search(db, 1, "electrons")
+    assert [result["title"] for result in page["results"]] == ["Covalent"]
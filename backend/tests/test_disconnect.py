@@ -0,0 +1,104 @@
+"""
+Client disconnects: cancelling the request handler and the upstream calls it awaits
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.core import disconnect
+from app.core.disconnect import CancellationCounter, DisconnectMiddleware
+from app.services import llm
+
+
+def scope(path: str = "/api/v1/notes/generate", body: bool = False):
+    headers = [(b"content-length", b"2")] if body else []
+    return {"type": "http", "method": "POST", "path": path, "headers": headers}
+
+
+class Client:
+    """ASGI receive/send pair; `disconnect()` makes the next receive report that the client left"""
+
+    def __init__(self, body: bytes = b""):
+        self.messages = [{"type": "http.request", "body": body, "more_body": False}] if body else []
+        self.left = asyncio.Event()
+        self.sent = []
+
+    async def receive(self):
+        if self.messages:
+            return self.messages.pop(0)
+        await self.left.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    def disconnect(self):
+        self.left.set()
+
+
+def handler(started: asyncio.Event, outcome: dict, delay: float = 10):
+    async def app(scope, receive, send):
+        if scope["headers"]:
+            outcome["body"] = (await receive())["body"]
+        started.set()
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            outcome["cancelled"] = True
+            raise
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"done"})
+    return app
+
+
+async def run_until_started(client, request_scope, delay: float = 10):
+    started, outcome = asyncio.Event(), {}
+    middleware = DisconnectMiddleware(handler(started, outcome, delay))
+    task = asyncio.create_task(middleware(request_scope, client.receive, client.send))
+    await started.wait()
+    return task, outcome
+
+
+async def test_disconnect_cancels_the_handler_and_is_counted(monkeypatch):
+    monkeypatch.setattr(disconnect, "cancellations", CancellationCounter())
+    client = Client(body=b"{}")
+    task, outcome = await run_until_started(client, scope(body=True))
+
+    client.disconnect()
+    await asyncio.wait_for(task, 1)
+    assert outcome == {"body": b"{}", "cancelled": True}
+    assert client.sent == []
+    assert disconnect.cancellations.metrics()["by_path"] == {"/api/v1/notes/generate": 1}
+
+
+async def test_completed_requests_are_not_cancelled(monkeypatch):
+    monkeypatch.setattr(disconnect, "cancellations", CancellationCounter())
+    client = Client()
+    task, outcome = await run_until_started(client, scope(), delay=0)
+    await asyncio.wait_for(task, 1)
+    client.disconnect()
+
+    assert "cancelled" not in outcome and client.sent[-1]["body"] == b"done"
+    assert disconnect.cancellations.metrics()["requests"] == 0
+
+
+async def test_cancelled_upstream_calls_are_counted_and_free_the_breaker_trial(monkeypatch):
+    monkeypatch.setattr(llm, "cancellations", CancellationCounter())
+    breaker = llm._breaker("disconnect-test-model")
+    breaker._opened_at = time.monotonic() - breaker.cooldown  # half open: the next call is the trial
+    waiting = asyncio.Event()
+
+    async def create(**kwargs):
+        waiting.set()
+        await asyncio.sleep(10)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    call = asyncio.create_task(llm.create_chat_completion(
+        client, model="disconnect-test-model", messages=[{"role": "user", "content": "hi"}]
+    ))
+    await waiting.wait()
+    call.cancel()
+    await asyncio.gather(call, return_exceptions=True)
+
+    assert llm.cancellations.metrics()["by_call"] == {"llm": {"default": 1}}
+    assert breaker.allow()  # the cancelled trial had no outcome, so another may run
@@ -0,0 +1,42 @@
+"""
+CPU offload: inline below the size threshold, in the process pool above it
+"""
+import operator
+import os
+
+import pytest
+
+from app.core.executor import CPUExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = CPUExecutor(workers=1, min_size=100)
+    yield executor
+    executor.shutdown()
+
+
+async def test_everything_runs_inline_until_started(executor):
+    assert await executor.run(os.getpid, size=10_000) == os.getpid()
+    assert executor.stats["inline"] == 1 and executor.metrics()["running"] is False
+
+
+async def test_large_inputs_go_to_the_pool_and_small_ones_stay_inline(executor):
+    executor.start()
+    assert await executor.run(os.getpid, size=99) == os.getpid()
+    assert await executor.run(os.getpid, size=100) != os.getpid()
+    assert await executor.run(sorted, [3, 1, 2], reverse=True, size=500) == [3, 2, 1]
+
+    with pytest.raises(ZeroDivisionError):
+        await executor.run(operator.truediv, 1, 0, size=500)
+
+    metrics = executor.metrics()
+    assert (metrics["inline"], metrics["offloaded"], metrics["errors"]) == (1, 3, 1)
+    assert metrics["in_flight"] == 0 and metrics["busy_seconds"] >= 0
+
+
+async def test_shutdown_returns_to_inline(executor):
+    executor.start()
+    executor.shutdown()
+    assert await executor.run(os.getpid, size=500) == os.getpid()
+    assert not executor.running
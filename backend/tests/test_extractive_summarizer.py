@@ -0,0 +1,58 @@
+"""
+Extractive pre-summarization: keeping central sentences in order, within the ratio, per method
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.extractive_summarizer import ExtractiveSummarizer, reduce_for_method
+
+
+TOPIC = [
+    "Photosynthesis turns light energy into chemical energy in the chloroplast.",
+    "The light reactions of photosynthesis split water and make ATP in the chloroplast.",
+    "The Calvin cycle uses that ATP to fix carbon dioxide into sugar during photosynthesis.",
+    "Chlorophyll in the chloroplast absorbs the light that drives photosynthesis.",
+]
+ASIDE = [
+    "Remember that the parking lot closes early on Friday.",
+    "Yesterday my neighbour bought a blue bicycle.",
+]
+
+
+@pytest.mark.parametrize("method", ["textrank", "tfidf"])
+def test_central_sentences_are_kept_in_their_original_order(method):
+    text = " ".join([TOPIC[0], ASIDE[0], TOPIC[1], ASIDE[1], TOPIC[2], TOPIC[3]])
+    summary = ExtractiveSummarizer(method).summarize(text, 0.6)
+
+    assert len(summary) <= 0.6 * len(text) + max(len(s) for s in TOPIC)
+    assert not any(aside in summary for aside in ASIDE)
+    kept = [sentence for sentence in TOPIC if sentence in summary]
+    assert len(kept) >= 2 and summary == " ".join(kept)
+
+
+def test_repeated_caption_text_is_kept_once():
+    text = " ".join(TOPIC + [TOPIC[1].upper()] * 3 + ASIDE)
+    summary = ExtractiveSummarizer().summarize(text, 0.9)
+    assert summary.lower().count(TOPIC[1].lower()) == 1
+
+
+def test_short_texts_and_full_ratios_are_unchanged():
+    summarizer = ExtractiveSummarizer()
+    assert summarizer.summarize(" ".join(TOPIC[:2]), 0.2) == " ".join(TOPIC[:2])
+    assert summarizer.summarize(" ".join(TOPIC), 1.0) == " ".join(TOPIC)
+    with pytest.raises(ValueError):
+        ExtractiveSummarizer("lsa")
+
+
+def test_unpunctuated_captions_are_ranked_as_pseudo_sentences():
+    words = " ".join(f"word{i % 60}" for i in range(400))
+    sentences = ExtractiveSummarizer().split_sentences(words)
+    assert len(sentences) >= 10 and all(len(s.split()) <= 40 for s in sentences)
+
+
+def test_reduction_applies_per_method_above_the_minimum(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTIVE_MIN_TOKENS", 200)
+    long_text = " ".join((TOPIC + ASIDE) * 5)
+    assert len(reduce_for_method("nlp.summarize_text", long_text)) < 0.5 * len(long_text)
+    assert reduce_for_method("tutor.answer_question", long_text) == long_text  # no ratio configured
+    assert reduce_for_method("nlp.summarize_text", " ".join(TOPIC)) == " ".join(TOPIC)  # under the minimum
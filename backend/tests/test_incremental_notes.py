@@ -0,0 +1,116 @@
+"""
+Incremental notes: merging sections, processing only new transcript text and refreshing stored notes
+"""
+import importlib
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import undefer
+
+from app.core.config import settings
+from app.models.models import Lecture, Note
+from app.services.nlp_service import TranscriptMismatchError, merge_notes, nlp_service
+
+notes_endpoints = importlib.import_module("app.api.v1.endpoints.notes")
+
+FIRST = "Cells take in glucose. Glycolysis splits it in the cytoplasm. "
+SECOND = "The Krebs cycle runs in the mitochondria. It releases carbon dioxide. "
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake note generation, recording the transcript text sent with each call"""
+    calls = []
+
+    async def generate_notes(transcript, subject=""):
+        calls.append(transcript)
+        return f"## Respiration\n- {transcript.strip()}\n"
+
+    async def generate_note_update(segment, headings, subject):
+        calls.append(segment)
+        return f"## Respiration\n- {segment.strip()}\n\n## New terms\n- Krebs cycle\n"
+
+    monkeypatch.setattr(nlp_service, "generate_notes", generate_notes)
+    monkeypatch.setattr(nlp_service, "_generate_note_update", generate_note_update)
+    monkeypatch.setattr(settings, "NOTES_MIN_UPDATE_TOKENS", 10)
+    return calls
+
+
+def test_merge_appends_to_matching_sections_and_skips_repeated_lines():
+    notes = "# Biology\n\n## Respiration\n- Glycolysis\n\n## Summary\n- Cells need energy\n"
+    update = "### respiration\n- Glycolysis\n- Krebs cycle\n\n## Enzymes\n- Catalysts\n"
+    assert merge_notes(notes, update) == (
+        "# Biology\n\n## Respiration\n- Glycolysis\n- Krebs cycle\n\n"
+        "## Summary\n- Cells need energy\n\n## Enzymes\n- Catalysts\n"
+    )
+
+
+async def test_only_complete_sentences_after_the_offset_are_processed(upstream):
+    notes, offset = await nlp_service.update_notes("", FIRST + "The electron")
+    assert offset == len(FIRST) - 1 and upstream == [FIRST.strip()]
+
+    transcript = FIRST + SECOND + "The electron"
+    notes, offset = await nlp_service.update_notes(notes, transcript, offset)
+    assert offset == len(FIRST + SECOND) - 1
+    assert upstream[1] == SECOND.strip()
+    assert notes.count("## Respiration") == 1 and "- Krebs cycle" in notes
+
+    # Too little new text: nothing is sent
+    assert await nlp_service.update_notes(notes, transcript + " chain.", offset) == (notes, offset)
+    assert len(upstream) == 2
+
+
+async def test_offset_past_the_transcript_raises_instead_of_dropping_notes(upstream):
+    with pytest.raises(TranscriptMismatchError):
+        await nlp_service.update_notes("## Respiration\n- Glycolysis\n", FIRST, len(FIRST) + 50)
+    assert upstream == []
+
+
+@pytest.fixture
+async def stored(db, topic):
+    db.add(Lecture(id=1, subject_id=1, title="Respiration", source_type="live", transcript=FIRST + SECOND))
+    await db.commit()
+
+    async def add_note(note_id: int, transcript_offset):
+        db.add(Note(id=note_id, topic_id=1, lecture_id=1, title="Respiration",
+                    content="## Respiration\n- Glycolysis\n", transcript_offset=transcript_offset))
+        await db.commit()
+
+    return add_note
+
+
+async def note_content(db, note_id: int) -> str:
+    db.expunge_all()
+    return (await db.get(Note, note_id, options=[undefer(Note.content)])).content
+
+
+async def test_refresh_processes_text_after_the_stored_offset(db, stored, upstream):
+    await stored(1, len(FIRST))
+    response = await notes_endpoints.refresh_note(1, db=db)
+    assert upstream == [SECOND.strip()]
+    assert response.processed_chars == len(SECOND) - 1
+    assert (await db.get(Note, 1)).transcript_offset == len(FIRST + SECOND) - 1
+
+
+async def test_refresh_without_a_known_offset_requires_a_full_regenerate(db, stored, upstream):
+    await stored(2, 0)
+    await db.execute(Note.__table__.update().values(transcript_offset=None))  # stored before the column existed
+    await db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        await notes_endpoints.refresh_note(2, db=db)
+    assert error.value.status_code == 409
+    assert upstream == [] and await note_content(db, 2) == "## Respiration\n- Glycolysis\n"
+
+    response = await notes_endpoints.refresh_note(2, full=True, db=db)
+    assert upstream == [(FIRST + SECOND).strip()]
+    assert response.covered_offset == len(FIRST + SECOND) - 1
+    assert await note_content(db, 2) == response.notes
+
+
+async def test_refresh_of_a_replaced_transcript_keeps_the_notes(db, stored, upstream):
+    await stored(1, len(FIRST + SECOND) + 100)
+    with pytest.raises(HTTPException) as error:
+        await notes_endpoints.refresh_note(1, db=db)
+    assert error.value.status_code == 409 and "full=true" in error.value.detail
+    assert await note_content(db, 1) == "## Respiration\n- Glycolysis\n"
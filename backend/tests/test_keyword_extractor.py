@@ -0,0 +1,73 @@
+"""
+Local key concepts: RAKE phrases weighted by corpus IDF, the stored corpus and sharing it with the CPU pool
+"""
+import pytest
+
+from app.core import executor as executor_module
+from app.core.database import async_session_maker
+from app.core.executor import CPUExecutor
+from app.services import keyword_extractor as keyword_module
+from app.services.keyword_extractor import KeywordExtractor, document_key, extract_concepts
+
+
+LECTURE = (
+    "Photosynthesis converts light energy into chemical energy. The light reactions happen in the "
+    "thylakoid membrane, and the Calvin cycle fixes carbon dioxide in the stroma. "
+    "Photosynthesis needs chlorophyll, and the Calvin cycle uses ATP from the light reactions."
+)
+
+
+@pytest.fixture(autouse=True)
+def published(monkeypatch):
+    """Keep corpora published by these tests away from the app's extractor"""
+    monkeypatch.setattr(executor_module, "_published", {})
+
+
+def test_phrases_are_ranked_and_common_corpus_terms_rank_low():
+    concepts = extract_concepts(LECTURE, 10, {}, 0)
+    assert set(concepts[:2]) == {"light reactions", "calvin cycle"}
+    assert "photosynthesis converts light" in concepts[:5] and "atp" in concepts
+    assert not {"the", "and", "uses", "happen"} & {word for concept in concepts for word in concept.split()}
+
+    # Terms found in every stored transcript lose their weight
+    common = extract_concepts(LECTURE, 5, {"photosynthesis": 100, "light": 100}, 100)
+    assert common[0] == "calvin cycle" and "photosynthesis converts light" not in common
+    assert extract_concepts("the and of", 5, {}, 0) == []
+
+
+async def test_documents_are_counted_once_per_key(db):
+    extractor = KeywordExtractor()
+    assert await extractor.add_document(document_key(video_id="abc123"), LECTURE)
+    assert not await extractor.add_document(document_key(video_id="abc123"), LECTURE + " Again.")
+    assert await extractor.add_document(document_key(lecture_id=7), "Mitosis divides cells.")
+    assert extractor.document_count == 2 and extractor.document_frequency["cells"] == 1
+
+    reloaded = KeywordExtractor()
+    await reloaded.load_corpus(async_session_maker)
+    assert (reloaded.document_count, reloaded.document_frequency) == (2, extractor.document_frequency)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    executor = CPUExecutor(workers=1, min_size=0)
+    monkeypatch.setattr(keyword_module, "cpu_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+async def test_pool_workers_use_the_corpus_published_when_it_changed(pool):
+    extractor = KeywordExtractor()
+    extractor.document_frequency.update({"photosynthesis": 50, "light": 50})
+    extractor.document_count = 50
+    extractor._publish()
+    pool.start()
+
+    before = await extractor.extract(LECTURE)
+    assert pool.stats["offloaded"] == 1
+    assert before == extract_concepts(LECTURE, 15, {"photosynthesis": 50, "light": 50}, 50)
+
+    extractor.document_frequency.update({"calvin": 50, "cycle": 50})
+    extractor._publish()
+    after = await extractor.extract(LECTURE)
+    assert after != before
+    assert after == extract_concepts(LECTURE, 15, extractor.document_frequency, 50)
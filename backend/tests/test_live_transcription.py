@@ -0,0 +1,122 @@
+"""
+Live transcription: overlapping windows, in-order partials, backpressure and WAV headers
+"""
+import asyncio
+import io
+import wave
+
+import pytest
+
+from app.services.live_transcription import LiveTranscriptionSession
+from app.services.transcription_service import pcm_to_wav
+
+
+RATE = 100  # samples per second, so one second of 16-bit mono audio is 200 bytes
+
+
+class Recorder:
+    """Collects partials sent to the client and the windows sent to Whisper"""
+
+    def __init__(self, texts=None, delays=None):
+        self.partials = []
+        self.calls = []
+        self.texts = texts or {}
+        self.delays = delays or {}
+
+    async def send(self, message):
+        self.partials.append(message)
+
+    async def transcribe(self, audio, filename, prompt=None):
+        seq = int(filename.split("-")[1].split(".")[0])
+        with wave.open(io.BytesIO(audio)) as wav:
+            self.calls.append((seq, wav.getframerate(), wav.getnframes(), prompt))
+        await asyncio.sleep(self.delays.get(seq, 0))
+        text = self.texts.get(seq, f"window {seq}")
+        if isinstance(text, Exception):
+            raise text
+        return text
+
+
+def session(recorder, **kwargs):
+    options = {"sample_rate": RATE, "window_seconds": 1.0, "overlap_seconds": 0.25, "max_inflight": 4}
+    return LiveTranscriptionSession(recorder.send, transcribe=recorder.transcribe, **{**options, **kwargs})
+
+
+async def test_windows_overlap_and_trailing_audio_is_flushed():
+    recorder = Recorder()
+    live = session(recorder)
+    for _ in range(6):
+        await live.feed(b"\x00" * 100)  # 3 seconds in half-second frames
+    await live.finish()
+
+    assert [(p["start"], p["end"]) for p in recorder.partials] == [(0.0, 1.0), (0.75, 1.75), (1.5, 2.5), (2.25, 3.0)]
+    assert [frames for _, _, frames, _ in sorted(recorder.calls)] == [100, 100, 100, 75]
+
+
+async def test_short_trailing_audio_is_dropped():
+    recorder = Recorder()
+    live = session(recorder)
+    await live.feed(b"\x00" * 210)  # one window, then only the overlap and 0.05s more
+    await live.finish()
+    assert live.windows == 1
+
+
+async def test_partials_arrive_in_order_without_repeated_overlap_words():
+    recorder = Recorder(
+        texts={
+            0: "the cell membrane controls",
+            1: "membrane controls what enters",
+            2: RuntimeError("upstream failed"),
+            3: "and leaves the cell",
+        },
+        delays={0: 0.05, 1: 0.01}  # finish in reverse order
+    )
+    live = session(recorder)
+    await live.feed(b"\x00" * 650)
+    transcript = await live.finish()
+
+    assert [p["seq"] for p in recorder.partials] == [0, 1, 2, 3]
+    assert recorder.partials[2]["error"] == "upstream failed" and recorder.partials[2]["text"] == ""
+    assert transcript == "the cell membrane controls what enters and leaves the cell"
+
+
+async def test_text_emitted_so_far_is_the_next_prompt():
+    recorder = Recorder(texts={0: "photosynthesis happens in chloroplasts"})
+    live = session(recorder)
+    await live.feed(b"\x00" * 200)
+    await asyncio.sleep(0.01)
+    await live.feed(b"\x00" * 150)
+    await live.finish()
+    assert [prompt for *_, prompt in sorted(recorder.calls)] == [None, "photosynthesis happens in chloroplasts"]
+
+
+async def test_feeding_waits_while_max_inflight_windows_are_running():
+    release = asyncio.Event()
+    recorder = Recorder()
+
+    async def slow(audio, filename, prompt=None):
+        await release.wait()
+        return "text"
+
+    live = LiveTranscriptionSession(recorder.send, sample_rate=RATE, window_seconds=1.0, overlap_seconds=0,
+                                    max_inflight=2, transcribe=slow)
+    await live.feed(b"\x00" * 400)
+    third = asyncio.create_task(live.feed(b"\x00" * 200))
+    await asyncio.sleep(0.02)
+    assert live.windows == 2 and not third.done()
+
+    release.set()
+    await third
+    await live.finish()
+    assert live.windows == 3 and len(recorder.partials) == 3
+
+
+async def test_format_is_taken_from_a_wav_header():
+    recorder = Recorder()
+    live = session(recorder)
+    await live.feed(pcm_to_wav(b"\x00" * 400, sample_rate=200))
+    await live.finish()
+    assert recorder.calls == [(0, 200, 200, None)]
+
+    with pytest.raises(ValueError):
+        await session(Recorder()).feed(b"RIFF\x00\x00\x00\x00WAVEjunk")
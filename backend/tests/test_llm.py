@@ -0,0 +1,138 @@
+"""
+Upstream call path: circuit breaker, hedged requests and deadlines
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.core.config import settings
+from app.services import llm
+from app.services.llm import CircuitBreaker, CircuitOpenError, DeadlineExceededError, create_chat_completion
+
+
+def completion(content: str):
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+class FakeClient:
+    """Stands in for AsyncOpenAI; each call runs the next behaviour (a coroutine function)"""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        behaviour = self.behaviours[min(self.calls, len(self.behaviours) - 1)]
+        self.calls += 1
+        return await behaviour()
+
+
+def reply(content: str, delay: float = 0.0):
+    async def behaviour():
+        await asyncio.sleep(delay)
+        return completion(content)
+    return behaviour
+
+
+async def connection_error():
+    raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+def call(client, model: str):
+    # A model other than OPENAI_MODEL is pinned, so each test gets its own circuit breaker
+    return create_chat_completion(client, model=model, messages=[{"role": "user", "content": "hi"}])
+
+
+def test_breaker_opens_after_consecutive_failures_and_half_opens_after_cooldown():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record(ok=False)
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record(ok=False)
+    assert breaker.state == "open" and not breaker.allow()
+    assert breaker.rejected == 1
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # a single trial call at a time
+    breaker.record(ok=False)
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(ok=True)
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_cancelled_trial_lets_the_next_call_through():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0)
+    breaker.record(ok=False)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+async def test_open_circuit_fails_fast_without_calling_upstream(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "LLM_HEDGING_ENABLED", False)
+    client = FakeClient(connection_error)
+    for _ in range(2):
+        with pytest.raises(openai.APIConnectionError):
+            await call(client, "breaker-test-model")
+
+    with pytest.raises(CircuitOpenError) as error:
+        await call(client, "breaker-test-model")
+    assert error.value.status_code == 503
+    assert client.calls == 2
+
+
+async def test_bad_requests_do_not_open_the_circuit(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(settings, "LLM_HEDGING_ENABLED", False)
+
+    async def bad_request():
+        raise ValueError("malformed request")
+
+    client = FakeClient(bad_request, reply("ok"))
+    with pytest.raises(ValueError):
+        await call(client, "bad-request-model")
+    assert (await call(client, "bad-request-model")).choices[0].message.content == "ok"
+
+
+async def test_slow_call_is_hedged_and_the_faster_attempt_wins(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_RATIO", 1.0)
+    monkeypatch.setattr(llm._latencies, "percentile", lambda method, pct: 0.01)
+    stats = llm._stats("default")
+    hedged, wins = stats["hedged"], stats["hedge_wins"]
+
+    client = FakeClient(reply("slow", delay=5.0), reply("fast"))
+    started = time.perf_counter()
+    response = await call(client, "hedge-test-model")
+
+    assert response.choices[0].message.content == "fast"
+    assert time.perf_counter() - started < 1.0  # the slow attempt was cancelled, not awaited
+    assert client.calls == 2
+    assert (stats["hedged"], stats["hedge_wins"]) == (hedged + 1, wins + 1)
+
+
+async def test_no_hedge_before_enough_latency_samples(monkeypatch):
+    monkeypatch.setattr(llm._latencies, "percentile", lambda method, pct: None)
+    client = FakeClient(reply("only", delay=0.05))
+    assert (await call(client, "unhedged-model")).choices[0].message.content == "only"
+    assert client.calls == 1
+
+
+async def test_deadline_is_reported_as_its_own_error(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_DEFAULT_DEADLINE", 0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGING_ENABLED", False)
+    client = FakeClient(reply("late", delay=5.0))
+    with pytest.raises(DeadlineExceededError) as error:
+        await call(client, "deadline-test-model")
+    assert error.value.status_code == 504
@@ -0,0 +1,80 @@
+"""
+Model routing: matching by method, tier and input size, context windows and fallbacks
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import llm
+from app.services.model_router import LatencyTierMiddleware, ModelRouter, model_router
+
+
+ROUTES = [
+    {"name": "small", "model": "gpt-4o-mini", "methods": ["nlp.summarize_text", "tutor.*"], "max_input_tokens": 2000,
+     "fallbacks": ["gpt-3.5-turbo"]},
+    {"name": "long", "model": "gpt-4", "methods": ["nlp.*"]},
+    {"name": "fast", "model": "gpt-4o-mini", "tiers": ["fast"]},
+]
+
+
+def messages(tokens: int):
+    return [{"role": "user", "content": "word " * (tokens * 4 // 5)}]
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(ROUTES, {"gpt-4o": ["gpt-4-turbo"]}, "standard")
+
+
+def test_first_matching_route_wins(router):
+    def model_for(method, tokens=100):
+        return router.route(method, messages(tokens), 500, "gpt-4o")
+
+    assert model_for("nlp.summarize_text").route == "small"
+    assert model_for("tutor.explain_concept").model == "gpt-4o-mini"  # prefix pattern
+    assert model_for("nlp.summarize_text", tokens=3000).route == "long"  # over the small route's limit
+    assert model_for("nlp.generate_notes", tokens=9000).route == "default"  # gpt-4's 8k window is too small
+    assert model_for("quiz.generate_quiz").route == "default"
+    assert model_for("quiz.generate_quiz").model == "gpt-4o"
+
+    with router.tier("fast"):
+        assert model_for("quiz.generate_quiz").route == "fast"
+    with router.tier("unknown"):
+        assert router.current_tier() == "standard"
+
+
+def test_unavailable_models_fall_back_in_order(router):
+    def choose(method, down):
+        return router.route(method, messages(100), 500, "gpt-4o", available=lambda model: model not in down)
+
+    assert vars(choose("tutor.explain_concept", {"gpt-4o-mini"})) == {
+        "route": "small", "model": "gpt-3.5-turbo", "fallback": True
+    }
+    assert choose("tutor.explain_concept", {"gpt-4o-mini", "gpt-3.5-turbo"}).model == "gpt-4o"  # the default model
+    assert choose("quiz.generate_quiz", {"gpt-4o"}).model == "gpt-4-turbo"  # MODEL_FALLBACKS
+    assert vars(choose("quiz.generate_quiz", {"gpt-4o", "gpt-4-turbo"})) == {
+        "route": "default", "model": "gpt-4o", "fallback": False
+    }
+
+
+def test_unknown_default_tier_is_rejected():
+    with pytest.raises(ValueError):
+        ModelRouter([], {}, "instant")
+
+
+def test_latency_tier_header_applies_to_the_request():
+    app = FastAPI()
+    app.add_middleware(LatencyTierMiddleware)
+
+    @app.get("/tier")
+    async def tier():
+        return {"tier": model_router.current_tier()}
+
+    client = TestClient(app)
+    assert client.get("/tier", headers={"X-Latency-Tier": "Fast"}).json() == {"tier": "fast"}
+    assert client.get("/tier").json() == {"tier": model_router.default_tier}
+
+
+def test_explicitly_named_models_are_not_routed():
+    kwargs = {"model": "gpt-4-turbo", "messages": messages(100), "max_tokens": 100}
+    assert vars(llm._route("nlp.summarize_text", kwargs)) == {"route": "pinned", "model": "gpt-4-turbo", "fallback": False}
@@ -0,0 +1,64 @@
+"""
+Prompt registry: stable prefixes, version pinning, cache keys and prefix-cache statistics
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.prompts import PromptRegistry, PromptTemplate, prompt_registry
+
+
+def template(version: int = 1, system: str = "You are a tutor.") -> PromptTemplate:
+    return PromptTemplate("tutor.answer", version, system=system, context="Lecture:\n{lecture}",
+                          user="{question} (level {level})")
+
+
+def test_messages_go_from_most_to_least_stable():
+    history = [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello"}]
+    messages = template().render(history=history, lecture="Enzymes", question="What is a substrate?", level=2)
+    assert messages == [
+        {"role": "system", "content": "You are a tutor."},
+        {"role": "system", "content": "Lecture:\nEnzymes"},
+        *history,
+        {"role": "user", "content": "What is a substrate? (level 2)"},
+    ]
+    with pytest.raises(KeyError, match="lecture, level"):
+        template().render(question="?")
+
+
+def test_registered_system_prompts_are_sent_verbatim():
+    for versions in prompt_registry._templates.values():
+        for prompt in versions.values():
+            first = prompt.render(**{field: "first" for field in prompt.fields})
+            second = prompt.render(**{field: "second" for field in prompt.fields})
+            assert first[0] == second[0] == {"role": "system", "content": prompt.system}
+
+
+def test_cache_keys_depend_on_version_variables_and_template_text():
+    key = template().cache_key(lecture="Enzymes", question="Why?", level=1, unused="ignored")
+    assert key == template().cache_key(level=1, question="Why?", lecture="Enzymes")
+    assert key.startswith("tutor.answer@1:")
+    assert key != template().cache_key(lecture="Enzymes", question="Why?", level=2)
+    assert key != template(system="You are a strict tutor.").cache_key(lecture="Enzymes", question="Why?", level=1)
+    assert template().prefix_key == template(version=2).prefix_key
+
+
+def test_latest_version_unless_pinned(monkeypatch):
+    registry = PromptRegistry()
+    first, second = registry.register(template(1)), registry.register(template(2, "You are a kind tutor."))
+    assert registry.get("tutor.answer") is second
+    monkeypatch.setitem(settings.PROMPT_VERSIONS, "tutor.answer", 1)
+    assert registry.get("tutor.answer") is first
+    assert registry.get("tutor.answer", version=2) is second
+    with pytest.raises(ValueError):
+        registry.register(template(1))
+
+
+def test_cache_hits_and_latency_are_reported_per_version():
+    registry = PromptRegistry()
+    prompt = registry.register(template())
+    registry.record(prompt, prompt_tokens=1000, cached_tokens=800, latency_seconds=0.2)
+    registry.record(prompt, prompt_tokens=1000, cached_tokens=0, latency_seconds=0.6)
+    assert registry.metrics() == [{
+        "prompt": "tutor.answer", "version": 1, "fingerprint": prompt.fingerprint, "calls": 2,
+        "hit_rate": 0.5, "cached_token_share": 0.4, "mean_latency_ms_hit": 200.0, "mean_latency_ms_miss": 600.0,
+    }]
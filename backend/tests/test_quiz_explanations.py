@@ -0,0 +1,98 @@
+"""
+Batched explanations of wrong answers, split when a batch exceeds the prompt budget
+"""
+import importlib
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.quiz_service import explanation_key, quiz_service
+from app.services.token_budget import InputTooLargeError
+
+quiz_module = importlib.import_module("app.services.quiz_service")  # app.services exports the singleton under this name
+
+
+def items(count: int):
+    return [
+        {"question": f"Question {n}?", "correct_answer": "A", "user_answer": "B",
+         "key": explanation_key(f"Question {n}?", "A", "B", "visual")}
+        for n in range(count)
+    ]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake batched and single-question calls, recording the questions of each"""
+    calls = {"batches": [], "singles": []}
+
+    async def create_chat_completion(client, prompt=None, **kwargs):
+        listing = kwargs["messages"][-1]["content"]
+        numbers = [n for n in range(1, 100) if f"Item {n}:" in listing]
+        calls["batches"].append(len(numbers))
+        content = json.dumps({"explanations": [{"item": n, "explanation": f"batched {n}"} for n in numbers]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    async def generate_explanation(question, correct_answer, user_answer, learning_style):
+        calls["singles"].append(question)
+        return f"single {question}"
+
+    monkeypatch.setattr(quiz_module, "create_chat_completion", create_chat_completion)
+    monkeypatch.setattr(quiz_service, "_generate_explanation", generate_explanation)
+    return calls
+
+
+def budget_of(monkeypatch, max_items: int):
+    """Let token_budget.fit reject listings with more than max_items items"""
+    def fit(method, text, max_tokens, **kwargs):
+        if text.count("Item ") > max_items:
+            raise InputTooLargeError("too long")
+
+    monkeypatch.setattr(quiz_module.token_budget, "fit", fit)
+
+
+async def test_batch_within_budget_is_one_call(monkeypatch, upstream):
+    budget_of(monkeypatch, 8)
+    explanations = await quiz_service._explain_batch(items(5), "visual")
+    assert upstream["batches"] == [5] and upstream["singles"] == []
+    assert len(explanations) == 5
+
+
+async def test_oversized_batch_is_split_in_half(monkeypatch, upstream):
+    budget_of(monkeypatch, 2)
+    batch = items(7)
+    explanations = await quiz_service._explain_batch(batch, "visual")
+    assert sorted(upstream["batches"]) == [1, 2, 2, 2]
+    assert set(explanations) == {item["key"] for item in batch}
+
+
+async def test_single_items_too_large_for_a_batch_use_the_single_prompt(monkeypatch, upstream):
+    budget_of(monkeypatch, 0)
+    batch = items(3)
+    explanations = await quiz_service._explain_batch(batch, "visual")
+    assert upstream["batches"] == []
+    assert sorted(upstream["singles"]) == ["Question 0?", "Question 1?", "Question 2?"]
+    assert explanations[batch[0]["key"]] == "single Question 0?"
+
+
+async def test_items_the_model_skipped_are_explained_one_at_a_time(monkeypatch, upstream):
+    budget_of(monkeypatch, 8)
+
+    async def partial(client, prompt=None, **kwargs):
+        content = json.dumps({"explanations": [{"item": 1, "explanation": "first"}, {"item": "x"}]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    monkeypatch.setattr(quiz_module, "create_chat_completion", partial)
+    batch = items(3)
+    explanations = await quiz_service._explain_batch(batch, "visual")
+    assert explanations[batch[0]["key"]] == "first"
+    assert upstream["singles"] == ["Question 1?", "Question 2?"]
+
+
+def test_explanation_keys_ignore_case_and_spacing():
+    assert explanation_key("What is ATP?", "Energy", "DNA", "visual") == explanation_key(
+        "what  is ATP? ", "energy", "dna", "Visual"
+    )
+    assert explanation_key("What is ATP?", "Energy", "DNA", "visual") != explanation_key(
+        "What is ATP?", "Energy", "RNA", "visual"
+    )
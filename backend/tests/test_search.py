@@ -0,0 +1,66 @@
+"""
+Full-text search: ranking per owner, snippets and keeping the contentless index current
+"""
+import pytest
+from sqlalchemy import text
+
+from app.models.models import Lecture, Note, Subject, Topic, User
+from app.services.search_service import _fts5_match, search_index
+
+
+TRANSCRIPT = "Today we cover the Calvin cycle and how carbon is fixed in the stroma. " * 40
+
+
+@pytest.fixture
+async def notes(db, topic):
+    db.add(User(id=2, email="other@example.com", username="other", hashed_password="x"))
+    db.add(Subject(id=2, user_id=2, name="Other"))
+    db.add(Topic(id=2, subject_id=2, name="Other"))
+    db.add_all([
+        Note(id=1, topic_id=1, title="Photosynthesis", content="Chloroplasts capture light energy.", summary="Light"),
+        Note(id=2, topic_id=1, title="Mitosis", content="Cell division produces two identical daughter cells."),
+        Note(id=3, topic_id=2, title="Someone else's", content="Photosynthesis in another account."),
+        Lecture(id=1, subject_id=1, title="Lecture 3", source_type="upload", transcript=TRANSCRIPT),
+    ])
+    await db.commit()
+
+
+async def search(db, query, **kwargs):
+    page = await search_index.search(db, 1, query, **kwargs)
+    return [(result["kind"], result["id"]) for result in page["results"]]
+
+
+async def test_results_are_ranked_and_limited_to_the_owner(db, notes):
+    assert await search(db, "photosynthesis") == [("note", 1)]
+    assert await search(db, "producing") == [("note", 2)]  # stemmed
+    assert await search(db, "calvin cycle", kinds=["note"]) == []
+
+    page = await search_index.search(db, 1, '"calvin cycle"', limit=1)
+    assert page["has_more"] is False
+    assert "<mark>Calvin cycle</mark>" in page["results"][0]["snippet"]  # from the compressed transcript
+
+
+async def test_updates_and_deletes_keep_the_index_current(db, notes):
+    note = await db.get(Note, 2)
+    note.content = "Meiosis halves the chromosome number."
+    await db.commit()
+    assert await search(db, "meiosis") == [("note", 2)]
+    assert await search(db, "division") == []
+
+    await db.delete(await db.get(Note, 1))
+    await db.commit()
+    assert await search(db, "photosynthesis") == []
+
+    # Raises if a row was removed with values other than those it was indexed with
+    await db.execute(text("INSERT INTO notes_fts (notes_fts, rank) VALUES ('integrity-check', 1)"))
+
+
+async def test_index_keeps_no_copy_of_the_text(db, notes):
+    stored = (await db.execute(text("SELECT content FROM notes_fts WHERE rowid = 1"))).scalar()
+    assert stored is None
+
+
+def test_user_input_is_quoted_for_fts5():
+    assert _fts5_match('cells OR "light energy" -plants') == '"cells" OR "light energy" NOT "plants"'
+    assert _fts5_match("title:secret NEAR(a b)") == '"title" "secret" "NEAR" "a" "b"'
+    assert _fts5_match("-only or") == ""
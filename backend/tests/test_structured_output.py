@@ -0,0 +1,91 @@
+"""
+Structured output: local repair, salvage of cut-off JSON, regeneration of missing items
+"""
+import json
+
+from app.core.config import settings
+from app.services.structured_output import (
+    FLASHCARD_SCHEMA, QuizQuestionSchema, StructuredOutput, parse_items, repair_max_tokens
+)
+
+
+def test_aliases_option_maps_and_boolean_answers_are_repaired():
+    content = json.dumps({"questions": [
+        {"type": "Multiple Choice", "prompt": " Which organelle makes ATP? ",
+         "choices": {"B": "Ribosome", "A": "Mitochondrion"}, "answer": "A"},
+        {"type": "true/false", "question": "Cells have walls", "correct_answer": False},
+        {"type": "mcq", "question": "Pick one", "options": ["x", "y"], "correct_answer": "z"},
+    ]})
+    parsed = parse_items(content, QuizQuestionSchema(["mcq", "true_false"]))
+
+    assert parsed.items == [
+        {"type": "mcq", "question": "Which organelle makes ATP?", "options": ["Mitochondrion", "Ribosome"],
+         "correct_answer": "A"},
+        {"type": "true_false", "question": "Cells have walls", "correct_answer": "False"},
+    ]
+    assert parsed.repaired == 2
+    assert parsed.invalid == ["correct_answer is not an option"]
+
+
+def test_unrequested_types_are_rejected():
+    content = json.dumps({"questions": [{"type": "short answer", "question": "Why?", "correct_answer": "Because"}]})
+    parsed = parse_items(content, QuizQuestionSchema(["mcq"]))
+    assert parsed.items == []
+    assert parsed.invalid == ["unrequested type short_answer"]
+
+
+def test_complete_items_are_salvaged_from_cut_off_json():
+    content = '{"flashcards": [{"front": "ATP", "back": "Energy carrier"}, {"q": "DNA", "a": "Genes"}, {"q": "RN'
+    parsed = parse_items(content, FLASHCARD_SCHEMA)
+    assert parsed.salvaged
+    assert parsed.items == [{"question": "ATP", "answer": "Energy carrier"}, {"question": "DNA", "answer": "Genes"}]
+
+
+def test_an_array_under_another_key_is_accepted():
+    parsed = parse_items(json.dumps({"cards": [{"question": "Q", "answer": "A"}]}), FLASHCARD_SCHEMA)
+    assert parsed.items == [{"question": "Q", "answer": "A"}]
+    assert not parsed.salvaged
+
+
+async def test_only_missing_items_are_requested_again(monkeypatch):
+    monkeypatch.setattr(settings, "STRUCTURED_OUTPUT_MAX_REPAIRS", 2)
+    responses = [
+        json.dumps({"flashcards": [
+            {"question": "ATP", "answer": "Energy"}, {"question": "atp ", "answer": "Duplicate"}, {"question": "DNA"},
+        ]}),
+        json.dumps({"flashcards": [{"question": "RNA", "answer": "Messenger"}, {"question": "ATP", "answer": "Again"}]}),
+        json.dumps({"flashcards": [{"question": "Ribosome", "answer": "Protein factory"}]}),
+    ]
+    requests = []
+
+    async def request(needed, accepted):
+        requests.append((needed, [item["question"] for item in accepted]))
+        return responses[len(requests) - 1]
+
+    service = StructuredOutput()
+    items = await service.collect("nlp.generate_flashcards", FLASHCARD_SCHEMA, 3, request)
+
+    assert [item["question"] for item in items] == ["ATP", "RNA", "Ribosome"]
+    assert requests == [(3, []), (2, ["ATP"]), (1, ["ATP", "RNA"])]
+    stats = service.metrics()["nlp.generate_flashcards"]
+    assert (stats["repair_calls"], stats["duplicates"], stats["invalid"], stats["short"]) == (2, 2, 1, 0)
+
+
+async def test_collection_stops_after_the_repair_limit(monkeypatch):
+    monkeypatch.setattr(settings, "STRUCTURED_OUTPUT_MAX_REPAIRS", 1)
+    calls = []
+
+    async def request(needed, accepted):
+        calls.append(needed)
+        return "not json"
+
+    service = StructuredOutput()
+    assert await service.collect("nlp.generate_flashcards", FLASHCARD_SCHEMA, 2, request) == []
+    assert calls == [2, 2]
+    assert service.metrics()["nlp.generate_flashcards"]["short"] == 1
+
+
+def test_repair_calls_ask_for_proportionally_fewer_tokens():
+    assert repair_max_tokens(2000, 10, 10) == 2000
+    assert repair_max_tokens(2000, 5, 10) == 1000
+    assert repair_max_tokens(2000, 1, 100) == 200  # never below MIN_REPAIR_TOKENS
@@ -0,0 +1,95 @@
+"""
+Local study-plan scheduling: allocation, laying sessions out within the study day and the hours limit
+"""
+import random
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.services.study_scheduler import StudyScheduler, TopicDemand, parse_deadline, study_scheduler
+from main import app
+
+
+def minutes(time: str) -> int:
+    hours, mins = time.split(":")
+    return int(hours) * 60 + int(mins)
+
+
+def check_layout(scheduler: StudyScheduler, plan, day_start: str, day_end: str):
+    for day, entries in plan.weekly_schedule.items():
+        assert day in scheduler.days
+        previous_end = minutes(day_start)
+        for entry in entries:
+            start, end = (minutes(part) for part in entry["time"].split("-"))
+            assert start == previous_end and end - start == entry["minutes"]
+            previous_end = end
+        assert previous_end <= minutes(day_end)
+
+
+def test_time_is_shared_by_mastery_gap():
+    scheduler = StudyScheduler(days=["Monday", "Wednesday"], day_start="18:00", day_end="22:00", session_minutes=60)
+    plan = scheduler.schedule([TopicDemand("Cells", 0.0), TopicDemand("Genetics", 0.5), TopicDemand("Cells", 0.3)], 6)
+
+    assert plan.allocation == {"Cells": 240, "Genetics": 120}  # duplicates keep their lowest mastery
+    assert plan.priority_topics == ["Cells", "Genetics"]
+    assert sum(entry["minutes"] for entries in plan.weekly_schedule.values() for entry in entries) == 360
+    check_layout(scheduler, plan, "18:00", "22:00")
+
+
+def test_hours_beyond_the_study_days_are_dropped():
+    scheduler = StudyScheduler(days=["Monday", "Tuesday"], day_start="19:00", day_end="21:00")
+    assert scheduler.max_hours_per_week == 4
+    plan = scheduler.schedule([TopicDemand("Cells"), TopicDemand("Energy")], 20)
+    assert sum(plan.allocation.values()) == 240
+    check_layout(scheduler, plan, "19:00", "21:00")
+
+
+def test_sessions_longer_than_the_day_are_split():
+    scheduler = StudyScheduler(days=["Monday", "Tuesday"], day_start="20:00", day_end="21:00", session_minutes=120)
+    plan = scheduler.schedule([TopicDemand("Cells")], 2)
+    assert [entry["minutes"] for entries in plan.weekly_schedule.values() for entry in entries] == [60, 60]
+    check_layout(scheduler, plan, "20:00", "21:00")
+
+
+def test_random_plans_stay_within_the_day():
+    rng = random.Random(3)
+    for _ in range(300):
+        start = rng.randint(6, 20) * 60 + rng.choice([0, 30])
+        end = min(start + rng.randint(1, 8) * 30, 24 * 60)
+        day_start, day_end = f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}"
+        scheduler = StudyScheduler(
+            days=rng.sample(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"], rng.randint(1, 5)),
+            day_start=day_start, day_end=day_end, session_minutes=rng.choice([30, 60, 90, 120]),
+        )
+        topics = [TopicDemand(f"Topic {k}", rng.random()) for k in range(rng.randint(1, 8))]
+        hours = rng.uniform(0.5, 30)
+        plan = scheduler.schedule(topics, hours)
+
+        scheduled = sum(entry["minutes"] for entries in plan.weekly_schedule.values() for entry in entries)
+        assert scheduled == sum(plan.allocation.values())
+        assert scheduled <= min(hours, scheduler.max_hours_per_week) * 60
+        check_layout(scheduler, plan, day_start, day_end)
+
+
+def test_milestones_follow_projected_mastery_until_the_deadline():
+    scheduler = StudyScheduler(days=["Monday"], day_start="18:00", day_end="22:00", hours_per_topic=10)
+    plan = scheduler.schedule([TopicDemand("Cells", 0.2)], 4, deadline=date(2024, 3, 29), today=date(2024, 3, 1))
+
+    assert plan.weeks == 4
+    assert plan.load == round(0.8 * 10 / 4 / 4, 2)
+    assert [milestone["week"] for milestone in plan.milestones] == [1, 2]
+    assert plan.milestones[0]["targets"] == {"Cells": 0.6}
+    assert plan.milestones[-1]["targets"] == {"Cells": 1.0}  # full mastery: later checkpoints are dropped
+
+
+def test_parse_deadline():
+    assert parse_deadline("2024-05-01T12:00:00") == date(2024, 5, 1)
+    assert parse_deadline("next week") is None
+    assert parse_deadline(None) is None
+
+
+def test_plans_over_the_weekly_hours_are_rejected():
+    hours = study_scheduler.max_hours_per_week + 1
+    response = TestClient(app).post("/api/v1/study-plans/", json={"user_id": 1, "available_hours_per_week": hours})
+    assert response.status_code == 400
+    assert "hours per week" in response.json()["detail"]
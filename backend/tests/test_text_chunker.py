@@ -0,0 +1,77 @@
+"""
+Streaming chunker: token budgets, overlap and the original chunk_text boundaries
+"""
+import random
+import re
+
+from app.services.nlp_service import nlp_service
+from app.services.text_chunker import iter_chunks, iter_sentences
+from app.services.tokens import count_words
+
+
+WORDS = ["cell", "membrane", "protein", "energy", "the", "a", "transport", "enzyme", "mitochondria"]
+
+
+def make_text(rng: random.Random, sentences: int) -> str:
+    parts = []
+    for _ in range(sentences):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 40)))
+        parts.append(words + rng.choice([".", "!", "?", ";"]) + rng.choice([" ", "  ", "\n", " \n "]))
+    return "".join(parts).rstrip() if rng.random() < 0.5 else "".join(parts)
+
+
+def original_chunk_text(text: str, chunk_size: int, overlap: int):
+    """NLPService.chunk_text before the streaming chunker, kept as the reference"""
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    chunks, current_chunk, current_length = [], [], 0
+    for sentence in sentences:
+        sentence_length = len(sentence.split())
+        if current_length + sentence_length > chunk_size and current_chunk:
+            chunks.append(' '.join(current_chunk))
+            overlap_sentences, overlap_length = [], 0
+            for s in reversed(current_chunk):
+                if overlap_length < overlap:
+                    overlap_sentences.insert(0, s)
+                    overlap_length += len(s.split())
+                else:
+                    break
+            current_chunk, current_length = overlap_sentences, overlap_length
+        current_chunk.append(sentence)
+        current_length += sentence_length
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+    return chunks
+
+
+def test_sentences_match_re_split():
+    for text in ("", "One. Two!  Three?", "Ends with space. ", "No punctuation at all"):
+        assert list(iter_sentences(text)) == re.split(r'(?<=[.!?])\s+', text)
+
+
+def test_chunk_text_keeps_the_original_boundaries():
+    rng = random.Random(7)
+    for _ in range(300):
+        text = make_text(rng, rng.randint(0, 30))
+        chunk_size, overlap = rng.randint(5, 80), rng.randint(1, 30)
+        assert nlp_service.chunk_text(text, chunk_size, overlap) == original_chunk_text(text, chunk_size, overlap)
+
+
+def test_fitted_chunks_stay_within_the_budget():
+    rng = random.Random(11)
+    for _ in range(200):
+        text = make_text(rng, rng.randint(1, 30))
+        budget, overlap = rng.randint(3, 60), rng.randint(0, 20)
+        chunks = list(iter_chunks(text, budget, overlap, count=count_words))
+        assert all(count_words(chunk) <= budget for chunk in chunks)
+
+
+def test_fitted_chunks_cover_every_word_in_order():
+    text = "Short one. " + " ".join(f"w{i}" for i in range(50)) + ". Tail sentence here."
+    chunks = list(iter_chunks(text, 10, 0, count=count_words))
+    assert all(count_words(chunk) <= 10 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_overlap_repeats_trailing_sentences():
+    text = "A b c. D e f. G h i. J k l."
+    assert list(iter_chunks(text, 6, 3, count=count_words)) == ["A b c. D e f.", "D e f. G h i.", "G h i. J k l."]
@@ -0,0 +1,57 @@
+"""
+Prompt token budgets: policies per method and fitting oversized inputs
+"""
+import pytest
+
+from app.core.config import settings
+from app.services.token_budget import InputTooLargeError, TokenBudget
+
+
+TEXT = " ".join(f"Sentence number {i} is about cells and energy." for i in range(400))
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_INPUT_TOKENS", {})
+    return TokenBudget()
+
+
+def test_input_that_fits_is_returned_unchanged(budget):
+    fitted = budget.fit("nlp.generate_notes", "A short input.", max_tokens=100)
+    assert fitted.fits and fitted.text == "A short input."
+
+
+def test_methods_without_a_policy_are_an_error(budget):
+    with pytest.raises(KeyError):
+        budget.fit("nlp.no_such_method", TEXT, max_tokens=100)
+
+
+def test_policies_for_unknown_methods_or_strategies_fail_at_startup(monkeypatch):
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_POLICIES", {"nlp.generate_note": "chunk"})
+    with pytest.raises(ValueError, match="unknown methods"):
+        TokenBudget()
+    monkeypatch.setattr(settings, "TOKEN_BUDGET_POLICIES", {"nlp.generate_notes": "shorten"})
+    with pytest.raises(ValueError, match="strategy"):
+        TokenBudget()
+
+
+def test_strategies(monkeypatch, budget):
+    monkeypatch.setattr(settings, "MAX_INPUT_TOKENS", {
+        "nlp.generate_notes": 500, "tutor.get_tutor_response": 500, "quiz.explain_attempt": 500,
+    })
+
+    chunked = budget.fit("nlp.generate_notes", TEXT, max_tokens=100)
+    assert chunked.strategy == "chunk" and len(chunked.chunks) > 1
+    assert all(len(chunk) <= 500 * 4 for chunk in chunked.chunks)  # estimate: four characters per token
+
+    truncated = budget.fit("tutor.get_tutor_response", TEXT, max_tokens=100)
+    assert truncated.strategy == "truncate"
+    assert TEXT.startswith(truncated.text) and truncated.input_tokens <= 500
+
+    with pytest.raises(InputTooLargeError):
+        budget.fit("quiz.explain_attempt", TEXT, max_tokens=100)
+
+
+def test_dated_model_names_use_their_family_window(budget):
+    assert budget.context_window("gpt-4o-mini-2024-07-18") == 128000
+    assert budget.context_window("gpt-4-0613") == 8192
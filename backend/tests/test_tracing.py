@@ -0,0 +1,80 @@
+"""
+Span tracing: nesting through contextvars, sampling and export
+"""
+import json
+import threading
+
+from app.core.tracing import NOOP_SPAN, JSONLExporter, Tracer, traced, tracer
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+        self.exported = threading.Event()
+
+    def export(self, spans):
+        self.spans.extend(spans)
+        self.exported.set()
+
+
+async def test_spans_nest_under_the_active_span(monkeypatch):
+    exporter = CollectingExporter()
+    sampled = Tracer(1.0, exporter)
+    monkeypatch.setattr(tracer, "span", sampled.span)  # traced() opens spans on the module tracer
+
+    @traced("service.method")
+    async def method():
+        with sampled.span("openai.chat.completions", kind="client") as span:
+            span.set("prompt_tokens", 12)
+            span.add("retries", 1)
+            span.add("retries", 1)
+
+    with sampled.start_trace("POST /notes/generate", method="POST") as root:
+        await method()
+
+    assert exporter.exported.wait(5)
+    by_name = {span.name: span for span in exporter.spans}
+    upstream, service = by_name["openai.chat.completions"], by_name["service.method"]
+    assert upstream.parent_id == service.span_id
+    assert service.parent_id == root.span_id
+    assert {span.trace_id for span in exporter.spans} == {root.trace_id}
+    assert upstream.attributes == {"prompt_tokens": 12, "retries": 2}
+    assert root.attributes == {"method": "POST"}
+
+
+def test_unsampled_traces_use_the_noop_span():
+    exporter = CollectingExporter()
+    unsampled = Tracer(0.0, exporter)
+    with unsampled.start_trace("request") as root, unsampled.span("child") as child:
+        child.set("ignored", True)
+    assert root is NOOP_SPAN and child is NOOP_SPAN
+    assert unsampled.current_span() is NOOP_SPAN
+    assert not exporter.exported.wait(0.05)
+
+
+def test_errors_mark_the_span():
+    exporter = CollectingExporter()
+    sampled = Tracer(1.0, exporter)
+    try:
+        with sampled.start_trace("request"), sampled.span("child"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert exporter.exported.wait(5)
+    assert all(span.status == "error" for span in exporter.spans)
+    assert {span.attributes["error"] for span in exporter.spans} == {"RuntimeError"}
+
+
+def test_jsonl_exporter_appends_one_line_per_span(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = CollectingExporter()
+    with Tracer(1.0, exporter).start_trace("request") as root:
+        root.set("status_code", 200)
+    assert exporter.exported.wait(5)
+
+    JSONLExporter(str(path)).export(exporter.spans)
+    JSONLExporter(str(path)).export(exporter.spans)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["name"] == "request" and lines[0]["attributes"] == {"status_code": 200}
+    assert lines[0]["end_ns"] >= lines[0]["start_ns"]
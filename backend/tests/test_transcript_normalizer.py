@@ -0,0 +1,56 @@
+"""
+Caption normalization: non-speech markers, rolling-caption overlap and added sentence breaks
+"""
+from collections import deque
+
+from app.services.transcript_normalizer import MAX_SENTENCE_WORDS, normalize_snippets, overlap_length
+
+
+def snippet(text: str, start: float, duration: float = 2.0):
+    return {"text": text, "start": start, "duration": duration}
+
+
+def test_markers_and_html_entities_are_removed():
+    transcript, stats = normalize_snippets([
+        snippet("[Music] welcome back &amp; today", 0.0),
+        snippet("we cover enzymes (laughs) ♪♪", 2.0),
+        snippet(">> [Applause]", 4.0),
+    ])
+    assert transcript == "Welcome back & today we cover enzymes."
+    assert stats.markers_removed == 5 and stats.snippets == 3
+    assert stats.duration == 6.0
+
+
+def test_rolling_caption_overlap_is_dropped_once():
+    transcript, stats = normalize_snippets([
+        snippet("the enzyme binds to", 0.0),
+        snippet("binds to the substrate", 1.5),
+        snippet("the substrate and then", 3.0),
+        snippet("that that changes shape", 4.5),
+    ])
+    assert transcript == "The enzyme binds to the substrate and then that that changes shape."
+    assert stats.duplicate_words_removed == 4
+    assert 0 < stats.token_reduction < 1
+
+
+def test_pauses_and_long_runs_become_sentence_breaks():
+    transcript, stats = normalize_snippets([
+        snippet("first idea here", 0.0, 1.0),
+        snippet("second idea after a pause", 3.0, 1.0),
+        snippet("continues right away.", 4.1, 1.0),
+    ], sentence_gap=1.5)
+    assert transcript == "First idea here. Second idea after a pause continues right away."
+    assert stats.sentence_breaks_added == 1
+
+    run = [snippet(" ".join(f"w{n}x{i}" for i in range(10)), 0.1 * n, 0.1) for n in range(6)]
+    transcript, _ = normalize_snippets(run, sentence_gap=10)
+    first = transcript.split(". ")[0]
+    assert MAX_SENTENCE_WORDS <= len(first.split()) < MAX_SENTENCE_WORDS + 10
+
+
+def test_overlap_needs_two_words_unless_it_is_the_whole_snippet():
+    recent = deque(["the", "enzyme", "binds"])
+    assert overlap_length(recent, ["enzyme", "binds", "to"]) == 2
+    assert overlap_length(recent, ["binds", "again"]) == 0  # "binds binds" may be speech
+    assert overlap_length(recent, ["Binds"]) == 1
+    assert overlap_length(deque(), ["new"]) == 0
@@ -0,0 +1,111 @@
+"""
+Timed transcript segments: the stored track, time-range lookups and the lecture endpoints
+"""
+import importlib
+
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from app.models.models import Lecture
+from app.services.nlp_service import nlp_service
+from app.services.transcript_normalizer import iter_segments
+from app.services.transcript_segments import SegmentTrack, build_segments
+
+lectures = importlib.import_module("app.api.v1.endpoints.lectures")
+transcription = importlib.import_module("app.services.transcription_service")
+
+SNIPPETS = [
+    {"text": "[Music]", "start": 0.0, "duration": 2.0},
+    {"text": "welcome to the lecture", "start": 2.0, "duration": 4.0},
+    {"text": "to the lecture on café enzymes", "start": 5.0, "duration": 4.0},  # rolling caption
+    {"text": "lower activation energy", "start": 9.0, "duration": 3.0},
+    {"text": "substrates bind &amp; react", "start": 15.0, "duration": 2.5},
+]
+
+
+def test_segments_keep_their_timing_and_drop_repeated_words():
+    assert list(iter_segments(SNIPPETS)) == [
+        (2.0, 4.0, "welcome to the lecture"),
+        (5.0, 4.0, "on café enzymes"),
+        (9.0, 3.0, "lower activation energy"),
+        (15.0, 2.5, "substrates bind & react"),
+    ]
+
+
+def test_tracks_round_trip_through_their_stored_form():
+    track = SegmentTrack.from_bytes(build_segments(SNIPPETS))
+    assert len(track) == 4
+    assert track.starts.tolist() == [2.0, 5.0, 9.0, 15.0]
+    assert track.text_between(0, 4) == "welcome to the lecture on café enzymes lower activation energy substrates bind & react"
+    with pytest.raises(ValueError):
+        SegmentTrack.from_bytes(b"NOPE" + bytes(4))
+
+
+def test_spans_include_segments_still_running_at_the_start():
+    track = SegmentTrack.from_snippets(SNIPPETS)
+    assert track.span(5.5, 9.0) == (0, 2)  # the first caption runs until 6.0
+    assert track.span(6.0, 9.5) == (1, 3)
+    assert track.span(12.0, 15.0) == (3, 3)
+    assert track.span(0.0, float("inf")) == (0, 4)
+
+
+def test_slices_use_character_offsets_into_their_own_text():
+    data = SegmentTrack.from_snippets(SNIPPETS).slice(1, 3)
+    text, offsets = data["text"], data["offsets"].tolist()
+    assert text == "on café enzymes lower activation energy"
+    assert [text[offsets[k]:offsets[k + 1] - 1] for k in range(2)] == ["on café enzymes", "lower activation energy"]
+
+
+@pytest.fixture
+async def lecture(db, topic):
+    db.add(Lecture(id=1, subject_id=1, title="Enzymes", source_type="youtube", segments=build_segments(SNIPPETS)))
+    db.add(Lecture(id=2, subject_id=1, title="Untimed", source_type="upload"))
+    await db.commit()
+
+
+async def test_segments_endpoint_returns_the_range_as_arrays(db, lecture):
+    response = await lectures.get_segments(1, start=6.0, end=10.0, db=db)
+    body = orjson.loads(response.body)
+    assert body["count"] == 2 and body["covered"] == [5.0, 12.0]
+    assert body["starts"] == [5.0, 9.0] and body["durations"] == [4.0, 3.0]
+    assert body["text"] == "on café enzymes lower activation energy"
+
+    empty = orjson.loads((await lectures.get_segments(1, start=100.0, end=None, db=db)).body)
+    assert empty["count"] == 0 and empty["covered"] is None and empty["text"] == ""
+
+
+@pytest.mark.parametrize("lecture_id, start, end, status", [(1, 5.0, 5.0, 400), (2, 0.0, None, 400), (3, 0.0, None, 404)])
+async def test_segments_endpoint_rejects_bad_requests(db, lecture, lecture_id, start, end, status):
+    with pytest.raises(HTTPException) as error:
+        await lectures.get_segments(lecture_id, start=start, end=end, db=db)
+    assert error.value.status_code == status
+
+
+async def test_notes_are_generated_from_the_captions_in_range(db, lecture, monkeypatch):
+    sent = []
+
+    async def generate_notes(transcript, subject=""):
+        sent.append((transcript, subject))
+        return "## Enzymes"
+
+    monkeypatch.setattr(nlp_service, "generate_notes", generate_notes)
+    request = lectures.RangeNotesRequest(start=9.0, end=20.0, subject="Biology")
+    response = await lectures.generate_range_notes(1, request, db=db)
+    assert sent == [("lower activation energy substrates bind & react", "Biology")]
+    assert response["segments"] == 2 and response["covered"] == [9.0, 17.5] and response["notes"] == "## Enzymes"
+
+    with pytest.raises(HTTPException) as error:
+        await lectures.generate_range_notes(1, lectures.RangeNotesRequest(start=12.5, end=14.0), db=db)
+    assert error.value.status_code == 400 and len(sent) == 1
+
+
+async def test_youtube_transcription_builds_segments_on_request(monkeypatch):
+    monkeypatch.setattr(transcription.YouTubeTranscriptApi, "get_transcript", lambda video_id, languages: SNIPPETS)
+    service = transcription.transcription_service
+    url = "https://www.youtube.com/watch?v=abcdefghijk"
+
+    _, metadata = await service.transcribe_youtube_video(url)
+    assert "segments" not in metadata
+    _, metadata = await service.transcribe_youtube_video(url, segments=True)
+    assert SegmentTrack.from_bytes(metadata["segments"]).text_between(0, 1) == "welcome to the lecture"
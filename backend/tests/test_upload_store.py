@@ -0,0 +1,94 @@
+"""
+Content-addressed upload store: deduplication, shared transcription and eviction
+"""
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from app.services.upload_store import MIN_IDLE_SECONDS, UploadStore, UploadTooLargeError
+
+
+def upload(data: bytes, filename: str = "lecture.mp3") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+def age(path: str, seconds: float):
+    """Make a stored recording look last used `seconds` ago"""
+    then = time.time() - seconds
+    for name in os.listdir(os.path.dirname(path)):
+        os.utime(os.path.join(os.path.dirname(path), name), (then, then))
+
+
+async def test_identical_uploads_are_stored_once(tmp_path):
+    store = UploadStore(str(tmp_path))
+    first = await store.save(upload(b"audio bytes"))
+    second = await store.save(upload(b"audio bytes", "copy.MP3"))
+    assert first.created and not second.created
+    assert first.path == second.path and first.path.endswith("audio.mp3")
+    assert os.listdir(tmp_path / "tmp") == []
+
+    with pytest.raises(UploadTooLargeError):
+        await store.save(upload(b"x" * 100), max_size=10)
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+async def test_concurrent_requests_share_one_transcription(tmp_path):
+    store = UploadStore(str(tmp_path))
+    stored = await store.save(upload(b"lecture"))
+    calls = []
+
+    async def transcribe(path):
+        calls.append(path)
+        await asyncio.sleep(0.02)
+        return "transcript"
+
+    results = await asyncio.gather(*(store.transcript_for(stored, transcribe) for _ in range(3)))
+    assert [transcript for transcript, _ in results] == ["transcript"] * 3
+    assert sorted(reused for _, reused in results) == [False, True, True]
+    assert len(calls) == 1
+    assert await store.transcript_for(stored, transcribe) == ("transcript", True)
+
+
+async def test_expired_recordings_are_evicted_but_recent_ones_kept(tmp_path):
+    store = UploadStore(str(tmp_path), max_age=86400)
+    old = await store.save(upload(b"old recording"))
+    store.put_transcript(old.digest, "old transcript")
+    recent = await store.save(upload(b"recent recording"))
+    age(old.path, 2 * 86400)
+    age(recent.path, MIN_IDLE_SECONDS + 60)
+
+    counts = store.evict()
+    assert counts["removed"] == 1
+    assert store.find(old.digest) is None and store.get_transcript(old.digest) is None
+    assert store.find(recent.digest) == recent.path
+
+
+async def test_least_recently_used_go_first_over_the_size_limit(tmp_path):
+    store = UploadStore(str(tmp_path), max_bytes=250)
+    saved = [await store.save(upload(bytes([n]) * 100)) for n in range(3)]
+    for n, stored in enumerate(saved):
+        age(stored.path, MIN_IDLE_SECONDS + 3000 - n * 1000)  # the first is the least recently used
+
+    assert store.evict()["removed"] == 1
+    assert [store.find(stored.digest) is not None for stored in saved] == [False, True, True]
+
+    await store.save(upload(bytes([1]) * 100))  # saving again counts as a use
+    store.max_bytes = 150
+    store.evict()
+    assert [store.find(stored.digest) is not None for stored in saved] == [False, True, False]
+
+
+async def test_recently_used_and_leftover_temporary_files(tmp_path):
+    store = UploadStore(str(tmp_path), max_bytes=1)
+    stored = await store.save(upload(b"in use"))
+    leftover = tmp_path / "tmp" / "crashed-upload"
+    leftover.write_bytes(b"partial")
+    os.utime(leftover, (time.time() - MIN_IDLE_SECONDS - 1,) * 2)
+
+    counts = store.evict()
+    assert counts == {"removed": 0, "removed_tmp": 1, "freed_bytes": 7}
+    assert store.find(stored.digest) == stored.path